@@ -4,39 +4,150 @@
 Предприятие: «Руда+» — добыча железной руды
 
 Скрипт генерирует HTML-отчёты профилирования для CSV-файлов Модуля 1.
+
+Режим --streaming читает CSV частями фиксированного размера и строит
+сливаемую статистику (profile_stats.py): память зависит от --chunksize,
+а не от размера файла. Подходит для sensor_readings на 86 млн строк.
+Это не отчёт YData-Profiling (он строится только по DataFrame целиком):
+HTML рендерит profile_html.py — то же имя файла и те же основные
+разделы, но без Spearman, поиска дубликатов строк и части статистик
+YData (асимметрия, эксцесс, MAD).
+
+Режим --workers N распределяет работу по пулу процессов: независимые
+датасеты профилируются параллельно, а колонки крупного датасета делятся
+между ядрами. Результат совпадает с последовательным запуском в том же
+режиме: без --streaming — отчёт YData, с --streaming — потоковый отчёт.
+
+Режим --sample N профилирует случайную выборку из N строк, набранную за
+один проход по файлу (sampling.py). С --stratify COL1,COL2 выборка
+стратифицированная: в каждой комбинации значений будет не меньше
+--min-per-stratum строк. Оценки средних, долей пропусков и категорий
+в отчёте дополняются доверительными интервалами.
+
+Сравнение групп (--compare-by shift,mine_id,equipment_id) строит для
+ore_production статистики всех значений ключа за один groupby
+(GroupedStats в profile_stats.py) и один отчёт на ключ — без
+отфильтрованных копий и отдельного профиля на каждую группу.
+
+Отпечатки файлов и потоковая статистика сохраняются в кэше
+(reports/.cache, profile_cache.py): неизменённый файл не профилируется
+повторно, а у файла, к которому только дописали строки, профилируется
+лишь новый «хвост». --no-cache отключает кэш.
+
+Полные DataFrame загружаются через datasets.py: типизированная схема
+(категории, узкие числа, даты) и колоночный кэш Feather, который читается
+через memory map. --no-cache отключает и его.
+
+--output stats сохраняет только посчитанную статистику (компактный JSON
+в reports/stats/, profile_store.py) без рендера HTML; --output both —
+и то, и другое. HTML по сохранённой статистике строит 10_render_reports.py.
 """
 
+import argparse
 import os
 import sys
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
+import numpy as np
 import pandas as pd
 from ydata_profiling import ProfileReport
 
+from datasets import load_dataset
+from instrumentation import METRICS_DIR, current, print_metrics, start
+from profile_cache import DEFAULT_MAX_AGE_DAYS, DEFAULT_MAX_BYTES, ProfileCache
+from profile_store import OUTPUT_MODES, outputs_exist, write_summary, write_ydata
+from profile_stats import (
+    DEFAULT_CHUNKSIZE,
+    CorrelationStats,
+    GroupedStats,
+    TableStats,
+    numeric_columns,
+)
+from sampling import (
+    DEFAULT_MIN_PER_STRATUM,
+    ROW,
+    WEIGHT,
+    attach_ci,
+    describe_ci,
+    describe_sample,
+    drop_service_columns,
+    estimate_ci,
+    sample_chunks,
+)
+
 # --- Пути ---
 SCRIPT_DIR = Path(__file__).resolve().parent
 PROJECT_DIR = SCRIPT_DIR.parent
 DATA_DIR = PROJECT_DIR.parent.parent / "Module_1" / "practice" / "data"
 REPORTS_DIR = PROJECT_DIR / "reports"
+CACHE_DIR = REPORTS_DIR / ".cache"
 
 # Создаём папку для отчётов
 REPORTS_DIR.mkdir(exist_ok=True)
 
+# --- Датасеты Модуля 1 ---
+DATASETS = [
+    ("equipment.csv", "Руда+ | Оборудование (equipment)"),
+    ("sensor_readings.csv", "Руда+ | Показания датчиков (sensor_readings)"),
+    ("ore_production.csv", "Руда+ | Добыча руды (ore_production)"),
+    ("downtime_events.csv", "Руда+ | Простои оборудования (downtime_events)"),
+]
+
+# --- Сравнение групп ore_production (--compare-by) ---
+COMPARE_TITLES = {
+    "shift": "Руда+ | Сравнение смен",
+    "mine_id": "Руда+ | Сравнение шахт",
+    "equipment_id": "Руда+ | Сравнение машин",
+}
+
 
-def profile_csv(filename: str, title: str, minimal: bool = False) -> pd.DataFrame:
-    """Загружает CSV и создаёт HTML-отчёт профилирования."""
+def profile_csv(filename: str, title: str, minimal: bool = False,
+                streaming: bool = False, chunksize: int = DEFAULT_CHUNKSIZE,
+                pool_size: int = 0, sample: int = None, stratify: list = None,
+                min_per_stratum: int = DEFAULT_MIN_PER_STRATUM,
+                cache: ProfileCache = None, output: str = "html") -> pd.DataFrame:
+    """Загружает CSV и создаёт HTML-отчёт профилирования.
+
+    В потоковом режиме DataFrame целиком не загружается — возвращается None.
+    pool_size — число потоков YData-Profiling для колонок (0 = все ядра).
+    sample — размер выборки; тогда возвращается выборка с весами, а её
+    описание лежит в df.attrs["sampling"].
+    cache — кэш профилей; если файл и отчёт не менялись, возвращается None.
+    output — что сохранять: "html", "stats" (только статистика) или "both".
+    """
 
     filepath = DATA_DIR / filename
     if not filepath.exists():
         print(f"  [!] Файл не найден: {filepath}")
         sys.exit(1)
 
-    print(f"  Загрузка {filename}...")
-    df = pd.read_csv(filepath)
-    print(f"  Загружено: {len(df)} строк, {len(df.columns)} колонок")
+    if sample:
+        return profile_csv_sample(filepath, title, sample, stratify, min_per_stratum,
+                                  minimal=minimal, streaming=streaming, chunksize=chunksize,
+                                  pool_size=pool_size, output=output)
+
+    if streaming:
+        profile_csv_streaming(filepath, title, chunksize, cache, output=output)
+        return None
 
     report_name = f"profile_{filename.replace('.csv', '')}.html"
     report_path = REPORTS_DIR / report_name
+    mode = "minimal" if minimal else "ydata"
+
+    lookup = cache.lookup(filepath, mode) if cache is not None else None
+    if lookup is not None and lookup["status"] == "hit" and outputs_exist(report_path, output):
+        print(f"  Файл не изменился, отчёт из кэша: {report_path}")
+        cache.touch(filepath, mode)
+        return None
+
+    metrics = current()
+    metrics.observe_file(filepath)
+    print(f"  Загрузка {filename}...")
+    with metrics.stage(filepath.stem), metrics.stage("load") as stage:
+        df = load_dataset(filepath.stem, DATA_DIR, use_cache=cache is not None)
+        stage.add_rows(len(df))
+    print(f"  Загружено: {len(df)} строк, {len(df.columns)} колонок")
 
     print(f"  Генерация отчёта ({report_name})...")
     profile = ProfileReport(
@@ -44,102 +155,462 @@ def profile_csv(filename: str, title: str, minimal: bool = False) -> pd.DataFram
         title=title,
         minimal=minimal,
         explorative=True,
+        pool_size=pool_size,
         correlations={
             "auto": {"calculate": True},
             "pearson": {"calculate": True},
             "spearman": {"calculate": True},
         },
     )
-    profile.to_file(report_path)
-    print(f"  Отчёт сохранён: {report_path}")
+    with metrics.stage(filepath.stem):
+        # статистики и корреляции YData считает вместе — при построении описания
+        with metrics.stage("statistics", rows=len(df)):
+            profile.get_description()
+        with metrics.stage("render" if output != "stats" else "store"):
+            written = write_ydata(profile, report_path, output)
+    print(f"  Сохранено: {', '.join(map(str, written))}")
+    if cache is not None:
+        cache.store(filepath, mode, lookup)
 
     return df
 
 
-def profile_comparison(df: pd.DataFrame, column: str, values: list, titles: list,
-                       report_name: str, main_title: str):
-    """Создаёт сравнительный отчёт для двух подмножеств данных."""
+def profile_csv_streaming(filepath: Path, title: str, chunksize: int = DEFAULT_CHUNKSIZE,
+                          cache: ProfileCache = None, lookup: dict = None,
+                          output: str = "html") -> TableStats:
+    """Потоковое профилирование: CSV читается частями по chunksize строк.
+
+    lookup — готовый результат cache.lookup(), чтобы не хешировать файл повторно.
+    """
 
-    if len(values) < 2:
-        print(f"  [!] Недостаточно значений для сравнения по колонке '{column}'")
-        return
+    if cache is not None and lookup is None:
+        lookup = cache.lookup(filepath, "streaming")
+    stats = cached_stats(filepath, lookup, cache, chunksize)
+    unchanged = stats is not None and lookup["status"] == "hit"
+    if unchanged and outputs_exist(REPORTS_DIR / f"profile_{filepath.stem}.html", output):
+        print(f"  Файл не изменился, отчёт из кэша ({stats.n_rows} строк)")
+        cache.touch(filepath, "streaming")
+        return stats
 
-    df1 = df[df[column] == values[0]]
-    df2 = df[df[column] == values[1]]
+    metrics = current()
+    metrics.observe_file(filepath)
+    if stats is None:
+        print(f"  Потоковое чтение {filepath.name} (по {chunksize} строк)...")
+        stats = TableStats()
+        with metrics.stage(filepath.stem), pd.read_csv(filepath, chunksize=chunksize) as reader:
+            for chunk in metrics.chunks(reader):
+                with metrics.stage("statistics", rows=len(chunk)):
+                    stats.update(chunk)
+    print(f"  Обработано: {stats.n_rows} строк, {len(stats.columns)} колонок, {stats.n_chunks} частей")
 
-    if df1.empty or df2.empty:
-        print(f"  [!] Одна из подвыборок пуста, сравнение невозможно")
-        return
+    write_streaming_report(stats, filepath.stem, title, output=output)
+    if cache is not None and not unchanged:
+        cache.store(filepath, "streaming", lookup, stats)
+    return stats
 
-    print(f"  Сравнение: {titles[0]} ({len(df1)} строк) vs {titles[1]} ({len(df2)} строк)")
 
-    report1 = ProfileReport(df1, title=titles[0], minimal=True)
-    report2 = ProfileReport(df2, title=titles[1], minimal=True)
+def cached_stats(filepath: Path, lookup: dict, cache: ProfileCache,
+                 chunksize: int = DEFAULT_CHUNKSIZE) -> TableStats:
+    """Статистика из кэша; для дописанного файла — дополненная «хвостом».
 
-    comparison = report1.compare(report2)
+    Возвращает None, если файл нужно профилировать целиком.
+    """
 
+    if lookup is None or lookup["status"] == "miss":
+        return None
+    if lookup["status"] == "hit":
+        return cache.load_stats(lookup["digest"])
+
+    stats = cache.load_stats(lookup["entry"]["digest"])
+    if stats is None:
+        return None
+    old_rows = stats.n_rows
+    header = list(pd.read_csv(filepath, nrows=0).columns)
+    print(f"  К {filepath.name} дописаны строки: чтение с байта {lookup['entry']['size']}...")
+    metrics = current()
+    with open(filepath, "rb") as f, metrics.stage(filepath.stem):
+        f.seek(lookup["entry"]["size"])
+        with pd.read_csv(f, header=None, names=header, chunksize=chunksize) as reader:
+            for chunk in metrics.chunks(reader):
+                with metrics.stage("statistics", rows=len(chunk)):
+                    stats.update(chunk)
+    print(f"  Новых строк: {stats.n_rows - old_rows}")
+    return stats
+
+
+def write_streaming_report(stats: TableStats, name: str, title: str,
+                           sampling: tuple = None, output: str = "html"):
+    """Сохраняет HTML-отчёт и/или статистику (output) по потоковой статистике.
+
+    sampling — (описание выборки, интервалы) для отчёта по выборке.
+    """
+
+    report_name = f"profile_{name}.html"
     report_path = REPORTS_DIR / report_name
-    comparison.to_file(report_path)
-    print(f"  Сравнительный отчёт: {report_path}")
+
+    print(f"  Генерация отчёта ({report_name})..." if output != "stats" else "  Сохранение статистики...")
+    with current().stage(name), current().stage("render" if output != "stats" else "store"):
+        summary = stats.summary(title)
+        if sampling is not None:
+            summary = attach_ci(summary, *sampling)
+        written = write_summary(summary, report_path, output)
+    print(f"  Сохранено: {', '.join(map(str, written))}")
+
+
+# ============================================================
+# Профилирование по выборке
+# ============================================================
+
+def profile_csv_sample(filepath: Path, title: str, size: int, stratify: list = None,
+                       min_per_stratum: int = DEFAULT_MIN_PER_STRATUM, minimal: bool = False,
+                       streaming: bool = False, chunksize: int = DEFAULT_CHUNKSIZE,
+                       pool_size: int = 0, output: str = "html") -> pd.DataFrame:
+    """Отчёт по выборке из size строк, набранной за один проход по файлу."""
+
+    header = list(pd.read_csv(filepath, nrows=0).columns)
+    strata = [c for c in stratify or [] if c in header]
+    if stratify and len(strata) < len(stratify):
+        print(f"  [!] Колонок {sorted(set(stratify) - set(strata))} нет — они не используются")
+
+    print(f"  Выборка {size} строк из {filepath.name}"
+          + (f", страты: {', '.join(strata)}" if strata else "") + "...")
+    metrics = current()
+    metrics.observe_file(filepath)
+    with metrics.stage(filepath.stem), pd.read_csv(filepath, chunksize=chunksize) as reader:
+        with metrics.stage("sample"):
+            sample, info = sample_chunks(metrics.chunks(reader), size, strata, min_per_stratum)
+    sample = sample.drop(columns=[ROW])
+    print(f"  {describe_sample(info)}")
+
+    ci = estimate_ci(sample, info)
+    data = drop_service_columns(sample)
+
+    if streaming:
+        stats = TableStats()
+        stats.update(data)
+        write_streaming_report(stats, filepath.stem, title, sampling=(info, ci), output=output)
+    else:
+        report_name = f"profile_{filepath.stem}.html"
+        print(f"  Генерация отчёта ({report_name})...")
+        profile = ProfileReport(
+            data,
+            title=title,
+            minimal=minimal,
+            explorative=True,
+            pool_size=pool_size,
+            dataset={"description": describe_sample(info)},
+            variables={"descriptions": {name: describe_ci(c) for name, c in ci.items()}},
+        )
+        with metrics.stage(filepath.stem), metrics.stage("render" if output != "stats" else "store"):
+            written = write_ydata(profile, REPORTS_DIR / report_name, output)
+        print(f"  Сохранено: {', '.join(map(str, written))}")
+
+    sample.attrs["sampling"] = info
+    return sample
+
+
+# ============================================================
+# Параллельный запуск
+# ============================================================
+
+def profile_columns(filepath: Path, columns: list, corr_columns: list,
+                    chunksize: int = DEFAULT_CHUNKSIZE) -> TableStats:
+    """Потоковая статистика только для части колонок файла.
+
+    Части читаются с теми же границами, что и в последовательном режиме,
+    поэтому статистика каждой колонки получается такой же.
+    """
+
+    usecols = list(dict.fromkeys(columns + corr_columns))
+    stats = TableStats(columns, correlations=False)
+    if corr_columns:
+        stats.corr = CorrelationStats(corr_columns)
+    with pd.read_csv(filepath, usecols=usecols, chunksize=chunksize) as reader:
+        for chunk in reader:
+            stats.update(chunk[columns])
+            if stats.corr is not None:
+                stats.corr.update(chunk)
+    return stats
+
+
+def plan_tasks(datasets: list, workers: int, streaming: bool,
+               chunksize: int = DEFAULT_CHUNKSIZE) -> list:
+    """Делит работу на задачи для пула процессов.
+
+    Каждому датасету достаётся доля ядер, пропорциональная размеру файла.
+    В потоковом режиме колонки датасета делятся на столько же групп
+    (плюс отдельная задача для корреляций), в режиме YData доля ядер
+    становится pool_size отчёта. Крупные задачи идут первыми.
+    """
+
+    sizes = {filename: (DATA_DIR / filename).stat().st_size for filename, _ in datasets}
+    total = sum(sizes.values()) or 1
+    tasks = []
+    for filename, title in datasets:
+        share = max(1, round(workers * sizes[filename] / total))
+        task = {"filename": filename, "title": title, "columns": None, "corr_columns": [],
+                "share": share, "weight": sizes[filename]}
+        if not streaming or share == 1:
+            tasks.append(task)
+            continue
+
+        head = pd.read_csv(DATA_DIR / filename, nrows=chunksize)
+        groups = [list(g) for g in np.array_split(np.array(head.columns, dtype=object),
+                                                  min(share, len(head.columns)))]
+        corr_columns = numeric_columns(head)
+        if corr_columns:
+            groups.append([])
+        for group in groups:
+            tasks.append({**task, "columns": group,
+                          "corr_columns": corr_columns if not group else [],
+                          "weight": sizes[filename] * max(len(group), 1) / len(head.columns)})
+
+    return sorted(tasks, key=lambda t: t["weight"], reverse=True)
+
+
+def _run_task(task: dict, streaming: bool, chunksize: int, minimal: bool, output: str):
+    """Выполняется в дочернем процессе."""
+    if task["columns"] is None and streaming:
+        return task, profile_csv_streaming(DATA_DIR / task["filename"], task["title"], chunksize,
+                                           output=output)
+    if task["columns"] is None:
+        profile_csv(task["filename"], task["title"], minimal=minimal,
+                    chunksize=chunksize, pool_size=task["share"], output=output)
+        return task, None
+    stats = profile_columns(DATA_DIR / task["filename"], task["columns"],
+                            task["corr_columns"], chunksize)
+    return task, stats
+
+
+def profile_parallel(datasets: list, workers: int, streaming: bool = False,
+                     chunksize: int = DEFAULT_CHUNKSIZE, minimal: bool = False,
+                     cache: ProfileCache = None, output: str = "html"):
+    """Профилирует датасеты в пуле из workers процессов.
+
+    С кэшем неизменённые и дописанные файлы обрабатываются сразу в
+    основном процессе (хвост невелик), в пул уходят только остальные.
+    """
+
+    for filename, _ in datasets:
+        if not (DATA_DIR / filename).exists():
+            print(f"  [!] Файл не найден: {DATA_DIR / filename}")
+            sys.exit(1)
+        # процессы пула метрики не пишут — возраст источников замеряется здесь
+        current().observe_file(DATA_DIR / filename)
+
+    mode = "streaming" if streaming else ("minimal" if minimal else "ydata")
+    lookups = {}
+    if cache is not None:
+        pending = []
+        for filename, title in datasets:
+            filepath = DATA_DIR / filename
+            lookup = lookups[filename] = cache.lookup(filepath, mode)
+            report_path = REPORTS_DIR / f"profile_{filepath.stem}.html"
+            if streaming and lookup["status"] != "miss":
+                profile_csv_streaming(filepath, title, chunksize, cache, lookup, output)
+            elif not streaming and lookup["status"] == "hit" and outputs_exist(report_path, output):
+                print(f"  {filename}: файл не изменился, отчёт из кэша")
+                cache.touch(filepath, mode)
+            else:
+                pending.append((filename, title))
+        datasets = pending
+        if not datasets:
+            return
+
+    tasks = plan_tasks(datasets, workers, streaming, chunksize)
+    print(f"  Задач: {len(tasks)}, процессов: {workers}")
+
+    parts = {}
+    # внутри процессов пула этапы не замеряются — только общее время пула
+    with current().stage("parallel"), ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_run_task, task, streaming, chunksize, minimal, output) for task in tasks]
+        for future in as_completed(futures):
+            task, stats = future.result()
+            if task["columns"] is not None:
+                parts.setdefault(task["filename"], []).append(stats)
+            elif cache is not None:
+                cache.store(DATA_DIR / task["filename"], mode, lookups[task["filename"]], stats)
+
+    # Сборка датасетов, разделённых по колонкам
+    for filename, title in datasets:
+        if filename not in parts:
+            continue
+        order = list(pd.read_csv(DATA_DIR / filename, nrows=0).columns)
+        stats = TableStats.join(parts[filename], order)
+        print(f"  {filename}: {stats.n_rows} строк, собрано из {len(parts[filename])} задач")
+        write_streaming_report(stats, Path(filename).stem, title, output=output)
+        if cache is not None:
+            cache.store(DATA_DIR / filename, mode, lookups[filename], stats)
+
+
+def compare_groups(df: pd.DataFrame, keys: list) -> dict:
+    """Статистики всех групп по каждому ключу за один groupby ({ключ: GroupedStats}).
+
+    У выборки (--sample) вместо строк суммируются веса — оценки по группам
+    остаются несмещёнными.
+    """
+    weight = WEIGHT if WEIGHT in df.columns else None
+    columns = list(drop_service_columns(df).columns)
+    result = {}
+    for key in keys:
+        if key not in df.columns:
+            print(f"  [!] Колонка '{key}' не найдена")
+            continue
+        stats = GroupedStats(key, weight=weight, columns=[c for c in columns if c != key])
+        with current().stage("comparison"), current().stage(key, rows=len(df)):
+            stats.update(df)
+        result[key] = stats
+    return result
+
+
+def compare_groups_streaming(filepath: Path, keys: list, chunksize: int = DEFAULT_CHUNKSIZE) -> dict:
+    """То же по CSV частями: один проход по файлу для всех ключей."""
+    header = list(pd.read_csv(filepath, nrows=0).columns)
+    result = {key: GroupedStats(key) for key in keys if key in header}
+    for key in set(keys) - set(result):
+        print(f"  [!] Колонка '{key}' не найдена")
+    metrics = current()
+    with metrics.stage("comparison"), pd.read_csv(filepath, chunksize=chunksize) as reader:
+        for chunk in metrics.chunks(reader):
+            with metrics.stage("statistics", rows=len(chunk)):
+                for stats in result.values():
+                    stats.update(chunk)
+    return result
+
+
+def write_comparison_report(stats: GroupedStats, report_name: str, output: str = "html") -> Path:
+    title = COMPARE_TITLES.get(stats.key, f"Руда+ | Сравнение по {stats.key}")
+    with current().stage("comparison"), current().stage("render" if output != "stats" else "store"):
+        summary = stats.summary(title)
+        if len(summary["groups"]) < 2:
+            print(f"  [!] По колонке '{stats.key}' одна группа, сравнение невозможно")
+            return None
+        report_path = REPORTS_DIR / report_name
+        written = write_summary(summary, report_path, output, kind="group_comparison")
+    sizes = ", ".join(f"{g}: {n}" for g, n in list(zip(summary["groups"], summary["n"]))[:10])
+    more = " …" if len(summary["groups"]) > 10 else ""
+    print(f"  {stats.key}: групп — {len(summary['groups'])} ({sizes}{more})")
+    print(f"  Сохранено: {', '.join(map(str, written))}")
+    return report_path
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Профилирование CSV-файлов «Руда+»")
+    parser.add_argument("--streaming", action="store_true",
+                        help="потоковый режим: чтение частями, сливаемая статистика")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE,
+                        help=f"строк в одной части (по умолчанию {DEFAULT_CHUNKSIZE})")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="число процессов (1 = последовательный запуск)")
+    parser.add_argument("--sample", type=int, metavar="N",
+                        help="профилировать случайную выборку из N строк каждого файла")
+    parser.add_argument("--stratify", metavar="COL1,COL2",
+                        help="колонки страт для --sample (например equipment_id,sensor_type,quality_flag)")
+    parser.add_argument("--min-per-stratum", type=int, default=DEFAULT_MIN_PER_STRATUM,
+                        help=f"минимум строк в страте (по умолчанию {DEFAULT_MIN_PER_STRATUM})")
+    parser.add_argument("--compare-by", default="shift", metavar="COL1,COL2",
+                        help="колонки ore_production для сравнения групп (shift, mine_id, equipment_id)")
+    parser.add_argument("--output", choices=OUTPUT_MODES, default="html",
+                        help="html — отчёты, stats — только статистика в reports/stats/ "
+                             "(HTML потом строит 10_render_reports.py), both — то и другое")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="не использовать кэш профилей (reports/.cache)")
+    parser.add_argument("--cache-max-mb", type=int, default=DEFAULT_MAX_BYTES // 1024 ** 2,
+                        help=f"предельный размер кэша, МБ (по умолчанию {DEFAULT_MAX_BYTES // 1024 ** 2})")
+    parser.add_argument("--cache-max-age-days", type=float, default=DEFAULT_MAX_AGE_DAYS,
+                        help=f"срок хранения записей кэша, дней (по умолчанию {DEFAULT_MAX_AGE_DAYS})")
+    parser.add_argument("--metrics-dir", type=Path, default=METRICS_DIR,
+                        help="куда писать метрики этапов (JSON и Prometheus)")
+    parser.add_argument("--no-metrics", action="store_true",
+                        help="не замерять этапы")
+    args = parser.parse_args()
+    args.stratify = args.stratify.split(",") if args.stratify else []
+    args.compare_by = [c for c in args.compare_by.split(",") if c]
+    return args
 
 
 def main():
+    args = parse_args()
+    metrics = start("01_ydata_profiling", enabled=not args.no_metrics)
+    mode = {"streaming": args.streaming, "chunksize": args.chunksize, "output": args.output}
+
+    # выборка каждый раз новая — её результаты не кэшируются
+    cache = None
+    if not (args.no_cache or args.sample):
+        cache = ProfileCache(CACHE_DIR, args.cache_max_mb * 1024 ** 2, args.cache_max_age_days)
+
     print("=" * 60)
     print("YData-Profiling: Профилирование данных «Руда+»")
     print("=" * 60)
 
-    # --- 1. Оборудование ---
-    print("\n[1/5] Профилирование equipment.csv")
-    profile_csv(
-        "equipment.csv",
-        "Руда+ | Оборудование (equipment)",
-    )
+    # --- 1–4. Профилирование датасетов ---
+    df_prod = None
+    if args.sample:
+        # выборки небольшие — файлы читаются по очереди, ядра отдаются YData
+        mode.update(sample=args.sample, stratify=args.stratify,
+                    min_per_stratum=args.min_per_stratum, pool_size=args.workers if args.workers > 1 else 0)
+        for i, (filename, title) in enumerate(DATASETS, start=1):
+            print(f"\n[{i}/5] Профилирование {filename} (выборка)")
+            df = profile_csv(filename, title, **mode)
+            if filename == "ore_production.csv":
+                df_prod = df
+    elif args.workers > 1:
+        print(f"\n[1-4/5] Параллельное профилирование ({args.workers} процессов)")
+        profile_parallel(DATASETS, args.workers, cache=cache, **mode)
+    else:
+        for i, (filename, title) in enumerate(DATASETS, start=1):
+            print(f"\n[{i}/5] Профилирование {filename}")
+            df = profile_csv(filename, title, cache=cache, **mode)
+            if filename == "ore_production.csv":
+                df_prod = df
 
-    # --- 2. Показания датчиков ---
-    print("\n[2/5] Профилирование sensor_readings.csv")
-    profile_csv(
-        "sensor_readings.csv",
-        "Руда+ | Показания датчиков (sensor_readings)",
-    )
+    # --- 5. Сравнение групп: все значения ключа за один проход ---
+    print(f"\n[5/5] Сравнение групп ore_production: {', '.join(args.compare_by)}")
+    prod_path = DATA_DIR / "ore_production.csv"
+    reports = {key: f"profile_production_by_{key}.html" for key in args.compare_by}
+    pending = []
+    for key in args.compare_by:
+        lookup = cache.lookup(prod_path, f"comparison:{key}") if cache is not None else None
+        if (lookup is not None and lookup["status"] == "hit"
+                and outputs_exist(REPORTS_DIR / reports[key], args.output)):
+            print(f"  {key}: файл не изменился, отчёт из кэша")
+            cache.touch(prod_path, f"comparison:{key}")
+        else:
+            pending.append((key, lookup))
 
-    # --- 3. Добыча руды ---
-    print("\n[3/5] Профилирование ore_production.csv")
-    df_prod = profile_csv(
-        "ore_production.csv",
-        "Руда+ | Добыча руды (ore_production)",
-    )
+    if pending:
+        keys = [key for key, _ in pending]
+        if df_prod is not None:
+            grouped = compare_groups(df_prod, keys)
+        elif args.streaming:
+            grouped = compare_groups_streaming(prod_path, keys, args.chunksize)
+        else:
+            with metrics.stage("ore_production"), metrics.stage("load") as stage:
+                df_prod = load_dataset("ore_production", DATA_DIR, use_cache=cache is not None)
+                stage.add_rows(len(df_prod))
+            grouped = compare_groups(df_prod, keys)
+        for key, lookup in pending:
+            if key in grouped and write_comparison_report(grouped[key], reports[key], args.output):
+                if cache is not None:
+                    cache.store(prod_path, f"comparison:{key}", lookup)
 
-    # --- 4. Простои ---
-    print("\n[4/5] Профилирование downtime_events.csv")
-    profile_csv(
-        "downtime_events.csv",
-        "Руда+ | Простои оборудования (downtime_events)",
-    )
+    if cache is not None:
+        evicted = cache.evict()
+        if evicted:
+            print(f"\n  Из кэша удалено записей: {evicted}")
 
-    # --- 5. Сравнительный отчёт: смена 1 vs смена 2 ---
-    print("\n[5/5] Сравнительный отчёт: Смена 1 vs Смена 2")
-    if "shift" in df_prod.columns:
-        shifts = sorted(df_prod["shift"].dropna().unique())
-        if len(shifts) >= 2:
-            profile_comparison(
-                df_prod,
-                column="shift",
-                values=[shifts[0], shifts[1]],
-                titles=[f"Смена {shifts[0]}", f"Смена {shifts[1]}"],
-                report_name="profile_production_comparison.html",
-                main_title="Руда+ | Сравнение смен",
-            )
-        else:
-            print("  [!] В данных только одна смена, сравнение невозможно")
-    else:
-        print("  [!] Колонка 'shift' не найдена")
+    if metrics.enabled:
+        print_metrics(metrics.write(args.metrics_dir))
 
     # --- Итог ---
     print("\n" + "=" * 60)
     print("Готово! Отчёты сохранены в папке:")
     print(f"  {REPORTS_DIR}")
     print()
-    print("Откройте HTML-файлы в браузере для изучения.")
+    if args.output == "stats":
+        print("Сохранена только статистика (reports/stats/); HTML: python 10_render_reports.py")
+    else:
+        print("Откройте HTML-файлы в браузере для изучения.")
     print("=" * 60)
 
 
@@ -6,19 +6,58 @@
 Скрипт создаёт Expectation Suite для каждого CSV-файла Модуля 1,
 валидирует «чистые» данные, затем создаёт «грязную» копию и показывает,
 как GX ловит ошибки качества.
+
+Наборы ожиданий описаны декларативно в expectation_suites.py. Бэкенд
+--backend compiled выполняет те же наборы собственным векторизованным
+движком (validation_engine.py): каждая колонка просматривается один раз,
+а не по разу на каждое ожидание. Great Expectations для него не нужен.
+
+Ссылочная целостность (правило QR-003) проверяется для всех связей из
+etl_config.json (Модуль 4) модулем referential_integrity.py.
+
+CSV загружаются через datasets.py (типизированная схема и колоночный
+кэш, --no-cache — разбирать CSV заново).
+
+Для «грязных» данных строки делятся на чистые и карантин с номерами
+нарушенных правил (quarantine.py); --quarantine-dir DIR сохраняет оба
+выхода в Parquet. --quarantine-file CSV делит так же большой файл
+(например, из synthetic_data.py), читая его частями; набор ожиданий
+выбирается по имени файла.
 """
 
-import copy
+import argparse
+import time
 from pathlib import Path
 
 import pandas as pd
-import great_expectations as gx
-from great_expectations.expectations.expectation import ExpectationConfiguration
+
+from datasets import ETL_CONFIG, load_dataset, memory_mb
+from expectation_suites import (
+    downtime_events_suite,
+    equipment_suite,
+    ore_production_suite,
+    quality_rule_suite,
+    sensor_readings_suite,
+)
+from instrumentation import METRICS_DIR, current, print_metrics, start
+from quarantine import DEFAULT_CHUNKSIZE, QuarantineSplitter, QuarantineWriter, print_quarantine, quarantine_file
+from referential_integrity import check_dataframes, check_files, load_config, print_integrity_results
+from validation_engine import validate_dataframe
 
 # --- Пути ---
 SCRIPT_DIR = Path(__file__).resolve().parent
 PROJECT_DIR = SCRIPT_DIR.parent
 DATA_DIR = PROJECT_DIR.parent.parent / "Module_1" / "practice" / "data"
+# Справочники (mines, operators, equipment_types) — из практики Модуля 2
+REFERENCE_DIR = PROJECT_DIR.parent / "practice" / "data"
+QUARANTINE_DIR = PROJECT_DIR / "reports" / "quarantine"
+
+SUITES = {
+    "equipment": equipment_suite,
+    "sensor_readings": sensor_readings_suite,
+    "ore_production": ore_production_suite,
+    "downtime_events": downtime_events_suite,
+}
 
 
 # ============================================================
@@ -58,94 +97,41 @@ def print_results(results: dict, dataset_name: str):
 # Функции валидации для каждого датасета
 # ============================================================
 
-def validate_equipment(context, df: pd.DataFrame) -> dict:
-    """Валидация equipment.csv."""
+# источник и ассет GX создаются один раз на контекст и датасет:
+# add_or_update_pandas() на каждый вызов пересобирал бы их заново
+_BATCH_DEFINITIONS = {}
 
-    ds = context.sources.add_or_update_pandas("equipment_ds")
-    asset = ds.add_dataframe_asset("equipment")
-    batch_def = asset.add_batch_definition_whole_dataframe("batch")
-    batch = batch_def.get_batch(batch_parameters={"dataframe": df})
-
-    # --- Структурные проверки ---
-    expectations = [
-        # PK: не NULL, уникальный
-        batch.expect_column_values_to_not_be_null("equipment_id"),
-        batch.expect_column_values_to_be_unique("equipment_id"),
-
-        # Обязательные поля
-        batch.expect_column_values_to_not_be_null("equipment_name"),
-        batch.expect_column_values_to_not_be_null("mine_id"),
-
-        # Допустимые значения
-        batch.expect_column_values_to_be_in_set(
-            "mine_id", ["MINE-1", "MINE-2"]
-        ),
-        batch.expect_column_values_to_be_in_set(
-            "status", ["В работе", "На ТО", "Простой"]
-        ),
-
-        # --- Бизнес-правила ---
-        batch.expect_column_values_to_be_between(
-            "year_manufactured", min_value=2010, max_value=2026
-        ),
-        batch.expect_column_values_to_be_between(
-            "engine_hours", min_value=0
-        ),
-        batch.expect_column_values_to_be_between(
-            "max_payload_tons", min_value=0, max_value=100
-        ),
-
-        # --- Полнота ---
-        batch.expect_table_row_count_to_be_between(min_value=10),
-    ]
 
-    # Собираем результаты
-    results = {
-        "success": all(e["success"] for e in expectations),
-        "results": expectations,
-    }
-    return results
-
-
-def validate_sensor_readings(context, df: pd.DataFrame, df_equipment: pd.DataFrame) -> dict:
-    """Валидация sensor_readings.csv."""
-
-    ds = context.sources.add_or_update_pandas("sensors_ds")
-    asset = ds.add_dataframe_asset("sensors")
-    batch_def = asset.add_batch_definition_whole_dataframe("batch")
-    batch = batch_def.get_batch(batch_parameters={"dataframe": df})
-
-    equipment_ids = df_equipment["equipment_id"].tolist()
+def batch_definition(context, name: str):
+    """Определение батча GX для датасета name (кэшируется)."""
+    key = (id(context), name)
+    if key not in _BATCH_DEFINITIONS:
+        ds = context.sources.add_or_update_pandas(f"{name}_ds")
+        asset = ds.add_dataframe_asset(name)
+        _BATCH_DEFINITIONS[key] = asset.add_batch_definition_whole_dataframe("batch")
+    return _BATCH_DEFINITIONS[key]
 
-    expectations = [
-        # PK
-        batch.expect_column_values_to_not_be_null("reading_id"),
-        batch.expect_column_values_to_be_unique("reading_id"),
 
-        # Обязательные поля
-        batch.expect_column_values_to_not_be_null("equipment_id"),
-        batch.expect_column_values_to_not_be_null("sensor_type"),
-        batch.expect_column_values_to_not_be_null("reading_timestamp"),
+def run_suite(context, name: str, df: pd.DataFrame, suite: list, backend: str = "gx") -> dict:
+    """Выполняет набор ожиданий выбранным бэкендом.
 
-        # Допустимые значения
-        batch.expect_column_values_to_be_in_set(
-            "quality_flag", ["OK", "WARN", "ALARM"]
-        ),
+    gx       — каждое ожидание вызывается через batch.expect_*() GX
+    compiled — весь набор за один проход по колонкам (validation_engine.py)
+    """
+    if backend == "compiled":
+        return validate_dataframe(df, suite)
 
-        # Бизнес-правила
-        batch.expect_column_values_to_be_between(
-            "reading_value", min_value=0
-        ),
+    batch = batch_definition(context, name).get_batch(batch_parameters={"dataframe": df})
 
-        # Ссылочная целостность: equipment_id должен быть в справочнике
-        batch.expect_column_values_to_be_in_set(
-            "equipment_id", equipment_ids
-        ),
-
-        # Полнота
-        batch.expect_table_row_count_to_be_between(min_value=40),
-    ]
+    # в GX каждое ожидание — отдельный проход по данным, замеряется каждое
+    metrics = current()
+    expectations = []
+    for exp in suite:
+        label = exp["kwargs"].get("column", exp["kwargs"].get("column_A", "table"))
+        with metrics.stage(f"{exp['expectation_type']}:{label}"):
+            expectations.append(getattr(batch, exp["expectation_type"])(**exp["kwargs"]))
 
+    # Собираем результаты
     results = {
         "success": all(e["success"] for e in expectations),
         "results": expectations,
@@ -153,91 +139,30 @@ def validate_sensor_readings(context, df: pd.DataFrame, df_equipment: pd.DataFra
     return results
 
 
-def validate_ore_production(context, df: pd.DataFrame) -> dict:
-    """Валидация ore_production.csv."""
+def validate_equipment(context, df: pd.DataFrame, backend: str = "gx") -> dict:
+    """Валидация equipment.csv."""
+    return run_suite(context, "equipment", df, equipment_suite(), backend)
 
-    ds = context.sources.add_or_update_pandas("production_ds")
-    asset = ds.add_dataframe_asset("production")
-    batch_def = asset.add_batch_definition_whole_dataframe("batch")
-    batch = batch_def.get_batch(batch_parameters={"dataframe": df})
-
-    expectations = [
-        # PK
-        batch.expect_column_values_to_not_be_null("production_id"),
-        batch.expect_column_values_to_be_unique("production_id"),
-
-        # Обязательные поля
-        batch.expect_column_values_to_not_be_null("mine_id"),
-        batch.expect_column_values_to_not_be_null("equipment_id"),
-        batch.expect_column_values_to_not_be_null("production_date"),
-
-        # Допустимые значения
-        batch.expect_column_values_to_be_in_set("shift", [1, 2]),
-        batch.expect_column_values_to_be_in_set(
-            "status", ["Завершена", "Прервана"]
-        ),
-
-        # Бизнес-правила: диапазоны
-        batch.expect_column_values_to_be_between(
-            "tonnage_extracted", min_value=0, max_value=500
-        ),
-        batch.expect_column_values_to_be_between(
-            "fe_content_pct", min_value=0, max_value=100
-        ),
-        batch.expect_column_values_to_be_between(
-            "moisture_pct", min_value=0, max_value=100
-        ),
-
-        # Полнота
-        batch.expect_table_row_count_to_be_between(min_value=10),
-    ]
 
-    results = {
-        "success": all(e["success"] for e in expectations),
-        "results": expectations,
-    }
-    return results
+def validate_sensor_readings(context, df: pd.DataFrame, backend: str = "gx") -> dict:
+    """Валидация sensor_readings.csv (без FK — см. validate_referential_integrity)."""
+    return run_suite(context, "sensors", df, sensor_readings_suite(), backend)
 
 
-def validate_downtime_events(context, df: pd.DataFrame) -> dict:
-    """Валидация downtime_events.csv."""
+def validate_referential_integrity() -> list:
+    """QR-003: связи из dependencies в etl_config.json и FOREIGN_KEYS."""
+    config = load_config(ETL_CONFIG)
+    return check_files(config, [DATA_DIR, REFERENCE_DIR])
 
-    ds = context.sources.add_or_update_pandas("downtime_ds")
-    asset = ds.add_dataframe_asset("downtime")
-    batch_def = asset.add_batch_definition_whole_dataframe("batch")
-    batch = batch_def.get_batch(batch_parameters={"dataframe": df})
-
-    expectations = [
-        # PK
-        batch.expect_column_values_to_not_be_null("event_id"),
-        batch.expect_column_values_to_be_unique("event_id"),
-
-        # Обязательные поля
-        batch.expect_column_values_to_not_be_null("equipment_id"),
-        batch.expect_column_values_to_not_be_null("event_type"),
-
-        # Допустимые значения
-        batch.expect_column_values_to_be_in_set(
-            "severity", ["Низкая", "Средняя", "Высокая", "Критическая", "Плановое"]
-        ),
-        batch.expect_column_values_to_be_in_set(
-            "event_type", ["Незапланированный", "Плановое ТО"]
-        ),
-
-        # Бизнес-правила
-        batch.expect_column_values_to_be_between(
-            "duration_minutes", min_value=1, max_value=1440
-        ),
-
-        # Полнота
-        batch.expect_table_row_count_to_be_between(min_value=5),
-    ]
 
-    results = {
-        "success": all(e["success"] for e in expectations),
-        "results": expectations,
-    }
-    return results
+def validate_ore_production(context, df: pd.DataFrame, backend: str = "gx") -> dict:
+    """Валидация ore_production.csv."""
+    return run_suite(context, "production", df, ore_production_suite(), backend)
+
+
+def validate_downtime_events(context, df: pd.DataFrame, backend: str = "gx") -> dict:
+    """Валидация downtime_events.csv."""
+    return run_suite(context, "downtime", df, downtime_events_suite(), backend)
 
 
 # ============================================================
@@ -262,9 +187,16 @@ def create_dirty_data(df: pd.DataFrame) -> pd.DataFrame:
     # 4. Отрицательный тоннаж
     dirty.loc[dirty.index[3], "tonnage_extracted"] = -10.0
 
-    # 5. Некорректный статус
+    # 5. Некорректный статус (в категориальную колонку — новой категорией)
+    if isinstance(dirty["status"].dtype, pd.CategoricalDtype):
+        dirty["status"] = dirty["status"].cat.add_categories(["Неизвестно"])
     dirty.loc[dirty.index[4], "status"] = "Неизвестно"
 
+    # 6. Ссылка на несуществующую машину
+    if isinstance(dirty["equipment_id"].dtype, pd.CategoricalDtype):
+        dirty["equipment_id"] = dirty["equipment_id"].cat.add_categories(["EQ-999"])
+    dirty.loc[dirty.index[5], "equipment_id"] = "EQ-999"
+
     return dirty
 
 
@@ -272,7 +204,39 @@ def create_dirty_data(df: pd.DataFrame) -> pd.DataFrame:
 # Главная функция
 # ============================================================
 
+def parse_args():
+    parser = argparse.ArgumentParser(description="Валидация CSV-файлов «Руда+»")
+    parser.add_argument("--backend", choices=["gx", "compiled"], default="gx",
+                        help="gx — Great Expectations, compiled — однопроходный движок")
+    parser.add_argument("--quarantine-dir", type=Path, default=None,
+                        help="сохранить чистые строки и карантин грязных данных")
+    parser.add_argument("--quarantine-format", choices=["parquet", "csv"], default="parquet")
+    parser.add_argument("--quarantine-file", type=Path, default=None,
+                        help="разделить большой CSV (equipment, sensor_readings, ... по имени) на чистые строки и карантин")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE,
+                        help="строк в части для --quarantine-file")
+    parser.add_argument("--no-cache", action="store_true",
+                        help="разбирать CSV заново, без колоночного кэша")
+    parser.add_argument("--metrics-dir", type=Path, default=METRICS_DIR,
+                        help="куда писать метрики этапов (JSON и Prometheus)")
+    parser.add_argument("--no-metrics", action="store_true",
+                        help="не замерять этапы")
+    return parser.parse_args()
+
+
+def make_context(backend: str):
+    """Контекст GX (для бэкенда compiled не нужен)."""
+    if backend != "gx":
+        return None
+    import great_expectations as gx
+    return gx.get_context()
+
+
 def main():
+    args = parse_args()
+    backend = args.backend
+    metrics = start("03_great_expectations", enabled=not args.no_metrics)
+
     print_header("Great Expectations: Валидация данных «Руда+»")
 
     # --- Загрузка данных ---
@@ -291,11 +255,15 @@ def main():
         if not filepath.exists():
             print(f"  [!] Файл не найден: {filepath}")
             return
-        dataframes[name] = pd.read_csv(filepath)
-        print(f"  {filename}: {len(dataframes[name])} строк")
+        metrics.observe_file(filepath)
+        with metrics.stage(name), metrics.stage("load") as stage:
+            dataframes[name] = load_dataset(name, DATA_DIR, use_cache=not args.no_cache)
+            stage.add_rows(len(dataframes[name]))
+        print(f"  {filename}: {len(dataframes[name])} строк, {memory_mb(dataframes[name]):.2f} МБ")
 
     # --- Создание контекста GX ---
-    context = gx.get_context()
+    context = make_context(backend)
+    started = time.perf_counter()
 
     # ==============================
     # ЧАСТЬ 1: Валидация чистых данных
@@ -303,21 +271,23 @@ def main():
     print_header("ЧАСТЬ 1: Валидация оригинальных (чистых) данных")
 
     print("\n[1/4] Валидация equipment.csv")
-    res_eq = validate_equipment(context, dataframes["equipment"])
+    with metrics.stage("equipment"), metrics.stage("validate", rows=len(dataframes["equipment"])):
+        res_eq = validate_equipment(context, dataframes["equipment"], backend)
     print_results(res_eq, "equipment.csv")
 
     print("\n[2/4] Валидация sensor_readings.csv")
-    res_sr = validate_sensor_readings(
-        context, dataframes["sensor_readings"], dataframes["equipment"]
-    )
+    with metrics.stage("sensor_readings"), metrics.stage("validate", rows=len(dataframes["sensor_readings"])):
+        res_sr = validate_sensor_readings(context, dataframes["sensor_readings"], backend)
     print_results(res_sr, "sensor_readings.csv")
 
     print("\n[3/4] Валидация ore_production.csv")
-    res_op = validate_ore_production(context, dataframes["ore_production"])
+    with metrics.stage("ore_production"), metrics.stage("validate", rows=len(dataframes["ore_production"])):
+        res_op = validate_ore_production(context, dataframes["ore_production"], backend)
     print_results(res_op, "ore_production.csv")
 
     print("\n[4/4] Валидация downtime_events.csv")
-    res_dt = validate_downtime_events(context, dataframes["downtime_events"])
+    with metrics.stage("downtime_events"), metrics.stage("validate", rows=len(dataframes["downtime_events"])):
+        res_dt = validate_downtime_events(context, dataframes["downtime_events"], backend)
     print_results(res_dt, "downtime_events.csv")
 
     # --- Сводка по чистым данным ---
@@ -337,6 +307,13 @@ def main():
         status = "PASS" if res["success"] else "FAIL"
         print(f"|  {name:<28} {passed:>2}/{total:<2} {status:<5}|")
     print("+" + "-" * 50 + "+")
+    print(f"  Бэкенд: {backend}, время валидации: {time.perf_counter() - started:.2f} с")
+
+    # --- Ссылочная целостность по связям из etl_config.json ---
+    print_header("Ссылочная целостность (QR-003)")
+    with metrics.stage("referential_integrity"):
+        integrity = validate_referential_integrity()
+    print_integrity_results(integrity)
 
     # ==============================
     # ЧАСТЬ 2: Валидация грязных данных
@@ -352,10 +329,11 @@ def main():
     print("    - fe_content_pct = 150% (строка 2)")
     print("    - tonnage_extracted = -10 (строка 3)")
     print("    - status = 'Неизвестно' (строка 4)")
+    print("    - equipment_id = 'EQ-999' (строка 5)")
 
-    # Валидация грязного датасета теми же правилами
-    context_dirty = gx.get_context()
-    res_dirty = validate_ore_production(context_dirty, dirty_df)
+    # Валидация грязного датасета теми же правилами и в том же контексте
+    with metrics.stage("ore_production_dirty"), metrics.stage("validate", rows=len(dirty_df)):
+        res_dirty = validate_ore_production(context, dirty_df, backend)
     print_results(res_dirty, "ore_production_dirty.csv")
 
     total = len(res_dirty["results"])
@@ -374,6 +352,53 @@ def main():
 
     print("+" + "-" * 50 + "+")
 
+    # --- QR-003 для грязной копии: таблицы уже в памяти, CSV не перечитываются ---
+    tables = {**dataframes, "ore_production": dirty_df}
+    for parent in ("mines", "operators"):
+        if (REFERENCE_DIR / f"{parent}.csv").exists():
+            tables[parent] = pd.read_csv(REFERENCE_DIR / f"{parent}.csv")
+    with metrics.stage("ore_production_dirty"), metrics.stage("referential_integrity"):
+        integrity_dirty = [r for r in check_dataframes(tables, load_config(ETL_CONFIG))
+                           if r["child"] == "ore_production"]
+    print_integrity_results(integrity_dirty)
+
+    # --- Карантин: какие строки и по каким правилам ---
+    print_header("Карантин строк (ore_production_dirty)")
+    suite = ore_production_suite() + quality_rule_suite(load_config(ETL_CONFIG), "ore_production")
+    splitter = QuarantineSplitter(suite)
+    with metrics.stage("ore_production_dirty"), metrics.stage("quarantine", rows=len(dirty_df)):
+        clean, quarantined = splitter.split(dirty_df)
+    metrics.reject(len(quarantined))
+    print_quarantine(splitter.summary(), quarantined, key="production_id")
+
+    if args.quarantine_dir:
+        args.quarantine_dir.mkdir(parents=True, exist_ok=True)
+        suffix = "parquet" if args.quarantine_format == "parquet" else "csv"
+        for name, part in [("clean", clean), ("quarantine", quarantined)]:
+            path = args.quarantine_dir / f"ore_production_dirty_{name}.{suffix}"
+            with QuarantineWriter(path, args.quarantine_format) as writer:
+                writer.write(part)
+            print(f"  Сохранено: {path} ({len(part)} строк)")
+
+    if args.quarantine_file:
+        name = args.quarantine_file.stem
+        print_header(f"Карантин строк ({args.quarantine_file})")
+        if name not in SUITES:
+            print(f"  [!] Нет набора ожиданий для {name}; известны: {', '.join(SUITES)}")
+        else:
+            suite = SUITES[name]() + quality_rule_suite(load_config(ETL_CONFIG), name)
+            with metrics.stage(name), metrics.stage("quarantine") as stage:
+                summary = quarantine_file(args.quarantine_file, suite, args.quarantine_dir or QUARANTINE_DIR,
+                                          args.quarantine_format, args.chunksize)
+                stage.add_rows(summary["n_rows"])
+            metrics.reject(summary["n_quarantined"])
+            print_quarantine(summary)
+            print(f"  Сохранено: {summary['clean']}, {summary['quarantine']}")
+
+    if metrics.enabled:
+        print_header("Метрики этапов")
+        print_metrics(metrics.write(args.metrics_dir))
+
     # --- Итог ---
     print_header("Работа завершена")
     print("""
@@ -0,0 +1,127 @@
+"""
+Практикум по анализу и моделированию данных
+Модуль 2 (доп.): Валидация таблиц PostgreSQL без выгрузки строк
+Предприятие: «Руда+» — добыча железной руды
+
+Те же наборы ожиданий, что и в 03_great_expectations.py, плюс правила
+quality_rules из etl_config.json (Модуль 4) выполняются внутри
+PostgreSQL (sql_pushdown.py): каждая таблица сканируется одним
+агрегирующим запросом, клиенту возвращаются только счётчики и несколько
+примеров нарушений. Для полной таблицы sensor_readings по сети передаются
+килобайты, а не вся таблица.
+
+Параметры подключения — в db_profiling.py (или переменные PG_*).
+
+Запуск:
+  python 04_sql_pushdown_validation.py
+  python 04_sql_pushdown_validation.py --tables sensor_readings --samples 10
+  python 04_sql_pushdown_validation.py --tables timeseries.sensor_readings --show-sql
+"""
+
+import argparse
+import time
+
+from datasets import ETL_CONFIG
+from db_profiling import DB_CONFIG, make_engine
+from referential_integrity import load_config
+from sql_pushdown import (
+    DEFAULT_SAMPLE_SIZE,
+    DEFAULT_SCHEMA,
+    SUITES,
+    PushdownPlan,
+    suite_for,
+    table_exists,
+)
+
+
+def print_header(title: str):
+    print("\n" + "=" * 60)
+    print(f"  {title}")
+    print("=" * 60)
+
+
+def print_results(results: dict, name: str):
+    """Результаты в формате print_results() из 03_great_expectations.py
+    с числом нарушений и примерами."""
+    total = len(results["results"])
+    passed = sum(1 for r in results["results"] if r["success"])
+    status = "PASS" if results["success"] else "FAIL"
+    stats = results["statistics"]
+    print(f"\n  {name}: {passed}/{total} {status} "
+          f"({stats['row_count']} строк, получено ≈{stats['bytes_received']} байт)")
+
+    for r in results["results"]:
+        if r["success"]:
+            continue
+        exp_type = r["expectation_config"]["expectation_type"]
+        column = r["expectation_config"].get("kwargs", {}).get("column", "—")
+        short_type = exp_type.replace("expect_column_values_to_", "").replace("expect_column_", "").replace("expect_table_", "table: ")
+        if r.get("exception_info", {}).get("raised_exception"):
+            print(f"    ✗ {column}: {short_type} — {r['exception_info']['exception_message']}")
+            continue
+        res = r["result"]
+        if "unexpected_count" in res:
+            print(f"    ✗ {column}: {short_type} — {res['unexpected_count']} "
+                  f"({res['unexpected_percent']:.1f}%)")
+            for sample in res["partial_unexpected_list"]:
+                print(f"        {sample}")
+        else:
+            print(f"    ✗ {column}: {short_type} — {res.get('observed_value')}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Валидация таблиц PostgreSQL на стороне сервера")
+    parser.add_argument("--tables", default=",".join(SUITES),
+                        help="таблицы через запятую (без схемы — в --schema)")
+    parser.add_argument("--schema", default=DEFAULT_SCHEMA)
+    parser.add_argument("--samples", type=int, default=DEFAULT_SAMPLE_SIZE,
+                        help="примеров нарушений на проверку (0 — без примеров)")
+    parser.add_argument("--no-rules", action="store_true",
+                        help="только наборы ожиданий, без quality_rules из etl_config.json")
+    parser.add_argument("--show-sql", action="store_true", help="показать агрегирующий запрос")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    config = {} if args.no_rules else load_config(ETL_CONFIG)
+
+    print_header("Валидация «Руда+» внутри PostgreSQL (SQL pushdown)")
+    print(f"  Подключение: {DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}")
+
+    engine = make_engine(pool_size=1)
+    summary = []
+    for table in [t.strip() for t in args.tables.split(",") if t.strip()]:
+        qualified = table if "." in table else f"{args.schema}.{table}"
+        if not table_exists(engine, qualified):
+            print(f"\n  [!] Таблица не найдена: {qualified}")
+            continue
+
+        started = time.perf_counter()
+        plan = PushdownPlan(engine, qualified, args.schema)
+        for exp in suite_for(qualified):
+            plan.add_expectation(exp)
+        plan.add_rules(config)
+        if args.show_sql:
+            print(f"\n{plan.aggregate_sql()}")
+        results = plan.run(args.samples)
+        elapsed = time.perf_counter() - started
+
+        print_results(results, qualified)
+        for reason in plan.skipped:
+            print(f"    – {reason} (пропущено)")
+        summary.append((qualified, results, elapsed))
+
+    print("\n" + "+" + "-" * 70 + "+")
+    print(f"|  {'СВОДКА':<68}|")
+    print("+" + "-" * 70 + "+")
+    for name, res, elapsed in summary:
+        stats = res["statistics"]
+        status = "PASS" if res["success"] else "FAIL"
+        print(f"|  {name:<36} {stats['successful_expectations']:>2}/{stats['evaluated_expectations']:<2} "
+              f"{status:<5} {elapsed:>6.2f} с {stats['bytes_received']:>7} Б  |")
+    print("+" + "-" * 70 + "+")
+
+
+if __name__ == "__main__":
+    main()
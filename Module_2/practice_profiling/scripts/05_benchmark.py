@@ -0,0 +1,378 @@
+"""
+Практикум по анализу и моделированию данных
+Модуль 2 (доп.): Нагрузочный бенчмарк профилирования и валидации
+Предприятие: «Руда+» — добыча железной руды
+
+Для каждого размера из --sizes (по умолчанию 10^4, 10^5, 10^6 строк
+sensor_readings) генерируются синтетические данные (synthetic_data.py)
+и замеряются:
+
+  profile_streaming:<датасет>   потоковый профиль CSV (01, --streaming)
+  profile_ydata:<датасет>       полный профиль YData в режиме minimal —
+                                только до --ydata-max-rows строк
+  validate:<датасет>            загрузка через datasets.py + набор ожиданий
+                                (03, validate_*, бэкенд compiled)
+  referential_integrity         QR-003 по всем связям etl_config.json
+  db_load / db_profile:<датасет> / db_pushdown:<датасет>
+                                с --db: загрузка в схему --db-schema через
+                                COPY, потоковый профиль из PostgreSQL (02)
+                                и SQL pushdown-валидация (04)
+
+Каждая задача выполняется в отдельном свежем процессе (spawn), поэтому
+пиковая память (VmHWM/ru_maxrss) относится только к ней. Для задачи
+сохраняются время (лучшее из --repeat запусков), пропускная способность
+(строк/с) и пиковый RSS.
+
+Показатель масштабирования — наклон log(время)/log(строки) между
+соседними размерами: 1.0 — линейный рост, заметно больше (> 1.2) —
+сверхлинейный, о нём выводится предупреждение.
+
+Результаты пишутся в JSON (--output). С --baseline FILE они
+сравниваются с прошлым прогоном: рост времени или памяти больше чем на
+--tolerance считается регрессией, и скрипт завершается с кодом 1.
+
+Примеры:
+    python 05_benchmark.py --sizes 1e4,1e5,1e6
+    python 05_benchmark.py --sizes 1e6 --error-rate 0.01 --db
+    python 05_benchmark.py --baseline ../reports/benchmark/baseline.json
+    python 05_benchmark.py --sizes 1e7,1e8 --generate-only
+"""
+
+import argparse
+import json
+import math
+import multiprocessing
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from importlib import import_module
+from pathlib import Path
+
+from datasets import ETL_CONFIG, SCHEMAS
+from instrumentation import peak_rss_mb
+from synthetic_data import DEFAULT_CHUNKSIZE, generate, load_manifest
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+PROJECT_DIR = SCRIPT_DIR.parent
+BENCHMARK_DIR = PROJECT_DIR / "reports" / "benchmark"
+
+DATASETS = ["equipment", "sensor_readings", "ore_production", "downtime_events"]
+DEFAULT_SIZES = "1e4,1e5,1e6"
+DEFAULT_YDATA_MAX_ROWS = 100_000
+DEFAULT_TOLERANCE = 0.2
+DEFAULT_DB_SCHEMA = "bench"
+# наклон log(t)/log(n), выше которого рост считается сверхлинейным
+SUPERLINEAR_EXPONENT = 1.2
+# задачи быстрее этого порога не сравниваются по времени — слишком шумно
+MIN_COMPARABLE_SECONDS = 0.05
+
+SQL_TYPES = {"category": "text", "string": "text", "datetime": "timestamp",
+             "float64": "double precision"}
+
+
+# ============================================================
+# Задачи (выполняются в отдельном процессе)
+# ============================================================
+
+def _profiling_module(data_dir: Path, reports_dir: Path):
+    """01_ydata_profiling с каталогами бенчмарка вместо данных Модуля 1."""
+    profiling = import_module("01_ydata_profiling")
+    reports_dir.mkdir(parents=True, exist_ok=True)
+    profiling.DATA_DIR = data_dir
+    profiling.REPORTS_DIR = reports_dir
+    return profiling
+
+
+def _load_table(engine, schema: str, name: str, path: Path) -> int:
+    """Пересоздаёт schema.name по схеме datasets.py и загружает CSV через COPY."""
+    from sqlalchemy import text
+
+    columns = ", ".join(
+        f'"{column}" {SQL_TYPES.get(kind, "integer")}' for column, kind in SCHEMAS[name].items()
+    )
+    with engine.begin() as conn:
+        conn.execute(text(f'CREATE SCHEMA IF NOT EXISTS "{schema}"'))
+        conn.execute(text(f'DROP TABLE IF EXISTS "{schema}"."{name}"'))
+        conn.execute(text(f'CREATE TABLE "{schema}"."{name}" ({columns})'))
+    raw = engine.raw_connection()
+    try:
+        with raw.cursor() as cur, open(path, encoding="utf-8") as f:
+            cur.copy_expert(f'COPY "{schema}"."{name}" FROM STDIN WITH (FORMAT csv, HEADER true)', f)
+            n_rows = cur.rowcount
+            cur.execute(f'ANALYZE "{schema}"."{name}"')
+        raw.commit()
+    finally:
+        raw.close()
+    return n_rows
+
+
+def prepare_task(spec: dict):
+    """Импортирует нужные модули и возвращает функцию задачи без аргументов.
+
+    Импорт (ydata_profiling — несколько секунд) не входит в замер времени;
+    функция возвращает число обработанных строк.
+    """
+    kind, name = spec["kind"], spec.get("dataset")
+    data_dir, reports_dir = Path(spec["data_dir"]), Path(spec["reports_dir"])
+
+    if kind == "profile_streaming":
+        profiling = _profiling_module(data_dir, reports_dir)
+        path, title = data_dir / f"{name}.csv", f"Бенчмарк | {name}"
+        return lambda: profiling.profile_csv_streaming(path, title, spec["chunksize"]).n_rows
+
+    if kind == "profile_ydata":
+        profiling = _profiling_module(data_dir, reports_dir)
+        return lambda: len(profiling.profile_csv(f"{name}.csv", f"Бенчмарк | {name}", minimal=True))
+
+    if kind == "validate":
+        from datasets import load_dataset
+
+        validate = getattr(import_module("03_great_expectations"), f"validate_{name}")
+
+        def task():
+            df = load_dataset(name, data_dir, use_cache=False)
+            validate(None, df, "compiled")
+            return len(df)
+        return task
+
+    from referential_integrity import load_config
+
+    config = load_config(ETL_CONFIG)
+    if kind == "referential_integrity":
+        from referential_integrity import check_files
+
+        return lambda: sum(r.get("n_rows", 0) for r in check_files(config, [data_dir], spec["chunksize"]))
+
+    from db_profiling import make_engine, profile_table_streaming
+    from sql_pushdown import validate_table
+
+    engine = make_engine(pool_size=1)
+    table = f"{spec['schema']}.{name}"
+    if kind == "db_load":
+        return lambda: sum(_load_table(engine, spec["schema"], ds, data_dir / f"{ds}.csv") for ds in DATASETS)
+    if kind == "db_profile":
+        return lambda: profile_table_streaming(engine, table).n_rows
+    if kind == "db_pushdown":
+        return lambda: validate_table(engine, table, config, schema=spec["schema"])["statistics"]["row_count"]
+    raise ValueError(f"неизвестная задача: {kind}")
+
+
+def run_task(spec: dict) -> dict:
+    """Точка входа дочернего процесса: время, строки и пиковая память."""
+    task = prepare_task(spec)
+    base_rss = peak_rss_mb()
+    start = time.perf_counter()
+    rows = task()
+    return {"seconds": time.perf_counter() - start, "rows": int(rows),
+            "peak_rss_mb": peak_rss_mb(), "base_rss_mb": base_rss}
+
+
+def run_isolated(spec: dict) -> dict:
+    """Задача в новом процессе: память предыдущих задач не влияет на замер."""
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as pool:
+        return pool.submit(run_task, spec).result()
+
+
+# ============================================================
+# План и прогон
+# ============================================================
+
+def parse_sizes(value: str) -> list:
+    return sorted({int(float(v)) for v in value.split(",") if v})
+
+
+def prepare_data(rows: int, error_rate: float, seed: int, chunksize: int) -> Path:
+    """Каталог с данными размера rows; генерирует, если их нет или параметры другие."""
+    data_dir = BENCHMARK_DIR / "data" / str(rows)
+    manifest = load_manifest(data_dir)
+    if manifest and (manifest["rows"], manifest["error_rate"], manifest["seed"]) == (rows, error_rate, seed):
+        print(f"  Данные {rows:,} строк уже сгенерированы: {data_dir}")
+        return data_dir
+    print(f"  Генерация {rows:,} строк (ошибок {error_rate:.1%})...")
+    start = time.perf_counter()
+    manifest = generate(data_dir, rows, error_rate, seed, chunksize)
+    n_errors = sum(sum(kinds.values()) for kinds in manifest["errors"].values())
+    print(f"  Готово за {time.perf_counter() - start:.1f} с: {manifest['sizes']}, ошибок {n_errors}")
+    return data_dir
+
+
+def plan_tasks(args, rows: int, data_dir: Path) -> list:
+    base = {"data_dir": str(data_dir), "reports_dir": str(BENCHMARK_DIR / "reports" / str(rows)),
+            "chunksize": args.chunksize, "schema": args.db_schema}
+    tasks = []
+    for name in args.datasets:
+        tasks.append({**base, "task": f"profile_streaming:{name}", "kind": "profile_streaming", "dataset": name})
+        if rows <= args.ydata_max_rows:
+            tasks.append({**base, "task": f"profile_ydata:{name}", "kind": "profile_ydata", "dataset": name})
+        tasks.append({**base, "task": f"validate:{name}", "kind": "validate", "dataset": name})
+    tasks.append({**base, "task": "referential_integrity", "kind": "referential_integrity"})
+    if args.db:
+        tasks.append({**base, "task": "db_load", "kind": "db_load"})
+        for name in args.datasets:
+            tasks.append({**base, "task": f"db_profile:{name}", "kind": "db_profile", "dataset": name})
+            tasks.append({**base, "task": f"db_pushdown:{name}", "kind": "db_pushdown", "dataset": name})
+    return tasks
+
+
+def measure(spec: dict, repeat: int) -> dict:
+    """Лучшее время и наибольший пиковый RSS из repeat запусков."""
+    runs = [run_isolated(spec) for _ in range(repeat)]
+    best = min(runs, key=lambda r: r["seconds"])
+    return {
+        "task": spec["task"],
+        "rows": best["rows"],
+        "seconds": round(best["seconds"], 4),
+        "throughput": round(best["rows"] / best["seconds"]) if best["seconds"] > 0 else None,
+        "peak_rss_mb": round(max(r["peak_rss_mb"] for r in runs), 1),
+        "base_rss_mb": round(min(r["base_rss_mb"] for r in runs), 1),
+    }
+
+
+# ============================================================
+# Анализ
+# ============================================================
+
+def scaling(results: list) -> list:
+    """Наклон log(время)/log(строки) между соседними размерами каждой задачи."""
+    by_task = {}
+    for r in results:
+        by_task.setdefault(r["task"], []).append(r)
+    slopes = []
+    for task, runs in by_task.items():
+        runs = sorted(runs, key=lambda r: r["size"])
+        for a, b in zip(runs, runs[1:]):
+            if a["seconds"] < MIN_COMPARABLE_SECONDS or b["rows"] <= a["rows"]:
+                continue
+            exponent = math.log(b["seconds"] / a["seconds"]) / math.log(b["rows"] / a["rows"])
+            slopes.append({"task": task, "from": a["size"], "to": b["size"],
+                           "exponent": round(exponent, 2),
+                           "superlinear": exponent > SUPERLINEAR_EXPONENT})
+    return slopes
+
+
+def regressions(results: list, baseline: dict, tolerance: float) -> list:
+    """Задачи, у которых время или пиковая память выросли больше чем на tolerance."""
+    previous = {(r["task"], r["size"]): r for r in baseline["results"]}
+    found = []
+    for r in results:
+        old = previous.get((r["task"], r["size"]))
+        if old is None:
+            continue
+        for metric in ("seconds", "peak_rss_mb"):
+            if metric == "seconds" and old[metric] < MIN_COMPARABLE_SECONDS:
+                continue
+            change = r[metric] / old[metric] - 1 if old[metric] else 0.0
+            if change > tolerance:
+                found.append({"task": r["task"], "size": r["size"], "metric": metric,
+                              "baseline": old[metric], "current": r[metric],
+                              "change": round(change, 3)})
+    return found
+
+
+def print_results(results: list):
+    print(f"\n  {'задача':<34} {'размер':>11} {'строк':>11} {'время, с':>9} "
+          f"{'строк/с':>11} {'RSS, МБ':>8}")
+    for r in results:
+        throughput = f"{r['throughput']:,}" if r["throughput"] else "—"
+        print(f"  {r['task']:<34} {r['size']:>11,} {r['rows']:>11,} {r['seconds']:>9.3f} "
+              f"{throughput:>11} {r['peak_rss_mb']:>8.1f}")
+
+
+# ============================================================
+# CLI
+# ============================================================
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Бенчмарк профилирования и валидации «Руда+»")
+    parser.add_argument("--sizes", default=DEFAULT_SIZES,
+                        help=f"строк sensor_readings через запятую (по умолчанию {DEFAULT_SIZES})")
+    parser.add_argument("--error-rate", type=float, default=0.01,
+                        help="доля строк с внесёнными ошибками (по умолчанию 0.01)")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--datasets", default=",".join(DATASETS),
+                        help="датасеты через запятую (по умолчанию все четыре)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE,
+                        help=f"строк в части при генерации и потоковом чтении (по умолчанию {DEFAULT_CHUNKSIZE})")
+    parser.add_argument("--ydata-max-rows", type=int, default=DEFAULT_YDATA_MAX_ROWS,
+                        help=f"полный профиль YData только до этого размера (по умолчанию {DEFAULT_YDATA_MAX_ROWS})")
+    parser.add_argument("--repeat", type=int, default=1,
+                        help="запусков каждой задачи (берётся лучшее время)")
+    parser.add_argument("--db", action="store_true",
+                        help="загрузить данные в PostgreSQL и замерить профиль и pushdown-валидацию")
+    parser.add_argument("--db-schema", default=DEFAULT_DB_SCHEMA,
+                        help=f"схема для данных бенчмарка (по умолчанию {DEFAULT_DB_SCHEMA}, пересоздаётся)")
+    parser.add_argument("--generate-only", action="store_true",
+                        help="только сгенерировать данные")
+    parser.add_argument("--output", type=Path, default=BENCHMARK_DIR / "benchmark.json",
+                        help="JSON с результатами")
+    parser.add_argument("--baseline", type=Path,
+                        help="JSON прошлого прогона для поиска регрессий")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help=f"допустимый рост времени и памяти (по умолчанию {DEFAULT_TOLERANCE * 100:.0f}%%)")
+    args = parser.parse_args()
+    args.sizes = parse_sizes(args.sizes)
+    args.datasets = [d for d in args.datasets.split(",") if d]
+    return args
+
+
+def main():
+    args = parse_args()
+
+    print("=" * 70)
+    print("Бенчмарк профилирования и валидации «Руда+»")
+    print("=" * 70)
+
+    results = []
+    for rows in args.sizes:
+        print(f"\n--- Размер {rows:,} ---")
+        data_dir = prepare_data(rows, args.error_rate, args.seed, args.chunksize)
+        if args.generate_only:
+            continue
+        for spec in plan_tasks(args, rows, data_dir):
+            print(f"  {spec['task']}...", end=" ", flush=True)
+            result = {"size": rows, **measure(spec, args.repeat)}
+            print(f"{result['seconds']:.3f} с, {result['peak_rss_mb']:.0f} МБ")
+            results.append(result)
+
+    if args.generate_only:
+        return 0
+
+    print_results(results)
+    slopes = scaling(results)
+    superlinear = [s for s in slopes if s["superlinear"]]
+    if superlinear:
+        print(f"\n  [!] Сверхлинейный рост времени (наклон > {SUPERLINEAR_EXPONENT}):")
+        for s in superlinear:
+            print(f"    {s['task']}: {s['from']:,} → {s['to']:,} строк, наклон {s['exponent']}")
+
+    report = {
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": sys.version.split()[0],
+        "parameters": {"sizes": args.sizes, "error_rate": args.error_rate, "seed": args.seed,
+                       "chunksize": args.chunksize, "repeat": args.repeat, "db": args.db},
+        "results": results,
+        "scaling": slopes,
+    }
+
+    exit_code = 0
+    if args.baseline:
+        baseline = json.loads(args.baseline.read_text(encoding="utf-8"))
+        report["regressions"] = regressions(results, baseline, args.tolerance)
+        if report["regressions"]:
+            exit_code = 1
+            print(f"\n  [!] Регрессии относительно {args.baseline.name} (допуск {args.tolerance:.0%}):")
+            for r in report["regressions"]:
+                print(f"    {r['task']} ({r['size']:,}): {r['metric']} "
+                      f"{r['baseline']} → {r['current']} (+{r['change']:.0%})")
+        else:
+            print(f"\n  Регрессий относительно {args.baseline.name} нет")
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    args.output.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"\n  Результаты: {args.output}")
+    return exit_code
+
+
+if __name__ == "__main__":
+    sys.exit(main())
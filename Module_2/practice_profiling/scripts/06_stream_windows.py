@@ -0,0 +1,150 @@
+"""
+Практикум по анализу и моделированию данных
+Модуль 2 (доп.): Оконные агрегации потока событий датчиков
+Предприятие: «Руда+» — добыча железной руды
+
+Прогоняет события в формате sensor_events_sample.csv (Модуль 4) через
+инкрементальный агрегатор stream_windows.WindowAggregator: окна
+tumbling_5min, tumbling_1h и sliding_10min из etl_config.json
+закрываются по мере продвижения watermark, и каждое закрытое окно сразу
+выводится — без пересчёта всей таблицы, как в 04_stream_processing.sql.
+
+  --input FILE         CSV событий (по умолчанию sensor_events_sample.csv)
+  --synthetic N        вместо файла — N синтетических событий не по порядку
+                       (замер пропускной способности)
+  --lateness-seconds   допустимое опоздание событий (watermark)
+  --chunksize          размер пакета событий
+
+Закрытые окна пишутся в CSV (--output) в формате
+streaming.window_aggregations.
+
+Примеры:
+    python 06_stream_windows.py
+    python 06_stream_windows.py --lateness-seconds 0 --chunksize 10
+    python 06_stream_windows.py --synthetic 5000000 --quiet
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from instrumentation import METRICS_DIR, print_metrics, start
+from stream_windows import (
+    DEFAULT_LATENESS_MS, ETL_CONFIG, EVENTS_SAMPLE, OUTPUT_COLUMNS,
+    WindowAggregator, load_config, read_events, synthetic_events, window_specs,
+)
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+STREAMING_DIR = SCRIPT_DIR.parent / "reports" / "streaming"
+DEFAULT_CHUNKSIZE = 100_000
+
+
+def print_windows(closed: pd.DataFrame, limit: int = 10):
+    """Краткий вывод окон, закрытых очередным пакетом."""
+    for (window_type, start_at), group in closed.groupby(["window_type", "window_start"], sort=False):
+        print(f"  {window_type:<14} {start_at:%Y-%m-%d %H:%M} — {group['window_end'].iloc[0]:%H:%M}"
+              f"  ключей: {len(group):>4}  событий: {group['reading_count'].sum():>7,}")
+        limit -= 1
+        if limit == 0:
+            print("  ...")
+            return
+
+
+def print_summary(summary: dict, seconds: float):
+    print("\n" + "-" * 70)
+    print(f"  Событий: {summary['n_events']:,} за {seconds:.2f} с "
+          f"({summary['n_events'] / max(seconds, 1e-9):,.0f} событий/с)")
+    print(f"  Исключено (quality_flag = 'bad'): {summary['n_excluded']:,}")
+    print(f"  Отброшено (все окна уже закрыты): {summary['n_dropped']:,}")
+    print(f"  Ключей equipment_id × event_type: {summary['n_keys']:,}")
+    print(f"  Watermark: {summary['watermark']}")
+    print(f"  {'Окно':<16} {'строк':>10} {'поздних событий':>16}")
+    for name, n in summary["n_windows"].items():
+        print(f"  {name:<16} {n:>10,} {summary['n_late'][name]:>16,}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Оконные агрегации потока событий «Руда+»")
+    parser.add_argument("--input", type=Path, default=EVENTS_SAMPLE,
+                        help="CSV событий в формате sensor_events_sample.csv")
+    parser.add_argument("--config", type=Path, default=ETL_CONFIG,
+                        help="etl_config.json с разделом streaming.window_config")
+    parser.add_argument("--synthetic", type=int,
+                        help="сгенерировать N событий вместо чтения --input")
+    parser.add_argument("--equipment", type=int, default=50,
+                        help="число единиц техники для --synthetic (по умолчанию 50)")
+    parser.add_argument("--rate", type=float, default=1000.0,
+                        help="событий в секунду времени потока для --synthetic (по умолчанию 1000)")
+    parser.add_argument("--disorder-seconds", type=float, default=5.0,
+                        help="разброс времени событий для --synthetic (по умолчанию 5)")
+    parser.add_argument("--lateness-seconds", type=float, default=DEFAULT_LATENESS_MS / 1000,
+                        help=f"допустимое опоздание событий (по умолчанию {DEFAULT_LATENESS_MS // 1000})")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE,
+                        help=f"событий в пакете (по умолчанию {DEFAULT_CHUNKSIZE:,})")
+    parser.add_argument("--output", type=Path, default=STREAMING_DIR / "window_aggregations.csv",
+                        help="CSV закрытых окон")
+    parser.add_argument("--quiet", action="store_true",
+                        help="не выводить закрытые окна по мере появления")
+    parser.add_argument("--metrics-dir", type=Path, default=METRICS_DIR,
+                        help="куда писать метрики этапов (JSON и Prometheus)")
+    parser.add_argument("--no-metrics", action="store_true",
+                        help="не замерять этапы")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    metrics = start("06_stream_windows", config_path=args.config, enabled=not args.no_metrics)
+
+    print("=" * 70)
+    print("Оконные агрегации потока событий «Руда+»")
+    print("=" * 70)
+
+    specs = window_specs(load_config(args.config))
+    for spec in specs:
+        print(f"  {spec['name']}: размер {spec['size_ms'] // 60_000} мин, шаг {spec['slide_ms'] // 60_000} мин")
+    aggregator = WindowAggregator(specs, lateness_ms=int(args.lateness_seconds * 1000))
+
+    if args.synthetic:
+        print(f"\n  Источник: {args.synthetic:,} синтетических событий")
+        source = synthetic_events(args.synthetic, n_equipment=args.equipment, rate_per_second=args.rate,
+                                  disorder_ms=int(args.disorder_seconds * 1000), batch_size=args.chunksize)
+        # генерация не входит в замер агрегатора
+        with metrics.stage("generate", rows=args.synthetic):
+            batches = list(source)
+    else:
+        print(f"\n  Источник: {args.input}")
+        metrics.observe_file(args.input)
+        batches = read_events(args.input, chunksize=args.chunksize)
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    pd.DataFrame(columns=OUTPUT_COLUMNS).to_csv(args.output, index=False)
+    started = time.perf_counter()
+    with metrics.stage("windows"):
+        for batch in metrics.chunks(batches):
+            with metrics.stage("aggregate", rows=len(batch)):
+                closed = aggregator.process(batch)
+            if len(batch):
+                metrics.observe_events(batch["event_timestamp"].max())
+            if not closed.empty:
+                closed.to_csv(args.output, mode="a", header=False, index=False, float_format="%.6g")
+                if not args.quiet:
+                    print_windows(closed)
+        closed = aggregator.flush()
+        if not closed.empty:
+            closed.to_csv(args.output, mode="a", header=False, index=False, float_format="%.6g")
+            if not args.quiet:
+                print("  -- конец потока --")
+                print_windows(closed)
+    seconds = time.perf_counter() - started
+
+    print_summary(aggregator.summary(), seconds)
+    print(f"\n  Окна: {args.output}")
+    if metrics.enabled:
+        print_metrics(metrics.write(args.metrics_dir))
+
+
+if __name__ == "__main__":
+    main()
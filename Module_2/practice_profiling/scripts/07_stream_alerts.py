@@ -0,0 +1,165 @@
+"""
+Практикум по анализу и моделированию данных
+Модуль 2 (доп.): Потоковые алерты с эскалацией
+Предприятие: «Руда+» — добыча железной руды
+
+Прогоняет события в формате sensor_events_sample.csv (Модуль 4) через
+stream_alerts.AlertEngine: пороги streaming.alert_rules и эскалация
+streaming.escalation из etl_config.json. Алерты пишутся в CSV
+(--output) в формате timeseries.alerts (Модуль 5).
+
+События делятся на микропакеты по --batch-ms миллисекунд времени
+потока. Задержка алерта — время накопления пакета плюс время его
+обработки; по каждому пакету она замеряется, в итоге печатаются
+медиана, p99 и максимум.
+
+  --input FILE         CSV событий (по умолчанию sensor_events_sample.csv)
+  --synthetic N        вместо файла — N синтетических событий
+  --rate               событий в секунду для --synthetic
+  --acks FILE          подтверждения операторов:
+                       equipment_id, sensor_type, acknowledged_at
+
+Примеры:
+    python 07_stream_alerts.py
+    python 07_stream_alerts.py --synthetic 5000000 --rate 200000 --quiet
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import METRICS_DIR, print_metrics, start
+from stream_alerts import OUTPUT_COLUMNS, SEVERITIES, AlertEngine
+from stream_windows import ETL_CONFIG, EVENTS_SAMPLE, load_config, read_events, synthetic_events, timestamps_ms
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+STREAMING_DIR = SCRIPT_DIR.parent / "reports" / "streaming"
+DEFAULT_BATCH_MS = 500
+DEFAULT_CHUNKSIZE = 100_000
+
+
+def micro_batches(chunks, batch_ms: int):
+    """Делит пакеты чтения на микропакеты по batch_ms времени потока.
+
+    Граница — момент, когда наибольшее время события (в порядке
+    поступления) переходит в следующий интервал batch_ms.
+    """
+    for chunk in chunks:
+        ts = timestamps_ms(chunk["event_timestamp"])
+        bucket = np.maximum.accumulate(ts) // batch_ms
+        bounds = np.flatnonzero(np.diff(bucket)) + 1
+        for lo, hi in zip(np.concatenate([[0], bounds]), np.concatenate([bounds, [len(chunk)]])):
+            yield chunk.iloc[lo:hi], int(ts[lo:hi].max() - ts[lo:hi].min())
+
+
+def print_alerts(alerts: pd.DataFrame, limit: int = 20):
+    for row in alerts.head(limit).itertuples():
+        print(f"  {row.alert_time:%Y-%m-%d %H:%M:%S}  {row.severity:<9} {row.equipment_id:<8} {row.message}")
+    if len(alerts) > limit:
+        print(f"  ... ещё {len(alerts) - limit}")
+
+
+def print_summary(summary: dict, seconds: float, latencies: list, batch_ms: int):
+    print("\n" + "-" * 70)
+    print(f"  Событий: {summary['n_events']:,} за {seconds:.2f} с "
+          f"({summary['n_events'] / max(seconds, 1e-9):,.0f} событий/с)")
+    print(f"  Исключено (quality_flag = 'bad'): {summary['n_excluded']:,}")
+    print(f"  Ключей equipment_id × sensor_type с нарушениями: {summary['n_keys']:,}")
+    for severity in SEVERITIES:
+        print(f"  {severity:<10} {summary['n_alerts'][severity]:>10,}")
+    print(f"  Подтверждено critical: {summary['n_acknowledged']:,}, "
+          f"открыто без подтверждения: {summary['open_critical']:,}")
+    if latencies:
+        latency = np.array(latencies)
+        print(f"  Задержка алерта (пакет {batch_ms} мс + обработка), с: "
+              f"медиана {np.median(latency):.3f}, p99 {np.percentile(latency, 99):.3f}, "
+              f"максимум {latency.max():.3f}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Потоковые алерты «Руда+» с эскалацией")
+    parser.add_argument("--input", type=Path, default=EVENTS_SAMPLE,
+                        help="CSV событий в формате sensor_events_sample.csv")
+    parser.add_argument("--config", type=Path, default=ETL_CONFIG,
+                        help="etl_config.json с разделами streaming.alert_rules и escalation")
+    parser.add_argument("--synthetic", type=int,
+                        help="сгенерировать N событий вместо чтения --input")
+    parser.add_argument("--equipment", type=int, default=50,
+                        help="число единиц техники для --synthetic (по умолчанию 50)")
+    parser.add_argument("--rate", type=float, default=1000.0,
+                        help="событий в секунду времени потока для --synthetic (по умолчанию 1000)")
+    parser.add_argument("--acks", type=Path,
+                        help="CSV подтверждений: equipment_id, sensor_type, acknowledged_at")
+    parser.add_argument("--batch-ms", type=int, default=DEFAULT_BATCH_MS,
+                        help=f"длительность микропакета по времени потока (по умолчанию {DEFAULT_BATCH_MS})")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE,
+                        help=f"строк в пакете чтения (по умолчанию {DEFAULT_CHUNKSIZE:,})")
+    parser.add_argument("--output", type=Path, default=STREAMING_DIR / "alerts.csv",
+                        help="CSV алертов")
+    parser.add_argument("--quiet", action="store_true",
+                        help="не выводить алерты по мере появления")
+    parser.add_argument("--metrics-dir", type=Path, default=METRICS_DIR,
+                        help="куда писать метрики этапов (JSON и Prometheus)")
+    parser.add_argument("--no-metrics", action="store_true",
+                        help="не замерять этапы")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    metrics = start("07_stream_alerts", config_path=args.config, enabled=not args.no_metrics)
+
+    print("=" * 70)
+    print("Потоковые алерты «Руда+» с эскалацией")
+    print("=" * 70)
+
+    engine = AlertEngine(load_config(args.config))
+    print(f"  Правил по типам датчиков: {len(engine.rules['types'])}; эскалация: "
+          f"{engine.repeat_count} предупреждения за {engine.repeat_window_ms // 60_000} мин → critical, "
+          f"без подтверждения {engine.ack_timeout_ms // 60_000} мин → emergency")
+    if args.acks:
+        acks = pd.read_csv(args.acks, parse_dates=["acknowledged_at"])
+        for row in acks.itertuples():
+            engine.acknowledge(row.equipment_id, row.sensor_type, row.acknowledged_at)
+        print(f"  Подтверждений: {len(acks):,}")
+
+    if args.synthetic:
+        print(f"\n  Источник: {args.synthetic:,} синтетических событий, {args.rate:,.0f} событий/с")
+        source = synthetic_events(args.synthetic, n_equipment=args.equipment, rate_per_second=args.rate,
+                                  disorder_ms=0, batch_size=args.chunksize)
+        with metrics.stage("generate", rows=args.synthetic):
+            chunks = list(source)
+    else:
+        print(f"\n  Источник: {args.input}")
+        metrics.observe_file(args.input)
+        chunks = read_events(args.input, chunksize=args.chunksize)
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    pd.DataFrame(columns=OUTPUT_COLUMNS).to_csv(args.output, index=False)
+    latencies = []
+    started = time.perf_counter()
+    with metrics.stage("alerts"):
+        for batch, span_ms in micro_batches(metrics.chunks(chunks), args.batch_ms):
+            batch_started = time.perf_counter()
+            with metrics.stage("evaluate", rows=len(batch)):
+                alerts = engine.process(batch)
+            if len(batch):
+                metrics.observe_events(batch["event_timestamp"].max())
+            latencies.append(span_ms / 1000 + time.perf_counter() - batch_started)
+            if not alerts.empty:
+                alerts.to_csv(args.output, mode="a", header=False, index=False)
+                if not args.quiet:
+                    print_alerts(alerts)
+    seconds = time.perf_counter() - started
+
+    print_summary(engine.summary(), seconds, latencies, args.batch_ms)
+    print(f"\n  Алерты: {args.output}")
+    if metrics.enabled:
+        print_metrics(metrics.write(args.metrics_dir))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""
+Практикум по анализу и моделированию данных
+Модуль 2 (доп.): Инкрементальная валидация по watermark
+Предприятие: «Руда+» — добыча железной руды
+
+Проверяет только новые строки датасета — новее сохранённого watermark
+с учётом перекрытия overlap_minutes из etl_config.json. Уникальность
+ключа проверяется по всей истории (incremental_validation.py,
+key_index.py). Состояние (watermark, индекс ключей) хранится в
+reports/incremental/<датасет>/.
+
+Источник строк:
+  --input FILE    CSV в формате Модуля 1 (по умолчанию — файл датасета).
+                  Читается и разбирается целиком при каждом запуске,
+                  проверяются только новые строки: стоимость растёт с
+                  историей. Для постоянной стоимости подавайте файл с
+                  новыми строками (landing-файл очередной выгрузки)
+  --db            таблица ruda_plus.<датасет> в PostgreSQL: условие
+                  watermark передаётся в WHERE, и база отдаёт только
+                  новые строки (без уже проверенных строк без метки
+                  времени) — стоимость запуска не зависит от истории
+
+Примеры:
+    python 08_incremental_validation.py --dataset ore_production
+    python 08_incremental_validation.py --dataset sensor_readings --input landing/sensor_readings_0815.csv
+    python 08_incremental_validation.py --dataset downtime_events --db
+    python 08_incremental_validation.py --dataset ore_production --reset
+"""
+
+import argparse
+import importlib
+import shutil
+import time
+from pathlib import Path
+
+import pandas as pd
+
+from datasets import DATA_DIR, ETL_CONFIG, apply_schema, read_options
+from incremental_validation import INCREMENTAL_DATASETS, INCREMENTAL_DIR, IncrementalValidator, incremental_settings
+from instrumentation import METRICS_DIR, print_metrics, start
+
+DEFAULT_DB_SCHEMA = "ruda_plus"
+
+
+def csv_chunks(path: Path, dataset: str, batch_size: int):
+    with pd.read_csv(path, chunksize=batch_size, **read_options(dataset)) as reader:
+        for chunk in reader:
+            yield apply_schema(chunk, dataset)
+
+
+def db_chunks(validator: IncrementalValidator, table: str, batch_size: int):
+    from db_profiling import make_engine, quote_ident, select_sql, stream_query
+
+    engine = make_engine()
+    where, params = "", {}
+    if validator.cutoff is not None:
+        column = quote_ident(engine, validator.watermark_column)
+        undated = f"{column} IS NULL"
+        params = {"cutoff": validator.cutoff.to_pydatetime()}
+        if validator.null_keys:
+            # строки без метки времени, проверенные раньше, база не отдаёт
+            undated += f" AND {quote_ident(engine, validator.key)} <> ALL(:null_keys)"
+            params["null_keys"] = sorted(validator.null_keys, key=str)
+        where = f"{column} > :cutoff OR ({undated})"
+    for chunk in stream_query(engine, select_sql(engine, table, where=where), params, batch_size):
+        yield apply_schema(chunk, validator.dataset)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Инкрементальная валидация «Руда+» по watermark")
+    parser.add_argument("--dataset", required=True, choices=list(INCREMENTAL_DATASETS))
+    parser.add_argument("--input", type=Path,
+                        help="CSV с новыми строками (по умолчанию — CSV датасета из Модуля 1)")
+    parser.add_argument("--db", action="store_true",
+                        help="читать новые строки из PostgreSQL (db_profiling.py)")
+    parser.add_argument("--db-schema", default=DEFAULT_DB_SCHEMA,
+                        help=f"схема таблиц для --db (по умолчанию {DEFAULT_DB_SCHEMA})")
+    parser.add_argument("--config", type=Path, default=ETL_CONFIG,
+                        help="etl_config.json с разделом incremental")
+    parser.add_argument("--batch-size", type=int,
+                        help="строк в пакете (по умолчанию incremental.batch_size)")
+    parser.add_argument("--overlap-minutes", type=float,
+                        help="перекрытие с прошлым запуском (по умолчанию incremental.overlap_minutes)")
+    parser.add_argument("--state-dir", type=Path, default=INCREMENTAL_DIR,
+                        help="каталог состояния (watermark и индексы ключей)")
+    parser.add_argument("--reset", action="store_true",
+                        help="удалить состояние датасета и проверить всё заново")
+    parser.add_argument("--metrics-dir", type=Path, default=METRICS_DIR,
+                        help="куда писать метрики этапов (JSON и Prometheus)")
+    parser.add_argument("--no-metrics", action="store_true",
+                        help="не замерять этапы")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    settings = incremental_settings(args.config)
+    batch_size = args.batch_size or settings["batch_size"]
+    overlap = settings["overlap_minutes"] if args.overlap_minutes is None else args.overlap_minutes
+    metrics = start("08_incremental_validation", config_path=args.config, enabled=not args.no_metrics)
+
+    print("=" * 70)
+    print(f"Инкрементальная валидация «Руда+»: {args.dataset}")
+    print("=" * 70)
+
+    if args.reset:
+        shutil.rmtree(args.state_dir / args.dataset, ignore_errors=True)
+    validator = IncrementalValidator(args.dataset, args.state_dir, overlap_minutes=overlap, batch_size=batch_size)
+    print(f"  Watermark ({validator.watermark_column}): {validator.watermark or '— (первый запуск)'}")
+    if validator.cutoff is not None:
+        print(f"  Проверяются строки новее {validator.cutoff} (перекрытие {overlap:g} мин)")
+    print(f"  Ключей в истории ({validator.key}): {len(validator.keys):,}")
+
+    if args.db:
+        table = f"{args.db_schema}.{args.dataset}"
+        print(f"  Источник: {table}")
+        chunks = db_chunks(validator, table, batch_size)
+    else:
+        path = args.input or DATA_DIR / f"{args.dataset}.csv"
+        print(f"  Источник: {path}")
+        metrics.observe_file(path)
+        chunks = csv_chunks(path, args.dataset, batch_size)
+
+    started = time.perf_counter()
+    with metrics.stage(args.dataset):
+        for chunk in metrics.chunks(chunks):
+            validator.process(chunk)
+        state = validator.commit()
+    seconds = time.perf_counter() - started
+
+    counts = validator.counts
+    print(f"\n  Прочитано строк:              {counts['read']:>10,}")
+    print(f"  Пропущено (старше watermark): {counts['skipped']:>10,}")
+    print(f"  Повторные доставки:           {counts['redelivered']:>10,}")
+    print(f"  Проверено:                    {counts['validated']:>10,}")
+    print(f"  Ключ уже был в истории:       {counts['history_duplicates']:>10,}")
+    if counts["validated"]:
+        # print_results из 03 — общий формат вывода результатов наборов
+        print_results = importlib.import_module("03_great_expectations").print_results
+        print_results(validator.result(), args.dataset)
+    index = validator.keys.stats()
+    print(f"\n  Новый watermark: {state['watermark']}; строк в истории: {state['n_rows']:,}, запусков: {state['runs']}")
+    print(f"  Индекс ключей: {index['n_keys']:,} ключей, {index['segments']} сегм., "
+          f"фильтр Блума {index['bloom_mb']} МБ, на диске {index['disk_mb']} МБ")
+    print(f"  Время: {seconds:.2f} с")
+
+    if metrics.enabled:
+        metrics.reject(counts["history_duplicates"])
+        if validator.new_watermark is not None:
+            metrics.observe_freshness(validator.new_watermark)
+        print_metrics(metrics.write(args.metrics_dir))
+    return 0 if validator.result()["success"] else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
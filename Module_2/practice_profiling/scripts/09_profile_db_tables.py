@@ -0,0 +1,142 @@
+"""
+Практикум по анализу и моделированию данных
+Модуль 2 (доп.): Профилирование всех таблиц-источников из PostgreSQL
+Предприятие: «Руда+» — добыча железной руды
+
+02_ydata_profiling_db.py профилирует одну таблицу. Этот скрипт берёт
+все таблицы source.tables из etl_config.json (Модуль 4) и профилирует
+их одновременно (db_scheduler.py):
+
+  - не больше --workers соединений и процессов одновременно;
+  - первой запускается самая большая по estimated_rows таблица (LPT),
+    чтобы крупная таблица не досчитывалась в конце одна;
+  - --follow-dependencies — таблица ждёт свои dependencies, из готовых
+    первой идёт самая тяжёлая цепочка «таблица + зависящие от неё».
+
+Для каждой таблицы сохраняется только статистика профиля —
+reports/db/stats/profile_<схема>_<таблица>.json (profile_store.py); рендер
+HTML в пакетном прогоне не выполняется. Отчёты по ней строит
+10_render_reports.py --stats-dir reports/db/stats, либо сразу
+--output html/both. Для всего прогона пишется reports/db/summary.json:
+время, строки, процесс, смещение старта и окончания от начала прогона.
+
+Параметры подключения — db_profiling.py (переменные PG_*).
+
+Примеры:
+    python 09_profile_db_tables.py
+    python 09_profile_db_tables.py --workers 2 --tables equipment,sensor_readings
+    python 09_profile_db_tables.py --schema bench --follow-dependencies
+    python 09_profile_db_tables.py --output both
+"""
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+from datasets import ETL_CONFIG
+from db_profiling import DB_CONFIG, DEFAULT_BATCH_SIZE
+from db_scheduler import critical_path, run_schedule, schedule_summary, source_tables
+from instrumentation import METRICS_DIR, print_metrics, start
+from profile_store import OUTPUT_MODES
+from referential_integrity import load_config
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+DB_REPORTS_DIR = SCRIPT_DIR.parent / "reports" / "db"
+DEFAULT_WORKERS = 4
+
+
+def print_plan(tables: list, rank: dict):
+    print(f"\n  {'Таблица':<18} {'приоритет':>9} {'estimated_rows':>15} {'цепочка':>13}  зависит от")
+    for table in sorted(tables, key=lambda t: rank[t["name"]], reverse=True):
+        print(f"  {table['name']:<18} {table['priority'] or '—':>9} {table['estimated_rows']:>15,} "
+              f"{rank[table['name']]:>13,}  {', '.join(table['dependencies']) or '—'}")
+
+
+def print_result(result: dict):
+    status = {"ok": "✓", "missing": "–", "error": "✗"}[result["status"]]
+    detail = {
+        "ok": f"{result.get('rows', 0):>10,} строк  {result['seconds']:7.2f} с",
+        "missing": "таблицы нет в базе",
+        "error": result.get("error", ""),
+    }[result["status"]]
+    print(f"  {status} [{result['start_offset']:7.2f} → {result['end_offset']:7.2f} с] "
+          f"pid {result.get('pid', '—'):<7} {result['name']:<18} {detail}")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Профилирование всех таблиц PostgreSQL «Руда+»")
+    parser.add_argument("--config", type=Path, default=ETL_CONFIG,
+                        help="etl_config.json с разделом source.tables")
+    parser.add_argument("--schema",
+                        help="схема таблиц (по умолчанию source.schema из конфигурации)")
+    parser.add_argument("--tables", metavar="T1,T2",
+                        help="профилировать только эти таблицы")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"процессов и соединений одновременно (по умолчанию {DEFAULT_WORKERS})")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"строк в пакете серверного курсора (по умолчанию {DEFAULT_BATCH_SIZE})")
+    parser.add_argument("--follow-dependencies", action="store_true",
+                        help="запускать таблицу после её dependencies (по умолчанию чистый LPT)")
+    parser.add_argument("--output", choices=OUTPUT_MODES, default="stats",
+                        help="stats — только статистика (по умолчанию), html — отчёты, both — то и другое")
+    parser.add_argument("--output-dir", type=Path, default=DB_REPORTS_DIR,
+                        help="каталог отчётов, статистики и summary.json")
+    parser.add_argument("--metrics-dir", type=Path, default=METRICS_DIR,
+                        help="куда писать метрики этапов (JSON и Prometheus)")
+    parser.add_argument("--no-metrics", action="store_true",
+                        help="не замерять этапы")
+    args = parser.parse_args()
+    args.tables = args.tables.split(",") if args.tables else None
+    return args
+
+
+def main():
+    args = parse_args()
+    metrics = start("09_profile_db_tables", config_path=args.config, enabled=not args.no_metrics)
+    config = load_config(args.config)
+    schema = args.schema or config["source"]["schema"]
+    use_dependencies = args.follow_dependencies
+
+    print("=" * 70)
+    print("Профилирование таблиц-источников из PostgreSQL")
+    print("=" * 70)
+    print(f"  {DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['database']}, схема {schema}, "
+          f"процессов: {args.workers}")
+
+    tables = source_tables(config, args.tables)
+    if not tables:
+        print("[!] В source.tables нет подходящих таблиц")
+        return 1
+    print_plan(tables, critical_path(tables, use_dependencies))
+
+    print()
+    started = time.perf_counter()
+    with metrics.stage("tables"):
+        results = run_schedule(tables, schema, args.output_dir, args.workers, args.batch_size,
+                               use_dependencies, on_done=print_result, output=args.output)
+    summary = schedule_summary(results, args.workers)
+    summary.update(schema=schema, dependencies=use_dependencies, output=args.output, seconds=round(time.perf_counter() - started, 3))
+
+    print(f"\n  Таблиц: {summary['tables']}, профилей: {summary['ok']}, строк: {summary['rows']:,}")
+    if summary["missing"]:
+        print(f"  Нет в базе: {', '.join(summary['missing'])}")
+    for name, error in summary["errors"].items():
+        print(f"  [!] {name}: {error}")
+    print(f"  Длина прогона: {summary['makespan_seconds']:.2f} с, работа процессов: "
+          f"{summary['busy_seconds']:.2f} с, нижняя граница: {summary['lower_bound_seconds']:.2f} с")
+
+    report = {"summary": summary, "tables": results}
+    summary_path = args.output_dir / "summary.json"
+    summary_path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    print(f"\n  Отчёты: {args.output_dir}")
+    if args.output == "stats":
+        print(f"  HTML по статистике: python 10_render_reports.py --stats-dir {args.output_dir / 'stats'}")
+    print(f"  Сводка: {summary_path}")
+    if metrics.enabled:
+        print_metrics(metrics.write(args.metrics_dir))
+    return 1 if summary["errors"] else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
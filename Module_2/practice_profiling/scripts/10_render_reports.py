@@ -0,0 +1,84 @@
+"""
+Практикум по анализу и моделированию данных
+Модуль 2 (доп.): HTML-отчёты по сохранённой статистике
+Предприятие: «Руда+» — добыча железной руды
+
+Скрипты профилирования с --output stats (09_profile_db_tables.py — по
+умолчанию) сохраняют только статистику: reports/stats/*.json
+(profile_store.py). Этот скрипт строит по ней HTML — без чтения данных
+и без пересчёта статистики. Отчёт, который новее своей статистики,
+пропускается (--force — строить заново).
+
+Примеры:
+    python 10_render_reports.py
+    python 10_render_reports.py --stats-dir ../reports/db/stats
+    python 10_render_reports.py --only profile_ore_production --force
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+from instrumentation import METRICS_DIR, print_metrics, start
+from profile_store import STATS_SUBDIR, report_path_for, render_stored, stored_files
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+STATS_DIR = SCRIPT_DIR.parent / "reports" / STATS_SUBDIR
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="HTML-отчёты «Руда+» по сохранённой статистике")
+    parser.add_argument("--stats-dir", type=Path, default=STATS_DIR,
+                        help="каталог статистики (по умолчанию reports/stats)")
+    parser.add_argument("--output-dir", type=Path,
+                        help="куда писать HTML (по умолчанию — каталог над stats/)")
+    parser.add_argument("--only", metavar="NAME1,NAME2",
+                        help="только эти отчёты (имя файла без расширения)")
+    parser.add_argument("--force", action="store_true",
+                        help="строить и те отчёты, что новее статистики")
+    parser.add_argument("--metrics-dir", type=Path, default=METRICS_DIR,
+                        help="куда писать метрики этапов (JSON и Prometheus)")
+    parser.add_argument("--no-metrics", action="store_true",
+                        help="не замерять этапы")
+    args = parser.parse_args()
+    args.only = set(args.only.split(",")) if args.only else None
+    return args
+
+
+def main():
+    args = parse_args()
+    metrics = start("10_render_reports", enabled=not args.no_metrics)
+
+    print("=" * 60)
+    print("HTML-отчёты по сохранённой статистике")
+    print("=" * 60)
+
+    files = [p for p in stored_files(args.stats_dir) if args.only is None or p.stem in args.only]
+    if not files:
+        print(f"  [!] В {args.stats_dir} нет файлов статистики")
+        return 1
+
+    rendered = skipped = 0
+    for path in files:
+        report_path = report_path_for(path)
+        if args.output_dir:
+            args.output_dir.mkdir(parents=True, exist_ok=True)
+            report_path = args.output_dir / report_path.name
+        if not args.force and report_path.exists() and report_path.stat().st_mtime >= path.stat().st_mtime:
+            print(f"  – {path.stem}: отчёт новее статистики")
+            skipped += 1
+            continue
+        started = time.perf_counter()
+        with metrics.stage(path.stem), metrics.stage("render"):
+            render_stored(path, report_path)
+        print(f"  ✓ {path.stem}: {report_path}  {time.perf_counter() - started:.2f} с")
+        rendered += 1
+
+    print(f"\n  Построено: {rendered}, пропущено: {skipped}")
+    if metrics.enabled:
+        print_metrics(metrics.write(args.metrics_dir))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
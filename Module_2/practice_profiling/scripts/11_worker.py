@@ -0,0 +1,204 @@
+"""
+Практикум по анализу и моделированию данных
+Модуль 2 (доп.): Постоянный рабочий процесс и клиент заданий
+Предприятие: «Руда+» — добыча железной руды
+
+serve запускает рабочий процесс (worker_daemon.py): библиотеки, контекст
+GX, наборы ожиданий и индексы ключей загружаются один раз. Остальные
+команды — клиент: отправляют задание по сокету и печатают ответ. Клиент
+импортирует только стандартную библиотеку, поэтому сам стартует за
+десятки миллисекунд, и задание по небольшому пакету тоже занимает
+десятки миллисекунд, а не секунды импорта.
+
+Адрес — --address: путь Unix-сокета или хост:порт. По умолчанию в Linux и
+macOS это сокет ruda_plus_worker.sock во временном каталоге, в Windows —
+127.0.0.1:6390. Через TCP каждый ответ задерживается ещё на ~40 мс
+(алгоритм Нейгла и отложенный ACK), через Unix-сокет — нет. Хост по
+умолчанию — 127.0.0.1.
+
+Ключ соединения — переменная RUDA_WORKER_AUTHKEY (одинаковая у процесса
+и клиента). Если она не задана, serve при первом запуске записывает
+случайный ключ в ~/.ruda_plus_worker.key (права 0600), клиент читает
+его оттуда. Общеизвестного ключа по умолчанию нет: соединение передаёт
+pickle, и любой, кто знает ключ, может выполнить код в процессе.
+
+Примеры:
+    python 11_worker.py serve --preload ydata &
+    python 11_worker.py ping
+    python 11_worker.py validate --dataset ore_production
+    python 11_worker.py incremental --dataset sensor_readings --input landing/sensor_readings_0815.csv
+    python 11_worker.py profile --dataset downtime_events --output both
+    python 11_worker.py status
+    python 11_worker.py stop
+"""
+
+import argparse
+import json
+import os
+import secrets
+import stat
+import sys
+import tempfile
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client
+from pathlib import Path
+
+DEFAULT_ADDRESS = (str(Path(tempfile.gettempdir()) / "ruda_plus_worker.sock") if os.name == "posix"
+                   else "127.0.0.1:6390")
+AUTHKEY_ENV = "RUDA_WORKER_AUTHKEY"
+AUTHKEY_FILE = Path.home() / ".ruda_plus_worker.key"
+
+
+def load_authkey(create: bool = False) -> bytes:
+    """Ключ из RUDA_WORKER_AUTHKEY или файла AUTHKEY_FILE (create — создать, если нет)."""
+    if os.environ.get(AUTHKEY_ENV):
+        return os.environ[AUTHKEY_ENV].encode()
+    if create and not AUTHKEY_FILE.exists():
+        try:
+            fd = os.open(AUTHKEY_FILE, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        except FileExistsError:
+            pass  # одновременно создал другой процесс
+        else:
+            with os.fdopen(fd, "w") as f:
+                f.write(secrets.token_hex(32))
+    if not AUTHKEY_FILE.exists():
+        raise RuntimeError(f"Нет ключа: задайте {AUTHKEY_ENV} или запустите serve (создаст {AUTHKEY_FILE})")
+    if os.name == "posix" and AUTHKEY_FILE.stat().st_mode & (stat.S_IRWXG | stat.S_IRWXO):
+        raise RuntimeError(f"{AUTHKEY_FILE} доступен не только владельцу: chmod 600 {AUTHKEY_FILE}")
+    return AUTHKEY_FILE.read_text(encoding="utf-8").strip().encode()
+
+
+def parse_address(value: str):
+    """хост:порт → (хост, порт) для TCP; иначе путь Unix-сокета."""
+    host, _, port = value.rpartition(":")
+    if port.isdigit():
+        return host or "127.0.0.1", int(port)
+    return value
+
+
+def format_address(address) -> str:
+    return address if isinstance(address, str) else f"{address[0]}:{address[1]}"
+
+
+def submit(address: tuple, jobs: list) -> list:
+    """Отправляет задания по одному соединению; ответы в том же порядке."""
+    replies = []
+    with Client(address, authkey=load_authkey()) as conn:
+        for job in jobs:
+            started = time.perf_counter()
+            conn.send(job)
+            reply = conn.recv()
+            reply["round_trip_seconds"] = time.perf_counter() - started
+            replies.append(reply)
+    return replies
+
+
+def print_reply(job: dict, reply: dict):
+    mark = "✓" if reply["ok"] and reply["result"].get("success", True) else "✗"
+    print(f"  {mark} {job['job']}: {reply['seconds'] * 1000:.1f} мс в процессе, "
+          f"{reply['round_trip_seconds'] * 1000:.1f} мс с передачей")
+    if not reply["ok"]:
+        print(f"    [!] {reply['error']}")
+        return
+    result = dict(reply["result"])
+    for item in result.pop("failed", []):
+        print(f"    ✗ {item['column']}: {item['expectation']} ({item['unexpected_count']} строк)")
+    result.pop("statistics", None)
+    print("    " + json.dumps(result, ensure_ascii=False, default=str))
+
+
+def serve(args) -> int:
+    started = time.perf_counter()
+    from worker_daemon import INCREMENTAL_DIR, WorkerDaemon
+
+    daemon = WorkerDaemon(preload=args.preload, state_dir=args.state_dir or INCREMENTAL_DIR)
+    print(f"  Рабочий процесс {os.getpid()}: загружено за {time.perf_counter() - started:.2f} с "
+          f"(preload: {', '.join(args.preload) or '—'})")
+    try:
+        daemon.serve(args.address, load_authkey(create=True),
+                     on_ready=lambda address: print(f"  Ожидание заданий на {format_address(address)}", flush=True))
+    except RuntimeError as e:
+        print(f"[!] {e}")
+        return 1
+    print(f"  Остановлен; заданий выполнено: {sum(len(t) for t in daemon.stats.values())}")
+    return 0
+
+
+def build_job(args) -> dict:
+    job = {"job": {"stop": "shutdown"}.get(args.command, args.command)}
+    for field in ("dataset", "backend", "mode", "output", "name", "title"):
+        if getattr(args, field, None):
+            job[field] = getattr(args, field)
+    if getattr(args, "input", None):
+        # процесс может работать в другом каталоге — путь абсолютный
+        job["path"] = str(args.input.resolve())
+    if getattr(args, "reset", False):
+        job["reset"] = True
+    return job
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Рабочий процесс «Руда+» и клиент заданий")
+    parser.add_argument("--address", type=parse_address, default=DEFAULT_ADDRESS,
+                        help=f"Unix-сокет или хост:порт процесса (по умолчанию {DEFAULT_ADDRESS})")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    p = commands.add_parser("serve", help="запустить рабочий процесс")
+    p.add_argument("--preload", default="", type=lambda v: [x for x in v.split(",") if x],
+                   help="загрузить заранее: ydata,gx")
+    p.add_argument("--state-dir", type=Path,
+                   help="каталог состояния инкрементальной валидации (по умолчанию reports/incremental)")
+
+    commands.add_parser("ping", help="проверить, что процесс работает")
+    commands.add_parser("status", help="задержки заданий по видам")
+    commands.add_parser("stop", help="остановить процесс")
+
+    p = commands.add_parser("validate", help="набор ожиданий для CSV")
+    p.add_argument("--dataset", required=True)
+    p.add_argument("--input", type=Path, help="CSV (по умолчанию — файл датасета Модуля 1)")
+    p.add_argument("--backend", choices=["compiled", "gx"], default="compiled")
+
+    p = commands.add_parser("incremental", help="инкрементальная валидация (как 08)")
+    p.add_argument("--dataset", required=True)
+    p.add_argument("--input", type=Path, help="CSV с новыми строками")
+    p.add_argument("--reset", action="store_true", help="удалить состояние датасета")
+
+    p = commands.add_parser("profile", help="профиль CSV")
+    p.add_argument("--dataset", help="датасет Модуля 1 (схема и путь по умолчанию)")
+    p.add_argument("--input", type=Path, help="CSV")
+    p.add_argument("--mode", choices=["streaming", "ydata"], default="streaming")
+    p.add_argument("--output", choices=["html", "stats", "both"], default="stats")
+    p.add_argument("--name", help="имя отчёта (по умолчанию — имя файла)")
+    p.add_argument("--title", help="заголовок отчёта")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if args.command == "serve":
+        return serve(args)
+    if args.command == "profile" and not (args.dataset or args.input):
+        print("[!] Укажите --dataset или --input")
+        return 2
+
+    job = build_job(args)
+    try:
+        reply, = submit(args.address, [job])
+    except (ConnectionRefusedError, FileNotFoundError):
+        print(f"[!] Нет рабочего процесса на {format_address(args.address)} (python 11_worker.py serve)")
+        return 2
+    except RuntimeError as e:
+        print(f"[!] {e}")
+        return 2
+    except AuthenticationError:
+        print(f"[!] Ключ не подошёл: у процесса и клиента должен быть один {AUTHKEY_ENV}")
+        return 2
+    print_reply(job, reply)
+    if not reply["ok"]:
+        return 1
+    return 0 if reply["result"].get("success", True) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
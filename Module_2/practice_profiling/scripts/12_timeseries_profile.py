@@ -0,0 +1,119 @@
+"""
+Практикум по анализу и моделированию данных
+Модуль 2 (доп.): Профиль телеметрии по рядам equipment_id × sensor_type
+Предприятие: «Руда+» — добыча железной руды
+
+Каждая пара equipment_id × sensor_type профилируется как временной ряд
+(timeseries_profile.py): шаг опроса, пропуски и потерянные точки,
+строки не по порядку, дубликаты меток времени, диапазон значений.
+Графики рядов прорежены методом LTTB — не больше --max-points точек
+на ряд, поэтому отчёт остаётся маленьким и при миллионах точек.
+
+По умолчанию профилируется sensor_timeseries_sample.csv Модуля 5;
+подходит и sensor_readings.csv Модуля 1 (--input).
+
+Отчёт — reports/profile_timeseries_<имя>.html; --output stats/both —
+как в 01 (profile_store.py, HTML потом строит 10_render_reports.py).
+
+Примеры:
+    python 12_timeseries_profile.py
+    python 12_timeseries_profile.py --input ../../../Module_1/practice/data/sensor_readings.csv
+    python 12_timeseries_profile.py --gap-factor 5 --max-points 1000 --output both
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+from instrumentation import METRICS_DIR, print_metrics, start
+from profile_store import OUTPUT_MODES, write_summary
+from timeseries_profile import (
+    DEFAULT_CHUNKSIZE, DEFAULT_GAP_FACTOR, DEFAULT_MAX_POINTS, TIMESERIES_SAMPLE, read_timeseries,
+    timeseries_summary,
+)
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+REPORTS_DIR = SCRIPT_DIR.parent / "reports"
+
+
+def print_series(series: list, limit: int = 20):
+    print(f"\n  {'Ряд':<34} {'строк':>8} {'шаг, с':>9} {'пропуски':>9} {'полнота':>8} "
+          f"{'не по пор.':>10} {'дубли':>6}")
+    # сначала ряды с проблемами
+    ranked = sorted(series, key=lambda s: (s["n_gaps"] + s["out_of_order"] + s["duplicate_timestamps"]
+                                           + s["conflicting_duplicates"]), reverse=True)
+    for s in ranked[:limit]:
+        name = f"{s['equipment_id']} / {s['sensor_type']}"
+        interval = f"{s['interval_seconds']:,.0f}" if s["interval_seconds"] is not None else "—"
+        completeness = f"{s['completeness']:.1%}" if s["completeness"] is not None else "—"
+        print(f"  {name:<34} {s['n']:>8,} {interval:>9} {s['n_gaps']:>9,} {completeness:>8} "
+              f"{s['out_of_order']:>10,} {s['duplicate_timestamps'] + s['conflicting_duplicates']:>6,}")
+    if len(series) > limit:
+        print(f"  … и ещё {len(series) - limit} рядов (все — в отчёте)")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Профиль рядов телеметрии «Руда+»")
+    parser.add_argument("--input", type=Path, default=TIMESERIES_SAMPLE,
+                        help="CSV с показаниями (по умолчанию sensor_timeseries_sample.csv Модуля 5)")
+    parser.add_argument("--name", help="имя отчёта (по умолчанию — имя файла)")
+    parser.add_argument("--gap-factor", type=float, default=DEFAULT_GAP_FACTOR,
+                        help=f"пропуск — шаг больше N медианных (по умолчанию {DEFAULT_GAP_FACTOR:g})")
+    parser.add_argument("--max-points", type=int, default=DEFAULT_MAX_POINTS,
+                        help=f"точек на график ряда после LTTB (по умолчанию {DEFAULT_MAX_POINTS})")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE,
+                        help=f"строк в части при чтении CSV (по умолчанию {DEFAULT_CHUNKSIZE})")
+    parser.add_argument("--output", choices=OUTPUT_MODES, default="html",
+                        help="html — отчёт, stats — только статистика в reports/stats/, both — то и другое")
+    parser.add_argument("--metrics-dir", type=Path, default=METRICS_DIR,
+                        help="куда писать метрики этапов (JSON и Prometheus)")
+    parser.add_argument("--no-metrics", action="store_true",
+                        help="не замерять этапы")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    metrics = start("12_timeseries_profile", enabled=not args.no_metrics)
+    name = args.name or args.input.stem
+
+    print("=" * 70)
+    print(f"Профиль рядов телеметрии: {args.input.name}")
+    print("=" * 70)
+    if not args.input.exists():
+        print(f"  [!] Файл не найден: {args.input}")
+        return 1
+
+    started = time.perf_counter()
+    metrics.observe_file(args.input)
+    with metrics.stage(name), metrics.stage("load") as stage:
+        df, columns = read_timeseries(args.input, args.chunksize)
+        stage.add_rows(len(df))
+    print(f"  Строк: {len(df):,}; время — {columns['time']}, значение — {columns['value']}, "
+          f"ряды — {columns['equipment']} × {columns['sensor']}")
+
+    with metrics.stage(name), metrics.stage("statistics", rows=len(df)):
+        summary = timeseries_summary(df, columns, f"Руда+ | Ряды телеметрии ({args.input.name})",
+                                     args.gap_factor, args.max_points)
+    table = summary["table"]
+    print(f"  Рядов: {table['n_series']}, период {table['start']} — {table['end']}")
+    print_series(summary["series"])
+    if summary["alerts"]:
+        print(f"\n  Предупреждений: {len(summary['alerts'])}")
+        for alert in summary["alerts"][:10]:
+            print(f"    [!] {alert['series']}: {alert['text']}")
+
+    report_path = REPORTS_DIR / f"profile_timeseries_{name}.html"
+    REPORTS_DIR.mkdir(exist_ok=True)
+    with metrics.stage(name), metrics.stage("render" if args.output != "stats" else "store"):
+        written = write_summary(summary, report_path, args.output, kind="timeseries")
+    print(f"\n  Точек на графиках: {table['chart_points']:,} из {table['n']:,}")
+    print(f"  Сохранено: {', '.join(map(str, written))}")
+    print(f"  Время: {time.perf_counter() - started:.2f} с")
+    if metrics.enabled:
+        print_metrics(metrics.write(args.metrics_dir))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
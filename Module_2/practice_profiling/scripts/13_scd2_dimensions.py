@@ -0,0 +1,209 @@
+"""
+Практикум по анализу и моделированию данных
+Модуль 2 (доп.): Измерения SCD Type 2 — поиск изменений пакетами
+Предприятие: «Руда+» — добыча железной руды
+
+Сравнивает строки-источники измерения (dim_mine, dim_equipment,
+dim_operator из target.dimensions etl_config.json) с его текущими
+версиями по хешу tracking_columns (scd2.py) и раскладывает их на
+insert / expire / unchanged.
+
+Измерение со всеми версиями и колонкой _row_hash хранится в
+reports/scd2/<измерение>.feather; первый запуск загружает все строки
+как новые. Изменения запуска пишутся рядом для загрузки в хранилище:
+
+    <измерение>_<дата>_inserts.csv  — новые версии (COPY в star.<измерение>)
+    <измерение>_<дата>_expires.csv  — surrogate key закрываемых версий и effective_to
+
+Источник строк — --input (CSV с колонками измерения). Без --input
+dim_equipment и dim_mine строятся из equipment.csv Модуля 1 (колонок
+region и max_depth_m там нет — они NULL и в хеш не входят, как в
+CONCAT_WS). --synthetic N — замер на измерении из N членов.
+
+Примеры:
+    python 13_scd2_dimensions.py --dimension dim_equipment
+    python 13_scd2_dimensions.py --dimension dim_operator --input landing/operators_0815.csv --load-date 2026-08-15
+    python 13_scd2_dimensions.py --dimension dim_operator --synthetic 1000000
+    python 13_scd2_dimensions.py --dimension dim_equipment --reset
+"""
+
+import argparse
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from datasets import DATA_DIR, ETL_CONFIG
+from instrumentation import METRICS_DIR, print_metrics, start
+from scd2 import SCD2Engine, apply_changes, scd_dimensions, scd_settings
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+SCD2_DIR = SCRIPT_DIR.parent / "reports" / "scd2"
+
+
+def module1_rows(dimension: str) -> pd.DataFrame:
+    """Строки-источники из CSV Модуля 1 (как JOIN в 02_star_schema.sql)."""
+    equipment = pd.read_csv(DATA_DIR / "equipment.csv")
+    if dimension == "dim_equipment":
+        return equipment.rename(columns={"equipment_type": "type_name"})[
+            ["equipment_id", "equipment_name", "type_name", "manufacturer", "model",
+             "year_manufactured", "max_payload_tons", "mine_name", "status"]]
+    if dimension == "dim_mine":
+        mines = equipment[["mine_id", "mine_name"]].drop_duplicates("mine_id")
+        return mines.assign(region=None, max_depth_m=None, status=None).reset_index(drop=True)
+    raise ValueError(f"Для {dimension} в Модуле 1 нет источника — укажите --input")
+
+
+def synthetic_rows(spec: dict, n: int, change_rate: float, new_rate: float, seed: int = 42) -> tuple:
+    """Измерение из n членов и выгрузка: все члены, доля change_rate изменена, new_rate новых."""
+    rng = np.random.default_rng(seed)
+    key, columns = spec["business_key"], spec["tracking_columns"]
+    prefix = key.split("_")[0][:2].upper()
+
+    def members(start: int, stop: int) -> pd.DataFrame:
+        ids = np.array([f"{prefix}-{i:07d}" for i in range(start, stop)], dtype=object)
+        df = pd.DataFrame({key: ids, columns[0]: ids + " name"})
+        for j, column in enumerate(columns[1:], start=1):
+            # остальные атрибуты — малая мощность, как должность или шахта
+            df[column] = np.array([f"{column}-{v}" for v in range(4 + 3 * j)], dtype=object)[
+                rng.integers(0, 4 + 3 * j, stop - start)]
+        return df
+
+    current = members(0, n)
+    incoming = current.copy()
+    changed = np.flatnonzero(rng.random(n) < change_rate)
+    column = rng.choice(columns[1:], len(changed))
+    for name in columns[1:]:
+        rows = changed[column == name]
+        incoming.loc[rows, name] = incoming.loc[rows, name] + " (изм.)"
+    incoming = pd.concat([incoming, members(n, n + int(n * new_rate))], ignore_index=True)
+    return current, incoming
+
+
+def read_state(path: Path) -> pd.DataFrame:
+    return pd.read_feather(path) if path.exists() else None
+
+
+def write_state(dimension: pd.DataFrame, path: Path):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    dimension.reset_index(drop=True).to_feather(tmp)
+    os.replace(tmp, path)
+
+
+def print_counts(counts: dict, seconds: float, n_rows: int):
+    print(f"\n  Строк-источников:    {n_rows:>10,}")
+    print(f"  insert (новые):      {counts['insert']:>10,}")
+    print(f"  expire + insert:     {counts['expire']:>10,}")
+    print(f"  unchanged:           {counts['unchanged']:>10,}")
+    if counts["duplicate"]:
+        print(f"  повтор ключа:        {counts['duplicate']:>10,} (взята последняя строка)")
+    print(f"  Поиск изменений: {seconds:.2f} с ({n_rows / max(seconds, 1e-9):,.0f} строк/с)")
+
+
+def parse_args(dimensions: list):
+    parser = argparse.ArgumentParser(description="Поиск изменений SCD Type 2 для измерений «Руда+»")
+    parser.add_argument("--dimension", required=True, choices=dimensions)
+    parser.add_argument("--input", type=Path,
+                        help="CSV со строками-источниками (по умолчанию — из CSV Модуля 1)")
+    parser.add_argument("--synthetic", type=int, metavar="N",
+                        help="замер: измерение из N членов и полная выгрузка с изменениями")
+    parser.add_argument("--change-rate", type=float, default=0.05,
+                        help="--synthetic: доля изменённых членов (по умолчанию 0.05)")
+    parser.add_argument("--new-rate", type=float, default=0.01,
+                        help="--synthetic: доля новых членов (по умолчанию 0.01)")
+    parser.add_argument("--load-date",
+                        help="дата загрузки: effective_from новых и effective_to закрытых версий (по умолчанию сегодня)")
+    parser.add_argument("--config", type=Path, default=ETL_CONFIG,
+                        help="etl_config.json с разделами target и incremental.scd_handling")
+    parser.add_argument("--batch-size", type=int,
+                        help="строк в пакете (по умолчанию incremental.batch_size)")
+    parser.add_argument("--state-dir", type=Path, default=SCD2_DIR,
+                        help="каталог измерений и файлов изменений")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="только посчитать изменения, измерение не обновлять")
+    parser.add_argument("--reset", action="store_true",
+                        help="удалить сохранённое измерение и загрузить всё заново")
+    parser.add_argument("--metrics-dir", type=Path, default=METRICS_DIR,
+                        help="куда писать метрики этапов (JSON и Prometheus)")
+    parser.add_argument("--no-metrics", action="store_true",
+                        help="не замерять этапы")
+    return parser.parse_args()
+
+
+def main():
+    dimensions = scd_dimensions()
+    args = parse_args(list(dimensions))
+    spec = scd_dimensions(args.config)[args.dimension]
+    settings = scd_settings(args.config)
+    batch_size = args.batch_size or settings["batch_size"]
+    metrics = start("13_scd2_dimensions", config_path=args.config, enabled=not args.no_metrics)
+    state_path = args.state_dir / f"{args.dimension}.feather"
+
+    print("=" * 70)
+    print(f"SCD Type 2 «Руда+»: {args.dimension}")
+    print("=" * 70)
+    print(f"  Ключ: {spec['business_key']}; отслеживаются: {', '.join(spec['tracking_columns'])}")
+
+    with metrics.stage(args.dimension), metrics.stage("load") as stage:
+        if args.synthetic:
+            members, rows = synthetic_rows(spec, args.synthetic, args.change_rate, args.new_rate)
+            source = f"синтетика: {args.synthetic:,} членов, изменено {args.change_rate:.0%}, новых {args.new_rate:.0%}"
+        else:
+            if args.reset and state_path.exists():
+                state_path.unlink()
+            current = read_state(state_path)
+            try:
+                rows = pd.read_csv(args.input) if args.input else module1_rows(args.dimension)
+            except ValueError as e:
+                print(f"  [!] {e}")
+                return 2
+            source = str(args.input or DATA_DIR / "equipment.csv")
+        stage.add_rows(len(rows))
+    print(f"  Источник: {source}")
+
+    if args.synthetic:
+        # начальное измерение — первый запуск по исходным членам
+        initial = SCD2Engine(spec, settings=settings, load_date="2025-01-01")
+        with metrics.stage(args.dimension), metrics.stage("initial_load", rows=args.synthetic):
+            for _ in initial.run(members, batch_size):
+                pass
+        current = initial.changes().inserts
+        print(f"  Начальное измерение: {len(current):,} версий")
+
+    with metrics.stage(args.dimension), metrics.stage("index") as stage:
+        engine = SCD2Engine(spec, current, settings, load_date=args.load_date)
+        stage.add_rows(len(engine.index))
+    print(f"  Текущих версий: {len(engine.index):,}" + ("" if current is not None else " (первая загрузка)")
+          + f"; дата загрузки {engine.load_date}")
+
+    started = time.perf_counter()
+    with metrics.stage(args.dimension), metrics.stage("detect", rows=len(rows)):
+        batches = (rows.iloc[i:i + batch_size] for i in range(0, len(rows), batch_size))
+        for batch in metrics.chunks(batches):
+            engine.process(batch)
+    changes = engine.changes()
+    print_counts(engine.counts, time.perf_counter() - started, len(rows))
+
+    if not (args.dry_run or args.synthetic):
+        with metrics.stage(args.dimension), metrics.stage("store"):
+            stem = args.state_dir / f"{args.dimension}_{engine.load_date:%Y%m%d}"
+            args.state_dir.mkdir(parents=True, exist_ok=True)
+            changes.inserts.to_csv(f"{stem}_inserts.csv", index=False)
+            changes.expires.to_csv(f"{stem}_expires.csv", index=False)
+            dimension = apply_changes(current, changes.inserts, changes.expires,
+                                      spec["surrogate_key"], settings)
+            write_state(dimension, state_path)
+        n_current = int(dimension[settings["is_current"]].sum())
+        print(f"\n  Измерение: {len(dimension):,} версий, текущих {n_current:,} → {state_path}")
+        print(f"  Изменения: {stem}_inserts.csv, {stem}_expires.csv")
+
+    if metrics.enabled:
+        print_metrics(metrics.write(args.metrics_dir))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,123 @@
+"""
+Практикум по анализу и моделированию данных
+Модуль 2 (доп.): Загрузка CSV в staging-слой через COPY
+Предприятие: «Руда+» — добыча железной руды
+
+Грузит CSV Модуля 1 и выгрузку событий датчиков Модуля 4 в таблицы
+staging.stg_<источник> (staging_loader.py): метаданные _load_id,
+_load_timestamp, _source_system и _row_hash добавляются векторно, данные
+идут в PostgreSQL через COPY из буферов в памяти — блоками, параллельно
+по --workers соединениям. Каждая загрузка записывается в etl_load_log.
+
+Подключение — как в 02 (db_profiling.DB_CONFIG, переменные PG_*).
+
+Индексы и внешние ключи, снятые на время упавшей полной загрузки,
+строятся заново при следующей загрузке таблицы; --restore-secondary
+строит их без загрузки.
+
+Примеры:
+    python 14_staging_load.py                                   # все источники
+    python 14_staging_load.py --source sensor_readings --input synthetic/sensor_readings.csv --workers 8
+    python 14_staging_load.py --source sensor_events --load-type incremental
+    python 14_staging_load.py --restore-secondary
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+from datasets import ETL_CONFIG
+from db_profiling import make_engine
+from instrumentation import METRICS_DIR, print_metrics, start
+from staging_loader import (DEFAULT_BLOCK_MB, DEFAULT_WORKERS, SOURCES, ensure_staging, load_file,
+                            restore_secondary, staging_settings)
+
+
+def print_result(result: dict):
+    print(f"  ✓ {result['table']}: {result['rows']:,} строк за {result['seconds']:.2f} с "
+          f"({result['rows_per_second']:,.0f} строк/с, {result['mb_per_second']:.1f} МБ/с), "
+          f"load_id={result['load_id']}")
+    print(f"    блоков: {result['blocks']}, процессов: {result['workers']}; разбор и хеши "
+          f"{result['encode_seconds']:.1f} с, COPY {result['copy_seconds']:.1f} с (сумма по процессам)")
+    if result["recovered"]:
+        print(f"    восстановлено после прошлой упавшей загрузки: {result['recovered']} индексов и внешних ключей")
+    if result["deferred"]:
+        print(f"    индексов и внешних ключей построено заново: {result['deferred']} "
+              f"за {result['index_seconds']:.1f} с")
+    if result["skipped_columns"]:
+        skip = SOURCES.get(result["name"], {}).get("skip", {})
+        print("    нет в таблице, пропущены: " + ", ".join(
+            f"{c} ({skip[c]})" if c in skip else c for c in result["skipped_columns"]))
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Загрузка CSV «Руда+» в staging через COPY")
+    parser.add_argument("--source", action="append", choices=list(SOURCES),
+                        help="источник (можно несколько раз; по умолчанию все)")
+    parser.add_argument("--input", type=Path,
+                        help="CSV вместо файла по умолчанию (только с одним --source)")
+    parser.add_argument("--load-type", choices=["full", "incremental"], default="full",
+                        help="full — TRUNCATE и загрузка заново, incremental — добавить строки")
+    parser.add_argument("--workers", type=int, default=DEFAULT_WORKERS,
+                        help=f"процессов и соединений COPY (по умолчанию {DEFAULT_WORKERS})")
+    parser.add_argument("--block-mb", type=float, default=DEFAULT_BLOCK_MB,
+                        help=f"размер блока файла, МБ (по умолчанию {DEFAULT_BLOCK_MB})")
+    parser.add_argument("--keep-indexes", action="store_true",
+                        help="не снимать вторичные индексы и внешние ключи на время полной загрузки")
+    parser.add_argument("--restore-secondary", action="store_true",
+                        help="только построить индексы и внешние ключи, снятые упавшей загрузкой")
+    parser.add_argument("--config", type=Path, default=ETL_CONFIG,
+                        help="etl_config.json с разделом staging")
+    parser.add_argument("--metrics-dir", type=Path, default=METRICS_DIR,
+                        help="куда писать метрики этапов (JSON и Prometheus)")
+    parser.add_argument("--no-metrics", action="store_true",
+                        help="не замерять этапы")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    sources = args.source or list(SOURCES)
+    if args.input and len(sources) != 1:
+        print("[!] --input задаётся вместе с одним --source")
+        return 2
+    settings = staging_settings(args.config)
+    metrics = start("14_staging_load", config_path=args.config, enabled=not args.no_metrics)
+
+    print("=" * 70)
+    print(f"Загрузка в {settings['schema']}.{settings['table_prefix']}* через COPY ({args.load_type})")
+    print("=" * 70)
+
+    if args.restore_secondary:
+        engine = make_engine(pool_size=1)
+        ensure_staging(engine, settings)
+        for name in sources:
+            table = f"{settings['schema']}.{settings['table_prefix']}{name}"
+            print(f"  {table}: восстановлено {restore_secondary(engine, table, settings)}")
+        engine.dispose()
+        return 0
+
+    started = time.perf_counter()
+    failed = 0
+    for name in sources:
+        path = args.input or SOURCES[name]["path"]
+        metrics.observe_file(path)
+        try:
+            with metrics.stage(name) as stage:
+                result = load_file(name, path, args.load_type, args.workers, int(args.block_mb * 2**20),
+                                   settings, defer_indexes=not args.keep_indexes)
+                stage.add_rows(result["rows"])
+        except Exception as e:
+            failed += 1
+            print(f"  ✗ {name}: {type(e).__name__}: {e}")
+            continue
+        print_result(result)
+
+    print(f"\n  Время: {time.perf_counter() - started:.2f} с")
+    if metrics.enabled:
+        print_metrics(metrics.write(args.metrics_dir))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
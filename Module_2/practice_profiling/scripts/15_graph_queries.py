@@ -0,0 +1,166 @@
+"""
+Практикум по анализу и моделированию данных
+Модуль 2 (доп.): Обходы графа MES «Руда+» без Neo4j
+Предприятие: «Руда+» — добыча железной руды
+
+Строит графовый индекс (graph_index.py) по схеме graph_model.json
+Модуля 5 из CSV Модуля 1 и выполняет типовые обходы
+04_graph_cypher.cypher: датчики оборудования шахты, простои машин
+оператора, маршруты CONNECTED_TO*, окрестность узла в k шагов. Для
+каждого запроса печатается результат и задержка (медиана и p99 по
+--repeat повторам).
+
+--synthetic N — граф парка из N машин (--events-per-equipment событий
+обслуживания на машину) для замера на объёмах всего предприятия.
+
+Запросы:
+    --query <имя> --key <ключ>      типовой запрос из graph_index.QUERIES
+    --start Метка:ключ --path ШАГИ  произвольный путь: "LOCATED_IN,HAS_SENSOR";
+                                    "<ТИП" — против направления, "ТИП*" — замыкание
+    --start Метка:ключ --hops K     окрестность в K шагов по всем связям
+Без них выполняются все типовые запросы и окрестность в 2 шага.
+
+Примеры:
+    python 15_graph_queries.py
+    python 15_graph_queries.py --query mine_sensors --key MINE-2
+    python 15_graph_queries.py --start "Operator:Козлов Д.М." --path "OPERATES,REQUIRED_MAINTENANCE"
+    python 15_graph_queries.py --start Equipment:EQ-001 --hops 3
+    python 15_graph_queries.py --synthetic 5000 --events-per-equipment 200
+"""
+
+import argparse
+import time
+from pathlib import Path
+
+import numpy as np
+
+from graph_index import GRAPH_MODEL, QUERIES, build_graph, load_schema, module1_frames, synthetic_frames
+from instrumentation import METRICS_DIR, print_metrics, start
+
+
+def timed(query, repeat: int) -> tuple:
+    """Результат запроса и задержки в микросекундах: медиана и p99."""
+    times = np.empty(repeat)
+    for i in range(repeat):
+        began = time.perf_counter_ns()
+        result = query()
+        times[i] = time.perf_counter_ns() - began
+    return result, np.median(times) / 1000, np.percentile(times, 99) / 1000
+
+
+def print_nodes(graph, label: str, ids: np.ndarray, limit: int = 8):
+    keys = graph.keys(label, ids[:limit])
+    more = f" … ещё {len(ids) - limit:,}" if len(ids) > limit else ""
+    print(f"    {len(ids):,} × {label}: {', '.join(keys)}{more}")
+
+
+def print_graph(graph, seconds: float):
+    print(f"\n  Граф построен за {seconds:.2f} с")
+    for label in graph.node_keys:
+        print(f"    {label:<18} {graph.count(label):>12,} узлов")
+    print(f"\n  {'Связь':<22} {'откуда → куда':<30} {'рёбер':>11} {'макс. степень':>14} {'без узла':>9}")
+    for row in graph.summary().itertuples():
+        print(f"  {row.relationship:<22} {row.source + ' → ' + row.target:<30} {row.edges:>11,} "
+              f"{max(row.max_out, row.max_in):>14,} {row.dropped:>9,}")
+    memory = graph.memory_bytes()
+    print(f"\n  Память: списки смежности {memory['adjacency'] / 2**20:.1f} МБ, ключи "
+          f"{memory['keys'] / 2**20:.1f} МБ, свойства {memory['properties'] / 2**20:.1f} МБ")
+
+
+def run_path(graph, label: str, key: str, steps: list, repeat: int, title: str):
+    (end, ids), median, p99 = timed(lambda: graph.traverse(label, [key], steps), repeat)
+    print(f"\n  {title}")
+    print(f"    ({label} {key}) → {' → '.join(steps)}: {median:,.1f} мкс (p99 {p99:,.1f})")
+    print_nodes(graph, end, ids)
+
+
+def run_hops(graph, label: str, key: str, hops: int, repeat: int):
+    layers, median, p99 = timed(lambda: graph.neighbourhood(label, [key], hops), repeat)
+    total = sum(len(ids) for layer in layers[1:] for ids in layer.values())
+    print(f"\n  Окрестность ({label} {key}), шагов {hops}: {total:,} узлов, "
+          f"{median:,.1f} мкс (p99 {p99:,.1f})")
+    for hop, layer in enumerate(layers[1:], start=1):
+        for other, ids in layer.items():
+            print(f"    шаг {hop}:", end="")
+            print_nodes(graph, other, ids, limit=5)
+
+
+def parse_start(value: str) -> tuple:
+    label, sep, key = value.partition(":")
+    if not sep:
+        raise argparse.ArgumentTypeError("ожидается Метка:ключ, например Equipment:EQ-001")
+    return label, key
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Обходы графа MES «Руда+» в памяти")
+    parser.add_argument("--model", type=Path, default=GRAPH_MODEL,
+                        help="graph_model.json со схемой графа (по умолчанию — Модуля 5)")
+    parser.add_argument("--query", choices=list(QUERIES), help="типовой запрос")
+    parser.add_argument("--key", help="ключ начального узла для --query (по умолчанию — первый узел)")
+    parser.add_argument("--start", type=parse_start, metavar="Метка:ключ",
+                        help="начальный узел для --path и --hops")
+    parser.add_argument("--path", help="шаги через запятую: LOCATED_IN,HAS_SENSOR; <ТИП, ТИП*")
+    parser.add_argument("--hops", type=int, help="окрестность в K шагов")
+    parser.add_argument("--synthetic", type=int, metavar="N",
+                        help="замер: синтетический граф парка из N машин")
+    parser.add_argument("--events-per-equipment", type=int, default=200,
+                        help="--synthetic: событий обслуживания на машину (по умолчанию 200)")
+    parser.add_argument("--repeat", type=int, default=200,
+                        help="повторов запроса для замера задержки (по умолчанию 200)")
+    parser.add_argument("--metrics-dir", type=Path, default=METRICS_DIR,
+                        help="куда писать метрики этапов (JSON и Prometheus)")
+    parser.add_argument("--no-metrics", action="store_true",
+                        help="не замерять этапы")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    if (args.path or args.hops is not None) and not args.start:
+        print("[!] --path и --hops задаются вместе с --start")
+        return 2
+    metrics = start("15_graph_queries", enabled=not args.no_metrics)
+    schema = load_schema(args.model)
+
+    print("=" * 70)
+    print("Граф MES «Руда+»: " + (f"синтетический парк из {args.synthetic:,} машин"
+                                 if args.synthetic else "CSV Модуля 1"))
+    print("=" * 70)
+
+    started = time.perf_counter()
+    with metrics.stage("build") as stage:
+        if args.synthetic:
+            nodes, edges = synthetic_frames(args.synthetic, args.events_per_equipment)
+        else:
+            nodes, edges = module1_frames(model_path=args.model)
+        graph = build_graph(schema, nodes, edges)
+        stage.add_rows(sum(rel.edges for rel in graph.relationships.values()))
+    del nodes, edges
+    print_graph(graph, time.perf_counter() - started)
+
+    try:
+        with metrics.stage("queries"):
+            if args.start and args.path:
+                steps = [step for step in args.path.split(",") if step.strip()]
+                run_path(graph, *args.start, steps, args.repeat, "Путь")
+            elif args.start:
+                run_hops(graph, *args.start, args.hops if args.hops is not None else 2, args.repeat)
+            else:
+                for name in [args.query] if args.query else QUERIES:
+                    label, steps, title = QUERIES[name]
+                    key = args.key if args.query and args.key else graph.keys(label, [0])[0]
+                    run_path(graph, label, key, steps, args.repeat, f"{name}: {title}")
+                if not args.query:
+                    run_hops(graph, "Equipment", graph.keys("Equipment", [0])[0], 2, args.repeat)
+    except (KeyError, ValueError) as e:
+        print(f"  [!] {e.args[0] if e.args else e}")
+        return 2
+
+    if metrics.enabled:
+        print_metrics(metrics.write(args.metrics_dir))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,182 @@
+"""
+Практикум по анализу и моделированию данных
+Модуль 2 (доп.): Часовые и суточные агрегаты телеметрии с обновлением по интервалам
+Предприятие: «Руда+» — добыча железной руды
+
+Замена непрерывных агрегатов timeseries.sensor_hourly / sensor_daily
+Модуля 5 там, где TimescaleDB нет (rollups.py). Каждый --input
+дописывается в сырые месячные части Parquet, а в часовых и суточных
+агрегатах пересчитываются только интервалы, куда попали его строки,
+включая опоздавшие. Повторно тот же файл (по содержимому) не грузится —
+иначе строки посчитались бы дважды; --force грузит всё равно.
+
+Дашборд месяца (--dashboard YYYY-MM) читает суточные агрегаты; с
+--compare-raw тот же результат считается по сырым показаниям, чтобы
+сравнить время. По умолчанию грузится sensor_timeseries_sample.csv
+Модуля 5 и строится дашборд последнего месяца.
+
+Хранилище — reports/rollups (--store):
+    raw/month=YYYY-MM/part-NNNNNN.parquet, hourly/…, daily/…, state.json
+
+Примеры:
+    python 16_rollups.py
+    python 16_rollups.py --input landing/readings_0315.csv landing/readings_0316.csv
+    python 16_rollups.py --dashboard 2025-03 --equipment EQ-001 --compare-raw
+    python 16_rollups.py --rebuild 2025-03
+    python 16_rollups.py --store reports/rollups_synth --reset --synthetic 20000000 --batches 30 --late-rate 0.01
+"""
+
+import argparse
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+
+from instrumentation import METRICS_DIR, print_metrics, start
+from rollups import ROLLUP_DIR, RAW_COLUMNS, RollupStore, dashboard, file_digest, raw_dashboard, synthetic_readings
+from timeseries_profile import TIMESERIES_SAMPLE, read_timeseries
+
+
+def print_refresh(result: dict):
+    late = f", опоздавших {result['late_rows']:,}" if result["late_rows"] else ""
+    print(f"  ✓ {result['source']}: {result['rows']:,} строк{late} → месяцы {', '.join(result['months']) or '—'}; "
+          f"пересчитано часов {result['touched_hours']:,}, суток {result['touched_days']:,} "
+          f"за {result['seconds']:.2f} с (сырые части {result['raw_seconds']:.2f} с)")
+    if result["skipped_rows"]:
+        print(f"    без метки времени, пропущено: {result['skipped_rows']:,}")
+
+
+def print_dashboard(overview, daily, seconds: float, month: str, limit: int = 20):
+    print(f"\n  Дашборд за {month}: {len(overview)} рядов, суточных строк {len(daily):,}, "
+          f"{seconds * 1000:.1f} мс")
+    print(f"  {'Оборудование':<14} {'Датчик':<24} {'показаний':>10} {'среднее':>9} {'мин':>9} "
+          f"{'макс':>9} {'σ':>8}")
+    for row in overview.sort_values(["equipment_id", "sensor_type"]).head(limit).itertuples():
+        print(f"  {row.equipment_id:<14} {row.sensor_type:<24} {row.reading_count:>10,} {row.avg_value:>9.2f} "
+              f"{row.min_value:>9.2f} {row.max_value:>9.2f} {row.stddev_value:>8.2f}")
+    if len(overview) > limit:
+        print(f"  … и ещё {len(overview) - limit} рядов")
+
+
+def run_synthetic(store: RollupStore, args, metrics):
+    """Синтетика по порядку времени, порциями --batches; доля --late-rate строк приходит позже."""
+    df = synthetic_readings(args.synthetic)
+    rng = np.random.default_rng(7)
+    elapsed = (df["reading_time"] - df["reading_time"].min()).to_numpy().astype(np.int64)
+    batch = np.minimum(elapsed * args.batches // (elapsed.max() + 1), args.batches - 1)
+    late = rng.random(len(df)) < args.late_rate
+    batch[late] = np.minimum(batch[late] + rng.integers(1, 4, late.sum()), args.batches - 1)
+    print(f"  Синтетика: {len(df):,} показаний, {args.batches} порций, опаздывает {args.late_rate:.0%}")
+    seconds = []
+    for i in range(args.batches):
+        with metrics.stage("refresh") as stage:
+            rows = df[batch == i]
+            result = store.refresh(rows, f"синтетика, порция {i + 1}")
+            stage.add_rows(len(rows))
+        seconds.append(result["seconds"])
+        if i < 3 or i == args.batches - 1:
+            print_refresh(result)
+        elif i == 3:
+            print("  …")
+    print(f"  Обновление: в среднем {np.mean(seconds):.2f} с на порцию ~{len(df) // args.batches:,} строк")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Часовые и суточные агрегаты телеметрии «Руда+»")
+    parser.add_argument("--input", type=Path, nargs="+",
+                        help="CSV с показаниями (по умолчанию sensor_timeseries_sample.csv Модуля 5)")
+    parser.add_argument("--store", type=Path, default=ROLLUP_DIR,
+                        help="каталог хранилища (по умолчанию reports/rollups)")
+    parser.add_argument("--force", action="store_true",
+                        help="грузить файл, даже если он уже загружен")
+    parser.add_argument("--reset", action="store_true",
+                        help="удалить хранилище перед загрузкой")
+    parser.add_argument("--rebuild", metavar="YYYY-MM",
+                        help="пересчитать агрегаты месяца из сырых частей (all — все месяцы)")
+    parser.add_argument("--dashboard", metavar="YYYY-MM",
+                        help="дашборд месяца (по умолчанию — месяц watermark)")
+    parser.add_argument("--equipment", action="append", help="фильтр дашборда (можно несколько раз)")
+    parser.add_argument("--sensor", action="append", help="фильтр дашборда (можно несколько раз)")
+    parser.add_argument("--compare-raw", action="store_true",
+                        help="посчитать дашборд и по сырым показаниям, сравнить время")
+    parser.add_argument("--synthetic", type=int, metavar="N",
+                        help="замер: N синтетических показаний (200 рядов, шаг 1 мин)")
+    parser.add_argument("--batches", type=int, default=30,
+                        help="--synthetic: на сколько порций по времени делить (по умолчанию 30)")
+    parser.add_argument("--late-rate", type=float, default=0.01,
+                        help="--synthetic: доля строк, приходящих в одной из 3 следующих порций")
+    parser.add_argument("--metrics-dir", type=Path, default=METRICS_DIR,
+                        help="куда писать метрики этапов (JSON и Prometheus)")
+    parser.add_argument("--no-metrics", action="store_true",
+                        help="не замерять этапы")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    metrics = start("16_rollups", enabled=not args.no_metrics)
+
+    print("=" * 70)
+    print(f"Агрегаты телеметрии «Руда+»: {args.store}")
+    print("=" * 70)
+    if args.reset and args.store.exists():
+        shutil.rmtree(args.store)
+    store = RollupStore(args.store)
+    pending = store.recover()
+    if pending:
+        print(f"  ↺ Откат прерванной загрузки {pending['source'] or 'часть ' + str(pending['part'])}: "
+              f"агрегаты {', '.join(pending['months'])} пересчитаны из сырых частей")
+
+    if args.synthetic:
+        run_synthetic(store, args, metrics)
+    elif args.input or not (args.dashboard or args.rebuild):
+        for path in args.input or [TIMESERIES_SAMPLE]:
+            if not path.exists():
+                print(f"  [!] Файл не найден: {path}")
+                return 1
+            digest = file_digest(path)
+            if store.seen(digest) and not args.force:
+                print(f"  = {path.name}: уже загружен, пропущен (--force — загрузить снова)")
+                continue
+            metrics.observe_file(path)
+            with metrics.stage("refresh") as stage:
+                df, columns = read_timeseries(path)
+                df = df.rename(columns={columns["time"]: "reading_time", columns["equipment"]: "equipment_id",
+                                        columns["sensor"]: "sensor_type", columns["value"]: "value"})[RAW_COLUMNS]
+                result = store.refresh(df, path.name, digest)
+                stage.add_rows(len(df))
+            print_refresh(result)
+
+    if args.rebuild:
+        months = store.months() if args.rebuild == "all" else [args.rebuild]
+        with metrics.stage("rebuild"):
+            for month in months:
+                print(f"  ↻ {month}: агрегаты пересчитаны из {store.rebuild_month(month):,} сырых строк")
+
+    month = args.dashboard or (str(np.datetime64(store.state["watermark"], "M"))
+                               if store.state["watermark"] else None)
+    if month is None:
+        print("  Хранилище пусто")
+        return 0
+    with metrics.stage("dashboard"):
+        started = time.perf_counter()
+        overview, daily = dashboard(store, month, args.equipment, args.sensor)
+        seconds = time.perf_counter() - started
+    print_dashboard(overview, daily, seconds, month)
+    if args.compare_raw or args.synthetic:
+        with metrics.stage("dashboard_raw"):
+            started = time.perf_counter()
+            raw_overview, _ = raw_dashboard(store, month, args.equipment, args.sensor)
+            raw_seconds = time.perf_counter() - started
+        raw_rows = int(raw_overview["reading_count"].sum())
+        print(f"\n  По сырым показаниям ({raw_rows:,} строк): {raw_seconds * 1000:.1f} мс — "
+              f"{raw_seconds / max(seconds, 1e-9):.1f}× от времени по агрегатам")
+
+    if metrics.enabled:
+        print_metrics(metrics.write(args.metrics_dir))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
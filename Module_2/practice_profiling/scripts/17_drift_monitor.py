@@ -0,0 +1,234 @@
+"""
+Практикум по анализу и моделированию данных
+Модуль 2 (доп.): Мониторинг дрейфа данных по сохранённым базовым профилям
+Предприятие: «Руда+» — добыча железной руды
+
+Лёгкая проверка для schedule.data_quality_check (etl_config.json):
+вместо повторного профилирования новая загрузка сравнивается с
+базовыми профилями колонок (drift.py) — скетчами квантилей, интервалами
+PSI и частотами категорий в reports/drift/baselines/<датасет>.json.
+
+Базовые профили строятся один раз (--build-baseline) по CSV из
+--data-dir частями — файл любого размера. Проверка (по умолчанию)
+читает только загрузку: CSV <датасет>.csv из --data-dir или --input для
+одного --dataset. Для каждой колонки печатаются PSI, KS, изменение долей
+категорий и пропусков; отчёт пишется в reports/drift/<датасет>_<время>.json.
+Код возврата 1 — в какой-то колонке дрейф.
+
+Пороги — DEFAULT_THRESHOLDS из drift.py, секция monitoring.drift в
+etl_config.json (если есть, с порогами по колонкам) и флаги --psi,
+--ks, --share, --missing.
+
+--update-baseline после проверки вливает загрузку в базовый профиль
+(если дрейфа нет; интервалы PSI не меняются).
+--synthetic N — демонстрация: синтетика synthetic_data.py на N + N/10
+строк, последние N/10 строк каждого датасета — проверяемая загрузка,
+остальное — базовый профиль; --inject-drift сдвигает в загрузке
+распределения нескольких колонок.
+
+Примеры:
+    python 17_drift_monitor.py --build-baseline
+    python 17_drift_monitor.py --data-dir landing/2026-03-02
+    python 17_drift_monitor.py --dataset ore_production --input new_shift.csv --psi 0.25
+    python 17_drift_monitor.py --data-dir landing/2026-03-02 --update-baseline
+    python 17_drift_monitor.py --synthetic 2000000 --inject-drift
+"""
+
+import argparse
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from datasets import DATA_DIR, ETL_CONFIG
+from drift import (DATASETS, DEFAULT_BINS, DEFAULT_CHUNKSIZE, DRIFT_DIR, TableBaseline, baseline_path,
+                   check_table, drift_settings, read_chunks, write_report)
+from instrumentation import METRICS_DIR, print_metrics, start
+
+
+def print_results(name: str, rows: int, results: list, seconds: float):
+    flagged = sum(r["status"] == "drift" for r in results)
+    print(f"\n  {name}: {rows:,} строк, {len(results)} колонок, {seconds * 1000:.0f} мс — "
+          + (f"дрейф в {flagged}" if flagged else "дрейфа нет"))
+    print(f"    {'Колонка':<20} {'PSI':>7} {'KS':>7} {'Δ доли':>8} {'пропуски':>9}  статус")
+    for r in results:
+        ks = f"{r['ks']:.3f}" if "ks" in r else "—"
+        share = f"{r['max_share_change']:.3f}" if "max_share_change" in r else "—"
+        psi = f"{r['psi']:.3f}" if "psi" in r else "—"
+        print(f"    {r['column']:<20} {psi:>7} {ks:>7} {share:>8} {r['missing_rate']:>9.1%}  {r['status']}")
+        for reason in r["reasons"]:
+            print(f"      · {reason}")
+
+
+def build_baselines(data_dir: Path, names: list, args, metrics) -> dict:
+    baselines = {}
+    for name in names:
+        path = data_dir / f"{name}.csv"
+        if not path.exists():
+            print(f"  [!] Файл не найден: {path}")
+            continue
+        metrics.observe_file(path)
+        with metrics.stage("baseline") as stage:
+            started = time.perf_counter()
+            baseline = TableBaseline.build(name, path, args.chunksize, args.bins)
+            baseline.save(baseline_path(name, args.drift_dir))
+            stage.add_rows(baseline.rows)
+        size = baseline_path(name, args.drift_dir).stat().st_size
+        print(f"  ✓ {name}: {baseline.rows:,} строк, {len(baseline.columns)} колонок за "
+              f"{time.perf_counter() - started:.1f} с → {size / 1024:.0f} КБ")
+        baselines[name] = baseline
+    return baselines
+
+
+def inject_drift(name: str, df: pd.DataFrame, rng) -> pd.DataFrame:
+    """--inject-drift: сдвиг среднего, рост пропусков и перекос долей категорий."""
+    if name == "ore_production":
+        df["tonnage_extracted"] *= 1.15
+        df.loc[rng.random(len(df)) < 0.1, "moisture_pct"] = np.nan
+    elif name == "sensor_readings":
+        df["reading_value"] += df["reading_value"].std() * 0.3
+    elif name == "downtime_events":
+        top = df["severity"].value_counts().index[-1]
+        df.loc[rng.random(len(df)) < 0.3, "severity"] = top
+    return df
+
+
+def split_tail(src: Path, base_dir: Path, batch_dir: Path, names: list, share: float, chunksize: int):
+    """--synthetic: последние share строк каждого CSV — «новая загрузка», остальное — база."""
+    for name in names:
+        path = src / f"{name}.csv"
+        total = sum(1 for _ in path.open(encoding="utf-8")) - 1
+        cut = total - int(total * share)
+        seen = 0
+        for out in (base_dir, batch_dir):
+            out.mkdir(parents=True, exist_ok=True)
+        with pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunksize) as reader:
+            for chunk in reader:
+                head = chunk.iloc[:max(cut - seen, 0)]
+                tail = chunk.iloc[len(head):]
+                for part, out in ((head, base_dir), (tail, batch_dir)):
+                    target = out / f"{name}.csv"
+                    if len(part) or not target.exists():
+                        part.to_csv(target, mode="a", header=not target.exists(), index=False)
+                seen += len(chunk)
+
+
+def check(name: str, path: Path, settings: dict, args, metrics, rng=None) -> int:
+    """Проверка загрузки по базовому профилю; 1 — дрейф, 0 — нет, 2 — нечего сравнивать."""
+    base_file = baseline_path(name, args.drift_dir)
+    if not base_file.exists():
+        print(f"  [!] {name}: нет базового профиля {base_file} (сначала --build-baseline)")
+        return 2
+    metrics.observe_file(path)
+    with metrics.stage("check") as stage:
+        started = time.perf_counter()
+        baseline = TableBaseline.load(base_file)
+        df = pd.concat(list(read_chunks(name, path, args.chunksize)), ignore_index=True)
+        if rng is not None:
+            df = inject_drift(name, df, rng)
+        results = check_table(baseline, df, settings)
+        seconds = time.perf_counter() - started
+        stage.add_rows(len(df))
+    print_results(name, len(df), results, seconds)
+    report = write_report(name, str(path), results, args.drift_dir)
+    print(f"    отчёт: {report}")
+    drifted = any(r["status"] == "drift" for r in results)
+
+    if args.update_baseline:
+        if drifted:
+            print("    базовый профиль не обновлён: в загрузке дрейф")
+        else:
+            batch = TableBaseline(name, sources=[str(path)])
+            batch.update(df)
+            baseline.merge(batch).save(base_file)
+            print(f"    базовый профиль обновлён: {baseline.rows:,} строк")
+    return int(drifted)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Мониторинг дрейфа данных «Руда+»")
+    parser.add_argument("--dataset", action="append", choices=DATASETS,
+                        help="датасет (можно несколько раз; по умолчанию все три)")
+    parser.add_argument("--data-dir", type=Path, default=DATA_DIR,
+                        help="каталог с CSV: базовые данные для --build-baseline или загрузка для проверки")
+    parser.add_argument("--input", type=Path, help="CSV загрузки для одного --dataset")
+    parser.add_argument("--build-baseline", action="store_true",
+                        help="построить базовые профили по --data-dir")
+    parser.add_argument("--update-baseline", action="store_true",
+                        help="влить проверенную загрузку в базовый профиль, если дрейфа нет")
+    parser.add_argument("--drift-dir", type=Path, default=DRIFT_DIR,
+                        help="каталог базовых профилей и отчётов (по умолчанию reports/drift)")
+    parser.add_argument("--config", type=Path, default=ETL_CONFIG,
+                        help="etl_config.json с необязательной секцией monitoring.drift")
+    parser.add_argument("--psi", type=float, help="порог PSI")
+    parser.add_argument("--ks", type=float, help="порог расстояния KS")
+    parser.add_argument("--share", type=float, help="порог изменения доли категории")
+    parser.add_argument("--missing", type=float, help="порог изменения доли пропусков")
+    parser.add_argument("--bins", type=int, default=DEFAULT_BINS,
+                        help="интервалов PSI в базовом профиле (по умолчанию 10)")
+    parser.add_argument("--chunksize", type=int, default=DEFAULT_CHUNKSIZE,
+                        help="строк в части при чтении CSV")
+    parser.add_argument("--synthetic", type=int, metavar="N",
+                        help="демонстрация: базовый профиль по N синтетическим строкам, загрузка N/10")
+    parser.add_argument("--inject-drift", action="store_true",
+                        help="--synthetic: внести дрейф в загрузку")
+    parser.add_argument("--metrics-dir", type=Path, default=METRICS_DIR,
+                        help="куда писать метрики этапов (JSON и Prometheus)")
+    parser.add_argument("--no-metrics", action="store_true",
+                        help="не замерять этапы")
+    return parser.parse_args()
+
+
+def main():
+    args = parse_args()
+    names = args.dataset or list(DATASETS)
+    if args.input and len(names) != 1:
+        print("[!] --input задаётся вместе с одним --dataset")
+        return 2
+    metrics = start("17_drift_monitor", enabled=not args.no_metrics)
+    settings = drift_settings(args.config)
+    for key in ("psi", "ks", "share", "missing"):
+        if getattr(args, key) is not None:
+            settings[key] = getattr(args, key)
+
+    print("=" * 70)
+    print("Мониторинг дрейфа данных «Руда+»")
+    print("=" * 70)
+    print(f"  Пороги: PSI {settings['psi']}, KS {settings['ks']}, доля {settings['share']}, "
+          f"пропуски {settings['missing']}" + (f"; по колонкам: {', '.join(settings['columns'])}"
+                                               if settings["columns"] else ""))
+
+    if args.synthetic:
+        from synthetic_data import generate
+
+        with tempfile.TemporaryDirectory(prefix="drift_") as tmp:
+            base_dir, batch_dir = Path(tmp) / "base", Path(tmp) / "batch"
+            with metrics.stage("generate"):
+                generate(Path(tmp) / "all", args.synthetic + args.synthetic // 10)
+                split_tail(Path(tmp) / "all", base_dir, batch_dir, names, 1 / 11, args.chunksize)
+            print(f"\n  Базовые профили: {args.synthetic:,} синтетических строк")
+            build_baselines(base_dir, names, args, metrics)
+            rng = np.random.default_rng(7) if args.inject_drift else None
+            codes = [check(name, batch_dir / f"{name}.csv", settings, args, metrics, rng) for name in names]
+    elif args.build_baseline:
+        print(f"\n  Базовые профили: {args.data_dir}")
+        codes = [0 if build_baselines(args.data_dir, names, args, metrics) else 2]
+    else:
+        codes = []
+        for name in names:
+            path = args.input or args.data_dir / f"{name}.csv"
+            if not path.exists():
+                print(f"  [!] Файл не найден: {path}")
+                codes.append(2)
+                continue
+            codes.append(check(name, path, settings, args, metrics))
+
+    if metrics.enabled:
+        print_metrics(metrics.write(args.metrics_dir))
+    return max(codes, default=0)
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,233 @@
+"""
+Практикум по анализу и моделированию данных
+Модуль 2 (доп.): Типизированная загрузка CSV Модуля 1 с колоночным кэшем
+Предприятие: «Руда+» — добыча железной руды
+
+По умолчанию pd.read_csv() делает из каждой строковой колонки колонку
+Python-объектов, а числа — int64/float64. Здесь для каждого датасета
+объявлена схема:
+
+  - category   — строки с небольшим числом значений (mine_id, sensor_type,
+                 unit, quality_flag, status, severity, ...)
+  - int8…int32 — целые, минимально достаточной ширины
+  - float64    — измерения (тоннаж, показания датчиков, проценты); их
+                 границы проверяются (between, QR-005, QR-007), а float32
+                 округлил бы 100.00001 до 100.0 и пропустил нарушение
+  - datetime   — метки времени разбираются при чтении
+  - string     — идентификаторы и свободный текст: в load_dataset() —
+                 string[pyarrow] (один Arrow-буфер на колонку вместо
+                 Python-объекта на строку), без pyarrow и в потоковом
+                 чтении по read_options() — object
+
+CSV разбирается один раз и сохраняется в кэш в формате Feather (Arrow
+IPC) без сжатия. Следующие запуски открывают кэш через memory map:
+текст не разбирается, категории приходят уже словарём. Строковые
+колонки остаются Arrow-буферами отображённого файла и не копируются;
+числа, даты и коды категорий копируются в блоки pandas (это память
+процесса, а не страницы файла). Кэш пересоздаётся, если изменился
+размер или время изменения CSV либо версия схемы. Без pyarrow данные
+читаются из CSV с той же схемой, но без кэша.
+
+    df = load_dataset("sensor_readings")
+"""
+
+import json
+from pathlib import Path
+
+import pandas as pd
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+DATA_DIR = SCRIPT_DIR.parent.parent.parent / "Module_1" / "practice" / "data"
+# конфигурация ETL Модуля 4: staging, incremental, quality_rules, monitoring
+ETL_CONFIG = SCRIPT_DIR.parent.parent.parent / "Module_4" / "practice" / "data" / "etl_config.json"
+DATASET_CACHE_DIR = SCRIPT_DIR.parent / "reports" / ".cache" / "datasets"
+SCHEMA_VERSION = 3
+
+SCHEMAS = {
+    "equipment": {
+        "equipment_id": "string",
+        "equipment_name": "string",
+        "equipment_type": "category",
+        "manufacturer": "category",
+        "model": "category",
+        "year_manufactured": "int16",
+        "mine_id": "category",
+        "mine_name": "category",
+        "status": "category",
+        "last_maintenance_date": "datetime",
+        "next_maintenance_date": "datetime",
+        "engine_hours": "int32",
+        "max_payload_tons": "float64",
+    },
+    "sensor_readings": {
+        "reading_id": "string",
+        "equipment_id": "category",
+        "sensor_type": "category",
+        "reading_value": "float64",
+        "unit": "category",
+        "reading_timestamp": "datetime",
+        "quality_flag": "category",
+    },
+    "ore_production": {
+        "production_id": "string",
+        "mine_id": "category",
+        "mine_name": "category",
+        "production_date": "datetime",
+        "shift": "int8",
+        "horizon_level": "category",
+        "block_id": "category",
+        "ore_type": "category",
+        "tonnage_extracted": "float64",
+        "fe_content_pct": "float64",
+        "moisture_pct": "float64",
+        "equipment_id": "category",
+        "operator_name": "category",
+        "start_time": "category",
+        "end_time": "category",
+        "status": "category",
+    },
+    "downtime_events": {
+        "event_id": "string",
+        "equipment_id": "category",
+        "event_type": "category",
+        "event_category": "category",
+        "start_time": "datetime",
+        "end_time": "datetime",
+        "duration_minutes": "int32",
+        "description": "string",
+        "severity": "category",
+        "reported_by": "category",
+    },
+}
+
+
+# ============================================================
+# Схема
+# ============================================================
+
+def read_options(name: str) -> dict:
+    """Аргументы pd.read_csv() для схемы: dtype и parse_dates.
+
+    Целые читаются как float64, если в колонке могут быть пропуски, —
+    ширина выбирается уже после чтения (apply_schema).
+    """
+    schema = SCHEMAS[name]
+    dtype = {c: ("category" if t == "category" else "object")
+             for c, t in schema.items() if t in ("category", "string")}
+    parse_dates = [c for c, t in schema.items() if t == "datetime"]
+    return {"dtype": dtype, "parse_dates": parse_dates}
+
+
+def apply_schema(df: pd.DataFrame, name: str) -> pd.DataFrame:
+    """Приводит колонки DataFrame к схеме датасета (лишние колонки не трогает).
+
+    Подходит и для данных из PostgreSQL (02_ydata_profiling_db.py).
+    """
+    for column, kind in SCHEMAS[name].items():
+        if column not in df.columns:
+            continue
+        series = df[column]
+        if kind == "category":
+            if not isinstance(series.dtype, pd.CategoricalDtype):
+                df[column] = series.astype("category")
+        elif kind == "datetime":
+            if not pd.api.types.is_datetime64_any_dtype(series):
+                df[column] = pd.to_datetime(series, errors="coerce")
+        elif kind.startswith("int"):
+            numeric = pd.to_numeric(series, errors="coerce")
+            if numeric.isna().any():
+                # пропуски в целой колонке — nullable-тип той же ширины
+                df[column] = numeric.astype(kind.capitalize())
+            else:
+                df[column] = pd.to_numeric(numeric, downcast="integer")
+        elif kind.startswith("float"):
+            df[column] = pd.to_numeric(series, errors="coerce").astype(kind)
+    return df
+
+
+def read_csv_typed(path: Path, name: str) -> pd.DataFrame:
+    """Разбор CSV по схеме (без кэша); строки — string[pyarrow], если есть pyarrow."""
+    df = apply_schema(pd.read_csv(path, **read_options(name)), name)
+    dtype = _arrow_string()
+    if dtype is not None:
+        for column, kind in SCHEMAS[name].items():
+            if kind == "string" and column in df.columns:
+                df[column] = df[column].astype(dtype)
+    return df
+
+
+def _arrow_string():
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return None
+    return pd.StringDtype("pyarrow")
+
+
+# ============================================================
+# Колоночный кэш
+# ============================================================
+
+def _source_info(path: Path) -> dict:
+    stat = path.stat()
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "schema": SCHEMA_VERSION}
+
+
+def _read_cache(cache_path: Path, source: dict):
+    """DataFrame из кэша (memory map) или None, если кэш устарел."""
+    import pyarrow.feather as feather
+
+    if not cache_path.exists():
+        return None
+    table = feather.read_table(cache_path, memory_map=True)
+    meta = (table.schema.metadata or {}).get(b"ruda_source")
+    if meta is None or json.loads(meta) != source:
+        return None
+    # строки остаются Arrow-массивами поверх отображённого файла;
+    # split_blocks: остальные колонки не склеиваются в общий блок
+    import pyarrow as pa
+
+    strings = {pa.string(): _arrow_string(), pa.large_string(): _arrow_string()}
+    return table.to_pandas(split_blocks=True, types_mapper=strings.get)
+
+
+def _write_cache(df: pd.DataFrame, cache_path: Path, source: dict):
+    import pyarrow as pa
+    import pyarrow.feather as feather
+
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = dict(table.schema.metadata or {})
+    metadata[b"ruda_source"] = json.dumps(source).encode()
+    table = table.replace_schema_metadata(metadata)
+    tmp = cache_path.with_suffix(".tmp")
+    # без сжатия: только так чтение через memory map обходится без копий
+    feather.write_feather(table, tmp, compression="uncompressed")
+    tmp.replace(cache_path)
+
+
+def load_dataset(name: str, data_dir: Path = DATA_DIR, cache_dir: Path = DATASET_CACHE_DIR,
+                 use_cache: bool = True) -> pd.DataFrame:
+    """Датасет Модуля 1 по имени (equipment, sensor_readings, ...).
+
+    Первый запуск разбирает CSV и пишет кэш, последующие читают кэш.
+    """
+    path = Path(data_dir) / f"{name}.csv"
+    if not use_cache:
+        return read_csv_typed(path, name)
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return read_csv_typed(path, name)
+
+    cache_path = Path(cache_dir) / f"{name}.feather"
+    source = _source_info(path)
+    df = _read_cache(cache_path, source)
+    if df is None:
+        df = read_csv_typed(path, name)
+        _write_cache(df, cache_path, source)
+    return df
+
+
+def memory_mb(df: pd.DataFrame) -> float:
+    return df.memory_usage(deep=True).sum() / 1024 ** 2
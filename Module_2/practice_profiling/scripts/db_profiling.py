@@ -0,0 +1,281 @@
+"""
+Практикум по анализу и моделированию данных
+Модуль 2 (доп.): Потоковое и параллельное чтение таблиц PostgreSQL
+Предприятие: «Руда+» — добыча железной руды
+
+Вспомогательные функции для 02_ydata_profiling_db.py:
+
+  - stream_query()            — чтение через серверный (именованный) курсор
+                                пакетами, без загрузки всего результата
+  - profile_table_streaming() — инкрементальная статистика (profile_stats.py)
+  - range_partitions()        — разбиение таблицы на диапазоны по колонке
+  - profile_table_parallel()  — одновременное чтение диапазонов по нескольким
+                                соединениям и слияние статистики
+  - sample_table()            — простая (TABLESAMPLE) или стратифицированная
+                                выборка на стороне сервера (см. sampling.py)
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import pandas as pd
+
+from instrumentation import current
+from profile_stats import TableStats
+from sampling import (
+    DEFAULT_MIN_PER_STRATUM,
+    KEY,
+    ROW,
+    WEIGHT,
+    ReservoirSampler,
+    weight_stratified,
+)
+
+# --- Параметры подключения к PostgreSQL ---
+# Отредактируйте под ваше окружение или задайте переменные PG_*:
+DB_CONFIG = {
+    "host": os.getenv("PG_HOST", "localhost"),
+    "port": os.getenv("PG_PORT", "5432"),
+    "database": os.getenv("PG_DATABASE", "ruda_plus"),
+    "user": os.getenv("PG_USER", "student"),
+    "password": os.getenv("PG_PASSWORD", "student_password"),
+}
+
+DEFAULT_BATCH_SIZE = 50_000
+
+
+def make_engine(pool_size: int = 5):
+    """SQLAlchemy engine с пулом из pool_size соединений."""
+    from sqlalchemy import create_engine
+    from sqlalchemy.engine import URL
+
+    url = URL.create(
+        "postgresql+psycopg2",
+        username=DB_CONFIG["user"],
+        password=DB_CONFIG["password"],
+        host=DB_CONFIG["host"],
+        port=int(DB_CONFIG["port"]),
+        database=DB_CONFIG["database"],
+    )
+    return create_engine(url, pool_size=pool_size, max_overflow=0)
+
+
+def quote_ident(engine, name: str) -> str:
+    """Экранирует имя таблицы/колонки, в том числе schema.table."""
+    preparer = engine.dialect.identifier_preparer
+    return ".".join(preparer.quote(part) for part in name.split("."))
+
+
+def select_sql(engine, table: str, columns: list = None, where: str = "") -> str:
+    cols = ", ".join(quote_ident(engine, c) for c in columns) if columns else "*"
+    sql = f"SELECT {cols} FROM {quote_ident(engine, table)}"
+    return f"{sql} WHERE {where}" if where else sql
+
+
+# ============================================================
+# Потоковое чтение
+# ============================================================
+
+def stream_query(engine, sql: str, params: dict = None, batch_size: int = DEFAULT_BATCH_SIZE):
+    """Генератор DataFrame-пакетов через серверный курсор.
+
+    stream_results=True заставляет psycopg2 открыть именованный курсор:
+    строки приходят с сервера порциями по batch_size, клиент не держит
+    в памяти весь результат.
+    """
+    from sqlalchemy import text
+
+    with engine.connect() as conn:
+        conn = conn.execution_options(stream_results=True, max_row_buffer=batch_size)
+        for chunk in pd.read_sql(text(sql), conn, params=params or {}, chunksize=batch_size):
+            yield chunk
+
+
+def profile_table_streaming(engine, table: str, columns: list = None, where: str = "",
+                            params: dict = None, batch_size: int = DEFAULT_BATCH_SIZE) -> TableStats:
+    """Инкрементальный профиль таблицы (или диапазона строк)."""
+    metrics = current()
+    stats = TableStats(columns)
+    chunks = stream_query(engine, select_sql(engine, table, columns, where), params, batch_size)
+    for chunk in metrics.chunks(chunks):
+        with metrics.stage("statistics", rows=len(chunk)):
+            stats.update(chunk)
+    return stats
+
+
+# ============================================================
+# Параллельное чтение по диапазонам
+# ============================================================
+
+def range_partitions(engine, table: str, column: str, n: int) -> list:
+    """Делит таблицу на n диапазонов [lo, hi) по колонке column.
+
+    Границы берутся из гистограммы pg_stats (бесплатно, после ANALYZE).
+    Если статистики нет — равномерно между MIN и MAX (для чисел и дат).
+    Первый диапазон открыт снизу, последний — сверху; NULL попадают
+    в отдельный диапазон, чтобы ни одна строка не потерялась.
+    """
+    from sqlalchemy import text
+
+    schema, _, name = table.rpartition(".")
+    col = quote_ident(engine, column)
+    with engine.connect() as conn:
+        bounds = conn.execute(text(
+            "SELECT histogram_bounds::text::text[] FROM pg_stats "
+            "WHERE tablename = :t AND attname = :c AND (:s = '' OR schemaname = :s)"
+        ), {"t": name, "c": column, "s": schema}).scalar()
+
+        if bounds and len(bounds) > n:
+            cuts = histogram_cuts(bounds, n)
+        else:
+            lo, hi = conn.execute(text(f"SELECT MIN({col}), MAX({col}) FROM {quote_ident(engine, table)}")).one()
+            if lo is None:
+                cuts = []
+            elif isinstance(lo, (int, float)) or hasattr(lo, "toordinal"):
+                cuts = _linear_cuts(lo, hi, n)
+            else:
+                cuts = []
+
+    edges = [None] + cuts + [None]
+    ranges = [(edges[i], edges[i + 1]) for i in range(len(edges) - 1)]
+    return ranges + [("NULL", "NULL")]
+
+
+def histogram_cuts(bounds: list, n: int) -> list:
+    """n − 1 границ из histogram_bounds.
+
+    Границы приходят текстом ('990', '1010'), но уже упорядочены по типу
+    колонки — сортировать их как строки нельзя, убираются только
+    соседние повторы (частое значение занимает несколько корзин).
+    """
+    step = (len(bounds) - 1) / n
+    cuts = [bounds[round(i * step)] for i in range(1, n)]
+    return [c for i, c in enumerate(cuts) if i == 0 or c != cuts[i - 1]]
+
+
+def _linear_cuts(lo, hi, n: int) -> list:
+    if isinstance(lo, (int, float)):
+        return [lo + (hi - lo) * i / n for i in range(1, n)]
+    origin = pd.Timestamp(lo)
+    span = pd.Timestamp(hi) - origin
+    cuts = [origin + span * i / n for i in range(1, n)]
+    return [c.date() if not hasattr(lo, "hour") else c.to_pydatetime() for c in cuts]
+
+
+def range_where(engine, column: str, lo, hi) -> tuple:
+    """Условие WHERE и параметры для диапазона [lo, hi)."""
+    col = quote_ident(engine, column)
+    if (lo, hi) == ("NULL", "NULL"):
+        return f"{col} IS NULL", {}
+    clauses, params = [], {}
+    if lo is not None:
+        clauses.append(f"{col} >= :lo")
+        params["lo"] = lo
+    if hi is not None:
+        clauses.append(f"{col} < :hi")
+        params["hi"] = hi
+    return " AND ".join(clauses) or f"{col} IS NOT NULL", params
+
+
+def _profile_range(table: str, partition_column: str, bounds: tuple,
+                   columns: list, batch_size: int) -> TableStats:
+    """Выполняется в дочернем процессе: своё соединение, свой серверный курсор."""
+    engine = make_engine(pool_size=1)
+    try:
+        where, params = range_where(engine, partition_column, *bounds)
+        return profile_table_streaming(engine, table, columns, where, params, batch_size)
+    finally:
+        engine.dispose()
+
+
+def profile_table_parallel(engine, table: str, partition_column: str, connections: int,
+                           columns: list = None, batch_size: int = DEFAULT_BATCH_SIZE) -> TableStats:
+    """Профиль таблицы: диапазоны читаются одновременно по connections соединениям.
+
+    Каждый диапазон читает отдельный процесс через своё соединение и
+    серверный курсор (разбор строк и статистика упираются в CPU клиента,
+    поэтому потоки здесь не масштабируются). Частичные TableStats
+    сливаются в порядке диапазонов.
+    """
+    ranges = range_partitions(engine, table, partition_column, connections)
+
+    with ProcessPoolExecutor(max_workers=connections) as pool:
+        parts = list(pool.map(_profile_range, repeat(table), repeat(partition_column), ranges,
+                              repeat(columns), repeat(batch_size)))
+
+    stats = TableStats(columns)
+    for part in parts:
+        stats.merge(part)
+    return stats
+
+
+# ============================================================
+# Выборки на стороне сервера
+# ============================================================
+
+def estimated_rows(engine, table: str) -> int:
+    """Оценка числа строк из pg_class.reltuples (без сканирования таблицы)."""
+    from sqlalchemy import text
+
+    with engine.connect() as conn:
+        rows = conn.execute(text("SELECT reltuples FROM pg_class WHERE oid = to_regclass(:t)"),
+                            {"t": table}).scalar()
+    return int(rows) if rows and rows > 0 else 0
+
+
+def sample_table(engine, table: str, size: int, strata: list = None,
+                 min_per_stratum: int = DEFAULT_MIN_PER_STRATUM, columns: list = None,
+                 batch_size: int = DEFAULT_BATCH_SIZE) -> tuple:
+    """Выборка из таблицы: возвращает (выборка с _weight, описание).
+
+    Без strata — TABLESAMPLE SYSTEM с долей под нужный размер (читаются
+    только случайные страницы, время зависит от размера выборки) и
+    доусечение до size строк резервуаром.
+
+    Со strata — один серверный проход с оконными функциями: в выборку
+    попадают min_per_stratum строк каждой страты и строки с ключом из
+    глобального bottom-size. Клиенту передаётся только выборка.
+    """
+    cols = ", ".join(quote_ident(engine, c) for c in columns) if columns else "*"
+    source = quote_ident(engine, table)
+
+    if not strata:
+        population = estimated_rows(engine, table)
+        pct = 100.0 if not population else min(100.0, 100.0 * size * 1.5 / population)
+        sql = f"SELECT {cols} FROM {source} TABLESAMPLE SYSTEM ({pct:.6f})"
+        sampler = ReservoirSampler(size)
+        for chunk in stream_query(engine, sql, batch_size=batch_size):
+            sampler.update(chunk)
+        sample, info = sampler.result()
+        if pct < 100.0:
+            # генеральная совокупность — вся таблица, а не прочитанные страницы
+            info.update(population=population, strata_sizes={0: population},
+                        sampling_fraction=len(sample) / population)
+            sample[WEIGHT] = population / max(len(sample), 1)
+        info["method"] = "reservoir (TABLESAMPLE SYSTEM)"
+        return sample.drop(columns=[ROW]), info
+
+    part = ", ".join(quote_ident(engine, c) for c in strata)
+    sql = f"""
+    SELECT * FROM (
+        SELECT s.*,
+               row_number() OVER (PARTITION BY {part} ORDER BY {KEY}) AS _rn,
+               count(*) OVER (PARTITION BY {part}) AS _n_h,
+               count(*) OVER () AS _n
+        FROM (SELECT {cols}, random() AS {KEY} FROM {source}) s
+    ) x
+    WHERE _rn <= :m OR {KEY} * _n < :size
+    """
+    chunks = list(stream_query(engine, sql, {"m": min_per_stratum, "size": size}, batch_size))
+    sample = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+    if sample.empty:
+        return sample, {"method": "stratified", "population": 0, "sample_size": 0,
+                        "sampling_fraction": 0.0, "strata": strata, "n_strata": 0,
+                        "strata_sizes": {}}
+    population = int(sample["_n"].iloc[0])
+    counts = sample[strata + ["_n_h"]].drop_duplicates(strata).rename(columns={"_n_h": "N_h"})
+    sample, info = weight_stratified(sample.drop(columns=["_rn", "_n_h", "_n", KEY]),
+                                     strata, counts, population)
+    info["min_per_stratum"] = min_per_stratum
+    return sample, info
@@ -0,0 +1,189 @@
+"""
+Практикум по анализу и моделированию данных
+Модуль 2 (доп.): Одновременное профилирование всех таблиц-источников
+Предприятие: «Руда+» — добыча железной руды
+
+Список таблиц, их dependencies и estimated_rows берутся из source.tables
+файла etl_config.json (Модуль 4). Таблицы профилируются одновременно
+в пуле из N процессов. У каждого процесса одно соединение (engine с
+pool_size=1), оно создаётся при старте процесса и переиспользуется для
+всех его таблиц. Всего к базе открыто не больше N соединений.
+
+Порядок по умолчанию — LPT (Longest Processing Time first) по
+estimated_rows: самые большие таблицы стартуют первыми, и в конце
+прогона не остаётся одной долгой таблицы, пока остальные процессы
+простаивают. Профиль только читает таблицу, поэтому ждать родительские
+таблицы незачем.
+
+С use_dependencies=True — списочное расписание с приоритетом по
+критическому пути, как при загрузке: таблица запускается после своих
+dependencies, а из готовых первой берётся таблица с самой тяжёлой
+цепочкой «она + все зависящие от неё».
+
+Профиль таблицы строится потоково (db_profiling.profile_table_streaming)
+и сразу сохраняется: по умолчанию только статистика (profile_store.py,
+output="stats"), HTML строится отдельно и по запросу. Родительскому
+процессу возвращаются только время и размеры.
+"""
+
+import atexit
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+from db_profiling import DEFAULT_BATCH_SIZE, make_engine, profile_table_streaming
+from profile_store import write_summary
+
+# накладные расходы на таблицу (соединение, запрос, отчёт) в «строках»:
+# без них таблицы с estimated_rows = 4 весили бы ноль
+TABLE_OVERHEAD_ROWS = 1_000
+
+_engine = None
+
+
+def source_tables(config: dict, names: list = None) -> list:
+    """Таблицы из source.tables: [{"name", "priority", "estimated_rows", "dependencies"}, ...]."""
+    tables = []
+    for table in config["source"]["tables"]:
+        if names and table["name"] not in names:
+            continue
+        tables.append({
+            "name": table["name"],
+            "priority": table.get("load_priority"),
+            "estimated_rows": int(table.get("estimated_rows", 0)),
+            "dependencies": list(table.get("dependencies", [])),
+        })
+    known = {t["name"] for t in tables}
+    for table in tables:
+        # зависимости вне выбранного списка не ждём
+        table["dependencies"] = [d for d in table["dependencies"] if d in known]
+    return tables
+
+
+def critical_path(tables: list, use_dependencies: bool = False) -> dict:
+    """Вес самой тяжёлой цепочки от таблицы через зависящие от неё."""
+    weight = {t["name"]: t["estimated_rows"] + TABLE_OVERHEAD_ROWS for t in tables}
+    if not use_dependencies:
+        return weight
+    dependents = {t["name"]: [] for t in tables}
+    for table in tables:
+        for parent in table["dependencies"]:
+            dependents[parent].append(table["name"])
+
+    rank = {}
+
+    def visit(name, path=()):
+        if name in path:
+            raise ValueError(f"Циклическая зависимость: {' → '.join(path + (name,))}")
+        if name not in rank:
+            rank[name] = weight[name] + max((visit(c, path + (name,)) for c in dependents[name]), default=0)
+        return rank[name]
+
+    for name in weight:
+        visit(name)
+    return rank
+
+
+# ============================================================
+# Рабочий процесс
+# ============================================================
+
+def _init_worker():
+    """Одно соединение на процесс — на все его таблицы."""
+    global _engine
+    _engine = make_engine(pool_size=1)
+    atexit.register(_engine.dispose)
+
+
+def profile_source_table(table: str, out_dir: Path, batch_size: int = DEFAULT_BATCH_SIZE,
+                         output: str = "stats") -> dict:
+    """Выполняется в рабочем процессе: профиль таблицы → статистика и/или HTML."""
+    from sqlalchemy import text
+
+    started = time.time()
+    result = {"table": table, "pid": os.getpid(), "started": started}
+    with _engine.connect() as conn:
+        exists = conn.execute(text("SELECT to_regclass(:t) IS NOT NULL"), {"t": table}).scalar()
+    if not exists:
+        return {**result, "status": "missing", "seconds": time.time() - started}
+
+    stats = profile_table_streaming(_engine, table, batch_size=batch_size)
+    report_path = Path(out_dir) / f"profile_{table.replace('.', '_')}.html"
+    written = write_summary(stats.summary(f"Руда+ | {table} (из PostgreSQL)"), report_path, output)
+    return {**result, "status": "ok", "seconds": time.time() - started, "rows": stats.n_rows,
+            "columns": len(stats.columns), "chunks": stats.n_chunks, "files": [str(p) for p in written]}
+
+
+# ============================================================
+# Расписание
+# ============================================================
+
+def run_schedule(tables: list, schema: str, out_dir: Path, workers: int = 4,
+                 batch_size: int = DEFAULT_BATCH_SIZE, use_dependencies: bool = False,
+                 on_done=None, output: str = "stats") -> list:
+    """Профилирует таблицы в пуле из workers процессов; результаты в порядке завершения."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rank = critical_path(tables, use_dependencies)
+    waiting = {t["name"]: set(t["dependencies"]) if use_dependencies else set() for t in tables}
+    info = {t["name"]: t for t in tables}
+    ready = [name for name, deps in waiting.items() if not deps]
+    results = []
+    origin = time.time()
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+        running, submitted = {}, {}
+        while ready or running:
+            ready.sort(key=lambda name: rank[name], reverse=True)
+            while ready and len(running) < workers:
+                name = ready.pop(0)
+                future = pool.submit(profile_source_table, f"{schema}.{name}", out_dir, batch_size, output)
+                running[future], submitted[future] = name, time.time()
+            finished, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in finished:
+                name = running.pop(future)
+                try:
+                    result = future.result()
+                except Exception as e:
+                    result = {"table": f"{schema}.{name}", "status": "error", "error": str(e),
+                              "started": submitted[future], "seconds": time.time() - submitted[future]}
+                result.update(name=name, priority=info[name]["priority"],
+                              estimated_rows=info[name]["estimated_rows"], rank=rank[name],
+                              start_offset=result["started"] - origin,
+                              end_offset=time.time() - origin)
+                results.append(result)
+                if on_done:
+                    on_done(result)
+                # ошибка родителя не останавливает дочерние таблицы — их профиль всё равно нужен
+                for child, deps in waiting.items():
+                    if name in deps:
+                        deps.discard(name)
+                        if not deps:
+                            ready.append(child)
+    return results
+
+
+def schedule_summary(results: list, workers: int) -> dict:
+    """Длина прогона, суммарная работа и нижняя граница длины расписания.
+
+    Длина считается от старта первой таблицы: запуск процессов пула в неё
+    не входит.
+    """
+    first = min((r["start_offset"] for r in results), default=0.0)
+    makespan = max((r["end_offset"] for r in results), default=0.0) - first
+    busy = sum(r["seconds"] for r in results)
+    longest = max((r["seconds"] for r in results), default=0.0)
+    bound = max(longest, busy / workers) if workers else busy
+    return {
+        "workers": workers,
+        "tables": len(results),
+        "ok": sum(r["status"] == "ok" for r in results),
+        "missing": [r["name"] for r in results if r["status"] == "missing"],
+        "errors": {r["name"]: r["error"] for r in results if r["status"] == "error"},
+        "rows": sum(r.get("rows", 0) for r in results),
+        "makespan_seconds": round(makespan, 3),
+        "busy_seconds": round(busy, 3),
+        "lower_bound_seconds": round(bound, 3),
+        "efficiency": round(bound / makespan, 3) if makespan else None,
+    }
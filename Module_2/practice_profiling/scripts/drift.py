@@ -0,0 +1,401 @@
+"""
+Практикум по анализу и моделированию данных
+Модуль 2 (доп.): Дрейф данных относительно сохранённого базового профиля
+Предприятие: «Руда+» — добыча железной руды
+
+Сравнение двух профилей ydata-profiling требует каждый раз заново
+профилировать обе стороны по строкам. Для ежедневной проверки
+(schedule.data_quality_check в etl_config.json) базовый профиль
+хранится компактно — по колонке:
+
+  Numeric      KLL-скетч квантилей (QuantileSketch из profile_stats.py),
+               границы равночастотных интервалов для PSI, число значений,
+               пропусков, среднее и M2
+  Categorical  частоты категорий (FrequentItems: top-k с границей ошибки)
+               и число пропусков
+
+Колонки и их роли берутся из datasets.SCHEMAS: числа — Numeric,
+category — Categorical; идентификаторы, свободный текст и даты в
+сравнение не входят. Ссылки на объекты (KEY_COLUMNS: машина, шахта,
+блок, оператор) хранятся как category, но тоже исключаются: новая
+машина или смена состава бригады — не дрейф данных.
+
+Проверка новой загрузки читает только её строки и базовый JSON:
+
+  - PSI — по интервалам базового профиля (для категорий — по самим
+    категориям, новые значения — отдельная корзина);
+  - KS — наибольшее расстояние между эмпирической функцией
+    распределения пакета и функцией распределения скетча.
+    Пороги PSI и KS не ниже критических значений при α = 0.05, чтобы
+    маленький пакет или колонка с сотнями категорий не давали ложных
+    срабатываний;
+  - сдвиг среднего в σ базового профиля, изменение доли пропусков;
+  - для категорий — наибольшее изменение доли и доля значений, которых
+    в базовом профиле не было.
+
+Колонка помечается дрейфом, если метрика выше порога (drift_settings).
+Стоимость проверки — сортировка и подсчёт значений пакета; от объёма
+данных, по которым строился базовый профиль, она не зависит.
+"""
+
+import json
+import os
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from datasets import ETL_CONFIG, SCHEMAS, apply_schema, read_options
+from profile_stats import FrequentItems, QuantileSketch, column_seed
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+DRIFT_DIR = SCRIPT_DIR.parent / "reports" / "drift"
+
+DATASETS = ("ore_production", "sensor_readings", "downtime_events")
+DEFAULT_BINS = 10
+DEFAULT_CHUNKSIZE = 500_000
+DEFAULT_THRESHOLDS = {
+    "psi": 0.2,          # PSI > 0.2 — заметный сдвиг распределения
+    "ks": 0.1,           # расстояние Колмогорова — Смирнова
+    "share": 0.1,        # изменение доли категории или доля новых категорий
+    "missing": 0.05,     # изменение доли пропусков
+    "min_rows": 30,      # на меньших пакетах метрики считаются, но дрейф не помечается
+}
+PSI_EPSILON = 1e-4
+KS_CRITICAL = 1.36       # c(α) для α = 0.05: D > c·sqrt(1/n + 1/m)
+PSI_Z = 1.645            # квантиль N(0, 1) для α = 0.05 в критическом значении PSI
+OTHER = "(прочие)"        # категории вне top-k базового профиля
+KEY_COLUMNS = frozenset({"equipment_id", "mine_id", "mine_name", "block_id",
+                         "operator_name", "reported_by"})
+
+
+def drift_columns(name: str) -> dict:
+    """Колонка → Numeric / Categorical по схеме датасета, без KEY_COLUMNS."""
+    kinds = {}
+    for column, kind in SCHEMAS[name].items():
+        if column in KEY_COLUMNS:
+            continue
+        if kind.startswith(("int", "float")):
+            kinds[column] = "Numeric"
+        elif kind == "category":
+            kinds[column] = "Categorical"
+    return kinds
+
+
+def drift_settings(config_path: Path = ETL_CONFIG) -> dict:
+    """Пороги: DEFAULT_THRESHOLDS, поверх — monitoring.drift из etl_config.json.
+
+    "drift": {"psi": 0.25, "columns": {"tonnage_extracted": {"psi": 0.3}}}
+    """
+    settings = dict(DEFAULT_THRESHOLDS, columns={})
+    path = Path(config_path)
+    if path.exists():
+        config = json.loads(path.read_text(encoding="utf-8"))
+        section = config.get("monitoring", {}).get("drift", {})
+        settings.update({k: v for k, v in section.items() if k != "columns"})
+        settings["columns"] = section.get("columns", {})
+    return settings
+
+
+def column_thresholds(settings: dict, column: str) -> dict:
+    return {**{k: v for k, v in settings.items() if k != "columns"}, **settings["columns"].get(column, {})}
+
+
+# ============================================================
+# Базовый профиль
+# ============================================================
+
+class ColumnBaseline:
+    """Сливаемый базовый профиль одной колонки."""
+
+    def __init__(self, name: str, kind: str):
+        self.name = name
+        self.kind = kind
+        self.n = 0
+        self.n_missing = 0
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.sketch = QuantileSketch(seed=column_seed(name))
+        self.freq = FrequentItems()
+        self.edges = None       # границы интервалов PSI; фиксируются в finalize()
+
+    def update(self, series: pd.Series):
+        self.n += len(series)
+        if self.kind == "Numeric":
+            values = _finite(series)
+            self.n_missing += len(series) - len(values)
+            if len(values):
+                mean = float(values.mean())
+                self._merge_moments(len(values), mean, float(((values - mean) ** 2).sum()))
+                self.sketch.update(values)
+        else:
+            counts = _category_counts(series)
+            self.n_missing += len(series) - int(counts.sum())
+            self.count += int(counts.sum())
+            self.freq._add(counts)
+
+    def _merge_moments(self, n_b: int, mean_b: float, m2_b: float):
+        n = self.count + n_b
+        delta = mean_b - self.mean
+        self.mean += delta * n_b / n
+        self.m2 += m2_b + delta * delta * self.count * n_b / n
+        self.count = n
+
+    def merge(self, other: "ColumnBaseline") -> "ColumnBaseline":
+        self.n += other.n
+        self.n_missing += other.n_missing
+        if self.kind == "Numeric":
+            if other.count:
+                self._merge_moments(other.count, other.mean, other.m2)
+                self.sketch.merge(other.sketch)
+        else:
+            self.freq.merge(other.freq)
+            self.count += other.count
+        return self
+
+    def finalize(self, bins: int = DEFAULT_BINS):
+        """Равночастотные интервалы по квантилям скетча (повторы границ — у дискретных колонок — схлопываются)."""
+        if self.kind == "Numeric" and self.edges is None and self.count:
+            self.edges = np.unique(self.sketch.quantiles(np.linspace(0, 1, bins + 1)))
+
+    @property
+    def std(self) -> float:
+        return float(np.sqrt(self.m2 / (self.count - 1))) if self.count > 1 else 0.0
+
+    @property
+    def missing_rate(self) -> float:
+        return self.n_missing / self.n if self.n else 0.0
+
+    def proportions(self) -> np.ndarray:
+        """Доли базового профиля в интервалах (-inf, e1], (e1, e2], …, (e_k, +inf)."""
+        cdf = self.sketch.cdf(self.edges[1:-1])
+        return np.diff(np.concatenate([[0.0], cdf, [1.0]]))
+
+    def shares(self) -> pd.Series:
+        """Доли категорий top-k; остаток до 1 — значения, вытесненные из top-k."""
+        return self.freq.counts / self.count if self.count else self.freq.counts.astype(np.float64)
+
+    def to_state(self) -> dict:
+        state = {"name": self.name, "kind": self.kind, "n": self.n, "n_missing": self.n_missing,
+                 "count": self.count}
+        if self.kind == "Numeric":
+            state.update({"mean": self.mean, "m2": self.m2, "sketch": self.sketch.to_state(),
+                          "histogram": {"edges": None if self.edges is None else self.edges.tolist(),
+                                        "proportions": None if self.edges is None
+                                        else self.proportions().round(6).tolist()}})
+        else:
+            state["freq"] = self.freq.to_state()
+        return state
+
+    @classmethod
+    def from_state(cls, state: dict) -> "ColumnBaseline":
+        obj = cls(state["name"], state["kind"])
+        obj.n, obj.n_missing, obj.count = state["n"], state["n_missing"], state["count"]
+        if obj.kind == "Numeric":
+            obj.mean, obj.m2 = state["mean"], state["m2"]
+            obj.sketch = QuantileSketch.from_state(state["sketch"])
+            edges = state["histogram"]["edges"]
+            obj.edges = None if edges is None else np.asarray(edges, dtype=np.float64)
+        else:
+            obj.freq = FrequentItems.from_state(state["freq"])
+        return obj
+
+
+def _finite(series: pd.Series) -> np.ndarray:
+    values = pd.to_numeric(series, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+    return values[np.isfinite(values)]
+
+
+def _category_counts(series: pd.Series) -> pd.Series:
+    counts = series.value_counts(dropna=True)
+    counts = counts[counts > 0]
+    counts.index = counts.index.astype(str)
+    return counts.groupby(level=0).sum().astype(np.int64)
+
+
+class TableBaseline:
+    """Базовые профили колонок датасета и сведения о том, по чему они построены."""
+
+    def __init__(self, name: str, columns: dict = None, rows: int = 0, sources: list = None):
+        self.name = name
+        self.columns = columns if columns is not None else {
+            column: ColumnBaseline(column, kind) for column, kind in drift_columns(name).items()}
+        self.rows = rows
+        self.sources = sources or []
+
+    def update(self, df: pd.DataFrame):
+        self.rows += len(df)
+        for column, baseline in self.columns.items():
+            if column in df.columns:
+                baseline.update(df[column])
+
+    def merge(self, other: "TableBaseline") -> "TableBaseline":
+        self.rows += other.rows
+        self.sources += other.sources
+        for column, baseline in self.columns.items():
+            if column in other.columns:
+                baseline.merge(other.columns[column])
+        return self
+
+    def finalize(self, bins: int = DEFAULT_BINS) -> "TableBaseline":
+        for baseline in self.columns.values():
+            baseline.finalize(bins)
+        return self
+
+    @classmethod
+    def build(cls, name: str, path: Path, chunksize: int = DEFAULT_CHUNKSIZE,
+              bins: int = DEFAULT_BINS) -> "TableBaseline":
+        """Базовый профиль по CSV частями — память не зависит от размера файла."""
+        baseline = cls(name, sources=[str(path)])
+        for chunk in read_chunks(name, path, chunksize):
+            baseline.update(chunk)
+        return baseline.finalize(bins)
+
+    def save(self, path: Path):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        state = {"dataset": self.name, "rows": self.rows, "sources": self.sources,
+                 "updated_at": datetime.now().isoformat(timespec="seconds"),
+                 "columns": {column: baseline.to_state() for column, baseline in self.columns.items()}}
+        tmp = path.with_name(path.name + ".tmp")
+        tmp.write_text(json.dumps(state, ensure_ascii=False), encoding="utf-8")
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: Path) -> "TableBaseline":
+        state = json.loads(Path(path).read_text(encoding="utf-8"))
+        columns = {column: ColumnBaseline.from_state(s) for column, s in state["columns"].items()}
+        return cls(state["dataset"], columns, state["rows"], state["sources"])
+
+
+def read_chunks(name: str, path: Path, chunksize: int = DEFAULT_CHUNKSIZE):
+    """Части CSV по схеме датасета (только колонки, которые сравниваются)."""
+    header = pd.read_csv(path, nrows=0).columns
+    usecols = [c for c in drift_columns(name) if c in header]
+    options = read_options(name)
+    options["dtype"] = {c: t for c, t in options["dtype"].items() if c in usecols}
+    options["parse_dates"] = [c for c in options["parse_dates"] if c in usecols]
+    with pd.read_csv(path, usecols=usecols, chunksize=chunksize, **options) as reader:
+        for chunk in reader:
+            yield apply_schema(chunk, name)
+
+
+def baseline_path(name: str, drift_dir: Path = DRIFT_DIR) -> Path:
+    return drift_dir / "baselines" / f"{name}.json"
+
+
+# ============================================================
+# Метрики дрейфа
+# ============================================================
+
+def psi(expected: np.ndarray, actual: np.ndarray) -> float:
+    """Population Stability Index: Σ (a − e) · ln(a / e); пустые доли — PSI_EPSILON."""
+    e = np.maximum(np.asarray(expected, dtype=np.float64), PSI_EPSILON)
+    a = np.maximum(np.asarray(actual, dtype=np.float64), PSI_EPSILON)
+    return float(np.sum((a - e) * np.log(a / e)))
+
+
+def psi_critical(bins: int, n: int, m: int) -> float:
+    """Критическое значение PSI при α = 0.05 без дрейфа.
+
+    PSI двух выборок из одного распределения ≈ χ²(bins − 1) · (1/n + 1/m);
+    квантиль χ² — по Уилсону — Хилферти. На колонках с сотнями категорий
+    и небольших пакетах шум PSI сам по себе больше 0.2.
+    """
+    df = max(bins - 1, 1)
+    chi2 = df * (1 - 2 / (9 * df) + PSI_Z * np.sqrt(2 / (9 * df))) ** 3
+    return float(chi2 * (1 / n + 1 / m))
+
+
+def ks_distance(sketch: QuantileSketch, values: np.ndarray) -> float:
+    """sup |F_пакета − F_скетча| по точкам обоих распределений (и пределам слева)."""
+    items, weights = sketch.weighted_items()
+    if not len(items) or not len(values):
+        return 0.0
+    base_cdf = np.concatenate([[0.0], np.cumsum(weights)]) / weights.sum()
+    values = np.sort(values)
+    points = np.concatenate([items, values])
+    distance = 0.0
+    for side in ("right", "left"):
+        expected = base_cdf[np.searchsorted(items, points, side=side)]
+        actual = np.searchsorted(values, points, side=side) / len(values)
+        distance = max(distance, float(np.abs(actual - expected).max()))
+    return distance
+
+
+def check_column(baseline: ColumnBaseline, series: pd.Series, thresholds: dict) -> dict:
+    """Метрики дрейфа колонки пакета и причины пометки."""
+    n = len(series)
+    result = {"column": baseline.name, "kind": baseline.kind, "rows": n, "reasons": []}
+    if baseline.kind == "Numeric":
+        values = _finite(series)
+        missing = 1 - len(values) / n if n else 0.0
+        if len(values) and baseline.count:
+            inner = baseline.edges[1:-1]
+            actual = np.bincount(np.searchsorted(inner, values, side="left"), minlength=len(inner) + 1)
+            ks_threshold = max(thresholds["ks"], KS_CRITICAL * np.sqrt(1 / len(values) + 1 / baseline.count))
+            psi_threshold = max(thresholds["psi"], psi_critical(len(inner) + 1, len(values), baseline.count))
+            result.update({
+                "psi": psi(baseline.proportions(), actual / len(values)),
+                "psi_threshold": psi_threshold,
+                "ks": ks_distance(baseline.sketch, values),
+                "ks_threshold": float(ks_threshold),
+                "mean": float(values.mean()), "baseline_mean": baseline.mean,
+                "mean_shift_sigma": (float(values.mean()) - baseline.mean) / baseline.std if baseline.std else None,
+            })
+            if result["psi"] > psi_threshold:
+                result["reasons"].append(f"PSI {result['psi']:.3f} > {psi_threshold:.3f}")
+            if result["ks"] > ks_threshold:
+                result["reasons"].append(f"KS {result['ks']:.3f} > {ks_threshold:.3f}")
+    else:
+        counts = _category_counts(series)
+        missing = 1 - counts.sum() / n if n else 0.0
+        if counts.sum() and baseline.count:
+            # значения вне top-k базового профиля (новые или вытесненные) — одна корзина «прочие»
+            known = baseline.shares()
+            actual = counts / counts.sum()
+            in_base = actual.index.isin(known.index)
+            e = pd.concat([known, pd.Series({OTHER: max(1 - known.sum(), 0.0)})])
+            a = pd.concat([actual[in_base].reindex(known.index, fill_value=0.0),
+                           pd.Series({OTHER: float(actual[~in_base].sum())})])
+            change = a - e
+            top = change.abs().sort_values(ascending=False, kind="stable").head(3)
+            psi_threshold = max(thresholds["psi"], psi_critical(len(e), int(counts.sum()), baseline.count))
+            result.update({
+                "psi": psi(e.to_numpy(), a.to_numpy()),
+                "psi_threshold": psi_threshold,
+                "max_share_change": float(top.iloc[0]),
+                "top_changes": [[str(c), float(e[c]), float(a[c])] for c in top.index],
+                "new_share": float(a[OTHER]),
+                "new_categories": [str(c) for c in actual[~in_base].sort_values(ascending=False).index[:5]],
+            })
+            if result["psi"] > psi_threshold:
+                result["reasons"].append(f"PSI {result['psi']:.3f} > {psi_threshold:.3f}")
+            if result["max_share_change"] > thresholds["share"]:
+                c, before, after = result["top_changes"][0]
+                result["reasons"].append(f"доля «{c}» {before:.1%} → {after:.1%}")
+    result["missing_rate"], result["baseline_missing_rate"] = float(missing), baseline.missing_rate
+    if abs(missing - baseline.missing_rate) > thresholds["missing"]:
+        result["reasons"].append(f"пропуски {baseline.missing_rate:.1%} → {missing:.1%}")
+    if not result["reasons"]:
+        result["status"] = "ok"
+    else:
+        result["status"] = "drift" if n >= thresholds["min_rows"] else "few_rows"
+    return result
+
+
+def check_table(baseline: TableBaseline, df: pd.DataFrame, settings: dict) -> list:
+    """Результаты по колонкам базового профиля, которые есть в пакете."""
+    return [check_column(column, df[name], column_thresholds(settings, name))
+            for name, column in baseline.columns.items() if name in df.columns]
+
+
+def write_report(name: str, source: str, results: list, drift_dir: Path = DRIFT_DIR) -> Path:
+    stamp = datetime.now()
+    path = drift_dir / f"{name}_{stamp:%Y%m%d_%H%M%S}.json"
+    path.parent.mkdir(parents=True, exist_ok=True)
+    report = {"dataset": name, "source": source, "checked_at": stamp.isoformat(timespec="seconds"),
+              "drift": [r["column"] for r in results if r["status"] == "drift"], "columns": results}
+    path.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    return path
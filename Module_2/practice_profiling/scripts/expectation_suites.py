@@ -0,0 +1,241 @@
+"""
+Практикум по анализу и моделированию данных
+Модуль 2 (доп.): Наборы ожиданий (Expectation Suites) для CSV Модуля 1
+Предприятие: «Руда+» — добыча железной руды
+
+Каждое ожидание описано декларативно — так же, как ExpectationConfiguration
+в Great Expectations:
+
+    {"expectation_type": "expect_column_values_to_be_between",
+     "kwargs": {"column": "fe_content_pct", "min_value": 0, "max_value": 100}}
+
+Один и тот же список выполняют оба бэкенда 03_great_expectations.py:
+  - gx        — вызовы batch.expect_*() Great Expectations по одному
+  - compiled  — однопроходный векторизованный движок (validation_engine.py)
+
+quality_rule_suite() переводит quality_rules из etl_config.json (Модуль 4)
+в такие же ожидания; идентификатор правила и действие (reject_row,
+flag_as_suspect, ...) хранятся в meta — их использует quarantine.py.
+"""
+
+SENSOR_TYPE_CONDITION = 'sensor_type == "{}"'
+# QR-007: ключи checks_by_type в etl_config.json — типы датчиков Модуля 5,
+# в sensor_readings.csv Модуля 1 те же датчики названы по-русски.
+# pressure (0–20 бар) здесь нет: «Давление гидравлики» Модуля 1 — другая
+# величина (~240–320 бар), и диапазон QR-007 к ней не относится
+SENSOR_TYPE_NAMES = {
+    "temperature": "Температура двигателя",
+    "vibration": "Вибрация",
+    "speed": "Скорость",
+    "fuel_level": "Уровень топлива",
+}
+
+
+def expectation(expectation_type: str, **kwargs) -> dict:
+    return {"expectation_type": expectation_type, "kwargs": kwargs}
+
+
+def not_null(column: str) -> dict:
+    return expectation("expect_column_values_to_not_be_null", column=column)
+
+
+def unique(column: str) -> dict:
+    return expectation("expect_column_values_to_be_unique", column=column)
+
+
+def in_set(column: str, value_set: list) -> dict:
+    return expectation("expect_column_values_to_be_in_set", column=column, value_set=value_set)
+
+
+def between(column: str, min_value=None, max_value=None, **options) -> dict:
+    kwargs = {"column": column}
+    if min_value is not None:
+        kwargs["min_value"] = min_value
+    if max_value is not None:
+        kwargs["max_value"] = max_value
+    return expectation("expect_column_values_to_be_between", **kwargs, **options)
+
+
+def contains_set(column: str, value_set: list) -> dict:
+    """Каждое значение value_set встречается в колонке хотя бы раз."""
+    return expectation("expect_column_distinct_values_to_contain_set", column=column, value_set=value_set)
+
+
+def greater_than(column_a: str, column_b: str, or_equal: bool = False) -> dict:
+    return expectation("expect_column_pair_values_A_to_be_greater_than_B",
+                       column_A=column_a, column_B=column_b, or_equal=or_equal)
+
+
+def where(exp: dict, condition: str) -> dict:
+    """Ожидание только для строк, где выполнено условие (синтаксис pandas)."""
+    exp["kwargs"].update(row_condition=condition, condition_parser="pandas")
+    return exp
+
+
+def with_rule(exp: dict, rule: dict) -> dict:
+    """Привязывает ожидание к правилу quality_rules."""
+    exp["meta"] = {"rule_id": rule["rule_id"], "action": rule["action"],
+                   "severity": rule["severity"]}
+    return exp
+
+
+def row_count_between(min_value=None, max_value=None) -> dict:
+    kwargs = {}
+    if min_value is not None:
+        kwargs["min_value"] = min_value
+    if max_value is not None:
+        kwargs["max_value"] = max_value
+    return expectation("expect_table_row_count_to_be_between", **kwargs)
+
+
+# ============================================================
+# Наборы ожиданий
+# ============================================================
+
+def equipment_suite() -> list:
+    """equipment.csv"""
+    return [
+        # --- Структурные проверки ---
+        # PK: не NULL, уникальный
+        not_null("equipment_id"),
+        unique("equipment_id"),
+
+        # Обязательные поля
+        not_null("equipment_name"),
+        not_null("mine_id"),
+
+        # Допустимые значения
+        in_set("mine_id", ["MINE-1", "MINE-2"]),
+        in_set("status", ["В работе", "На ТО", "Простой"]),
+
+        # --- Бизнес-правила ---
+        between("year_manufactured", min_value=2010, max_value=2026),
+        between("engine_hours", min_value=0),
+        between("max_payload_tons", min_value=0, max_value=100),
+
+        # --- Полнота ---
+        row_count_between(min_value=10),
+    ]
+
+
+def sensor_readings_suite() -> list:
+    """sensor_readings.csv
+
+    Ссылочная целостность equipment_id → equipment проверяется отдельно
+    (referential_integrity.py, правило QR-003).
+    """
+    return [
+        # PK
+        not_null("reading_id"),
+        unique("reading_id"),
+
+        # Обязательные поля
+        not_null("equipment_id"),
+        not_null("sensor_type"),
+        not_null("reading_timestamp"),
+
+        # Допустимые значения
+        in_set("quality_flag", ["OK", "WARN", "ALARM"]),
+
+        # Бизнес-правила
+        between("reading_value", min_value=0),
+
+        # Полнота
+        row_count_between(min_value=40),
+    ]
+
+
+def ore_production_suite() -> list:
+    """ore_production.csv"""
+    return [
+        # PK
+        not_null("production_id"),
+        unique("production_id"),
+
+        # Обязательные поля
+        not_null("mine_id"),
+        not_null("equipment_id"),
+        not_null("production_date"),
+
+        # Допустимые значения
+        in_set("shift", [1, 2]),
+        in_set("status", ["Завершена", "Прервана"]),
+
+        # Бизнес-правила: диапазоны
+        between("tonnage_extracted", min_value=0, max_value=500),
+        between("fe_content_pct", min_value=0, max_value=100),
+        between("moisture_pct", min_value=0, max_value=100),
+
+        # Полнота
+        row_count_between(min_value=10),
+    ]
+
+
+def downtime_events_suite() -> list:
+    """downtime_events.csv"""
+    return [
+        # PK
+        not_null("event_id"),
+        unique("event_id"),
+
+        # Обязательные поля
+        not_null("equipment_id"),
+        not_null("event_type"),
+
+        # Допустимые значения
+        in_set("severity", ["Низкая", "Средняя", "Высокая", "Критическая", "Плановое"]),
+        in_set("event_type", ["Незапланированный", "Плановое ТО"]),
+
+        # Бизнес-правила
+        between("duration_minutes", min_value=1, max_value=1440),
+
+        # Полнота
+        row_count_between(min_value=5),
+    ]
+
+
+# ============================================================
+# Правила качества из etl_config.json
+# ============================================================
+
+def _rule_expectations(rule: dict, primary_key: str) -> list:
+    """Ожидания для одного правила (по name; QR-003 — referential_integrity.py)."""
+    name = rule["name"]
+    if name in ("not_null_primary_key", "unique_primary_key") and primary_key is None:
+        return []
+    if name == "not_null_primary_key":
+        return [not_null(primary_key)]
+    if name == "unique_primary_key":
+        return [unique(primary_key)]
+    if name == "tonnage_positive":
+        return [where(between("tonnage_extracted", min_value=0, strict_min=True),
+                      'status == "Завершена"')]
+    if name == "fe_content_range":
+        return [between("fe_content_pct", min_value=0, max_value=100)]
+    if name == "downtime_consistency":
+        return [greater_than("end_time", "start_time", or_equal=True)]
+    if name == "sensor_value_range":
+        types = module1_sensor_types(rule["checks_by_type"])
+        # тип без единой строки — ошибка конфигурации, а не пройденная проверка
+        return [contains_set("sensor_type", list(types))] + [
+            where(between("reading_value", min_value=bounds["min"], max_value=bounds["max"]),
+                  SENSOR_TYPE_CONDITION.format(sensor_type))
+            for sensor_type, bounds in types.items()]
+    return []
+
+
+def module1_sensor_types(checks_by_type: dict) -> dict:
+    """checks_by_type QR-007 в названиях Модуля 1; типы без пары в SENSOR_TYPE_NAMES не проверяются."""
+    return {SENSOR_TYPE_NAMES[key]: bounds for key, bounds in checks_by_type.items() if key in SENSOR_TYPE_NAMES}
+
+
+def quality_rule_suite(config: dict, table: str) -> list:
+    """Ожидания по quality_rules, относящимся к таблице."""
+    tables = {t["name"]: t for t in config["source"]["tables"]}
+    primary_key = tables.get(table, {}).get("primary_key")
+    suite = []
+    for rule in config.get("quality_rules", []):
+        if rule["applies_to"] != "all_tables" and table not in rule["applies_to"]:
+            continue
+        suite.extend(with_rule(exp, rule) for exp in _rule_expectations(rule, primary_key))
+    return suite
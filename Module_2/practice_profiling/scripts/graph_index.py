@@ -0,0 +1,548 @@
+"""
+Практикум по анализу и моделированию данных
+Модуль 2 (доп.): Графовый индекс MES «Руда+» в памяти
+Предприятие: «Руда+» — добыча железной руды
+
+Графовая модель Модуля 5 (graph_model.json: шахта → горизонт →
+оборудование → датчик → событие обслуживания) в 04_graph_cypher.cypher
+запрашивается в Neo4j. Здесь те же обходы делаются без сервера:
+
+  - схема (метки узлов, ключевое свойство метки, типы связей с метками
+    концов) читается из graph_model.json;
+  - узлы метки нумеруются 0..n-1. Ключи хранятся Arrow-строками
+    (номер → ключ) и отсортированными 64-битными хешами (ключ → номер:
+    np.searchsorted и сравнение самого ключа, как в key_index.py) —
+    без словаря Python-строк на каждый узел;
+  - связи каждого типа хранятся дважды, по направлению и против него,
+    как сжатые списки смежности (CSR): indptr (int32, пока рёбер меньше
+    2^31) и indices (int32 — номера узлов другой метки). Тип связи сам
+    задаёт метки концов, поэтому соседи узла по типу — один срез массива,
+    без фильтрации чужих рёбер;
+  - шаг обхода для множества узлов — один векторный gather по срезам
+    indptr, так что стоимость запроса зависит от числа затронутых рёбер,
+    а не от размера графа.
+
+Узлы и связи строятся из CSV Модуля 1 (module1_frames): оборудование и
+шахты — equipment.csv, горизонты и операторы — ore_production.csv,
+датчики — пары (оборудование, тип датчика) из sensor_readings.csv,
+события обслуживания — downtime_events.csv, маршруты CONNECTED_TO —
+routes_list из graph_model.json. Идентификаторов операторов в Модуле 1
+нет, ключ оператора — ФИО (как в ore_production и downtime_events).
+
+    graph = build_graph(load_schema(), *module1_frames())
+    label, ids = graph.traverse("Mine", ["MINE-1"], ["LOCATED_IN", "HAS_SENSOR"])
+    graph.keys(label, ids)                  # датчики оборудования шахты
+    graph.neighbourhood("Equipment", ["EQ-001"], 2)
+"""
+
+import json
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+from datasets import DATA_DIR
+from key_index import key_bytes
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+GRAPH_MODEL = SCRIPT_DIR.parent.parent.parent / "Module_5" / "practice" / "data" / "graph_model.json"
+
+
+# ============================================================
+# Схема
+# ============================================================
+
+@dataclass(frozen=True)
+class GraphSchema:
+    keys: dict            # метка → ключевое свойство (unique в graph_model.json)
+    properties: dict      # метка → имена свойств
+    relationships: dict   # тип связи → (метка начала, метка конца)
+
+
+def load_schema(path: Path = GRAPH_MODEL) -> GraphSchema:
+    model = json.loads(Path(path).read_text(encoding="utf-8"))
+    keys, properties = {}, {}
+    for node in model["nodes"]:
+        keys[node["label"]] = next(p["name"] for p in node["properties"] if p.get("unique"))
+        properties[node["label"]] = [p["name"] for p in node["properties"]]
+    relationships = {r["type"]: (r["from"], r["to"]) for r in model["relationships"]}
+    return GraphSchema(keys, properties, relationships)
+
+
+def model_routes(path: Path = GRAPH_MODEL) -> list:
+    """Цепочки оборудования маршрутов: ["EQ-001 (ПДМ-01)", ...] → ["EQ-001", ...]."""
+    model = json.loads(Path(path).read_text(encoding="utf-8"))
+    return [[item.split()[0] for item in route["chain"]]
+            for route in model.get("routes", {}).get("routes_list", [])]
+
+
+# ============================================================
+# Ключи узлов
+# ============================================================
+
+def _hashes(keys: np.ndarray) -> np.ndarray:
+    # те же хеши, что key_index.key_hashes; без categorize pandas не строит
+    # factorize — для одного ключа это ~20 мкс вместо ~200
+    return pd.util.hash_array(keys, categorize=False).astype(np.uint64)
+
+
+class NodeKeys:
+    """Ключи узлов одной метки; позиция ключа — номер узла.
+
+    Повторы ключа отбрасываются (остаётся первое вхождение); ключи с
+    одинаковым хешем, но разными байтами — разные узлы. rows —
+    позиции оставленных ключей во входном массиве или None, если повторов нет.
+    """
+
+    def __init__(self, keys):
+        keys = np.asarray(keys, dtype=object)
+        hashes = _hashes(keys)
+        order = np.argsort(hashes, kind="stable")
+        same = hashes[order][1:] == hashes[order][:-1]
+        self.rows = None
+        if same.any():
+            # повтор — ключ, равный первому в серии равных хешей; ключи,
+            # отличные от него, — коллизии, их байты сравниваются отдельно
+            start = np.concatenate(([True], ~same))
+            head = order[np.flatnonzero(start)[np.cumsum(start) - 1]]
+            keep = start.copy()
+            other = np.flatnonzero(keys[order] != keys[head])
+            if len(other):
+                other = other[np.lexsort((order[other], key_bytes(keys[order[other]]), hashes[order[other]]))]
+                run_hashes, run_bytes = hashes[order[other]], key_bytes(keys[order[other]])
+                keep[other] = np.concatenate(([True], (run_hashes[1:] != run_hashes[:-1])
+                                              | (run_bytes[1:] != run_bytes[:-1])))
+            if not keep.all():
+                self.rows = np.sort(order[keep])
+                keys, hashes = keys[self.rows], hashes[self.rows]
+                order = np.argsort(hashes, kind="stable")
+        self.values = pa.array(keys, type=pa.string())
+        self.order = order.astype(np.int32)
+        self.hashes = hashes[order]
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def lookup(self, keys) -> np.ndarray:
+        """Номера узлов для keys; -1 — такого ключа нет."""
+        keys = np.asarray(keys, dtype=object)
+        ids = np.full(len(keys), -1, dtype=np.int32)
+        if not len(self) or not len(keys):
+            return ids
+        hashes = _hashes(keys)
+        if len(hashes) > 1024:
+            # отсортированные иглы идут по массиву подряд — в разы меньше промахов кэша
+            needles = np.argsort(hashes)
+            left = np.empty(len(hashes), dtype=np.int64)
+            right = np.empty(len(hashes), dtype=np.int64)
+            left[needles] = np.searchsorted(self.hashes, hashes[needles], side="left")
+            right[needles] = np.searchsorted(self.hashes, hashes[needles], side="right")
+        else:
+            left = np.searchsorted(self.hashes, hashes, side="left")
+            right = np.searchsorted(self.hashes, hashes, side="right")
+        # при коллизии хешей кандидатов несколько — сравниваются все
+        for offset in range(int((right - left).max())):
+            probe = left + offset
+            valid = np.flatnonzero(probe < right)
+            candidates = self.order[probe[valid]]
+            match = self.take(candidates) == keys[valid]
+            ids[valid[match]] = candidates[match]
+        return ids
+
+    def take(self, ids: np.ndarray) -> np.ndarray:
+        return self.values.take(pa.array(ids)).to_numpy(zero_copy_only=False)
+
+    @property
+    def nbytes(self) -> int:
+        return self.values.nbytes + self.order.nbytes + self.hashes.nbytes
+
+
+# ============================================================
+# Списки смежности
+# ============================================================
+
+class Adjacency:
+    """CSR одного направления: соседи узла i — indices[indptr[i]:indptr[i + 1]]."""
+
+    __slots__ = ("indptr", "indices")
+
+    def __init__(self, src: np.ndarray, dst: np.ndarray, n_src: int):
+        # src, dst отсортированы по (src, dst) и без повторов
+        width = np.int32 if len(dst) < 2**31 else np.int64
+        self.indptr = np.zeros(n_src + 1, dtype=width)
+        np.cumsum(np.bincount(src, minlength=n_src), out=self.indptr[1:])
+        self.indices = dst.astype(np.int32)
+
+    def neighbours(self, node: int) -> np.ndarray:
+        return self.indices[self.indptr[node]:self.indptr[node + 1]]
+
+    def expand(self, nodes: np.ndarray) -> np.ndarray:
+        """Соседи всех nodes одним массивом (с повторами)."""
+        if len(nodes) == 1:
+            return self.neighbours(nodes[0])
+        starts = self.indptr[nodes].astype(np.int64)
+        counts = self.indptr[nodes + 1] - starts
+        # позиция k-го соседа узла j: starts[j] + k
+        offsets = np.repeat(starts - (np.cumsum(counts) - counts), counts)
+        return self.indices[offsets + np.arange(len(offsets))]
+
+    def degrees(self) -> np.ndarray:
+        return np.diff(self.indptr)
+
+    @property
+    def nbytes(self) -> int:
+        return self.indptr.nbytes + self.indices.nbytes
+
+
+def _sorted_pairs(src: np.ndarray, dst: np.ndarray, n_dst: int) -> tuple:
+    """Пары (src, dst) без повторов, отсортированные по src, затем dst."""
+    if not len(src):
+        return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+    # np.sort + сравнение соседей: np.unique на миллионах пар в разы медленнее
+    pairs = np.sort(src.astype(np.int64) * n_dst + dst)
+    pairs = pairs[np.concatenate(([True], pairs[1:] != pairs[:-1]))]
+    return np.divmod(pairs, n_dst)
+
+
+@dataclass
+class Relationship:
+    name: str
+    source: str
+    target: str
+    out: Adjacency        # source → target
+    inc: Adjacency        # target → source
+    dropped: int = 0      # рёбер с ключом, которого нет среди узлов
+
+    @property
+    def edges(self) -> int:
+        return len(self.out.indices)
+
+
+def _unique(ids: np.ndarray, n: int) -> np.ndarray:
+    """Отсортированные уникальные номера: для больших выборок — битовая маска, без сортировки."""
+    if len(ids) > n >> 4:
+        mask = np.zeros(n, dtype=bool)
+        mask[ids] = True
+        return np.flatnonzero(mask).astype(np.int32)
+    ids = np.sort(ids)
+    return ids[np.concatenate(([True], ids[1:] != ids[:-1]))] if len(ids) else ids
+
+
+def parse_step(step: str) -> tuple:
+    """"HAS_SENSOR" → (тип, направление, замыкание); "<" — против направления,
+    ">" — по направлению, "*" в конце — обход до неподвижной точки."""
+    name, direction = step.strip(), None
+    if name[:1] in "<>":
+        direction, name = ("in" if name[0] == "<" else "out"), name[1:]
+    closure = name.endswith("*")
+    return name.rstrip("*"), direction, closure
+
+
+# ============================================================
+# Граф
+# ============================================================
+
+class GraphIndex:
+    """Узлы по меткам и типизированные связи в CSR; запросы — обходы по шагам."""
+
+    def __init__(self, schema: GraphSchema, keys: dict, properties: dict, relationships: dict):
+        self.schema = schema
+        self.node_keys = keys                  # метка → NodeKeys
+        self.properties = properties           # метка → DataFrame свойств (без ключа) в порядке номеров
+        self.relationships = relationships     # тип → Relationship
+        self.incident = {label: [] for label in keys}
+        for rel in relationships.values():
+            self.incident[rel.source].append((rel, "out"))
+            self.incident[rel.target].append((rel, "in"))
+
+    def count(self, label: str) -> int:
+        return len(self.node_keys[label])
+
+    def ids(self, label: str, keys) -> np.ndarray:
+        keys = [keys] if isinstance(keys, str) else list(keys)
+        ids = self.node_keys[label].lookup(keys)
+        if (ids < 0).any():
+            missing = [k for k, i in zip(keys, ids) if i < 0]
+            raise KeyError(f"{label}: нет узлов {', '.join(map(str, missing[:5]))}")
+        return ids
+
+    def keys(self, label: str, ids: np.ndarray) -> np.ndarray:
+        return self.node_keys[label].take(ids)
+
+    def frame(self, label: str, ids: np.ndarray) -> pd.DataFrame:
+        """Свойства узлов ids (ключ и всё, что загружено)."""
+        df = pd.DataFrame({self.schema.keys[label]: self.keys(label, ids)})
+        props = self.properties.get(label)
+        if props is not None:
+            df = df.join(props.iloc[ids].reset_index(drop=True))
+        return df
+
+    def where(self, label: str, ids: np.ndarray, **equals) -> np.ndarray:
+        """Узлы ids, у которых свойства равны заданным: where("MaintenanceEvent", ids, type="Аварийный")."""
+        mask = np.ones(len(ids), dtype=bool)
+        for column, value in equals.items():
+            mask &= self.properties[label][column].to_numpy()[ids] == value
+        return ids[mask]
+
+    # ---------------------------------------------------------------- обход
+
+    def _direction(self, label: str, rel: Relationship, direction) -> str:
+        if direction is None:
+            if rel.source == label:
+                return "out"
+            if rel.target == label:
+                return "in"
+        elif (rel.source if direction == "out" else rel.target) == label:
+            return direction
+        raise ValueError(f"Связь {rel.name} ({rel.source} → {rel.target}) не начинается в {label}")
+
+    def step(self, label: str, ids: np.ndarray, name: str, direction=None) -> tuple:
+        """Один шаг по связям типа name: (метка соседей, уникальные номера)."""
+        rel = self.relationships[name]
+        direction = self._direction(label, rel, direction)
+        adjacency, other = (rel.out, rel.target) if direction == "out" else (rel.inc, rel.source)
+        return other, _unique(adjacency.expand(ids), self.count(other))
+
+    def closure(self, label: str, ids: np.ndarray, name: str, direction=None) -> np.ndarray:
+        """Узлы, достижимые за 1 и более шагов по связи name (CONNECTED_TO* в Cypher)."""
+        reached = np.empty(0, dtype=np.int32)
+        frontier = ids
+        while len(frontier):
+            _, found = self.step(label, frontier, name, direction)
+            frontier = np.setdiff1d(found, reached, assume_unique=True)
+            reached = np.union1d(reached, frontier)
+        return reached
+
+    def traverse(self, label: str, keys, steps: list) -> tuple:
+        """Путь из узлов keys по шагам ("LOCATED_IN", "<MAINTAINED_BY", "CONNECTED_TO*"):
+        (метка, номера узлов в конце пути)."""
+        ids = self.ids(label, keys)
+        for step in steps:
+            name, direction, closure = parse_step(step)
+            if closure:
+                ids = self.closure(label, ids, name, direction)
+            else:
+                label, ids = self.step(label, ids, name, direction)
+        return label, ids
+
+    def neighbourhood(self, label: str, keys, hops: int, relationships=None) -> list:
+        """Узлы на расстоянии 0..hops по связям любого направления:
+        layers[h] = {метка: номера узлов, впервые достигнутых на шаге h}."""
+        frontier = {label: _unique(self.ids(label, keys), self.count(label))}
+        seen = {label: frontier[label]}
+        layers = [frontier]
+        for _ in range(hops):
+            found = {}
+            for current, ids in frontier.items():
+                for rel, direction in self.incident[current]:
+                    if relationships and rel.name not in relationships:
+                        continue
+                    adjacency, other = (rel.out, rel.target) if direction == "out" else (rel.inc, rel.source)
+                    found.setdefault(other, []).append(adjacency.expand(ids))
+            frontier = {}
+            for other, parts in found.items():
+                ids = _unique(np.concatenate(parts), self.count(other))
+                if other in seen:
+                    ids = np.setdiff1d(ids, seen[other], assume_unique=True)
+                if len(ids):
+                    frontier[other] = ids
+                    seen[other] = np.union1d(seen[other], ids) if other in seen else ids
+            if not frontier:
+                break
+            layers.append(frontier)
+        return layers
+
+    def layers_frame(self, layers: list) -> pd.DataFrame:
+        rows = [(hop, label, key) for hop, layer in enumerate(layers)
+                for label, ids in layer.items() for key in self.keys(label, ids)]
+        return pd.DataFrame(rows, columns=["hop", "label", "key"])
+
+    # ---------------------------------------------------------------- сводка
+
+    def summary(self) -> pd.DataFrame:
+        return pd.DataFrame([
+            {"relationship": rel.name, "source": rel.source, "target": rel.target, "edges": rel.edges,
+             "dropped": rel.dropped, "max_out": int(rel.out.degrees().max(initial=0)),
+             "max_in": int(rel.inc.degrees().max(initial=0)), "bytes": rel.out.nbytes + rel.inc.nbytes}
+            for rel in self.relationships.values()])
+
+    def memory_bytes(self) -> dict:
+        return {
+            "adjacency": sum(rel.out.nbytes + rel.inc.nbytes for rel in self.relationships.values()),
+            "keys": sum(keys.nbytes for keys in self.node_keys.values()),
+            "properties": sum(int(df.memory_usage(deep=True).sum())
+                              for df in self.properties.values() if df is not None),
+        }
+
+
+def build_graph(schema: GraphSchema, nodes: dict, edges: dict) -> GraphIndex:
+    """nodes: метка → DataFrame с ключевым свойством схемы (и любыми другими);
+    edges: тип связи → DataFrame с колонками src, dst (ключи узлов)."""
+    keys, properties = {}, {}
+    for label, key in schema.keys.items():
+        df = nodes.get(label)
+        if df is None:
+            keys[label], properties[label] = NodeKeys([]), None
+            continue
+        keys[label] = NodeKeys(df[key])
+        if keys[label].rows is not None:
+            df = df.iloc[keys[label].rows]
+        df = df.reset_index(drop=True)
+        properties[label] = df.drop(columns=key) if len(df.columns) > 1 else None
+
+    relationships = {}
+    for name, (source, target) in schema.relationships.items():
+        pairs = edges.get(name, pd.DataFrame({"src": [], "dst": []}))
+        src = keys[source].lookup(pairs["src"])
+        dst = keys[target].lookup(pairs["dst"])
+        known = (src >= 0) & (dst >= 0)
+        n_source, n_target = len(keys[source]), len(keys[target])
+        out_src, out_dst = _sorted_pairs(src[known], dst[known], n_target)
+        in_src, in_dst = _sorted_pairs(dst[known], src[known], n_source)
+        relationships[name] = Relationship(
+            name, source, target,
+            Adjacency(out_src, out_dst, n_source), Adjacency(in_src, in_dst, n_target),
+            dropped=int((~known).sum()))
+    return GraphIndex(schema, keys, properties, relationships)
+
+
+# ============================================================
+# Источники узлов и связей
+# ============================================================
+
+def _pairs(src, dst) -> pd.DataFrame:
+    return pd.DataFrame({"src": np.asarray(src, dtype=object), "dst": np.asarray(dst, dtype=object)})
+
+
+def _horizon_depth(level: pd.Series) -> pd.Series:
+    """«Горизонт -320м» → 320."""
+    return pd.to_numeric(level.str.extract(r"-(\d+)", expand=False), errors="coerce")
+
+
+def module1_frames(data_dir: Path = DATA_DIR, model_path: Path = GRAPH_MODEL) -> tuple:
+    """Узлы и связи графовой модели из CSV Модуля 1."""
+    equipment = pd.read_csv(data_dir / "equipment.csv")
+    production = pd.read_csv(data_dir / "ore_production.csv")
+    downtime = pd.read_csv(data_dir / "downtime_events.csv")
+    readings = pd.read_csv(data_dir / "sensor_readings.csv")
+
+    placement = production[["mine_id", "horizon_level", "equipment_id"]]
+    locations = json.loads((data_dir / "equipment.json").read_text(encoding="utf-8"))
+    placement = pd.concat([placement, pd.DataFrame(
+        [{"mine_id": item["location"]["mine_id"], "horizon_level": item["location"]["current_horizon"],
+          "equipment_id": item["equipment_id"]} for item in locations])], ignore_index=True)
+    # «Ствол шахты» и прочие места без глубины — не горизонт
+    placement = placement[_horizon_depth(placement["horizon_level"]).notna()].drop_duplicates()
+    placement["horizon_id"] = placement["mine_id"] + ":" + placement["horizon_level"]
+
+    sensors = readings[["equipment_id", "sensor_type", "unit"]].drop_duplicates(["equipment_id", "sensor_type"])
+    sensors = sensors.assign(sensor_id=sensors["equipment_id"] + ":" + sensors["sensor_type"])
+    operators = pd.concat([production["operator_name"], downtime["reported_by"]]).dropna().unique()
+    mines = pd.concat([equipment[["mine_id", "mine_name"]], production[["mine_id", "mine_name"]]])
+    horizons = placement.drop_duplicates("horizon_id")
+
+    nodes = {
+        "Mine": mines.rename(columns={"mine_name": "name"}),
+        "Horizon": pd.DataFrame({"horizon_id": horizons["horizon_id"], "name": horizons["horizon_level"],
+                                 "depth_m": _horizon_depth(horizons["horizon_level"]),
+                                 "mine_id": horizons["mine_id"]}),
+        "Equipment": equipment.rename(columns={"equipment_name": "name", "equipment_type": "type",
+                                               "year_manufactured": "year"})[
+            ["equipment_id", "name", "type", "manufacturer", "model", "status", "year",
+             "engine_hours", "max_payload_tons", "mine_id"]],
+        "Operator": pd.DataFrame({"operator_id": operators, "name": operators}),
+        "Sensor": sensors.rename(columns={"sensor_type": "type"})[["sensor_id", "type", "unit", "equipment_id"]],
+        "MaintenanceEvent": pd.DataFrame({
+            "event_id": downtime["event_id"], "date": downtime["start_time"].str[:10],
+            "type": downtime["event_type"], "description": downtime["description"],
+            "duration_hours": downtime["duration_minutes"] / 60, "equipment_id": downtime["equipment_id"],
+            "performed_by": downtime["reported_by"]}),
+    }
+    routes = [(a, b) for chain in model_routes(model_path) for a, b in zip(chain, chain[1:])]
+    edges = {
+        "LOCATED_IN": _pairs(equipment["equipment_id"], equipment["mine_id"]),
+        "ON_HORIZON": _pairs(placement["equipment_id"], placement["horizon_id"]),
+        "PART_OF": _pairs(horizons["horizon_id"], horizons["mine_id"]),
+        "WORKS_AT": _pairs(production["operator_name"], production["mine_id"]),
+        "OPERATES": _pairs(production["operator_name"], production["equipment_id"]),
+        "HAS_SENSOR": _pairs(sensors["equipment_id"], sensors["sensor_id"]),
+        "CONNECTED_TO": _pairs([a for a, _ in routes], [b for _, b in routes]),
+        "REQUIRED_MAINTENANCE": _pairs(downtime["equipment_id"], downtime["event_id"]),
+        "MAINTAINED_BY": _pairs(downtime["event_id"], downtime["reported_by"]),
+    }
+    return nodes, edges
+
+
+def _ids(prefix: str, n: int, width: int) -> np.ndarray:
+    return np.array([f"{prefix}-{i:0{width}d}" for i in range(1, n + 1)], dtype=object)
+
+
+def synthetic_frames(n_equipment: int, events_per_equipment: int = 200, sensors_per_equipment: int = 8,
+                     equipment_per_mine: int = 500, seed: int = 42) -> tuple:
+    """Граф парка из n_equipment машин: шахты по equipment_per_mine машин, 10 горизонтов
+    на шахту, оператор на 3 машины, маршруты-цепочки по 4 машины, события с исполнителем."""
+    rng = np.random.default_rng(seed)
+    n_mines = max(1, -(-n_equipment // equipment_per_mine))
+    n_horizons, n_operators = n_mines * 10, max(1, n_equipment // 3)
+    n_sensors, n_events = n_equipment * sensors_per_equipment, n_equipment * events_per_equipment
+
+    mine_ids, horizon_ids = _ids("MINE", n_mines, 3), _ids("HRZ", n_horizons, 5)
+    equipment_ids, operator_ids = _ids("EQ", n_equipment, 6), _ids("OP", n_operators, 6)
+    sensor_ids, event_ids = _ids("SENS", n_sensors, 8), _ids("MNT", n_events, 9)
+
+    equipment_mine = np.arange(n_equipment) // equipment_per_mine
+    equipment_horizon = equipment_mine * 10 + rng.integers(0, 10, n_equipment)
+    operator_mine = rng.integers(0, n_mines, n_operators)
+    # оператор управляет машинами своей шахты
+    operates = np.repeat(np.arange(n_operators), 3)
+    operated = np.minimum(operator_mine[operates] * equipment_per_mine + rng.integers(0, equipment_per_mine, len(operates)),
+                          n_equipment - 1)
+    event_equipment = np.repeat(np.arange(n_equipment), events_per_equipment)
+    event_operator = rng.integers(0, n_operators, n_events)
+    chain = np.arange(n_equipment)
+    linked = chain[(chain % 4) != 3][:-1]
+
+    nodes = {
+        "Mine": pd.DataFrame({"mine_id": mine_ids}),
+        "Horizon": pd.DataFrame({"horizon_id": horizon_ids}),
+        "Equipment": pd.DataFrame({"equipment_id": equipment_ids}),
+        "Operator": pd.DataFrame({"operator_id": operator_ids}),
+        "Sensor": pd.DataFrame({"sensor_id": sensor_ids}),
+        "MaintenanceEvent": pd.DataFrame({
+            "event_id": event_ids,
+            "type": pd.Categorical.from_codes(rng.choice(4, n_events, p=[0.6, 0.2, 0.15, 0.05]),
+                                              ["Плановое ТО", "Диагностика", "Аварийный", "Модернизация"])}),
+    }
+    edges = {
+        "LOCATED_IN": _pairs(equipment_ids, mine_ids[equipment_mine]),
+        "ON_HORIZON": _pairs(equipment_ids, horizon_ids[equipment_horizon]),
+        "PART_OF": _pairs(horizon_ids, mine_ids[np.arange(n_horizons) // 10]),
+        "WORKS_AT": _pairs(operator_ids, mine_ids[operator_mine]),
+        "OPERATES": _pairs(operator_ids[operates], equipment_ids[operated]),
+        "HAS_SENSOR": _pairs(np.repeat(equipment_ids, sensors_per_equipment), sensor_ids),
+        "CONNECTED_TO": _pairs(equipment_ids[linked], equipment_ids[linked + 1]),
+        "REQUIRED_MAINTENANCE": _pairs(equipment_ids[event_equipment], event_ids),
+        "MAINTAINED_BY": _pairs(event_ids, operator_ids[event_operator]),
+    }
+    return nodes, edges
+
+
+# ============================================================
+# Типовые запросы
+# ============================================================
+
+# имя → (метка начала, шаги, описание); шаги — как в GraphIndex.traverse
+QUERIES = {
+    "mine_sensors": ("Mine", ["LOCATED_IN", "HAS_SENSOR"],
+                     "датчики оборудования шахты"),
+    "operator_downtime": ("Operator", ["OPERATES", "REQUIRED_MAINTENANCE"],
+                          "события обслуживания машин, которыми управляет оператор"),
+    "operator_maintenance": ("Operator", ["MAINTAINED_BY"],
+                             "события, оформленные оператором"),
+    "horizon_sensors": ("Horizon", ["ON_HORIZON", "HAS_SENSOR"],
+                        "датчики оборудования горизонта"),
+    "route_downstream": ("Equipment", ["CONNECTED_TO*"],
+                         "оборудование ниже по маршрутам транспортировки"),
+}
@@ -0,0 +1,229 @@
+"""
+Практикум по анализу и моделированию данных
+Модуль 2 (доп.): Инкрементальная валидация по watermark
+Предприятие: «Руда+» — добыча железной руды
+
+Раздел incremental файла etl_config.json (Модуль 4) задаёт загрузку по
+watermark: пакеты по batch_size строк и перекрытие overlap_minutes.
+Здесь по той же схеме проверяются наборы ожиданий (expectation_suites.py):
+
+  - watermark — наибольшее значение колонки времени среди уже
+    проверенных строк; хранится в state.json;
+  - очередной запуск проверяет только строки новее watermark − overlap;
+    более старые строки считаются проверенными и пропускаются;
+  - строка без метки времени проверяется один раз: её ключ сохраняется
+    в state.json (null_keys), и следующие запуски её пропускают (в --db —
+    исключают в WHERE);
+  - в окне перекрытия строка, чей ключ уже есть в истории с тем же
+    содержимым (хеш строки), — повторная доставка: она отбрасывается
+    без нарушения. Тот же ключ с другим содержимым — дубликат;
+  - уникальность ключа (production_id, event_id, reading_id)
+    проверяется по всей истории через постоянный индекс ключей
+    (key_index.py): фильтр Блума и сегменты с точной проверкой;
+  - expect_table_row_count_to_be_between считается по всей таблице —
+    по числу строк истории вместе с пакетом.
+
+Ключи добавляются в индекс после каждого пакета, watermark сдвигается
+в конце запуска. Если запуск прервался, следующий снова прочитает его
+строки — они окажутся повторными доставками, и проверка останется
+идемпотентной.
+
+Поиск ключей по индексу и проверка набора зависят только от числа новых
+строк. Постоянную стоимость запуска даёт источник, который сам отдаёт
+только новые строки: таблица с условием watermark в WHERE (--db) или
+landing-файл очередной выгрузки. CSV со всей историей разбирается
+целиком при каждом запуске — фильтр по watermark отбрасывает старые
+строки уже после чтения.
+
+    validator = IncrementalValidator("ore_production")
+    for chunk in chunks:          # строки новее validator.cutoff
+        validator.process(chunk)
+    validator.commit()
+"""
+
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from datasets import ETL_CONFIG
+from expectation_suites import downtime_events_suite, ore_production_suite, sensor_readings_suite
+from instrumentation import current
+from key_index import SegmentKeyIndex, row_hashes
+from validation_engine import PARTIAL_UNEXPECTED_COUNT, CompiledSuite
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+INCREMENTAL_DIR = SCRIPT_DIR.parent / "reports" / "incremental"
+
+# колонки updated_at/created_at из etl_config есть только в хранилище;
+# в CSV Модуля 1 watermark — время самого события
+INCREMENTAL_DATASETS = {
+    "sensor_readings": {"key": "reading_id", "watermark": "reading_timestamp", "suite": sensor_readings_suite},
+    "ore_production": {"key": "production_id", "watermark": "production_date", "suite": ore_production_suite},
+    "downtime_events": {"key": "event_id", "watermark": "start_time", "suite": downtime_events_suite},
+}
+
+
+def incremental_settings(config_path: Path = ETL_CONFIG) -> dict:
+    """batch_size и overlap_minutes из раздела incremental."""
+    with open(config_path, encoding="utf-8") as f:
+        incremental = json.load(f).get("incremental", {})
+    return {"batch_size": int(incremental.get("batch_size", 10_000)),
+            "overlap_minutes": float(incremental.get("overlap_minutes", 0))}
+
+
+def merge_results(results: list) -> dict:
+    """Результаты пакетов → один результат в формате GX (счётчики суммируются)."""
+    if not results:
+        return {"success": True, "results": [], "statistics": {}}
+    merged = []
+    for parts in zip(*(r["results"] for r in results)):
+        last = parts[-1]
+        result = dict(last["result"])
+        success = all(p["success"] for p in parts)
+        if "unexpected_count" in result:
+            for field in ("element_count", "missing_count", "unexpected_count"):
+                result[field] = sum(p["result"].get(field, 0) for p in parts)
+            # как в _column_result: для not_null доля от всех строк, для остальных — от непустых
+            base = result["element_count"] - result["missing_count"]
+            if last["expectation_config"]["expectation_type"] == "expect_column_values_to_not_be_null":
+                base = result["element_count"]
+            result["unexpected_percent"] = 100.0 * result["unexpected_count"] / base if base else None
+            for field in ("partial_unexpected_list", "partial_unexpected_index_list"):
+                result[field] = [v for p in parts for v in p["result"].get(field, [])][:PARTIAL_UNEXPECTED_COUNT]
+            mostly = last["expectation_config"]["kwargs"].get("mostly", 1.0)
+            success = result["unexpected_count"] == 0 if mostly >= 1.0 else (
+                base == 0 or 1 - result["unexpected_count"] / base >= mostly)
+        merged.append({"success": success,
+                       "expectation_config": last["expectation_config"],
+                       "result": result,
+                       "exception_info": last["exception_info"]})
+    n_success = sum(1 for r in merged if r["success"])
+    return {
+        "success": n_success == len(merged),
+        "results": merged,
+        "statistics": {
+            "evaluated_expectations": len(merged),
+            "successful_expectations": n_success,
+            "unsuccessful_expectations": len(merged) - n_success,
+            "success_percent": 100.0 * n_success / len(merged) if merged else 100.0,
+        },
+    }
+
+
+class IncrementalValidator:
+    """Проверка новых строк датасета с состоянием между запусками."""
+
+    def __init__(self, dataset: str, state_dir: Path = INCREMENTAL_DIR, overlap_minutes: float = 5,
+                 batch_size: int = 10_000, suite: list = None):
+        spec = INCREMENTAL_DATASETS[dataset]
+        self.dataset = dataset
+        self.key = spec["key"]
+        self.watermark_column = spec["watermark"]
+        self.batch_size = batch_size
+        self.overlap_minutes = overlap_minutes
+        self.dir = Path(state_dir) / dataset
+        self.dir.mkdir(parents=True, exist_ok=True)
+        self.state = self._load_state()
+        self.keys = SegmentKeyIndex(self.dir / f"keys_{self.key}")
+        self.compiled = CompiledSuite(spec["suite"]() if suite is None else suite)
+        self.start_run()
+
+    def start_run(self):
+        """Новый запуск от сохранённого watermark (после commit() — от нового).
+
+        Позволяет держать валидатор в памяти между запусками (worker_daemon.py):
+        индекс ключей и скомпилированный набор не создаются заново.
+        """
+        watermark = self.state["watermark"]
+        self.watermark = None if watermark is None else pd.Timestamp(watermark)
+        self.cutoff = None if self.watermark is None else self.watermark - pd.Timedelta(minutes=self.overlap_minutes)
+        self.new_watermark = self.watermark
+        # ключи строк без метки времени, уже проверенных в прошлых запусках
+        self.null_keys = set(self.state.get("null_keys", []))
+        self.new_null_keys = set()
+        self.results = []
+        self.counts = dict.fromkeys(("read", "skipped", "redelivered", "validated", "history_duplicates"), 0)
+
+    # --- состояние ---
+
+    def _load_state(self) -> dict:
+        path = self.dir / "state.json"
+        if path.exists():
+            return json.loads(path.read_text(encoding="utf-8"))
+        return {"dataset": self.dataset, "watermark": None, "n_rows": 0, "runs": 0}
+
+    def commit(self) -> dict:
+        """Конец запуска: сдвигает watermark и сохраняет state.json."""
+        self.state.update({
+            "watermark_column": self.watermark_column,
+            "watermark": None if self.new_watermark is None else str(self.new_watermark),
+            "n_rows": self.state["n_rows"] + self.counts["validated"],
+            "null_keys": sorted(self.null_keys | self.new_null_keys, key=str),
+            "runs": self.state["runs"] + 1,
+            "last_run": {**self.counts, "cutoff": None if self.cutoff is None else str(self.cutoff)},
+        })
+        tmp = self.dir / "state.json.tmp"
+        tmp.write_text(json.dumps(self.state, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp, self.dir / "state.json")
+        return self.state
+
+    # --- пакеты ---
+
+    def select(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Строки новее watermark − overlap и ещё не проверенные строки без метки времени."""
+        if self.cutoff is None and not self.null_keys:
+            return df
+        column = df[self.watermark_column]
+        undated = column.isna() & ~df[self.key].isin(self.null_keys)
+        keep = undated if self.cutoff is None else (column > self.cutoff) | undated
+        self.counts["skipped"] += int((~keep).sum())
+        return df[keep.to_numpy()]
+
+    def process(self, chunk: pd.DataFrame):
+        """Проверяет пакет; крупные пакеты делятся по batch_size строк."""
+        for start in range(0, len(chunk), self.batch_size):
+            self._process_batch(chunk.iloc[start:start + self.batch_size])
+
+    def _process_batch(self, df: pd.DataFrame):
+        metrics = current()
+        self.counts["read"] += len(df)
+        df = self.select(df)
+        if df.empty:
+            return
+        with metrics.stage("key_lookup", rows=len(df)):
+            keys = df[self.key].astype(object).to_numpy()
+            rows = row_hashes(df)
+            present = ~pd.isna(keys)
+            found = np.zeros(len(df), dtype=bool)
+            stored = np.zeros(len(df), dtype=np.uint64)
+            found[present], stored[present] = self.keys.lookup(keys[present])
+
+        # повторная доставка из окна перекрытия — та же строка целиком
+        redelivered = found & (stored == rows)
+        self.counts["redelivered"] += int(redelivered.sum())
+        if redelivered.any():
+            fresh = ~redelivered
+            df, keys, rows, found, present = df[fresh], keys[fresh], rows[fresh], found[fresh], present[fresh]
+        if df.empty:
+            return
+
+        n_rows = self.state["n_rows"] + self.counts["validated"] + len(df)
+        with metrics.stage("validate", rows=len(df)):
+            self.results.append(self.compiled.validate(df, history={self.key: found}, n_rows=n_rows))
+        self.counts["validated"] += len(df)
+        self.counts["history_duplicates"] += int(found.sum())
+
+        new = present & ~found & ~pd.Series(keys).duplicated().to_numpy()
+        with metrics.stage("key_index", rows=int(new.sum())):
+            self.keys.add(keys[new], rows[new])
+        undated = df[self.watermark_column].isna().to_numpy() & present
+        self.new_null_keys.update(keys[undated].tolist())
+        latest = df[self.watermark_column].max()
+        if pd.notna(latest) and (self.new_watermark is None or latest > self.new_watermark):
+            self.new_watermark = latest
+
+    def result(self) -> dict:
+        return merge_results(self.results)
@@ -0,0 +1,387 @@
+"""
+Практикум по анализу и моделированию данных
+Модуль 2 (доп.): Метрики этапов профилирования и валидации
+Предприятие: «Руда+» — добыча железной руды
+
+Скрипты 01–03 замеряют каждый этап: загрузку CSV или SQL, расчёт
+статистик, корреляции, генерацию отчёта, проверки ожиданий. Этапы
+вкладываются друг в друга (sensor_readings/load, sensor_readings/statistics/
+correlations, ...); повторные вызовы этапа (например, по частям файла)
+суммируются: время, число вызовов, строки, пиковый RSS.
+
+Из этих замеров считаются метрики блока monitoring файла
+etl_config.json (Модуль 4) и сравниваются с их порогами:
+
+  etl_load_duration_seconds   — время работы скрипта
+  etl_rows_rejected_count     — строки, отправленные в карантин
+  etl_data_freshness_minutes  — минут от самой поздней метки времени в
+                                данных (watermark) до текущего момента
+  streaming_lag_seconds       — наибольшее отставание обработки от
+                                времени событий: часы в момент обработки
+                                пакета минус его самое позднее событие
+
+Свежесть и задержку считают только скрипты, у данных которых есть время
+события (06, 07, 08); остальные их не измеряют. Дополнительно, без
+порогов:
+
+  ruda_source_age_minutes     — минут с последнего изменения файла
+                                источника (самого «старого» из прочитанных)
+  ruda_chunk_seconds_max      — наибольшее время обработки одной части
+                                потока
+
+Результат пишется в reports/metrics/<скрипт>.json и <скрипт>.prom
+(текстовый формат Prometheus для textfile collector node_exporter).
+
+Замер — это два вызова perf_counter() и чтение /proc/self/status на
+границе этапа (десятки микросекунд); внутри этапов ничего не
+добавляется, поэтому метрики можно не отключать. Пока сборщик не
+запущен (start), current() возвращает пустой сборщик, и библиотечный
+код (validation_engine, profile_stats, db_profiling) работает как
+раньше.
+
+    metrics = start("01_ydata_profiling")
+    with metrics.stage("equipment"):
+        with metrics.stage("load") as st:
+            df = ...
+            st.add_rows(len(df))
+    metrics.write(METRICS_DIR)
+"""
+
+import json
+import os
+import resource
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from datasets import ETL_CONFIG
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+METRICS_DIR = SCRIPT_DIR.parent / "reports" / "metrics"
+
+STAGE_METRICS = [
+    ("ruda_stage_duration_seconds", "seconds", "Время этапа (сумма по вызовам), с"),
+    ("ruda_stage_calls", "calls", "Число вызовов этапа"),
+    ("ruda_stage_rows", "rows", "Строк обработано на этапе"),
+    ("ruda_stage_peak_rss_bytes", "peak_rss_bytes", "Пиковый RSS процесса к концу этапа, байт"),
+]
+
+
+def peak_rss_mb() -> float:
+    """Пиковый RSS процесса, МБ.
+
+    ru_maxrss наследуется через fork+exec, поэтому в Linux берётся VmHWM
+    из /proc.
+    """
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    # ru_maxrss в Linux — в килобайтах
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def load_thresholds(config_path: Path = ETL_CONFIG) -> dict:
+    """Метрики monitoring из etl_config.json: {имя: {"description", "threshold"}}.
+
+    Порог — поле alert_threshold* метрики (в секундах, минутах или штуках).
+    """
+    path = Path(config_path)
+    if not path.exists():
+        return {}
+    with open(path, encoding="utf-8") as f:
+        config = json.load(f)
+    result = {}
+    for metric in config.get("monitoring", {}).get("metrics", []):
+        threshold = next((v for k, v in metric.items() if k.startswith("alert_threshold")), None)
+        result[metric["name"]] = {"description": metric.get("description", ""), "threshold": threshold}
+    return result
+
+
+# ============================================================
+# Сборщик
+# ============================================================
+
+class Stage:
+    """Суммарные замеры одного этапа."""
+
+    __slots__ = ("path", "calls", "seconds", "rows", "peak_rss_mb")
+
+    def __init__(self, path: str):
+        self.path = path
+        self.calls = 0
+        self.seconds = 0.0
+        self.rows = 0
+        self.peak_rss_mb = 0.0
+
+    def add_rows(self, n: int):
+        self.rows += int(n)
+
+    def to_dict(self) -> dict:
+        return {"stage": self.path, "calls": self.calls, "seconds": round(self.seconds, 6),
+                "rows": self.rows, "peak_rss_mb": round(self.peak_rss_mb, 1)}
+
+
+class Metrics:
+    """Замеры этапов одного запуска скрипта."""
+
+    enabled = True
+
+    def __init__(self, script: str, thresholds: dict = None):
+        self.script = script
+        self.thresholds = thresholds or {}
+        self.started_at = time.time()
+        self.started = time.perf_counter()
+        self.stages = {}
+        self.rows_rejected = None
+        self.freshness_minutes = None
+        self.lag_seconds = None
+        self.source_age_minutes = None
+        self.chunk_seconds = None
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def _stack(self) -> list:
+        # у каждого потока своя вложенность (профиль по диапазонам — в пуле потоков)
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    @contextmanager
+    def stage(self, name: str, rows: int = None):
+        """Этап внутри текущего; у выданного Stage можно вызвать add_rows()."""
+        stack = self._stack()
+        stack.append(name)
+        path = "/".join(stack)
+        with self._lock:
+            record = self.stages.get(path) or self.stages.setdefault(path, Stage(path))
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            elapsed = time.perf_counter() - start
+            stack.pop()
+            rss = peak_rss_mb()
+            with self._lock:
+                record.calls += 1
+                record.seconds += elapsed
+                if rows is not None:
+                    record.rows += int(rows)
+                record.peak_rss_mb = max(record.peak_rss_mb, rss)
+
+    def chunks(self, iterable, name: str = "load"):
+        """Итератор частей потока с замером чтения (этап name) и обработки.
+
+        Чтение каждой части суммируется в этап name, а время между выдачей
+        части и запросом следующей (её обработка) — в ruda_chunk_seconds_max.
+        """
+        iterator = iter(iterable)
+        while True:
+            with self.stage(name) as record:
+                try:
+                    chunk = next(iterator)
+                except StopIteration:
+                    record.calls -= 1
+                    return
+                record.add_rows(len(chunk))
+            ready = time.perf_counter()
+            yield chunk
+            elapsed = time.perf_counter() - ready
+            with self._lock:
+                self.chunk_seconds = max(self.chunk_seconds or 0.0, elapsed)
+
+    def observe_events(self, latest):
+        """Задержка потока: сейчас минус самое позднее событие обработанного пакета."""
+        seconds = max(time.time() - _epoch(latest), 0.0)
+        with self._lock:
+            self.lag_seconds = max(self.lag_seconds or 0.0, seconds)
+
+    def observe_file(self, path: Path):
+        """Возраст файла источника: минуты с последнего изменения."""
+        minutes = max(time.time() - os.stat(path).st_mtime, 0.0) / 60
+        self.source_age_minutes = max(self.source_age_minutes or 0.0, minutes)
+
+    def observe_freshness(self, latest):
+        """Свежесть данных по самой поздней метке времени (watermark) источника."""
+        minutes = max(time.time() - _epoch(latest), 0.0) / 60
+        self.freshness_minutes = max(self.freshness_minutes or 0.0, minutes)
+
+    def reject(self, n_rows: int):
+        """Строки, отклонённые проверками (карантин)."""
+        self.rows_rejected = (self.rows_rejected or 0) + int(n_rows)
+
+    # --- результат ---
+
+    def etl_metrics(self) -> dict:
+        """Метрики monitoring с порогами: {имя: {"value", "threshold", "alert"}}."""
+        values = {
+            "etl_load_duration_seconds": time.perf_counter() - self.started,
+            "etl_rows_rejected_count": self.rows_rejected,
+            "etl_data_freshness_minutes": self.freshness_minutes,
+            "streaming_lag_seconds": self.lag_seconds,
+            "ruda_source_age_minutes": self.source_age_minutes,
+            "ruda_chunk_seconds_max": self.chunk_seconds,
+        }
+        result = {}
+        for name, value in values.items():
+            threshold = self.thresholds.get(name, {}).get("threshold")
+            result[name] = {
+                "value": None if value is None else round(value, 3),
+                "threshold": threshold,
+                # метрика, которую запуск не наблюдал (None), не тревожит
+                "alert": value is not None and threshold is not None and value > threshold,
+            }
+        return result
+
+    def report(self) -> dict:
+        metrics = self.etl_metrics()
+        return {
+            "script": self.script,
+            "started_at": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(self.started_at)),
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+            "stages": [s.to_dict() for s in self.stages.values()],
+            "metrics": metrics,
+            "alerts": [name for name, m in metrics.items() if m["alert"]],
+        }
+
+    def write(self, out_dir: Path = METRICS_DIR) -> dict:
+        """Пишет <скрипт>.json и <скрипт>.prom; возвращает отчёт."""
+        out_dir = Path(out_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        report = self.report()
+        _write_atomic(out_dir / f"{self.script}.json",
+                      json.dumps(report, ensure_ascii=False, indent=2))
+        _write_atomic(out_dir / f"{self.script}.prom", prometheus_text(report, self.thresholds))
+        return report
+
+
+class NullMetrics(Metrics):
+    """Сборщик, который ничего не замеряет (метрики не запущены)."""
+
+    enabled = False
+
+    def __init__(self):
+        super().__init__("")
+
+    @contextmanager
+    def stage(self, name: str, rows: int = None):
+        yield Stage(name)
+
+    def chunks(self, iterable, name: str = "load"):
+        return iter(iterable)
+
+    def observe_events(self, latest):
+        pass
+
+    def observe_file(self, path: Path):
+        pass
+
+    def observe_freshness(self, latest):
+        pass
+
+    def reject(self, n_rows: int):
+        pass
+
+
+def _epoch(value) -> float:
+    """Секунды epoch из числа, datetime или pd.Timestamp (без зоны — местное время)."""
+    if isinstance(value, (int, float)):
+        return float(value)
+    if value.tzinfo is not None:
+        return value.timestamp()
+    return time.mktime(value.timetuple()) + value.microsecond / 1e6
+
+
+_NULL = NullMetrics()
+_current = _NULL
+
+
+def start(script: str, config_path: Path = ETL_CONFIG, enabled: bool = True) -> Metrics:
+    """Создаёт сборщик запуска с порогами из etl_config.json и делает его текущим."""
+    global _current
+    _current = Metrics(script, load_thresholds(config_path)) if enabled else _NULL
+    return _current
+
+
+def current() -> Metrics:
+    """Текущий сборщик (пустой, если start() не вызывался)."""
+    return _current
+
+
+# ============================================================
+# Вывод
+# ============================================================
+
+def _label(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def _sample(name: str, labels: dict, value) -> str:
+    rendered = ",".join(f'{k}="{_label(v)}"' for k, v in labels.items())
+    return f"{name}{{{rendered}}} {value:.6g}" if isinstance(value, float) else f"{name}{{{rendered}}} {value}"
+
+
+def prometheus_text(report: dict, thresholds: dict = None) -> str:
+    """Отчёт в текстовом формате Prometheus (textfile collector)."""
+    thresholds = thresholds or {}
+    script = {"script": report["script"]}
+    lines = []
+    for name, key, help_text in STAGE_METRICS:
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge"]
+        for stage in report["stages"]:
+            value = stage["peak_rss_mb"] * 1024 ** 2 if key == "peak_rss_bytes" else stage[key]
+            lines.append(_sample(name, {**script, "stage": stage["stage"]}, value))
+
+    for name, metric in report["metrics"].items():
+        if metric["value"] is None:
+            continue
+        help_text = thresholds.get(name, {}).get("description") or name
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} gauge",
+                  _sample(name, script, float(metric["value"]))]
+
+    lines += ["# HELP etl_metric_threshold Порог метрики из etl_config.json",
+              "# TYPE etl_metric_threshold gauge"]
+    lines += [_sample("etl_metric_threshold", {**script, "metric": name}, float(m["threshold"]))
+              for name, m in report["metrics"].items() if m["threshold"] is not None]
+    lines += ["# HELP etl_metric_alert 1, если метрика превысила порог",
+              "# TYPE etl_metric_alert gauge"]
+    lines += [_sample("etl_metric_alert", {**script, "metric": name}, int(m["alert"]))
+              for name, m in report["metrics"].items()]
+    return "\n".join(lines) + "\n"
+
+
+def _write_atomic(path: Path, text: str):
+    # textfile collector не должен увидеть наполовину записанный файл
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    tmp.write_text(text, encoding="utf-8")
+    tmp.replace(path)
+
+
+def print_metrics(report: dict, top: int = 8):
+    """Самые долгие этапы и метрики monitoring с порогами."""
+    # собственное время этапа — без вложенных, чтобы родитель не дублировал детей
+    own = {s["stage"]: s["seconds"] for s in report["stages"]}
+    for stage in report["stages"]:
+        parent = stage["stage"].rpartition("/")[0]
+        if parent in own:
+            own[parent] -= stage["seconds"]
+    stages = sorted(report["stages"], key=lambda s: -own[s["stage"]])[:top]
+    if stages:
+        print(f"\n  Этапы (топ-{len(stages)} по собственному времени):")
+        for s in stages:
+            rows = f", {s['rows']} строк" if s["rows"] else ""
+            calls = f" ×{s['calls']}" if s["calls"] > 1 else ""
+            print(f"    {s['stage']:<48} {max(own[s['stage']], 0.0):>8.3f} с{calls}{rows}, "
+                  f"RSS {s['peak_rss_mb']:.0f} МБ")
+    print("\n  Метрики запуска (пороги — etl_config.monitoring):")
+    for name, m in report["metrics"].items():
+        if m["value"] is None:
+            print(f"    – {name}: не измерялась")
+            continue
+        limit = f" (порог {m['threshold']})" if m["threshold"] is not None else ""
+        mark = "✗" if m["alert"] else ("✓" if m["threshold"] is not None else "·")
+        print(f"    {mark} {name}: {m['value']:g}{limit}")
@@ -0,0 +1,248 @@
+"""
+Практикум по анализу и моделированию данных
+Модуль 2 (доп.): Постоянный индекс ключей для инкрементальной валидации
+Предприятие: «Руда+» — добыча железной руды
+
+expect_column_values_to_be_unique видит только текущий пакет. Чтобы
+ключ (production_id, event_id, reading_id) был уникален по всей
+истории, ключи прошлых запусков хранятся на диске:
+
+  bloom.bin           фильтр Блума (np.memmap): «ключа точно нет» без
+                      чтения сегментов; ложные срабатывания ~1%
+  seg_<N>.*.npy       отсортированные сегменты: 64-битный хеш ключа,
+                      сам ключ (bytes фиксированной ширины) и хеш строки.
+                      Открываются через mmap — с диска читаются только
+                      страницы, куда попал бинарный поиск
+  meta.json           список сегментов, ёмкость фильтра, число ключей
+
+Проверка пакета: хеши → фильтр Блума → для «возможно есть» бинарный
+поиск (np.searchsorted) в сегментах и точное сравнение самого ключа,
+так что ни ложные срабатывания фильтра, ни коллизии хешей не дают
+ложных дубликатов. Стоимость зависит от размера пакета и числа
+сегментов, а не от числа строк в истории.
+
+Каждый пакет добавляет сегмент уровня 0. Когда на уровне набирается
+FANOUT сегментов, они сливаются в один сегмент следующего уровня
+(как в LSM-дереве): сегментов — O(log n), каждый ключ переписывается
+O(log n) раз. Фильтр Блума пересобирается (ёмкость ×4), когда ключей
+становится больше ёмкости.
+
+meta.json пишется последним и атомарно: после сбоя посреди записи
+остаются лишние файлы сегментов и лишние биты фильтра — они дают только
+ложные срабатывания фильтра, которые отсекает точная проверка.
+"""
+
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+FANOUT = 8
+BITS_PER_KEY = 10
+N_HASHES = 7
+MIN_CAPACITY = 1_000_000
+
+
+def key_hashes(keys) -> np.ndarray:
+    """64-битные хеши ключей (одинаковые между запусками)."""
+    return pd.util.hash_array(np.asarray(keys, dtype=object)).astype(np.uint64)
+
+
+def key_bytes(keys) -> np.ndarray:
+    return np.char.encode(np.asarray(keys, dtype=str), "utf-8")
+
+
+def row_hashes(df: pd.DataFrame) -> np.ndarray:
+    """Хеш содержимого строк — отличает повторную доставку от дубликата.
+
+    Числа приводятся к float64, чтобы ширина типа (int8/int16 после
+    apply_schema) не меняла хеш между запусками.
+    """
+    canonical = {}
+    for column, series in df.items():
+        if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+            canonical[column] = series.astype("float64")
+        elif isinstance(series.dtype, pd.CategoricalDtype):
+            canonical[column] = series.astype(object)
+        else:
+            canonical[column] = series
+    return pd.util.hash_pandas_object(pd.DataFrame(canonical), index=False).to_numpy()
+
+
+# ============================================================
+# Фильтр Блума
+# ============================================================
+
+class BloomFilter:
+    """Битовый массив в файле; k позиций из одного 64-битного хеша."""
+
+    def __init__(self, path: Path, n_bits: int, n_hashes: int = N_HASHES):
+        self.path = Path(path)
+        self.n_bits = int(n_bits)
+        self.n_hashes = n_hashes
+        n_bytes = (self.n_bits + 7) // 8
+        # новый (или другого размера) файл — фильтр пуст, его нужно заполнить
+        self.created = not (self.path.exists() and self.path.stat().st_size == n_bytes)
+        self.bits = np.memmap(self.path, dtype=np.uint8, mode="w+" if self.created else "r+",
+                              shape=(n_bytes,))
+
+    def _positions(self, hashes: np.ndarray) -> np.ndarray:
+        # двойное хеширование: h1 + i·h2 (Кирш — Митценмахер)
+        h1 = hashes & np.uint64(0xFFFFFFFF)
+        h2 = (hashes >> np.uint64(32)) | np.uint64(1)
+        i = np.arange(self.n_hashes, dtype=np.uint64)
+        return (h1[:, None] + i[None, :] * h2[:, None]) % np.uint64(self.n_bits)
+
+    def add(self, hashes: np.ndarray):
+        positions = np.unique(self._positions(hashes).ravel())
+        np.bitwise_or.at(self.bits, positions >> np.uint64(3),
+                         (np.uint8(1) << (positions & np.uint64(7)).astype(np.uint8)))
+
+    def might_contain(self, hashes: np.ndarray) -> np.ndarray:
+        positions = self._positions(hashes)
+        hit = self.bits[positions >> np.uint64(3)] >> (positions & np.uint64(7)).astype(np.uint8) & 1
+        return hit.all(axis=1)
+
+    def flush(self):
+        self.bits.flush()
+
+
+# ============================================================
+# Индекс ключей
+# ============================================================
+
+class SegmentKeyIndex:
+    """Ключи одной колонки по всей истории: Блум + отсортированные сегменты."""
+
+    def __init__(self, directory: Path):
+        self.dir = Path(directory)
+        self.dir.mkdir(parents=True, exist_ok=True)
+        meta_path = self.dir / "meta.json"
+        if meta_path.exists():
+            self.meta = json.loads(meta_path.read_text(encoding="utf-8"))
+        else:
+            self.meta = {"n_keys": 0, "capacity": MIN_CAPACITY, "next_id": 0, "segments": []}
+        self._segments = {}
+        self.bloom = self._open_bloom()
+
+    def __len__(self):
+        return self.meta["n_keys"]
+
+    # --- хранение ---
+
+    def _open_bloom(self) -> BloomFilter:
+        bloom = BloomFilter(self.dir / "bloom.bin", self.meta["capacity"] * BITS_PER_KEY)
+        if bloom.created:
+            for segment in self.meta["segments"]:
+                bloom.add(np.asarray(self._segment(segment["name"])[0]))
+        return bloom
+
+    def _segment(self, name: str) -> tuple:
+        if name not in self._segments:
+            self._segments[name] = tuple(
+                np.load(self.dir / f"{name}.{part}.npy", mmap_mode="r") for part in ("hash", "key", "row"))
+        return self._segments[name]
+
+    def _write_segment(self, hashes, keys, rows, level: int) -> dict:
+        name = f"seg_{self.meta['next_id']:06d}"
+        self.meta["next_id"] += 1
+        for part, values in (("hash", hashes), ("key", keys), ("row", rows)):
+            np.save(self.dir / f"{name}.{part}.npy", values)
+        return {"name": name, "level": level, "size": int(len(hashes))}
+
+    def _save_meta(self):
+        self.bloom.flush()
+        tmp = self.dir / "meta.json.tmp"
+        tmp.write_text(json.dumps(self.meta, indent=2), encoding="utf-8")
+        os.replace(tmp, self.dir / "meta.json")
+
+    def _drop_segment(self, name: str):
+        self._segments.pop(name, None)
+        for part in ("hash", "key", "row"):
+            (self.dir / f"{name}.{part}.npy").unlink(missing_ok=True)
+
+    # --- поиск ---
+
+    def lookup(self, keys) -> tuple:
+        """(найден ли ключ в истории, хеш строки, под которым он сохранён)."""
+        hashes = key_hashes(keys)
+        found = np.zeros(len(hashes), dtype=bool)
+        stored_rows = np.zeros(len(hashes), dtype=np.uint64)
+        if not self.meta["n_keys"] or not len(hashes):
+            return found, stored_rows
+        candidates = np.flatnonzero(self.bloom.might_contain(hashes))
+        if not len(candidates):
+            return found, stored_rows
+        wanted = key_bytes(np.asarray(keys, dtype=object)[candidates])
+        for segment in self.meta["segments"]:
+            seg_hash, seg_key, seg_row = self._segment(segment["name"])
+            h = hashes[candidates]
+            left = np.searchsorted(seg_hash, h, side="left")
+            right = np.searchsorted(seg_hash, h, side="right")
+            # при коллизии хешей кандидатов несколько — сравниваются все
+            for offset in range(int((right - left).max(initial=0))):
+                probe = left + offset
+                valid = probe < right
+                match = valid.copy()
+                match[valid] = seg_key[probe[valid]] == wanted[valid]
+                found[candidates[match]] = True
+                stored_rows[candidates[match]] = seg_row[probe[match]]
+        return found, stored_rows
+
+    # --- добавление ---
+
+    def add(self, keys, rows: np.ndarray):
+        """Добавляет новые ключи (уже проверенные lookup) одним сегментом."""
+        if not len(keys):
+            return
+        hashes = key_hashes(keys)
+        order = np.argsort(hashes, kind="stable")
+        keys_b = key_bytes(np.asarray(keys, dtype=object)[order])
+        self.meta["segments"].append(
+            self._write_segment(hashes[order], keys_b, np.asarray(rows, dtype=np.uint64)[order], 0))
+        self.meta["n_keys"] += len(hashes)
+        if self.meta["n_keys"] > self.meta["capacity"]:
+            self._rebuild_bloom()
+        else:
+            self.bloom.add(hashes)
+        merged = self._compact()
+        self._save_meta()
+        # слитые сегменты удаляются только после записи meta.json
+        for name in merged:
+            self._drop_segment(name)
+
+    def _compact(self) -> list:
+        """Сливает уровни, где FANOUT сегментов; возвращает имена слитых."""
+        level, dropped = 0, []
+        while True:
+            same = [s for s in self.meta["segments"] if s["level"] == level]
+            if len(same) < FANOUT:
+                return dropped
+            parts = [self._segment(s["name"]) for s in same]
+            hashes = np.concatenate([p[0] for p in parts])
+            order = np.argsort(hashes, kind="stable")
+            width = max(p[1].dtype.itemsize for p in parts)
+            keys = np.concatenate([p[1].astype(f"S{width}") for p in parts])[order]
+            rows = np.concatenate([p[2] for p in parts])[order]
+            merged = self._write_segment(hashes[order], keys, rows, level + 1)
+            names = {s["name"] for s in same}
+            self.meta["segments"] = [s for s in self.meta["segments"] if s["name"] not in names] + [merged]
+            dropped += sorted(names)
+            level += 1
+
+    def _rebuild_bloom(self):
+        while self.meta["capacity"] < self.meta["n_keys"]:
+            self.meta["capacity"] *= 4
+        self.bloom = None
+        (self.dir / "bloom.bin").unlink(missing_ok=True)
+        self.bloom = self._open_bloom()
+
+    def stats(self) -> dict:
+        return {
+            "n_keys": self.meta["n_keys"],
+            "segments": len(self.meta["segments"]),
+            "bloom_mb": round(self.meta["capacity"] * BITS_PER_KEY / 8 / 1024 ** 2, 2),
+            "disk_mb": round(sum(p.stat().st_size for p in self.dir.iterdir()) / 1024 ** 2, 2),
+        }
@@ -0,0 +1,200 @@
+"""
+Практикум по анализу и моделированию данных
+Модуль 2 (доп.): Кэш профилей по содержимому файлов
+Предприятие: «Руда+» — добыча железной руды
+
+ProfileCache хранит отпечаток каждого профилированного CSV и (в потоковом
+режиме) сохранённую статистику TableStats. При следующем запуске:
+
+  - файл не менялся            → профилирование пропускается ("hit")
+  - к файлу только дописаны    → профилируется только «хвост» — строки
+    строки (append-only)          после прежнего конца файла, — и его
+                                  статистика сливается с сохранённой
+                                  ("append")
+  - файл изменён иначе         → полный пересчёт ("miss")
+
+Отпечаток — BLAKE2b от содержимого файла. За тот же проход считается
+хеш первых old_size байт: если он совпал с прежним отпечатком, файл
+изменился только дописыванием. Если размер и mtime не менялись, файл
+не читается вовсе.
+
+Статистика хранится по адресу содержимого (objects/<хеш>.json.gz),
+индекс — в index.json. Старые записи удаляются по возрасту и при
+превышении общего размера кэша (сначала давно не использованные).
+"""
+
+import gzip
+import hashlib
+import json
+import os
+import time
+from pathlib import Path
+
+from profile_stats import TableStats
+
+CACHE_VERSION = 1
+DEFAULT_MAX_BYTES = 512 * 1024 ** 2
+DEFAULT_MAX_AGE_DAYS = 30
+READ_BLOCK = 1024 ** 2
+
+
+def fingerprint(path: Path, prefix_size: int = None) -> tuple:
+    """(хеш всего файла, хеш первых prefix_size байт или None) за один проход."""
+    digest = hashlib.blake2b(digest_size=20)
+    prefix = None
+    done = 0
+    with open(path, "rb") as f:
+        while True:
+            block = f.read(READ_BLOCK)
+            if not block:
+                break
+            if prefix_size is not None and prefix is None and done + len(block) >= prefix_size:
+                cut = prefix_size - done
+                digest.update(block[:cut])
+                prefix = digest.hexdigest()
+                digest.update(block[cut:])
+            else:
+                digest.update(block)
+            done += len(block)
+    if prefix_size == 0:
+        prefix = hashlib.blake2b(digest_size=20).hexdigest()
+    return digest.hexdigest(), prefix
+
+
+class ProfileCache:
+    """Кэш отпечатков и потоковых профилей в каталоге root."""
+
+    def __init__(self, root: Path, max_bytes: int = DEFAULT_MAX_BYTES,
+                 max_age_days: float = DEFAULT_MAX_AGE_DAYS):
+        self.root = Path(root)
+        self.objects = self.root / "objects"
+        self.objects.mkdir(parents=True, exist_ok=True)
+        self.index_path = self.root / "index.json"
+        self.max_bytes = max_bytes
+        self.max_age = max_age_days * 86400
+        self.index = {"version": CACHE_VERSION, "files": {}, "objects": {}}
+        if self.index_path.exists():
+            index = json.loads(self.index_path.read_text(encoding="utf-8"))
+            if index.get("version") == CACHE_VERSION:
+                self.index = index
+
+    @staticmethod
+    def key(path: Path, mode: str) -> str:
+        """Ключ записи: режим отчёта + путь (отчёты YData и потоковые различаются)."""
+        return f"{mode}:{Path(path).resolve()}"
+
+    def lookup(self, path: Path, mode: str) -> dict:
+        """Сравнивает файл с записью кэша.
+
+        Возвращает {"status": "hit"|"append"|"miss", "entry", "digest",
+        "size", "mtime"}; для "append" в entry лежит прежняя запись —
+        хвост начинается с entry["size"].
+        """
+        stat = Path(path).stat()
+        entry = self.index["files"].get(self.key(path, mode))
+        result = {"status": "miss", "entry": entry, "digest": None,
+                  "size": stat.st_size, "mtime": stat.st_mtime}
+        if entry is None:
+            result["digest"], _ = fingerprint(path)
+            return result
+
+        if entry["size"] == stat.st_size and entry["mtime"] == stat.st_mtime:
+            result.update(status="hit", digest=entry["digest"])
+            return result
+
+        appended = entry["size"] < stat.st_size and entry["ends_with_newline"]
+        digest, prefix = fingerprint(path, entry["size"] if appended else None)
+        result["digest"] = digest
+        if digest == entry["digest"]:
+            # содержимое то же, изменился только mtime — запоминаем новый,
+            # чтобы следующие запуски не хешировали файл заново
+            result["status"] = "hit"
+            entry.update(size=stat.st_size, mtime=stat.st_mtime)
+            self.save()
+        elif appended and prefix == entry["digest"]:
+            result["status"] = "append"
+        return result
+
+    def load_stats(self, digest: str) -> TableStats:
+        path = self.objects / f"{digest}.json.gz"
+        if digest not in self.index["objects"] or not path.exists():
+            return None
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            stats = TableStats.from_state(json.load(f))
+        self.index["objects"][digest]["accessed"] = time.time()
+        return stats
+
+    def store(self, path: Path, mode: str, lookup: dict, stats: TableStats = None):
+        """Записывает отпечаток файла (и статистику для потокового режима)."""
+        now = time.time()
+        digest = lookup["digest"]
+        with open(path, "rb") as f:
+            f.seek(max(lookup["size"] - 1, 0))
+            ends_with_newline = lookup["size"] == 0 or f.read(1) == b"\n"
+
+        previous = self.index["files"].get(self.key(path, mode))
+        self.index["files"][self.key(path, mode)] = {
+            "digest": digest,
+            "size": lookup["size"],
+            "mtime": lookup["mtime"],
+            "ends_with_newline": ends_with_newline,
+            "n_rows": stats.n_rows if stats is not None else None,
+            "accessed": now,
+        }
+        if previous and previous["digest"] != digest:
+            self._release(previous["digest"])
+
+        if stats is not None:
+            target = self.objects / f"{digest}.json.gz"
+            tmp = target.with_suffix(".tmp")
+            with gzip.open(tmp, "wt", encoding="utf-8") as f:
+                json.dump(stats.to_state(), f)
+            os.replace(tmp, target)
+            self.index["objects"][digest] = {"bytes": target.stat().st_size,
+                                             "created": now, "accessed": now}
+        self.save()
+
+    def _release(self, digest: str):
+        """Удаляет объект, на который больше не ссылается ни один файл."""
+        if any(e["digest"] == digest for e in self.index["files"].values()):
+            return
+        self.index["objects"].pop(digest, None)
+        (self.objects / f"{digest}.json.gz").unlink(missing_ok=True)
+
+    def touch(self, path: Path, mode: str):
+        """Отмечает использование записи (для вытеснения по возрасту)."""
+        entry = self.index["files"].get(self.key(path, mode))
+        if entry is None:
+            return
+        entry["accessed"] = time.time()
+        if entry["digest"] in self.index["objects"]:
+            self.index["objects"][entry["digest"]]["accessed"] = entry["accessed"]
+        self.save()
+
+    def evict(self) -> int:
+        """Удаляет записи старше max_age и давно не использованные сверх max_bytes."""
+        now = time.time()
+        objects = self.index["objects"]
+        expired = [d for d, o in objects.items() if now - o["accessed"] > self.max_age]
+        total = sum(o["bytes"] for d, o in objects.items() if d not in expired)
+        for digest, obj in sorted(objects.items(), key=lambda item: item[1]["accessed"]):
+            if total <= self.max_bytes:
+                break
+            if digest not in expired:
+                expired.append(digest)
+                total -= obj["bytes"]
+
+        for digest in expired:
+            objects.pop(digest, None)
+            (self.objects / f"{digest}.json.gz").unlink(missing_ok=True)
+        files = self.index["files"]
+        for key in [k for k, e in files.items()
+                    if e["digest"] in expired or now - e["accessed"] > self.max_age]:
+            del files[key]
+        self.save()
+        return len(expired)
+
+    def save(self):
+        tmp = self.index_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(self.index, ensure_ascii=False, indent=1), encoding="utf-8")
+        os.replace(tmp, self.index_path)
@@ -0,0 +1,315 @@
+"""
+Практикум по анализу и моделированию данных
+Модуль 2 (доп.): HTML-отчёт по сохранённой статистике профиля
+Предприятие: «Руда+» — добыча железной руды
+
+Рендерит отчёт из словаря `TableStats.summary()` (см. profile_stats.py).
+Разделы повторяют отчёт YData-Profiling: Overview, Alerts, Variables,
+Correlations, Missing values. render_group_comparison_html() строит
+сравнение N групп по `GroupedStats.summary()`, render_timeseries_html() —
+профиль рядов телеметрии (timeseries_profile.py). Отчёт самодостаточный — без JS и внешних
+ресурсов, графики рисуются встроенным SVG.
+"""
+
+from html import escape
+
+STYLE = """
+body { font-family: -apple-system, Segoe UI, Roboto, sans-serif; margin: 0; color: #222; }
+header { background: #337ab7; color: #fff; padding: 16px 32px; }
+section { padding: 8px 32px; border-bottom: 1px solid #eee; }
+h2 { color: #337ab7; }
+table { border-collapse: collapse; margin: 4px 0 12px; font-size: 13px; }
+td, th { padding: 3px 10px; border-bottom: 1px solid #eee; text-align: left; }
+th { background: #f7f7f7; }
+.var { display: flex; gap: 32px; flex-wrap: wrap; border-top: 1px solid #ddd; padding: 8px 0; }
+.type { color: #888; font-size: 12px; }
+.alert { color: #a94442; }
+.note { color: #888; font-size: 12px; }
+"""
+
+
+def _fmt(value) -> str:
+    if value is None:
+        return "—"
+    if isinstance(value, float):
+        if abs(value) >= 1e6 or (value != 0 and abs(value) < 1e-3):
+            return f"{value:.4g}"
+        return f"{value:,.4f}".rstrip("0").rstrip(".").replace(",", " ")
+    if isinstance(value, int):
+        return f"{value:,}".replace(",", " ")
+    return escape(str(value))
+
+
+def _pct(value) -> str:
+    return "—" if value is None else f"{value:.1%}"
+
+
+def _table(rows) -> str:
+    body = "".join(f"<tr><th>{escape(str(k))}</th><td>{v}</td></tr>" for k, v in rows)
+    return f"<table>{body}</table>"
+
+
+def svg_histogram(counts: list, width: int = 360, height: int = 120) -> str:
+    """Гистограмма в виде встроенного SVG."""
+    if not counts:
+        return ""
+    peak = max(counts) or 1
+    bar = width / len(counts)
+    rects = "".join(
+        f'<rect x="{i * bar:.1f}" y="{height - c / peak * height:.1f}" '
+        f'width="{max(bar - 1, 1):.1f}" height="{c / peak * height:.1f}" fill="#337ab7"/>'
+        for i, c in enumerate(counts)
+    )
+    return f'<svg width="{width}" height="{height}" viewBox="0 0 {width} {height}">{rects}</svg>'
+
+
+def svg_line(t: list, v: list, width: int = 480, height: int = 120) -> str:
+    """Линия ряда (уже прореженного) в виде встроенного SVG."""
+    if len(t) < 2:
+        return ""
+    t0, t1 = min(t), max(t)
+    v0, v1 = min(v), max(v)
+    dt, dv = (t1 - t0) or 1, (v1 - v0) or 1
+    points = " ".join(f"{(x - t0) / dt * width:.1f},{height - (y - v0) / dv * height:.1f}" for x, y in zip(t, v))
+    return (f'<svg width="{width}" height="{height}" viewBox="0 0 {width} {height}">'
+            f'<polyline points="{points}" fill="none" stroke="#337ab7" stroke-width="1"/></svg>'
+            f'<div class="note">{_fmt(v0)} … {_fmt(v1)}, точек на графике: {len(t)}</div>')
+
+
+def svg_bars(items: list, width: int = 360) -> str:
+    """Горизонтальные столбики для top-k значений."""
+    if not items:
+        return ""
+    peak = max(count for _, count in items) or 1
+    rows = "".join(
+        f"<tr><td>{escape(str(value))}</td><td>"
+        f'<svg width="{width // 2}" height="12"><rect width="{count / peak * width / 2:.1f}" '
+        f'height="12" fill="#337ab7"/></svg></td><td>{_fmt(count)}</td></tr>'
+        for value, count in items
+    )
+    return f"<table>{rows}</table>"
+
+
+def _variable(v: dict) -> str:
+    rows = [
+        ("Distinct", _fmt(v["n_distinct"]) + ("" if v.get("distinct_is_exact", True) else " ≈")),
+        ("Distinct (%)", _pct(v["p_distinct"])),
+        ("Missing", _fmt(v["n_missing"])),
+        ("Missing (%)", _pct(v["p_missing"])),
+    ]
+    if v.get("n_invalid"):
+        rows.append(("Invalid", _fmt(v["n_invalid"])))
+    for key in ("mean", "std", "min", "max", "sum", "iqr", "cv", "n_zeros", "n_negative", "n_infinite"):
+        if key in v:
+            rows.append((key, _fmt(v[key])))
+    for key, value in v.get("quantiles", {}).items():
+        rows.append((key, _fmt(value)))
+    for key, ci in v.get("ci", {}).items():
+        fmt = _fmt if key == "mean" else _pct
+        rows.append((f"{key} ({ci['level']:.0%} ДИ)",
+                     f"{fmt(ci['estimate'])} [{fmt(ci['low'])}; {fmt(ci['high'])}]"))
+
+    chart = ""
+    if "histogram" in v:
+        chart = svg_histogram(v["histogram"]["counts"])
+        if not v.get("quantiles_are_exact", True):
+            chart += '<div class="note">гистограмма и квантили — оценка по скетчу</div>'
+    elif "value_counts_top" in v:
+        chart = svg_bars(v["value_counts_top"])
+
+    return (
+        f'<div class="var"><div><h3>{escape(str(v["name"]))} '
+        f'<span class="type">{escape(v["type"])}</span></h3>{_table(rows)}</div>'
+        f"<div>{chart}</div></div>"
+    )
+
+
+def _correlations(correlations: dict) -> str:
+    pearson = correlations.get("pearson")
+    if not pearson or not pearson["columns"]:
+        return '<p class="note">Нет числовых колонок</p>'
+    cols = pearson["columns"]
+    head = "".join(f"<th>{escape(c)}</th>" for c in cols)
+    body = ""
+    for name, row in zip(cols, pearson["matrix"]):
+        cells = "".join(
+            f'<td style="background: rgba(51,122,183,{abs(r) if r is not None else 0:.2f})">{_fmt(r)}</td>'
+            for r in row
+        )
+        body += f"<tr><th>{escape(name)}</th>{cells}</tr>"
+    return f"<table><tr><th></th>{head}</tr>{body}</table>"
+
+
+def render_profile_html(summary: dict) -> str:
+    """Возвращает HTML-отчёт по словарю статистик профиля."""
+    table = summary["table"]
+    overview = _table([
+        ("Number of variables", _fmt(table["n_var"])),
+        ("Number of observations", _fmt(table["n"])),
+        ("Missing cells", _fmt(table["n_cells_missing"])),
+        ("Missing cells (%)", _pct(table["p_cells_missing"])),
+        ("Chunks", _fmt(table.get("n_chunks"))),
+    ] + [(f"Type: {k}", _fmt(v)) for k, v in table["types"].items()])
+
+    alerts = "".join(
+        f'<li class="alert"><b>{escape(str(a["column"]))}</b> — {escape(a["alert"])}: {escape(a["text"])}</li>'
+        for a in summary["alerts"]
+    ) or "<li>Нет предупреждений</li>"
+
+    sampling = ""
+    if summary.get("sampling"):
+        info = summary["sampling"]
+        sampling = "<section><h2>Sampling</h2>" + _table([
+            ("Method", _fmt(info["method"])),
+            ("Population", _fmt(info["population"])),
+            ("Sample size", _fmt(info["sample_size"])),
+            ("Sampling fraction", _pct(info["sampling_fraction"])),
+            ("Strata", _fmt(", ".join(info["strata"]) or "—")),
+            ("Number of strata", _fmt(info["n_strata"])),
+        ]) + ('<p class="note">Распределения — по выборке без весов; '
+              "оценки с доверительными интервалами — с весами страт.</p></section>")
+
+    missing = svg_bars([[v["name"], v["n"] - v["n_missing"]] for v in summary["variables"]])
+
+    return f"""<!DOCTYPE html>
+<html lang="ru"><head><meta charset="utf-8"><title>{escape(summary["title"])}</title>
+<style>{STYLE}</style></head><body>
+<header><h1>{escape(summary["title"])}</h1></header>
+<section><h2>Overview</h2>{overview}<h3>Alerts</h3><ul>{alerts}</ul></section>
+{sampling}
+<section><h2>Variables</h2>{"".join(_variable(v) for v in summary["variables"])}</section>
+<section><h2>Correlations (Pearson)</h2>{_correlations(summary["correlations"])}</section>
+<section><h2>Missing values (count of non-missing)</h2>{missing}</section>
+</body></html>
+"""
+
+
+# ============================================================
+# Сравнение групп (GroupedStats.summary())
+# ============================================================
+
+def _group_rows(groups: list, columns: list, cells: list) -> str:
+    head = "".join(f"<th>{escape(c)}</th>" for c in columns)
+    body = "".join(
+        f"<tr><th>{escape(g)}</th>{''.join(f'<td>{c}</td>' for c in row)}</tr>"
+        for g, row in zip(groups, cells)
+    )
+    return f"<table><tr><th></th>{head}</tr>{body}</table>"
+
+
+def _group_variable(v: dict, groups: list) -> str:
+    missing = [_pct(p) for p in v["p_missing"]]
+    if "mean" in v:
+        columns = ["mean", "std", "min", "max", "Missing (%)"]
+        cells = [[_fmt(a), _fmt(b), _fmt(c), _fmt(d), m]
+                 for a, b, c, d, m in zip(v["mean"], v["std"], v["min"], v["max"], missing)]
+        chart = ""
+        if v["type"] == "Numeric":
+            chart = svg_bars([[g, m] for g, m in zip(groups, v["mean"]) if m is not None])
+        note = "разброс средних, σ"
+    else:
+        columns = list(v["values"]) + ["Distinct", "Missing (%)"]
+        cells = [[_pct(x) for x in shares] + [_fmt(d), m]
+                 for shares, d, m in zip(v["shares"], v["n_distinct"], missing)]
+        chart = ""
+        note = "наибольшая разница долей"
+    difference = v.get("difference")
+    header = f'{escape(v["name"])} <span class="type">{escape(v["type"])}'
+    if difference is not None:
+        header += f" · {note}: {_fmt(difference) if 'mean' in v else _pct(difference)}"
+    return (f'<div class="var"><div><h3>{header}</span></h3>'
+            f"{_group_rows(groups, columns, cells)}</div><div>{chart}</div></div>")
+
+
+def render_group_comparison_html(summary: dict) -> str:
+    """HTML-отчёт сравнения N групп по словарю GroupedStats.summary()."""
+    groups = summary["groups"]
+    sizes = _group_rows(groups, ["Rows"] + (["Weighted rows"] if summary["weighted_n"] else []),
+                        [[_fmt(n)] + ([_fmt(float(w))] if summary["weighted_n"] else [])
+                         for n, w in zip(summary["n"], summary["weighted_n"] or summary["n"])])
+    overview = _table([
+        ("Group by", _fmt(summary["key"])),
+        ("Number of groups", _fmt(len(groups))),
+        ("Number of observations", _fmt(summary["n_rows"])),
+        ("Chunks", _fmt(summary["n_chunks"])),
+    ])
+    differences = "".join(
+        f"<li><b>{escape(d['column'])}</b> — "
+        f"{_fmt(d['difference']) + ' σ' if d['type'] in ('Numeric', 'DateTime') else _pct(d['difference'])}</li>"
+        for d in summary["differences"][:10]
+    ) or "<li>Нет различий</li>"
+    variables = "".join(_group_variable(v, groups) for v in summary["variables"])
+    return f"""<!DOCTYPE html>
+<html lang="ru"><head><meta charset="utf-8"><title>{escape(summary["title"])}</title>
+<style>{STYLE}</style></head><body>
+<header><h1>{escape(summary["title"])}</h1></header>
+<section><h2>Overview</h2>{overview}{sizes}
+<h3>Наибольшие различия между группами</h3><ul>{differences}</ul>
+<p class="note">Числовые колонки: (max − min) средних групп в единицах внутригруппового σ.
+Категориальные: наибольшая разница доли одного значения между группами.</p></section>
+<section><h2>Variables</h2>{variables}</section>
+</body></html>
+"""
+
+
+# ============================================================
+# Ряды телеметрии (timeseries_profile.timeseries_summary())
+# ============================================================
+
+def _seconds(value) -> str:
+    if value is None:
+        return "—"
+    for unit, size in (("ч", 3600), ("мин", 60)):
+        if value >= size:
+            return f"{_fmt(value / size)} {unit}"
+    return f"{_fmt(value)} с"
+
+
+def _series(s: dict) -> str:
+    rows = [
+        ("Rows", _fmt(s["n"])),
+        ("Unit", _fmt(s.get("unit"))),
+        ("Period", f"{escape(s['start'])} — {escape(s['end'])}"),
+        ("Interval (median)", _seconds(s["interval_seconds"])),
+        ("Step min / max", f"{_seconds(s['min_step_seconds'])} / {_seconds(s['max_step_seconds'])}"),
+        ("Regular steps", _pct(s["p_regular"])),
+        ("Gaps", f"{_fmt(s['n_gaps'])} (самый длинный {_seconds(s['longest_gap_seconds'])})"),
+        ("Missing points (est.)", _fmt(s["missing_points"])),
+        ("Completeness", _pct(s["completeness"])),
+        ("Out of order", _fmt(s["out_of_order"])),
+        ("Duplicate timestamps", _fmt(s["duplicate_timestamps"])),
+        ("Conflicting duplicates", _fmt(s["conflicting_duplicates"])),
+        ("Missing values", _fmt(s["n_missing_values"])),
+        ("min / max", f"{_fmt(s['min'])} / {_fmt(s['max'])}"),
+        ("mean ± std", f"{_fmt(s['mean'])} ± {_fmt(s['std'])}"),
+    ]
+    if s.get("quality"):
+        rows.append(("Quality", ", ".join(f"{escape(k)}: {_fmt(v)}" for k, v in s["quality"].items())))
+    return (f'<div class="var"><div><h3>{escape(s["equipment_id"])} '
+            f'<span class="type">{escape(s["sensor_type"])}</span></h3>{_table(rows)}</div>'
+            f'<div>{svg_line(s["chart"]["t"], s["chart"]["v"])}</div></div>')
+
+
+def render_timeseries_html(summary: dict) -> str:
+    """HTML-отчёт по рядам equipment × sensor (timeseries_summary())."""
+    table = summary["table"]
+    overview = _table([
+        ("Number of observations", _fmt(table["n"])),
+        ("Number of series", _fmt(table["n_series"])),
+        ("Missing timestamps", _fmt(table["n_missing_time"])),
+        ("Period", f"{escape(str(table['start']))} — {escape(str(table['end']))}"),
+        ("Gap threshold", f"{_fmt(table['gap_factor'])} × медианный шаг"),
+        ("Chart points", f"{_fmt(table['chart_points'])} (LTTB, не больше {_fmt(table['max_points'])} на ряд)"),
+    ])
+    alerts = "".join(
+        f'<li class="alert"><b>{escape(a["series"])}</b> — {escape(a["alert"])}: {escape(a["text"])}</li>'
+        for a in summary["alerts"]
+    ) or "<li>Нет предупреждений</li>"
+    return f"""<!DOCTYPE html>
+<html lang="ru"><head><meta charset="utf-8"><title>{escape(summary["title"])}</title>
+<style>{STYLE}</style></head><body>
+<header><h1>{escape(summary["title"])}</h1></header>
+<section><h2>Overview</h2>{overview}<h3>Alerts</h3><ul>{alerts}</ul></section>
+<section><h2>Series</h2>{"".join(_series(s) for s in summary["series"])}</section>
+</body></html>
+"""
@@ -0,0 +1,942 @@
+"""
+Практикум по анализу и моделированию данных
+Модуль 2 (доп.): Сливаемая статистика для потокового профилирования
+Предприятие: «Руда+» — добыча железной руды
+
+Модуль считает статистики колонок по частям (chunk) так, что результаты
+двух частей можно слить (merge) без повторного чтения строк. Память
+зависит от размера части и параметров скетчей, а не от размера файла.
+
+  - HyperLogLog        — приближённое число уникальных значений
+  - QuantileSketch     — приближённые квантили и гистограмма (KLL)
+  - FrequentItems      — top-k категорий
+  - ColumnStats        — все статистики одной колонки
+  - CorrelationStats   — попарная корреляция Пирсона
+  - TableStats         — профиль таблицы целиком
+  - GroupedStats       — статистики каждой группы по значению ключа
+                         (смена, шахта, машина) за один groupby на часть
+"""
+
+import base64
+import zlib
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import current
+
+# --- Параметры по умолчанию ---
+DEFAULT_CHUNKSIZE = 200_000
+HLL_PRECISION = 14            # 2^14 регистров ≈ 0.8% ошибки
+EXACT_DISTINCT_LIMIT = 4096   # до этого порога уникальные считаются точно
+QUANTILE_K = 512              # ёмкость уровня KLL-скетча
+TOP_K_CAPACITY = 1000         # сколько категорий хранить в top-k
+HISTOGRAM_BINS = 50
+QUANTILES = [0.05, 0.25, 0.5, 0.75, 0.95]
+GROUP_TOP_VALUES = 8          # сколько категорий показывать в сравнении групп
+MISSING_GROUP = "(пусто)"
+KIND_SAMPLE_ROWS = 10_000     # по скольким строкам GroupedStats определяет типы колонок
+
+
+# ============================================================
+# Сериализация numpy-массивов в JSON-совместимый вид
+# ============================================================
+
+def _pack(arr: np.ndarray) -> dict:
+    arr = np.ascontiguousarray(arr)
+    return {"dtype": arr.dtype.str, "data": base64.b64encode(arr.tobytes()).decode("ascii")}
+
+
+def _unpack(state: dict) -> np.ndarray:
+    return np.frombuffer(base64.b64decode(state["data"]), dtype=np.dtype(state["dtype"])).copy()
+
+
+def column_seed(name: str) -> int:
+    """Детерминированный seed по имени колонки: одинаковый результат в любом процессе."""
+    return zlib.crc32(str(name).encode("utf-8"))
+
+
+def hash_values(series: pd.Series) -> np.ndarray:
+    """64-битные хэши значений (без индекса), векторизованно."""
+    return pd.util.hash_pandas_object(series, index=False).to_numpy(dtype=np.uint64)
+
+
+def _bit_length(x: np.ndarray) -> np.ndarray:
+    """Число значащих бит для каждого элемента uint64 (векторизованно)."""
+    x = x.copy()
+    n = np.zeros(x.shape, dtype=np.uint8)
+    for shift in (32, 16, 8, 4, 2, 1):
+        mask = x >= (np.uint64(1) << np.uint64(shift))
+        n[mask] += shift
+        x[mask] >>= np.uint64(shift)
+    n += (x > 0).astype(np.uint8)
+    return n
+
+
+# ============================================================
+# Скетчи
+# ============================================================
+
+class HyperLogLog:
+    """Приближённый подсчёт уникальных значений (с точным режимом для малых объёмов)."""
+
+    def __init__(self, p: int = HLL_PRECISION, exact_limit: int = EXACT_DISTINCT_LIMIT):
+        self.p = p
+        self.exact_limit = exact_limit
+        self.registers = np.zeros(1 << p, dtype=np.uint8)
+        self.exact = np.empty(0, dtype=np.uint64)
+        self.overflow = False
+
+    def update(self, hashes: np.ndarray):
+        if hashes.size == 0:
+            return
+        idx = (hashes >> np.uint64(64 - self.p)).astype(np.int64)
+        rest = hashes & np.uint64((1 << (64 - self.p)) - 1)
+        rho = (64 - self.p) - _bit_length(rest) + 1
+        np.maximum.at(self.registers, idx, rho.astype(np.uint8))
+
+        if not self.overflow:
+            self.exact = np.union1d(self.exact, np.unique(hashes))
+            if self.exact.size > self.exact_limit:
+                self.overflow = True
+                self.exact = np.empty(0, dtype=np.uint64)
+
+    def merge(self, other: "HyperLogLog") -> "HyperLogLog":
+        np.maximum(self.registers, other.registers, out=self.registers)
+        if self.overflow or other.overflow:
+            self.overflow = True
+            self.exact = np.empty(0, dtype=np.uint64)
+        else:
+            self.exact = np.union1d(self.exact, other.exact)
+            if self.exact.size > self.exact_limit:
+                self.overflow = True
+                self.exact = np.empty(0, dtype=np.uint64)
+        return self
+
+    def estimate(self) -> int:
+        if not self.overflow:
+            return int(self.exact.size)
+        m = float(self.registers.size)
+        alpha = 0.7213 / (1 + 1.079 / m)
+        raw = alpha * m * m / np.sum(np.power(2.0, -self.registers.astype(np.float64)))
+        zeros = int(np.count_nonzero(self.registers == 0))
+        if raw <= 2.5 * m and zeros:
+            return int(round(m * np.log(m / zeros)))
+        return int(round(raw))
+
+    def to_state(self) -> dict:
+        return {
+            "p": self.p,
+            "exact_limit": self.exact_limit,
+            "registers": _pack(self.registers),
+            "exact": _pack(self.exact),
+            "overflow": self.overflow,
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "HyperLogLog":
+        obj = cls(state["p"], state["exact_limit"])
+        obj.registers = _unpack(state["registers"])
+        obj.exact = _unpack(state["exact"])
+        obj.overflow = state["overflow"]
+        return obj
+
+
+class QuantileSketch:
+    """KLL-скетч: уровни отсортированных выборок с весом 2^h.
+
+    Пока данных не больше k, скетч точный (все значения на уровне 0).
+    """
+
+    def __init__(self, k: int = QUANTILE_K, seed: int = 0):
+        self.k = k
+        self.levels = [np.empty(0, dtype=np.float64)]
+        self._rng = np.random.default_rng(seed)
+
+    @property
+    def is_exact(self) -> bool:
+        return len(self.levels) == 1
+
+    def update(self, values: np.ndarray):
+        if values.size == 0:
+            return
+        self.levels[0] = np.concatenate([self.levels[0], values.astype(np.float64, copy=False)])
+        self._compress()
+
+    def merge(self, other: "QuantileSketch") -> "QuantileSketch":
+        for h, buf in enumerate(other.levels):
+            if h >= len(self.levels):
+                self.levels.append(np.empty(0, dtype=np.float64))
+            self.levels[h] = np.concatenate([self.levels[h], buf])
+        self._compress()
+        return self
+
+    def _compress(self):
+        h = 0
+        while h < len(self.levels):
+            buf = self.levels[h]
+            if buf.size > self.k:
+                buf = np.sort(buf)
+                keep = np.empty(0, dtype=np.float64)
+                if buf.size % 2:
+                    i = int(self._rng.integers(buf.size))
+                    keep = buf[i:i + 1]
+                    buf = np.delete(buf, i)
+                offset = int(self._rng.integers(2))
+                if h + 1 == len(self.levels):
+                    self.levels.append(np.empty(0, dtype=np.float64))
+                self.levels[h + 1] = np.concatenate([self.levels[h + 1], buf[offset::2]])
+                self.levels[h] = keep
+            h += 1
+
+    def weighted_items(self):
+        items = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(buf.size, float(1 << h)) for h, buf in enumerate(self.levels)])
+        order = np.argsort(items, kind="stable")
+        return items[order], weights[order]
+
+    def total_weight(self) -> float:
+        return float(sum(buf.size * (1 << h) for h, buf in enumerate(self.levels)))
+
+    def quantiles(self, qs) -> list:
+        items, weights = self.weighted_items()
+        if items.size == 0:
+            return [None for _ in qs]
+        if self.is_exact:
+            return [float(v) for v in np.quantile(items, qs)]
+        cum = np.cumsum(weights)
+        positions = (cum - weights / 2) / cum[-1]
+        return [float(v) for v in np.interp(qs, positions, items)]
+
+    def cdf(self, x: np.ndarray) -> np.ndarray:
+        """Доля веса со значениями <= x."""
+        items, weights = self.weighted_items()
+        if items.size == 0:
+            return np.zeros(np.shape(x))
+        cum = np.concatenate([[0.0], np.cumsum(weights)])
+        return cum[np.searchsorted(items, x, side="right")] / cum[-1]
+
+    def histogram(self, bins: int, value_range) -> tuple:
+        items, weights = self.weighted_items()
+        counts, edges = np.histogram(items, bins=bins, range=value_range, weights=weights)
+        return counts, edges
+
+    def to_state(self) -> dict:
+        return {
+            "k": self.k,
+            "levels": [_pack(buf) for buf in self.levels],
+            "rng": self._rng.bit_generator.state,
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "QuantileSketch":
+        obj = cls(state["k"])
+        obj.levels = [_unpack(buf) for buf in state["levels"]]
+        obj._rng.bit_generator.state = state["rng"]
+        return obj
+
+
+class FrequentItems:
+    """Top-k категорий: точные счётчики с ограниченной ёмкостью.
+
+    При переполнении хранятся `capacity` самых частых значений, а
+    наибольший отброшенный счётчик запоминается как граница ошибки.
+    """
+
+    def __init__(self, capacity: int = TOP_K_CAPACITY):
+        self.capacity = capacity
+        self.counts = pd.Series(dtype=np.int64)
+        self.error = 0
+
+    def update(self, values: pd.Series):
+        counts = values.value_counts()
+        if len(counts) > 2 * self.capacity:
+            self.error += int(counts.iloc[2 * self.capacity])
+            counts = counts.iloc[:2 * self.capacity]
+        self._add(counts)
+
+    def merge(self, other: "FrequentItems") -> "FrequentItems":
+        self._add(other.counts)
+        self.error += other.error
+        return self
+
+    def _add(self, counts: pd.Series):
+        if counts.empty:
+            return
+        if self.counts.empty:
+            merged = counts
+        else:
+            merged = self.counts.add(counts, fill_value=0)
+        merged = merged.astype(np.int64)
+        if len(merged) > 2 * self.capacity:
+            merged = merged.sort_values(ascending=False, kind="stable")
+            self.error += int(merged.iloc[self.capacity])
+            merged = merged.iloc[:self.capacity]
+        self.counts = merged
+
+    def top(self, n: int = 10) -> list:
+        top = self.counts.sort_values(ascending=False, kind="stable").head(n)
+        return [[str(value), int(count)] for value, count in top.items()]
+
+    def to_state(self) -> dict:
+        return {
+            "capacity": self.capacity,
+            "error": self.error,
+            "counts": [[str(value), int(count)] for value, count in self.counts.items()],
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "FrequentItems":
+        obj = cls(state["capacity"])
+        obj.error = state["error"]
+        if state["counts"]:
+            values, counts = zip(*state["counts"])
+            obj.counts = pd.Series(counts, index=list(values), dtype=np.int64)
+        return obj
+
+
+# ============================================================
+# Статистика колонки
+# ============================================================
+
+def infer_kind(series: pd.Series):
+    """Тип колонки по первой части с данными: Numeric / DateTime / Boolean / Categorical."""
+    non_null = series.dropna()
+    if non_null.empty:
+        return None
+    if pd.api.types.is_bool_dtype(series):
+        return "Boolean"
+    if pd.api.types.is_numeric_dtype(series):
+        return "Numeric"
+    if pd.api.types.is_datetime64_any_dtype(series):
+        return "DateTime"
+    sample = non_null.astype(str).head(1000)
+    if sample.str.match(r"^\d{4}-\d{2}-\d{2}").all():
+        parsed = pd.to_datetime(sample, errors="coerce", format="ISO8601")
+        if parsed.notna().all():
+            return "DateTime"
+    return "Categorical"
+
+
+class ColumnStats:
+    """Сливаемые статистики одной колонки."""
+
+    def __init__(self, name: str, kind: str = None):
+        self.name = name
+        self.kind = kind
+        self.n = 0
+        self.n_missing = 0
+        self.n_invalid = 0
+        self.distinct = HyperLogLog()
+        # Numeric / DateTime
+        self.count = 0
+        self.min = None
+        self.max = None
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.total = 0.0
+        self.n_zeros = 0
+        self.n_negative = 0
+        self.n_infinite = 0
+        self.sketch = QuantileSketch(seed=column_seed(name))
+        # Categorical / Boolean
+        self.freq = FrequentItems()
+
+    # --- обновление по части данных ---
+
+    def _coerce(self, series: pd.Series) -> pd.Series:
+        """Приводит часть к типу колонки; непарсящиеся значения считаются invalid."""
+        if self.kind == "Numeric" and not pd.api.types.is_numeric_dtype(series):
+            coerced = pd.to_numeric(series, errors="coerce")
+        elif self.kind == "DateTime" and not pd.api.types.is_datetime64_any_dtype(series):
+            coerced = pd.to_datetime(series, errors="coerce", format="ISO8601")
+        else:
+            return series
+        self.n_invalid += int((coerced.isna() & series.notna()).sum())
+        return coerced
+
+    def update(self, series: pd.Series):
+        self.n += len(series)
+        if self.kind is None:
+            self.kind = infer_kind(series)
+            if self.kind is None:
+                self.n_missing += len(series)
+                return
+
+        series = self._coerce(series)
+        mask = series.notna().to_numpy()
+        self.n_missing += int(len(series) - mask.sum())
+        values = series[mask]
+        if values.empty:
+            return
+
+        if self.kind in ("Categorical", "Boolean"):
+            values = values.astype(str)
+            self.freq.update(values)
+            self.distinct.update(hash_values(values))
+            self.count += len(values)
+            return
+
+        if self.kind == "DateTime":
+            arr = values.to_numpy(dtype="datetime64[ns]").astype(np.int64).astype(np.float64)
+        else:
+            arr = values.to_numpy(dtype=np.float64)
+            inf = np.isinf(arr)
+            if inf.any():
+                self.n_infinite += int(inf.sum())
+                arr = arr[~inf]
+            if arr.size == 0:
+                return
+        self.distinct.update(hash_values(pd.Series(arr)))
+        self._update_moments(arr)
+        self.sketch.update(arr)
+
+    def _update_moments(self, arr: np.ndarray):
+        n_b = arr.size
+        mean_b = float(arr.mean())
+        m2_b = float(((arr - mean_b) ** 2).sum())
+        self._merge_moments(n_b, mean_b, m2_b, float(arr.min()), float(arr.max()))
+        self.total += float(arr.sum())
+        self.n_zeros += int(np.count_nonzero(arr == 0))
+        self.n_negative += int(np.count_nonzero(arr < 0))
+
+    def _merge_moments(self, n_b, mean_b, m2_b, min_b, max_b):
+        n_a = self.count
+        n = n_a + n_b
+        delta = mean_b - self.mean
+        self.mean += delta * n_b / n
+        self.m2 += m2_b + delta * delta * n_a * n_b / n
+        self.count = n
+        self.min = min_b if self.min is None else min(self.min, min_b)
+        self.max = max_b if self.max is None else max(self.max, max_b)
+
+    # --- слияние ---
+
+    def merge(self, other: "ColumnStats") -> "ColumnStats":
+        if self.kind is None:
+            self.kind = other.kind
+        self.n += other.n
+        self.n_missing += other.n_missing
+        self.n_invalid += other.n_invalid
+        self.distinct.merge(other.distinct)
+        if self.kind in ("Categorical", "Boolean"):
+            self.freq.merge(other.freq)
+            self.count += other.count
+        elif other.count:
+            self._merge_moments(other.count, other.mean, other.m2, other.min, other.max)
+            self.total += other.total
+            self.n_zeros += other.n_zeros
+            self.n_negative += other.n_negative
+            self.n_infinite += other.n_infinite
+            self.sketch.merge(other.sketch)
+        return self
+
+    # --- итоговые значения ---
+
+    def _fmt(self, value):
+        if value is None:
+            return None
+        if self.kind == "DateTime":
+            return str(pd.Timestamp(int(value)))
+        return float(value)
+
+    def summary(self) -> dict:
+        n_distinct = self.distinct.estimate()
+        result = {
+            "name": self.name,
+            "type": self.kind or "Unsupported",
+            "n": self.n,
+            "count": self.count,
+            "n_missing": self.n_missing,
+            "p_missing": self.n_missing / self.n if self.n else 0.0,
+            "n_invalid": self.n_invalid,
+            "n_distinct": n_distinct,
+            "p_distinct": n_distinct / self.count if self.count else 0.0,
+            "distinct_is_exact": not self.distinct.overflow,
+        }
+        if self.kind in ("Categorical", "Boolean"):
+            result["value_counts_top"] = self.freq.top(10)
+            result["top_k_error"] = self.freq.error
+            return result
+        if not self.count:
+            return result
+
+        variance = self.m2 / (self.count - 1) if self.count > 1 else 0.0
+        quantiles = self.sketch.quantiles(QUANTILES)
+        bins = max(1, min(HISTOGRAM_BINS, n_distinct))
+        counts, edges = self.sketch.histogram(bins, (self.min, self.max))
+        result.update({
+            "min": self._fmt(self.min),
+            "max": self._fmt(self.max),
+            "quantiles": {f"{int(q * 100)}%": self._fmt(v) for q, v in zip(QUANTILES, quantiles)},
+            "quantiles_are_exact": self.sketch.is_exact,
+            "histogram": {
+                "counts": [int(round(c)) for c in counts],
+                "bin_edges": [self._fmt(e) for e in edges],
+            },
+        })
+        if self.kind == "Numeric":
+            std = float(np.sqrt(variance))
+            result.update({
+                "mean": self.mean,
+                "std": std,
+                "variance": variance,
+                "sum": self.total,
+                "cv": std / self.mean if self.mean else None,
+                "iqr": quantiles[3] - quantiles[1],
+                "range": self.max - self.min,
+                "n_zeros": self.n_zeros,
+                "p_zeros": self.n_zeros / self.n,
+                "n_negative": self.n_negative,
+                "n_infinite": self.n_infinite,
+            })
+        else:
+            result["mean"] = self._fmt(self.mean)
+        return result
+
+    # --- сохранение состояния ---
+
+    def to_state(self) -> dict:
+        return {
+            "name": self.name, "kind": self.kind, "n": self.n,
+            "n_missing": self.n_missing, "n_invalid": self.n_invalid,
+            "distinct": self.distinct.to_state(),
+            "count": self.count, "min": self.min, "max": self.max,
+            "mean": self.mean, "m2": self.m2, "total": self.total,
+            "n_zeros": self.n_zeros, "n_negative": self.n_negative, "n_infinite": self.n_infinite,
+            "sketch": self.sketch.to_state(),
+            "freq": self.freq.to_state(),
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "ColumnStats":
+        obj = cls(state["name"], state["kind"])
+        for key in ("n", "n_missing", "n_invalid", "count", "min", "max", "mean", "m2",
+                    "total", "n_zeros", "n_negative", "n_infinite"):
+            setattr(obj, key, state[key])
+        obj.distinct = HyperLogLog.from_state(state["distinct"])
+        obj.sketch = QuantileSketch.from_state(state["sketch"])
+        obj.freq = FrequentItems.from_state(state["freq"])
+        return obj
+
+
+# ============================================================
+# Корреляции
+# ============================================================
+
+class CorrelationStats:
+    """Сливаемая попарная корреляция Пирсона (pairwise-complete).
+
+    Для каждой пары колонок хранятся n, средние, суммы квадратов
+    отклонений и со-момент — они сливаются так же, как mean/variance.
+    В части значения сначала сдвигаются на среднее колонки, поэтому
+    центральные моменты части не теряют точность при больших средних
+    (сумма квадратов минус n·mean² на исходных значениях её теряет).
+    """
+
+    def __init__(self, columns: list):
+        self.columns = list(columns)
+        p = len(self.columns)
+        self.n = np.zeros((p, p))
+        self.mean_x = np.zeros((p, p))   # среднее колонки i по строкам, где есть и i, и j
+        self.mean_y = np.zeros((p, p))   # среднее колонки j по тем же строкам
+        self.m2_x = np.zeros((p, p))
+        self.m2_y = np.zeros((p, p))
+        self.c = np.zeros((p, p))
+
+    def update(self, df: pd.DataFrame):
+        if not self.columns or df.empty:
+            return
+        x = df[self.columns].apply(pd.to_numeric, errors="coerce").to_numpy(dtype=np.float64)
+        m = np.isfinite(x).astype(np.float64)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            # сдвиг — среднее колонки в части; у пары строк меньше, и её
+            # среднее сдвинутых значений d близко к нулю
+            count = m.sum(axis=0)
+            shift = np.where(count > 0, np.where(m > 0, x, 0.0).sum(axis=0) / count, 0.0)
+            x = np.where(m > 0, x - shift, 0.0)
+            n_b = m.T @ m
+            sx = x.T @ m
+            sy = sx.T
+            dx = np.where(n_b > 0, sx / n_b, 0.0)
+            dy = np.where(n_b > 0, sy / n_b, 0.0)
+            sxx = (x * x).T @ m
+            syy = sxx.T
+            sxy = x.T @ x
+            m2_xb = sxx - n_b * dx ** 2
+            m2_yb = syy - n_b * dy ** 2
+            c_b = sxy - n_b * dx * dy
+        mean_xb = np.where(n_b > 0, dx + shift[:, None], 0.0)
+        mean_yb = np.where(n_b > 0, dy + shift[None, :], 0.0)
+        self._merge(n_b, mean_xb, mean_yb, m2_xb, m2_yb, c_b)
+
+    def _merge(self, n_b, mean_xb, mean_yb, m2_xb, m2_yb, c_b):
+        n_a = self.n
+        n = n_a + n_b
+        with np.errstate(invalid="ignore", divide="ignore"):
+            w = np.where(n > 0, n_a * n_b / n, 0.0)
+            frac = np.where(n > 0, n_b / n, 0.0)
+        dx = mean_xb - self.mean_x
+        dy = mean_yb - self.mean_y
+        self.m2_x += m2_xb + dx * dx * w
+        self.m2_y += m2_yb + dy * dy * w
+        self.c += c_b + dx * dy * w
+        self.mean_x += dx * frac
+        self.mean_y += dy * frac
+        self.n = n
+
+    def merge(self, other: "CorrelationStats") -> "CorrelationStats":
+        arrays = [other.n, other.mean_x, other.mean_y, other.m2_x, other.m2_y, other.c]
+        if other.columns != self.columns:
+            # Части могли определить разный набор числовых колонок —
+            # выравниваем по своим, отсутствующие пары дают n = 0
+            idx = [other.columns.index(c) if c in other.columns else -1 for c in self.columns]
+            present = np.array([i >= 0 for i in idx])
+            mask = np.outer(present, present)
+            pos = np.maximum(idx, 0)
+            arrays = [np.where(mask, a[np.ix_(pos, pos)], 0.0) for a in arrays]
+        self._merge(*arrays)
+        return self
+
+    def pearson(self) -> dict:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            r = self.c / np.sqrt(self.m2_x * self.m2_y)
+        r = np.where(self.n > 1, r, np.nan)
+        return {
+            "columns": self.columns,
+            "matrix": [[None if not np.isfinite(v) else float(v) for v in row] for row in r],
+        }
+
+    def to_state(self) -> dict:
+        return {
+            "columns": self.columns,
+            **{key: _pack(getattr(self, key)) for key in ("n", "mean_x", "mean_y", "m2_x", "m2_y", "c")},
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "CorrelationStats":
+        obj = cls(state["columns"])
+        for key in ("n", "mean_x", "mean_y", "m2_x", "m2_y", "c"):
+            setattr(obj, key, _unpack(state[key]).reshape(len(obj.columns), len(obj.columns)))
+        return obj
+
+
+# ============================================================
+# Профиль таблицы
+# ============================================================
+
+class TableStats:
+    """Потоковый профиль таблицы: статистики всех колонок + корреляции."""
+
+    def __init__(self, columns: list = None, correlations: bool = True):
+        self.n_rows = 0
+        self.n_chunks = 0
+        self.columns = {}
+        self.correlations = correlations
+        self.corr = None
+        if columns:
+            for name in columns:
+                self.columns[name] = ColumnStats(name)
+
+    def update(self, df: pd.DataFrame):
+        self.n_rows += len(df)
+        self.n_chunks += 1
+        for name in df.columns:
+            if name not in self.columns:
+                self.columns[name] = ColumnStats(name)
+            self.columns[name].update(df[name])
+
+        if self.correlations:
+            if self.corr is None:
+                numeric = [c for c, s in self.columns.items() if s.kind == "Numeric"]
+                if not numeric:
+                    return
+                self.corr = CorrelationStats(numeric)
+            with current().stage("correlations", rows=len(df)):
+                self.corr.update(df)
+
+    def merge(self, other: "TableStats") -> "TableStats":
+        """Сливает профиль другой части тех же колонок (части строк)."""
+        self.n_rows += other.n_rows
+        self.n_chunks += other.n_chunks
+        for name, stats in other.columns.items():
+            if name in self.columns:
+                self.columns[name].merge(stats)
+            else:
+                self.columns[name] = stats
+        if other.corr is not None:
+            if self.corr is None:
+                self.corr = other.corr
+            else:
+                self.corr.merge(other.corr)
+        return self
+
+    @classmethod
+    def join(cls, parts: list, order: list = None) -> "TableStats":
+        """Собирает профиль из частей с разными колонками одних и тех же строк."""
+        result = cls()
+        result.n_rows = parts[0].n_rows
+        result.n_chunks = parts[0].n_chunks
+        for part in parts:
+            if part.n_rows != result.n_rows:
+                raise ValueError("Части профиля покрывают разное число строк")
+            result.columns.update(part.columns)
+            if part.corr is not None:
+                result.corr = part.corr
+        if order:
+            result.columns = {name: result.columns[name] for name in order if name in result.columns}
+        return result
+
+    def summary(self, title: str = "") -> dict:
+        variables = [stats.summary() for stats in self.columns.values()]
+        n_cells = self.n_rows * len(variables)
+        n_missing = sum(v["n_missing"] for v in variables)
+        types = {}
+        for v in variables:
+            types[v["type"]] = types.get(v["type"], 0) + 1
+        return {
+            "title": title,
+            "table": {
+                "n": self.n_rows,
+                "n_var": len(variables),
+                "n_cells_missing": n_missing,
+                "p_cells_missing": n_missing / n_cells if n_cells else 0.0,
+                "n_vars_with_missing": sum(1 for v in variables if v["n_missing"]),
+                "types": types,
+                "n_chunks": self.n_chunks,
+            },
+            "variables": variables,
+            "correlations": {"pearson": self.corr.pearson()} if self.corr is not None else {},
+            "alerts": build_alerts(variables),
+        }
+
+    def to_state(self) -> dict:
+        return {
+            "n_rows": self.n_rows,
+            "n_chunks": self.n_chunks,
+            "correlations": self.correlations,
+            "columns": [stats.to_state() for stats in self.columns.values()],
+            "corr": self.corr.to_state() if self.corr is not None else None,
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "TableStats":
+        obj = cls(correlations=state["correlations"])
+        obj.n_rows = state["n_rows"]
+        obj.n_chunks = state["n_chunks"]
+        for col_state in state["columns"]:
+            obj.columns[col_state["name"]] = ColumnStats.from_state(col_state)
+        if state["corr"] is not None:
+            obj.corr = CorrelationStats.from_state(state["corr"])
+        return obj
+
+
+# ============================================================
+# Сравнение групп
+# ============================================================
+
+class GroupedStats:
+    """Статистики всех групп по значению ключа.
+
+    Вместо отфильтрованной копии и отдельного профиля на каждую группу
+    часть данных проходит через один groupby: для числовых колонок
+    копятся суммы w, w·x, w·x² (среднее и дисперсия), минимум и максимум,
+    для категориальных — число строк каждой пары (группа, значение).
+    Все накопители складываются, поэтому части и процессы сливаются
+    через merge(). weight — колонка весов (выборка, sampling.py).
+    """
+
+    def __init__(self, key: str, weight: str = None, columns: list = None):
+        self.key = key
+        self.weight = weight
+        self.columns = columns
+        self.kinds = {}
+        self.n_rows = 0
+        self.n_chunks = 0
+        self.sums = None
+        self.extremes = None
+        self.counts = {}
+
+    def _keys(self, df: pd.DataFrame) -> pd.Series:
+        keys = df[self.key]
+        if keys.isna().any():
+            keys = keys.astype(object).where(keys.notna(), MISSING_GROUP)
+        return keys
+
+    def update(self, df: pd.DataFrame):
+        if not self.kinds:
+            names = self.columns or [c for c in df.columns if c not in (self.key, self.weight)]
+            head = df.head(KIND_SAMPLE_ROWS)
+            self.kinds = {c: infer_kind(head[c]) or "Unsupported" for c in names if c in df.columns}
+        self.n_rows += len(df)
+        self.n_chunks += 1
+        keys = self._keys(df)
+        w = (df[self.weight].to_numpy(dtype=np.float64) if self.weight
+             else np.ones(len(df)))
+
+        sums = {("", "n"): np.ones(len(df)), ("", "w"): w}
+        values = {}
+        for name, kind in self.kinds.items():
+            series = df[name]
+            sums[(name, "missing")] = series.isna().to_numpy(dtype=np.float64)
+            if kind in ("Numeric", "DateTime"):
+                x = _group_numeric(series, kind)
+                valid = ~np.isnan(x)
+                x0 = np.where(valid, x, 0.0)
+                sums[(name, "w")] = w * valid
+                sums[(name, "wx")] = w * x0
+                sums[(name, "wx2")] = w * x0 * x0
+                values[name] = x
+            elif kind in ("Categorical", "Boolean"):
+                counts = pd.Series(w, index=df.index).groupby(
+                    [keys, series], observed=True, dropna=True).sum()
+                self.counts[name] = counts if name not in self.counts else \
+                    self.counts[name].add(counts, fill_value=0)
+
+        # группировка по самой колонке: у категорий коды уже готовы
+        part = pd.DataFrame(sums, index=df.index).groupby(keys, observed=True, sort=False).sum()
+        self.sums = part if self.sums is None else self.sums.add(part, fill_value=0)
+        if values:
+            grouped = pd.DataFrame(values, index=df.index).groupby(keys, observed=True, sort=False)
+            extremes = pd.concat({"min": grouped.min(), "max": grouped.max()}, axis=1)
+            self.extremes = extremes if self.extremes is None else _merge_extremes(self.extremes, extremes)
+
+    def merge(self, other: "GroupedStats") -> "GroupedStats":
+        if other.sums is None:
+            return self
+        if self.sums is None:
+            self.__dict__.update(other.__dict__)
+            return self
+        self.n_rows += other.n_rows
+        self.n_chunks += other.n_chunks
+        self.sums = self.sums.add(other.sums, fill_value=0)
+        if other.extremes is not None:
+            self.extremes = other.extremes if self.extremes is None else \
+                _merge_extremes(self.extremes, other.extremes)
+        for name, counts in other.counts.items():
+            self.counts[name] = counts if name not in self.counts else \
+                self.counts[name].add(counts, fill_value=0)
+        return self
+
+    def summary(self, title: str = "", top: int = GROUP_TOP_VALUES) -> dict:
+        """Словарь для render_group_comparison_html() (profile_html.py)."""
+        sums = self.sums.sort_index(key=lambda idx: idx.map(str))
+        groups = [str(g) for g in sums.index]
+        n = sums[("", "n")]
+        variables = []
+        for name, kind in self.kinds.items():
+            v = {"name": name, "type": kind,
+                 "p_missing": (sums[(name, "missing")] / n).tolist()}
+            if kind in ("Numeric", "DateTime"):
+                wsum = sums[(name, "w")].replace(0, np.nan)
+                mean = sums[(name, "wx")] / wsum
+                std = np.sqrt((sums[(name, "wx2")] / wsum - mean ** 2).clip(lower=0))
+                lo = self.extremes[("min", name)].reindex(sums.index)
+                hi = self.extremes[("max", name)].reindex(sums.index)
+                fmt = _group_value(kind)
+                v.update(mean=[fmt(x) for x in mean], std=[_group_spread(x, kind) for x in std],
+                         min=[fmt(x) for x in lo], max=[fmt(x) for x in hi],
+                         difference=_mean_difference(mean, std, sums[(name, "w")]))
+            elif name in self.counts:
+                counts = self.counts[name].unstack(fill_value=0).reindex(sums.index, fill_value=0)
+                shares = counts.div(counts.sum(axis=1).replace(0, np.nan), axis=0).fillna(0)
+                order = counts.sum(axis=0).sort_values(ascending=False).index[:top]
+                v.update(values=[str(c) for c in order],
+                         shares=shares[order].to_numpy().tolist(),
+                         n_distinct=(counts > 0).sum(axis=1).astype(int).tolist(),
+                         difference=float((shares.max() - shares.min()).max()) if len(shares) else 0.0)
+            variables.append(v)
+        return {
+            "title": title,
+            "key": self.key,
+            "groups": groups,
+            "n": n.astype(int).tolist(),
+            "weighted_n": sums[("", "w")].tolist() if self.weight else None,
+            "n_rows": self.n_rows,
+            "n_chunks": self.n_chunks,
+            "variables": variables,
+            "differences": sorted(
+                ({"column": v["name"], "type": v["type"], "difference": v["difference"]}
+                 for v in variables if v.get("difference") is not None),
+                # σ и доли несравнимы: сначала числовые колонки, затем категориальные
+                key=lambda d: (d["type"] not in ("Numeric", "DateTime"), -d["difference"])),
+        }
+
+
+def _group_numeric(series: pd.Series, kind: str) -> np.ndarray:
+    if kind == "DateTime":
+        if not pd.api.types.is_datetime64_any_dtype(series):
+            series = pd.to_datetime(series, errors="coerce", format="ISO8601")
+        arr = series.to_numpy(dtype="datetime64[ns]").astype(np.int64).astype(np.float64)
+        arr[series.isna().to_numpy()] = np.nan
+        return arr
+    return pd.to_numeric(series, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+
+
+def _merge_extremes(a: pd.DataFrame, b: pd.DataFrame) -> pd.DataFrame:
+    both = pd.concat([a, b])
+    return pd.concat({"min": both["min"].groupby(level=0, sort=False).min(),
+                      "max": both["max"].groupby(level=0, sort=False).max()}, axis=1)
+
+
+def _group_value(kind: str):
+    def fmt(x):
+        if x is None or pd.isna(x):
+            return None
+        return str(pd.Timestamp(int(x))) if kind == "DateTime" else float(x)
+    return fmt
+
+
+def _group_spread(x, kind: str):
+    if pd.isna(x):
+        return None
+    return str(pd.Timedelta(int(x))) if kind == "DateTime" else float(x)
+
+
+def _mean_difference(mean: pd.Series, std: pd.Series, weight: pd.Series):
+    """Разброс средних групп в единицах общего (внутригруппового) σ."""
+    mean = mean.dropna()
+    if len(mean) < 2:
+        return None
+    pooled = np.sqrt((std ** 2 * weight).sum() / weight.sum()) if weight.sum() else 0.0
+    spread = float(mean.max() - mean.min())
+    return float(spread / pooled) if pooled else (0.0 if spread == 0 else float("inf"))
+
+
+def build_alerts(variables: list) -> list:
+    """Предупреждения в духе YData-Profiling (Alerts)."""
+    alerts = []
+    for v in variables:
+        name = v["name"]
+        if v["type"] == "Unsupported":
+            alerts.append({"column": name, "alert": "EMPTY", "text": "колонка полностью пустая"})
+            continue
+        if v["p_missing"] > 0.05:
+            alerts.append({"column": name, "alert": "MISSING",
+                           "text": f"{v['n_missing']} пропусков ({v['p_missing']:.1%})"})
+        if v["n_distinct"] == 1:
+            alerts.append({"column": name, "alert": "CONSTANT", "text": "одно значение"})
+        elif v["count"] and v["n_distinct"] >= v["count"]:
+            alerts.append({"column": name, "alert": "UNIQUE", "text": "все значения уникальны"})
+        elif v["type"] == "Categorical" and v["n_distinct"] > 50:
+            alerts.append({"column": name, "alert": "HIGH_CARDINALITY",
+                           "text": f"{v['n_distinct']} уникальных значений"})
+        if v.get("p_zeros", 0) > 0.1:
+            alerts.append({"column": name, "alert": "ZEROS", "text": f"{v['p_zeros']:.1%} нулей"})
+        if v.get("n_invalid"):
+            alerts.append({"column": name, "alert": "INVALID",
+                           "text": f"{v['n_invalid']} значений не приводятся к типу {v['type']}"})
+    return alerts
+
+
+def numeric_columns(df: pd.DataFrame) -> list:
+    """Колонки, которые TableStats возьмёт в корреляции по первой части."""
+    return [name for name in df.columns if infer_kind(df[name]) == "Numeric"]
+
+
+def profile_chunks(chunks, columns: list = None, correlations: bool = True) -> TableStats:
+    """Строит профиль по итератору DataFrame-частей."""
+    stats = TableStats(columns, correlations=correlations)
+    for chunk in chunks:
+        stats.update(chunk)
+    return stats
@@ -0,0 +1,154 @@
+"""
+Практикум по анализу и моделированию данных
+Модуль 2 (доп.): Сохранённая статистика профиля и отложенный рендер
+Предприятие: «Руда+» — добыча железной руды
+
+Профилирование делится на два шага: расчёт статистики и рендер HTML.
+В режиме вывода "stats" сохраняется только статистика — компактный
+JSON рядом с отчётом, в подкаталоге stats/:
+
+    reports/profile_ore_production.html        — отчёт (режимы html, both)
+    reports/stats/profile_ore_production.json  — статистика (режимы stats, both)
+
+Файл статистики — {"format": ..., "title": ..., "summary": {...}}:
+
+  - profile — TableStats.summary() (потоковый режим, profile_stats.py);
+  - group_comparison — GroupedStats.summary() (сравнение групп);
+  - timeseries — timeseries_summary() (ряды телеметрии, timeseries_profile.py);
+  - ydata — описание YData-Profiling (ProfileReport.to_json()). Рядом
+    лежит .pp (ProfileReport.dump()): по нему YData строит HTML без
+    повторного расчёта и без исходного DataFrame.
+
+render_stored() строит HTML по такому файлу (10_render_reports.py) —
+только из сохранённых чисел, данные не читаются.
+"""
+
+import json
+import math
+import os
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from profile_html import render_group_comparison_html, render_profile_html, render_timeseries_html
+
+OUTPUT_MODES = ("html", "stats", "both")
+STATS_SUBDIR = "stats"
+
+RENDERERS = {
+    "profile": render_profile_html,
+    "group_comparison": render_group_comparison_html,
+    "timeseries": render_timeseries_html,
+}
+
+
+def jsonable(value):
+    """Значение → типы JSON: numpy-скаляры в числа, NaN и inf в null, даты в строки."""
+    if isinstance(value, dict):
+        return {str(k): jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple, np.ndarray)):
+        return [jsonable(v) for v in value]
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, (int, np.integer)):
+        return int(value)
+    if isinstance(value, (float, np.floating)):
+        return float(value) if math.isfinite(value) else None
+    if isinstance(value, (pd.Timestamp, pd.Timedelta)):
+        return str(value)
+    if value is None or isinstance(value, str):
+        return value
+    if pd.isna(value):
+        return None
+    return str(value)
+
+
+def stats_path(report_path: Path) -> Path:
+    """Файл статистики для HTML-отчёта: <каталог>/stats/<имя>.json."""
+    report_path = Path(report_path)
+    return report_path.parent / STATS_SUBDIR / f"{report_path.stem}.json"
+
+
+def report_path_for(path: Path) -> Path:
+    """HTML-отчёт для файла статистики (обратное к stats_path)."""
+    path = Path(path)
+    return path.parent.parent / f"{path.stem}.html"
+
+
+def outputs_exist(report_path: Path, output: str = "html") -> bool:
+    """Есть ли все файлы, которые пишет режим output (для проверок кэша)."""
+    paths = []
+    if output in ("html", "both"):
+        paths.append(Path(report_path))
+    if output in ("stats", "both"):
+        paths.append(stats_path(report_path))
+    return all(p.exists() for p in paths)
+
+
+def _write_json(path: Path, document: dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps(jsonable(document), ensure_ascii=False, separators=(",", ":"),
+                              allow_nan=False), encoding="utf-8")
+    os.replace(tmp, path)
+
+
+def write_summary(summary: dict, report_path: Path, output: str = "html",
+                  kind: str = "profile") -> list:
+    """Сохраняет статистику и/или HTML по словарю summary(); возвращает пути."""
+    report_path = Path(report_path)
+    written = []
+    if output in ("stats", "both"):
+        path = stats_path(report_path)
+        _write_json(path, {"format": kind, "title": summary.get("title", ""), "summary": summary})
+        written.append(path)
+    if output in ("html", "both"):
+        report_path.write_text(RENDERERS[kind](summary), encoding="utf-8")
+        written.append(report_path)
+    return written
+
+
+def write_ydata(profile, report_path: Path, output: str = "html") -> list:
+    """То же для ProfileReport: описание уже посчитано (get_description())."""
+    report_path = Path(report_path)
+    written = []
+    if output in ("stats", "both"):
+        path = stats_path(report_path)
+        description = json.loads(profile.to_json())
+        _write_json(path, {"format": "ydata", "title": profile.config.title, "summary": description})
+        profile.dump(path.with_suffix(".pp"))
+        written += [path, path.with_suffix(".pp")]
+    if output in ("html", "both"):
+        profile.to_file(report_path)
+        written.append(report_path)
+    return written
+
+
+# ============================================================
+# Отложенный рендер
+# ============================================================
+
+def load_stored(path: Path) -> dict:
+    return json.loads(Path(path).read_text(encoding="utf-8"))
+
+
+def stored_files(stats_dir: Path) -> list:
+    """Файлы статистики каталога stats/ (по имени)."""
+    return sorted(p for p in Path(stats_dir).glob("*.json") if p.is_file())
+
+
+def render_stored(path: Path, report_path: Path = None) -> Path:
+    """Строит HTML по сохранённой статистике; по умолчанию — на место отчёта."""
+    path = Path(path)
+    report_path = Path(report_path) if report_path else report_path_for(path)
+    document = load_stored(path)
+    if document["format"] == "ydata":
+        from ydata_profiling import ProfileReport
+
+        profile = ProfileReport(title=document["title"], progress_bar=False)
+        profile.loads(path.with_suffix(".pp").read_bytes())
+        profile.to_file(report_path, silent=True)
+    else:
+        report_path.write_text(RENDERERS[document["format"]](document["summary"]), encoding="utf-8")
+    return report_path
@@ -0,0 +1,264 @@
+"""
+Практикум по анализу и моделированию данных
+Модуль 2 (доп.): Построчные результаты валидации и карантин
+Предприятие: «Руда+» — добыча железной руды
+
+print_results() показывает только, какие ожидания не выполнены. Здесь
+по тем же маскам, что строит однопроходный движок (validation_engine.py,
+CompiledSuite.masks()), для каждой строки собирается битовая маска
+нарушений: бит i — ожидание i набора. Повторного прохода по данным нет —
+пакет сразу делится на выходы:
+
+  - clean        — строки без отклоняющих нарушений; колонка _suspect_rules
+                   содержит правила с действием flag_as_suspect
+  - quarantined  — строки с нарушением правила reject_row/reject_duplicates;
+                   колонка _failed_rules — все нарушенные правила, через «;»
+
+Действие берётся из meta ожидания (quality_rule_suite() в
+expectation_suites.py). Ожидания без meta отклоняют строку, а unique —
+только повторы значения (первое вхождение остаётся чистым).
+Правила с log_and_continue попадают в маску и счётчики, но строку не
+отклоняют.
+
+Уникальность проверяется по всем пакетам, прошедшим через один
+QuarantineSplitter: хеши ключей прошлых пакетов (key_hashes из
+key_index.py) хранятся отсортированными прогонами, как сегменты
+SegmentKeyIndex: каждый пакет добавляет свой прогон, FANOUT прогонов
+одного уровня сливаются в один следующего. Повтор ключа из другой части
+файла отклоняется так же, как повтор внутри пакета, а добавление пакета
+не копирует всю накопленную историю.
+
+Карантин пишется пакетами в Parquet (pyarrow) или CSV (QuarantineWriter);
+quarantine_file() делит большой CSV, читая его частями.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from key_index import FANOUT, key_hashes
+from validation_engine import CompiledSuite
+
+FAILED_RULES = "_failed_rules"
+SUSPECT_RULES = "_suspect_rules"
+FAILURE_MASK = "_failure_mask"
+REJECT_ACTIONS = {"reject_row", "reject_duplicates"}
+SUSPECT_ACTIONS = {"flag_as_suspect"}
+DEFAULT_ACTIONS = {"expect_column_values_to_be_unique": "reject_duplicates"}
+MAX_RULES = 64
+DEFAULT_CHUNKSIZE = 500_000
+
+
+def rule_id(exp: dict) -> str:
+    """QR-00x из meta или «тип:колонка» (not_null:mine_id)."""
+    meta = exp.get("meta", {})
+    if "rule_id" in meta:
+        return meta["rule_id"]
+    short = (exp["expectation_type"].replace("expect_column_values_to_", "")
+             .replace("expect_column_pair_values_", "").replace("expect_", ""))
+    kwargs = exp["kwargs"]
+    column = kwargs.get("column") or f"{kwargs.get('column_A')}/{kwargs.get('column_B')}"
+    return f"{short}:{column}"
+
+
+def rule_action(exp: dict) -> str:
+    return exp.get("meta", {}).get("action") or DEFAULT_ACTIONS.get(exp["expectation_type"], "reject_row")
+
+
+class QuarantineSplitter:
+    """Построчная маска нарушений и деление пакетов на clean / quarantined."""
+
+    def __init__(self, suite: list):
+        self.compiled = CompiledSuite(suite)
+        # табличные ожидания (row_count) к строкам не относятся
+        self.rows = sorted(i for indices in self.compiled.columns.values() for i in indices)
+        self.rows += sorted(self.compiled.pairs)
+        if len(self.rows) > MAX_RULES:
+            raise ValueError(f"Не больше {MAX_RULES} построчных ожиданий в наборе")
+        self.suite = self.compiled.suite
+        self.ids = [rule_id(self.suite[i]) for i in self.rows]
+        self.actions = [rule_action(self.suite[i]) for i in self.rows]
+        self.reject_bits = _bits(a in REJECT_ACTIONS for a in self.actions)
+        self.suspect_bits = _bits(a in SUSPECT_ACTIONS for a in self.actions)
+        self.labels = {0: None}
+        # хеши ключей прошлых пакетов для колонок с unique: [(уровень, прогон)]
+        self.seen = {self.suite[i]["kwargs"]["column"]: []
+                     for i in self.rows if self.suite[i]["expectation_type"] == "expect_column_values_to_be_unique"}
+
+        self.n_rows = self.n_quarantined = self.n_suspect = 0
+        self.n_failed = np.zeros(len(self.rows), dtype=np.int64)
+
+    def history(self, df: pd.DataFrame) -> dict:
+        """{колонка: строки, чей ключ был в прошлых пакетах}; ключи пакета запоминаются."""
+        history = {}
+        for column, seen in self.seen.items():
+            if column not in df.columns:
+                continue
+            values = df[column]
+            if pd.api.types.is_numeric_dtype(values):
+                # части CSV читаются по отдельности: int64 в одной и float64 (с NaN) в другой
+                values = values.astype("float64")
+            present = values.notna().to_numpy()
+            hashes = key_hashes(values[present].astype(object).to_numpy())
+            found = np.zeros(len(df), dtype=bool)
+            known = np.zeros(len(hashes), dtype=bool)
+            for _, run in seen:
+                pos = np.searchsorted(run, hashes).clip(max=len(run) - 1)
+                known |= run[pos] == hashes
+            found[present] = known
+            history[column] = found
+            new = np.unique(hashes[~known])
+            if len(new):
+                seen.append((0, new))
+                _compact(seen)
+        return history
+
+    def bitmask(self, df: pd.DataFrame, history: dict = None) -> np.ndarray:
+        """uint64 на строку: бит b выставлен, если нарушено ожидание self.rows[b]."""
+        masks = self.compiled.masks(df, history)
+        bits = np.zeros(len(df), dtype=np.uint64)
+        for b, i in enumerate(self.rows):
+            mask = masks[i]
+            if isinstance(mask, str):
+                raise ValueError(mask)
+            if self.actions[b] == "reject_duplicates" and mask.any():
+                # повтор ключа, а не первое вхождение (первое могло быть в прошлом пакете)
+                column = self.suite[i]["kwargs"]["column"]
+                repeat = df[column].duplicated(keep="first").to_numpy()
+                if history and column in history:
+                    repeat |= history[column]
+                mask = mask & repeat
+            bits |= mask.astype(np.uint64) << np.uint64(b)
+        return bits
+
+    def decode(self, bits: np.ndarray) -> np.ndarray:
+        """Маски → строки «QR-005;in_set:status» (None для 0).
+
+        Различных масок мало, поэтому расшифровываются только уникальные.
+        """
+        uniques, inverse = np.unique(bits, return_inverse=True)
+        for value in uniques.tolist():
+            if value not in self.labels:
+                self.labels[value] = ";".join(
+                    rule for b, rule in enumerate(self.ids) if value >> b & 1)
+        labels = np.array([self.labels[v] for v in uniques.tolist()], dtype=object)
+        return labels[inverse.reshape(-1)]
+
+    def split(self, df: pd.DataFrame) -> tuple:
+        """(clean, quarantined) для очередного пакета."""
+        bits = self.bitmask(df, self.history(df))
+        rejected = (bits & np.uint64(self.reject_bits)) != 0
+        suspect = bits[~rejected] & np.uint64(self.suspect_bits)
+
+        quarantined = df[rejected].copy()
+        quarantined[FAILED_RULES] = self.decode(bits[rejected])
+        quarantined[FAILURE_MASK] = bits[rejected]
+        clean = df[~rejected].copy()
+        clean[SUSPECT_RULES] = self.decode(suspect)
+
+        self.n_rows += len(df)
+        self.n_quarantined += int(rejected.sum())
+        self.n_suspect += int((suspect != 0).sum())
+        for b in range(len(self.rows)):
+            self.n_failed[b] += int(((bits >> np.uint64(b)) & np.uint64(1)).sum())
+        return clean, quarantined
+
+    def summary(self) -> dict:
+        return {
+            "n_rows": self.n_rows,
+            "n_clean": self.n_rows - self.n_quarantined,
+            "n_quarantined": self.n_quarantined,
+            "n_suspect": self.n_suspect,
+            "rules": [{"rule_id": rule, "action": action, "bit": b, "n_failed": int(n)}
+                      for b, (rule, action, n) in enumerate(zip(self.ids, self.actions, self.n_failed))],
+        }
+
+
+def _bits(flags) -> int:
+    return sum(1 << b for b, flag in enumerate(flags) if flag)
+
+
+def _compact(runs: list):
+    """Сливает уровни, где FANOUT прогонов, в один прогон следующего уровня."""
+    level = 0
+    while True:
+        same = [run for lvl, run in runs if lvl == level]
+        if len(same) < FANOUT:
+            return
+        runs[:] = [(lvl, run) for lvl, run in runs if lvl != level]
+        # прогоны не пересекаются: ключ попадает в историю один раз
+        runs.append((level + 1, np.sort(np.concatenate(same))))
+        level += 1
+
+
+# ============================================================
+# Запись
+# ============================================================
+
+class QuarantineWriter:
+    """Пакетная запись в Parquet (колоночный формат, нужен pyarrow) или CSV."""
+
+    def __init__(self, path: Path, fmt: str = "parquet"):
+        self.path = Path(path)
+        self.fmt = fmt
+        self.writer = None
+        self.schema = None
+        self.n_rows = 0
+
+    def write(self, df: pd.DataFrame):
+        if self.fmt == "parquet":
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = pa.Table.from_pandas(df, schema=self.schema, preserve_index=False)
+            if self.writer is None:
+                # колонка из одних None (нет подозрительных строк в первом
+                # пакете) получила бы тип null — следующие пакеты в него не лягут
+                self.schema = pa.schema([f.with_type(pa.string()) if pa.types.is_null(f.type) else f
+                                         for f in table.schema], metadata=table.schema.metadata)
+                table = table.cast(self.schema)
+                self.writer = pq.ParquetWriter(self.path, self.schema)
+            self.writer.write_table(table)
+        else:
+            df.to_csv(self.path, mode="a" if self.n_rows else "w", header=not self.n_rows, index=False)
+        self.n_rows += len(df)
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def quarantine_file(path: Path, suite: list, out_dir: Path, fmt: str = "parquet",
+                    chunksize: int = DEFAULT_CHUNKSIZE) -> dict:
+    """Читает CSV пакетами и пишет <имя>_clean.* и <имя>_quarantine.*."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    suffix = "parquet" if fmt == "parquet" else "csv"
+    splitter = QuarantineSplitter(suite)
+    with QuarantineWriter(out_dir / f"{path.stem}_clean.{suffix}", fmt) as clean_out, \
+            QuarantineWriter(out_dir / f"{path.stem}_quarantine.{suffix}", fmt) as bad_out:
+        for chunk in pd.read_csv(path, chunksize=chunksize):
+            clean, quarantined = splitter.split(chunk)
+            clean_out.write(clean)
+            if len(quarantined):
+                bad_out.write(quarantined)
+    return {"clean": str(clean_out.path), "quarantine": str(bad_out.path), **splitter.summary()}
+
+
+def print_quarantine(summary: dict, quarantined: pd.DataFrame = None, key: str = None, limit: int = 10):
+    """Сводка карантина и первые строки с нарушенными правилами."""
+    print(f"\n  Строк: {summary['n_rows']}, чистых: {summary['n_clean']}, "
+          f"в карантине: {summary['n_quarantined']}, подозрительных: {summary['n_suspect']}")
+    for rule in summary["rules"]:
+        if rule["n_failed"]:
+            print(f"    {rule['rule_id']:<36} {rule['action']:<18} {rule['n_failed']:>6}")
+    if quarantined is not None and len(quarantined):
+        columns = [key, FAILED_RULES] if key else [FAILED_RULES]
+        print(quarantined[columns].head(limit).to_string())
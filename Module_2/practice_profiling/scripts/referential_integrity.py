@@ -0,0 +1,268 @@
+"""
+Практикум по анализу и моделированию данных
+Модуль 2 (доп.): Проверка ссылочной целостности (правило QR-003)
+Предприятие: «Руда+» — добыча железной руды
+
+Связи «дочерняя → родительская таблица» берутся из dependencies в
+source.tables файла etl_config.json (Модуль 4) и из FOREIGN_KEYS —
+связей, которых в общем конфиге нет. Внешний ключ — колонка дочерней
+таблицы с именем первичного ключа родителя (equipment_id, mine_id, ...).
+Если такой колонки нет, связь отмечается как пропущенная.
+
+Строковые ключи сравниваются без ведущих нулей в номере: в справочниках
+Модуля 2 шахта — MINE-01, в данных Модуля 1 — MINE-1.
+
+Для каждого родителя индекс ключей строится один раз (KeyIndex) и
+используется всеми дочерними таблицами:
+
+  - числовые ключи — отсортированный массив, поиск np.searchsorted
+  - строковые ключи — хеш-индекс pd.Index, поиск get_indexer
+
+Колонка дочерней таблицы кодируется (pd.factorize или коды категорий),
+в индексе ищутся только её уникальные значения, а число сирот по
+каждому ключу получается одним np.bincount по кодам.
+
+Дочерние таблицы читаются частями и только FK-колонками, поэтому время
+пропорционально числу строк, а Python-кода на строку нет. Для каждой
+связи возвращаются число «сирот» и примеры ключей-сирот.
+"""
+
+import json
+import re
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+RULE_ID = "QR-003"
+DEFAULT_CHUNKSIZE = 1_000_000
+ORPHAN_SAMPLE_SIZE = 10
+# сколько разных ключей-сирот учитывать поимённо (остальные — только в сумме)
+ORPHAN_KEYS_LIMIT = 1000
+# внешние ключи, которых нет в dependencies etl_config.json (общий конфиг
+# Модуля 4 не меняется); проверяются независимо от applies_to правила
+FOREIGN_KEYS = {"sensor_readings": ["equipment"]}
+# «-0…0N» → «-N»: MINE-01 и MINE-1 — один ключ
+LEADING_ZEROS = re.compile(r"-0+(?=\d)")
+
+
+def load_config(path: Path) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def relationships(config: dict) -> list:
+    """Связи из source.tables: [{"child", "parent", "column"}, ...].
+
+    Связи для таблиц, к которым не относится QR-003 (applies_to), не
+    возвращаются.
+    """
+    tables = {t["name"]: t for t in config["source"]["tables"]}
+    rule = next((r for r in config.get("quality_rules", []) if r["rule_id"] == RULE_ID), None)
+    applies_to = rule["applies_to"] if rule else "all_tables"
+
+    result = []
+    for table in config["source"]["tables"]:
+        parents = list(FOREIGN_KEYS.get(table["name"], []))
+        if applies_to == "all_tables" or table["name"] in applies_to:
+            parents = list(dict.fromkeys(table.get("dependencies", []) + parents))
+        for parent in parents:
+            if parent not in tables:
+                continue
+            result.append({"child": table["name"], "parent": parent,
+                           "column": tables[parent]["primary_key"]})
+    return result
+
+
+def find_table(name: str, data_dirs: list) -> Path:
+    """CSV-файл таблицы в одном из каталогов (первый найденный)."""
+    for data_dir in data_dirs:
+        path = Path(data_dir) / f"{name}.csv"
+        if path.exists():
+            return path
+    return None
+
+
+def canonical_keys(values: pd.Series) -> pd.Series:
+    """Строковые ключи без ведущих нулей в номере (MINE-01 → MINE-1)."""
+    return values.astype(str).str.replace(LEADING_ZEROS, "-", regex=True)
+
+
+# ============================================================
+# Индекс ключей родительской таблицы
+# ============================================================
+
+class KeyIndex:
+    """Множество ключей родителя с векторным поиском."""
+
+    def __init__(self, keys: pd.Series):
+        keys = keys.dropna()
+        self.n_keys = int(keys.nunique())
+        self.numeric = (pd.api.types.is_numeric_dtype(keys)
+                        and not pd.api.types.is_bool_dtype(keys))
+        if self.numeric:
+            self.sorted = np.unique(keys.to_numpy(dtype=np.float64))
+        else:
+            self.index = pd.Index(pd.unique(canonical_keys(keys)))
+
+    def missing(self, values) -> np.ndarray:
+        """True для непустых значений, которых нет среди ключей."""
+        values = pd.Series(values)
+        null = values.isna().to_numpy()
+        if self.numeric:
+            arr = pd.to_numeric(values, errors="coerce").to_numpy(dtype=np.float64, na_value=np.nan)
+            if len(self.sorted) == 0:
+                return ~null
+            pos = np.searchsorted(self.sorted, arr).clip(max=len(self.sorted) - 1)
+            found = self.sorted[pos] == arr
+        else:
+            found = self.index.get_indexer(canonical_keys(values)) >= 0
+        return ~found & ~null
+
+    def encode(self, values: pd.Series) -> tuple:
+        """(коды строк, уникальные значения, признак «сирота» для каждого уникального).
+
+        Поиск в индексе выполняется только для уникальных значений; у
+        категориальной колонки коды уже готовы. Код -1 — NULL.
+        """
+        if isinstance(values.dtype, pd.CategoricalDtype):
+            codes, uniques = values.cat.codes.to_numpy(), values.cat.categories
+        else:
+            codes, uniques = pd.factorize(values, use_na_sentinel=True)
+        return codes, uniques, self.missing(uniques)
+
+    def orphans(self, values: pd.Series) -> np.ndarray:
+        """Маска строк-сирот (NULL во внешнем ключе сиротой не считается)."""
+        codes, _, missing = self.encode(values)
+        if len(missing) == 0:
+            return np.zeros(len(values), dtype=bool)
+        return np.where(codes >= 0, missing[np.maximum(codes, 0)], False)
+
+
+class OrphanCounter:
+    """Сливаемые счётчики по одной связи."""
+
+    def __init__(self, relation: dict):
+        self.relation = relation
+        self.n_rows = 0
+        self.n_checked = 0
+        self.n_orphans = 0
+        self.orphan_keys = {}
+
+    def update(self, values: pd.Series, index: KeyIndex):
+        codes, uniques, missing = index.encode(values)
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        self.n_rows += len(values)
+        self.n_checked += int(counts.sum())
+        n_orphans = int(counts[missing].sum())
+        if not n_orphans:
+            return
+        self.n_orphans += n_orphans
+        for key, count in zip(np.asarray(uniques)[missing], counts[missing]):
+            key = str(key)
+            if count and (key in self.orphan_keys or len(self.orphan_keys) < ORPHAN_KEYS_LIMIT):
+                self.orphan_keys[key] = self.orphan_keys.get(key, 0) + int(count)
+
+    def result(self, sample_size: int = ORPHAN_SAMPLE_SIZE) -> dict:
+        top = sorted(self.orphan_keys.items(), key=lambda kv: -kv[1])[:sample_size]
+        return {
+            "rule_id": RULE_ID,
+            **self.relation,
+            "status": "checked",
+            "success": self.n_orphans == 0,
+            "n_rows": self.n_rows,
+            "n_checked": self.n_checked,
+            "n_orphans": self.n_orphans,
+            "p_orphans": self.n_orphans / self.n_checked if self.n_checked else 0.0,
+            "n_orphan_keys": len(self.orphan_keys),
+            "orphan_keys_sample": [{"key": k, "rows": n} for k, n in top],
+        }
+
+
+def _skipped(relation: dict, reason: str) -> dict:
+    return {"rule_id": RULE_ID, **relation, "status": "skipped", "success": None, "reason": reason}
+
+
+# ============================================================
+# Проверка
+# ============================================================
+
+def check_dataframes(tables: dict, config: dict) -> list:
+    """Проверка связей для таблиц, уже загруженных в память ({имя: DataFrame})."""
+    indexes = {}
+    results = []
+    for relation in relationships(config):
+        child, parent, column = relation["child"], relation["parent"], relation["column"]
+        if child not in tables or parent not in tables:
+            missing = child if child not in tables else parent
+            results.append(_skipped(relation, f"нет данных таблицы {missing}"))
+            continue
+        if column not in tables[child].columns:
+            results.append(_skipped(relation, f"в {child} нет колонки {column}"))
+            continue
+        if parent not in indexes:
+            indexes[parent] = KeyIndex(tables[parent][column])
+        counter = OrphanCounter(relation)
+        counter.update(tables[child][column], indexes[parent])
+        results.append(counter.result())
+    return results
+
+
+def check_files(config: dict, data_dirs: list, chunksize: int = DEFAULT_CHUNKSIZE) -> list:
+    """Проверка связей по CSV-файлам.
+
+    Каждый родитель читается один раз (только колонка ключа), каждая
+    дочерняя таблица — один раз частями по chunksize строк и только
+    FK-колонками; все её связи проверяются в том же проходе.
+    """
+    by_child = {}
+    results = {}
+    for i, relation in enumerate(relationships(config)):
+        child, parent, column = relation["child"], relation["parent"], relation["column"]
+        child_path, parent_path = find_table(child, data_dirs), find_table(parent, data_dirs)
+        if child_path is None or parent_path is None:
+            missing = child if child_path is None else parent
+            results[i] = _skipped(relation, f"нет файла {missing}.csv")
+            continue
+        if column not in pd.read_csv(child_path, nrows=0).columns:
+            results[i] = _skipped(relation, f"в {child} нет колонки {column}")
+            continue
+        by_child.setdefault(child_path, []).append((i, relation, parent_path))
+
+    indexes = {}
+    for child_path, relations in by_child.items():
+        counters = {}
+        for i, relation, parent_path in relations:
+            if relation["parent"] not in indexes:
+                keys = pd.read_csv(parent_path, usecols=[relation["column"]])[relation["column"]]
+                indexes[relation["parent"]] = KeyIndex(keys)
+            counters[i] = OrphanCounter(relation)
+
+        columns = sorted({relation["column"] for _, relation, _ in relations})
+        # FK-колонки читаются как категории: индекс проверяет только уникальные ключи
+        dtypes = {c: "category" for c in columns}
+        with pd.read_csv(child_path, usecols=columns, dtype=dtypes, chunksize=chunksize) as reader:
+            for chunk in reader:
+                for i, relation, _ in relations:
+                    counters[i].update(chunk[relation["column"]], indexes[relation["parent"]])
+        for i, counter in counters.items():
+            results[i] = counter.result()
+
+    return [results[i] for i in sorted(results)]
+
+
+def print_integrity_results(results: list):
+    """Вывод результатов QR-003 в стиле print_results()."""
+    checked = [r for r in results if r["status"] == "checked"]
+    passed = sum(1 for r in checked if r["success"])
+    status = "PASS" if passed == len(checked) else "FAIL"
+    print(f"\n  {RULE_ID} referential_integrity: {passed}/{len(checked)} {status}")
+    for r in results:
+        link = f"{r['child']}.{r['column']} → {r['parent']}"
+        if r["status"] == "skipped":
+            print(f"    – {link}: пропущено ({r['reason']})")
+        elif r["success"]:
+            print(f"    ✓ {link}: {r['n_checked']} ссылок")
+        else:
+            keys = ", ".join(f"{s['key']} ({s['rows']})" for s in r["orphan_keys_sample"])
+            print(f"    ✗ {link}: {r['n_orphans']} сирот ({r['p_orphans']:.1%}), ключи: {keys}")
@@ -0,0 +1,355 @@
+"""
+Практикум по анализу и моделированию данных
+Модуль 2 (доп.): Часовые и суточные агрегаты телеметрии без TimescaleDB
+Предприятие: «Руда+» — добыча железной руды
+
+В Модуле 5 агрегаты timeseries.sensor_hourly и sensor_daily — непрерывные
+агрегаты TimescaleDB (refresh_continuous_aggregate), а запасной путь —
+помесячные секции sensor_readings_YYYY_MM. Здесь то же хранится в файлах
+Parquet с разбиением по месяцам:
+
+  raw/month=YYYY-MM/part-NNNNNN.parquet  сырые показания; каждая загрузка
+                                         дописывает свою часть в месяцы,
+                                         которые задела
+  hourly/month=YYYY-MM/data.parquet      часовые агрегаты месяца
+  daily/month=YYYY-MM/data.parquet       суточные агрегаты месяца
+  state.json                             загруженные файлы, watermark,
+                                         номер следующей части и
+                                         незавершённая загрузка
+
+Строка агрегата — (bucket, equipment_id, sensor_type) и сливаемые
+статистики: число строк и значений, среднее, M2 (сумма квадратов
+отклонений), минимум, максимум. Два агрегата одного интервала сливаются
+формулой Чана, как ColumnStats в profile_stats.py, поэтому stddev_value
+(выборочное, как STDDEV в PostgreSQL) точен и после слияния.
+
+Обновление (refresh): пакет новых строк сворачивается в частичные
+агрегаты по часам и суткам — сортировка по составному ключу
+(ряд, интервал) и np.*.reduceat, без groupby. В файлах затронутых
+месяцев пересчитываются только интервалы, куда попали строки пакета —
+в том числе опоздавшие, старше watermark; остальные строки файла
+переписываются как есть. Сырые показания при обновлении не читаются:
+стоимость зависит от пакета и числа рядов, а не от истории.
+
+Загрузка сначала записывается в state.json как незавершённая (pending:
+номер части, месяцы, отпечаток файла), и только потом пишутся сырые
+части и агрегаты. Если процесс упал посередине, recover() удаляет
+сырые части этой загрузки и пересчитывает агрегаты её месяцев из
+оставшихся частей, а файл не числится загруженным — повторная загрузка
+не посчитает его строки дважды.
+
+Запрос дашборда за месяц читает суточные агрегаты (десятки строк на
+ряд) вместо сырых показаний; rebuild_month пересчитывает агрегаты
+месяца из сырых частей, если их нужно построить заново.
+"""
+
+import json
+import os
+import time
+from datetime import datetime
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from profile_cache import fingerprint
+from timeseries_profile import _segment_starts, series_codes
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+ROLLUP_DIR = SCRIPT_DIR.parent / "reports" / "rollups"
+
+GRAINS = {"hourly": "h", "daily": "D"}     # имя агрегата → шаг (единица datetime64)
+RAW_COLUMNS = ["reading_time", "equipment_id", "sensor_type", "value"]
+ROLLUP_COLUMNS = ["bucket", "equipment_id", "sensor_type", "reading_count", "value_count",
+                  "avg_value", "min_value", "max_value", "stddev_value", "m2"]
+
+
+# ============================================================
+# Свёртка и слияние агрегатов
+# ============================================================
+
+def _combine(codes: np.ndarray, bucket: np.ndarray, reading_count: np.ndarray, value_count: np.ndarray,
+             mean: np.ndarray, m2: np.ndarray, vmin: np.ndarray, vmax: np.ndarray) -> tuple:
+    """Слияние частичных агрегатов с одинаковым (ряд, интервал).
+
+    Вход — по строке на частичный агрегат (сырое показание — агрегат из
+    одного значения). M2 группы: ΣM2ᵢ + Σnᵢ(meanᵢ − mean)² — формула Чана
+    для любого числа частей.
+    """
+    b0 = int(bucket.min())
+    span = int(bucket.max()) - b0 + 1
+    key = codes.astype(np.int64) * span + (bucket - b0)
+    order = np.argsort(key, kind="stable")
+    key = key[order]
+    starts = _segment_starts(key)
+    sizes = np.diff(np.r_[starts, len(key)])
+
+    n_part = value_count[order]
+    mean_part = np.where(n_part > 0, mean[order], 0.0)
+    n = np.add.reduceat(n_part, starts)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        total_mean = np.add.reduceat(n_part * mean_part, starts) / n
+    delta = mean_part - np.repeat(np.nan_to_num(total_mean), sizes)
+    total_m2 = np.add.reduceat(np.where(n_part > 0, m2[order] + n_part * delta * delta, 0.0), starts)
+    return (
+        key[starts] // span, key[starts] % span + b0,
+        np.add.reduceat(reading_count[order], starts), n, total_mean, total_m2,
+        np.fmin.reduceat(vmin[order], starts), np.fmax.reduceat(vmax[order], starts),
+    )
+
+
+def _frame(keys: list, codes, bucket, unit: str, reading_count, value_count, mean, m2, vmin, vmax) -> pd.DataFrame:
+    equipment = np.array([k[0] for k in keys], dtype=object)
+    sensor = np.array([k[1] for k in keys], dtype=object)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        stddev = np.where(value_count > 1, np.sqrt(m2 / (value_count - 1)), np.nan)
+    return pd.DataFrame({
+        "bucket": bucket.astype(f"datetime64[{unit}]").astype("datetime64[ns]"),
+        "equipment_id": equipment[codes], "sensor_type": sensor[codes],
+        "reading_count": reading_count.astype(np.int64), "value_count": value_count.astype(np.int64),
+        "avg_value": mean, "min_value": vmin, "max_value": vmax, "stddev_value": stddev, "m2": m2,
+    })
+
+
+def rollup(df: pd.DataFrame, grain: str) -> pd.DataFrame:
+    """Агрегаты сырых показаний (колонки RAW_COLUMNS) по интервалам grain."""
+    unit = GRAINS.get(grain, grain)
+    codes, keys = series_codes(df["equipment_id"], df["sensor_type"])
+    ts = df["reading_time"].to_numpy("datetime64[ns]")
+    ok = (codes >= 0) & ~np.isnat(ts)
+    if not ok.any():
+        return pd.DataFrame(columns=ROLLUP_COLUMNS)
+    values = df["value"].to_numpy(np.float64)[ok]
+    present = ~np.isnan(values)
+    bucket = ts[ok].astype(f"datetime64[{unit}]").astype(np.int64)
+    ones = np.ones(len(values), dtype=np.int64)
+    merged = _combine(codes[ok], bucket, ones, present.astype(np.int64), values,
+                      np.zeros(len(values)), values, values)
+    return _frame(keys, *merged[:2], unit, *merged[2:])
+
+
+def merge_rollups(df: pd.DataFrame, grain: str) -> pd.DataFrame:
+    """Слить строки агрегатов с одинаковым (bucket, ряд); grain "M" — в месяц."""
+    unit = GRAINS.get(grain, grain)
+    if df.empty:
+        return df.reindex(columns=ROLLUP_COLUMNS)
+    codes, keys = series_codes(df["equipment_id"], df["sensor_type"])
+    bucket = df["bucket"].to_numpy("datetime64[ns]").astype(f"datetime64[{unit}]").astype(np.int64)
+    merged = _combine(codes, bucket, df["reading_count"].to_numpy(np.int64),
+                      df["value_count"].to_numpy(np.int64), df["avg_value"].to_numpy(np.float64),
+                      df["m2"].to_numpy(np.float64), df["min_value"].to_numpy(np.float64),
+                      df["max_value"].to_numpy(np.float64))
+    return _frame(keys, *merged[:2], unit, *merged[2:])
+
+
+def _month(values) -> np.ndarray:
+    """Метки месяцев YYYY-MM для datetime64."""
+    return np.datetime_as_string(np.asarray(values, dtype="datetime64[ns]").astype("datetime64[M]"), unit="M")
+
+
+# ============================================================
+# Хранилище
+# ============================================================
+
+def _write_parquet(df: pd.DataFrame, path: Path):
+    """Запись через временный файл: читатель видит старый или новый файл целиком."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp, compression="zstd")
+    os.replace(tmp, path)
+
+
+def _filters(equipment=None, sensor=None) -> list:
+    filters = []
+    if equipment:
+        filters.append(("equipment_id", "in", list(equipment)))
+    if sensor:
+        filters.append(("sensor_type", "in", list(sensor)))
+    return filters or None
+
+
+class RollupStore:
+    """Каталог с сырыми показаниями и агрегатами, разбитыми по месяцам."""
+
+    def __init__(self, root: Path = ROLLUP_DIR):
+        self.root = Path(root)
+        self.state_path = self.root / "state.json"
+        if self.state_path.exists():
+            self.state = json.loads(self.state_path.read_text(encoding="utf-8"))
+        else:
+            self.state = {"ingests": [], "watermark": None, "next_part": 1}
+        self.state.setdefault("pending", None)
+
+    def month_path(self, kind: str, month: str) -> Path:
+        return self.root / kind / f"month={month}" / "data.parquet"
+
+    def months(self, kind: str = "raw") -> list:
+        base = self.root / kind
+        return sorted(p.name.split("=", 1)[1] for p in base.glob("month=*")) if base.exists() else []
+
+    def _save_state(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        tmp = self.state_path.with_name(self.state_path.name + ".tmp")
+        tmp.write_text(json.dumps(self.state, ensure_ascii=False, indent=2), encoding="utf-8")
+        os.replace(tmp, self.state_path)
+
+    def seen(self, digest: str) -> bool:
+        return any(item["fingerprint"] == digest for item in self.state["ingests"])
+
+    def recover(self) -> dict:
+        """Откатить загрузку, прерванную сбоем; None, если откатывать нечего.
+
+        Агрегаты могли получить строки этой части не во всех месяцах,
+        поэтому они пересчитываются из сырых частей без неё.
+        """
+        pending = self.state["pending"]
+        if pending is None:
+            return None
+        for month in pending["months"]:
+            directory = self.root / "raw" / f"month={month}"
+            (directory / f"part-{pending['part']:06d}.parquet").unlink(missing_ok=True)
+            if directory.exists() and any(directory.glob("*.parquet")):
+                self.rebuild_month(month)
+            else:
+                # месяц появился только с этой загрузкой
+                if directory.exists():
+                    directory.rmdir()
+                for grain in GRAINS:
+                    self.month_path(grain, month).unlink(missing_ok=True)
+        self.state["pending"] = None
+        self._save_state()
+        return pending
+
+    # ---------------------------------------------------------------- обновление
+
+    def refresh(self, df: pd.DataFrame, source: str = "", digest: str = None) -> dict:
+        """Дописать пакет в сырые части и пересчитать затронутые интервалы агрегатов."""
+        started = time.perf_counter()
+        self.recover()
+        df = df[RAW_COLUMNS]
+        watermark = np.datetime64(self.state["watermark"]) if self.state["watermark"] else None
+        ts = df["reading_time"].to_numpy("datetime64[ns]")
+        late = int((ts < watermark).sum()) if watermark is not None else 0
+
+        months = _month(ts[~np.isnat(ts)])
+        raw_months = sorted(set(months))
+        part = self.state["next_part"]
+        valid = df[~np.isnat(ts)]
+        # сначала намерение, потом данные: после сбоя recover() знает, что откатывать
+        self.state["pending"] = {"part": part, "months": raw_months, "source": source, "fingerprint": digest}
+        self.state["next_part"] = part + 1
+        self._save_state()
+        for month in raw_months:
+            rows = valid[months == month].sort_values(["equipment_id", "sensor_type", "reading_time"])
+            _write_parquet(rows, self.root / "raw" / f"month={month}" / f"part-{part:06d}.parquet")
+        raw_seconds = time.perf_counter() - started
+
+        touched = {}
+        for grain in GRAINS:
+            partial = rollup(valid, grain)
+            touched[grain] = len(partial)
+            for month, rows in partial.groupby(_month(partial["bucket"])):
+                self._merge_month(grain, month, rows)
+
+        if len(ts) and not np.isnat(ts).all():
+            newest = ts[~np.isnat(ts)].max()
+            if watermark is None or newest > watermark:
+                self.state["watermark"] = str(newest)
+        result = {"source": source, "fingerprint": digest, "rows": len(df), "late_rows": late,
+                  "skipped_rows": int(np.isnat(ts).sum()), "months": raw_months,
+                  "touched_hours": touched["hourly"], "touched_days": touched["daily"],
+                  "part": part, "loaded_at": datetime.now().isoformat(timespec="seconds")}
+        self.state["ingests"].append(result)
+        self.state["pending"] = None
+        self._save_state()
+        return {**result, "raw_seconds": raw_seconds, "seconds": time.perf_counter() - started}
+
+    def _merge_month(self, grain: str, month: str, partial: pd.DataFrame):
+        """Слить частичные агрегаты в файл месяца; нетронутые интервалы не пересчитываются."""
+        path = self.month_path(grain, month)
+        if not path.exists():
+            _write_parquet(partial[ROLLUP_COLUMNS], path)
+            return
+        existing = pd.read_parquet(path)
+        touched = (pd.MultiIndex.from_frame(existing[["bucket", "equipment_id", "sensor_type"]])
+                   .isin(pd.MultiIndex.from_frame(partial[["bucket", "equipment_id", "sensor_type"]])))
+        merged = merge_rollups(pd.concat([existing[touched], partial], ignore_index=True), grain)
+        result = pd.concat([existing[~touched], merged], ignore_index=True)
+        _write_parquet(result.sort_values(["equipment_id", "sensor_type", "bucket"])[ROLLUP_COLUMNS], path)
+
+    def rebuild_month(self, month: str) -> int:
+        """Пересчитать агрегаты месяца из сырых частей (после ручной правки или смены формата)."""
+        raw = self.read_raw(month)
+        for grain in GRAINS:
+            _write_parquet(rollup(raw, grain)[ROLLUP_COLUMNS], self.month_path(grain, month))
+        return len(raw)
+
+    # ---------------------------------------------------------------- чтение
+
+    def read_raw(self, month: str, equipment=None, sensor=None) -> pd.DataFrame:
+        directory = self.root / "raw" / f"month={month}"
+        if not directory.exists():
+            return pd.DataFrame(columns=RAW_COLUMNS)
+        return pq.read_table(directory, columns=RAW_COLUMNS, filters=_filters(equipment, sensor)).to_pandas()
+
+    def read(self, grain: str, start, end, equipment=None, sensor=None) -> pd.DataFrame:
+        """Агрегаты grain за [start, end): читаются только файлы нужных месяцев."""
+        start, end = np.datetime64(start, "ns"), np.datetime64(end, "ns")
+        months = np.arange(start.astype("datetime64[M]"), (end - 1).astype("datetime64[M]") + 1)
+        filters = (_filters(equipment, sensor) or []) + [("bucket", ">=", pd.Timestamp(start)),
+                                                         ("bucket", "<", pd.Timestamp(end))]
+        parts = [pq.read_table(path, filters=filters).to_pandas()
+                 for path in (self.month_path(grain, str(m)) for m in months) if path.exists()]
+        return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=ROLLUP_COLUMNS)
+
+
+# ============================================================
+# Дашборд
+# ============================================================
+
+DASHBOARD_COLUMNS = ["equipment_id", "sensor_type", "reading_count", "avg_value", "min_value",
+                     "max_value", "stddev_value"]
+
+
+def dashboard(store: RollupStore, month: str, equipment=None, sensor=None) -> tuple:
+    """Дашборд месяца по агрегатам: (итог месяца по рядам, суточные строки)."""
+    start = np.datetime64(month, "M")
+    daily = store.read("daily", start, start + 1, equipment, sensor)
+    overview = merge_rollups(daily, "M")
+    return overview[DASHBOARD_COLUMNS], daily
+
+
+def raw_dashboard(store: RollupStore, month: str, equipment=None, sensor=None) -> tuple:
+    """Тот же дашборд полным чтением сырых показаний месяца (для сравнения)."""
+    raw = store.read_raw(month, equipment, sensor)
+    daily = rollup(raw, "daily")
+    return rollup(raw, "M")[DASHBOARD_COLUMNS], daily
+
+
+# ============================================================
+# Синтетика
+# ============================================================
+
+def synthetic_readings(rows: int, n_series: int = 200, interval_seconds: int = 60,
+                       start: str = "2025-03-01", seed: int = 42) -> pd.DataFrame:
+    """Показания n_series рядов с шагом interval_seconds, по порядку времени."""
+    rng = np.random.default_rng(seed)
+    per_series = -(-rows // n_series)
+    sensors = ["temperature", "vibration", "pressure", "speed", "fuel_level", "load_weight"]
+    n_equipment = -(-n_series // len(sensors))
+    equipment = np.array([f"EQ-{i:04d}" for i in range(1, n_equipment + 1)], dtype=object)
+    tick = np.repeat(np.arange(per_series), n_series)[:rows]
+    series = np.tile(np.arange(n_series), per_series)[:rows]
+    base = 50 + 10 * (series % 7)
+    return pd.DataFrame({
+        "reading_time": np.datetime64(start, "ns") + tick * np.timedelta64(interval_seconds, "s"),
+        "equipment_id": pd.Categorical.from_codes(series // len(sensors), equipment),
+        "sensor_type": pd.Categorical.from_codes(series % len(sensors), sensors),
+        "value": np.round(base + rng.normal(0, 3, rows), 2),
+    })
+
+
+def file_digest(path: Path) -> str:
+    return fingerprint(path)[0]
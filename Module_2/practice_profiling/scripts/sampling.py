@@ -0,0 +1,262 @@
+"""
+Практикум по анализу и моделированию данных
+Модуль 2 (доп.): Выборки для профилирования и доверительные интервалы
+Предприятие: «Руда+» — добыча железной руды
+
+Однопроходные выборки по потоку DataFrame-частей:
+
+  - ReservoirSampler   — простая случайная выборка фиксированного размера
+  - StratifiedSampler  — то же + минимум строк в каждой страте
+                         (например, equipment_id × sensor_type × quality_flag),
+                         чтобы редкие комбинации и строки ALARM не терялись
+
+Каждой строке присваивается случайный ключ; выборка — строки с
+наименьшими ключами (bottom-k). В стратифицированном режиме берётся
+объединение глобальных bottom-k и bottom-m внутри каждой страты. Так как
+ключ у строки один, внутри страты это снова простая случайная выборка,
+и вес строки равен N_h / n_h.
+
+estimate_ci() по выборке оценивает средние, долю пропусков и доли
+категорий генеральной совокупности с доверительными интервалами
+(стратифицированная оценка, нормальное приближение).
+"""
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_SAMPLE_SIZE = 100_000
+DEFAULT_MIN_PER_STRATUM = 30
+CI_LEVEL = 0.95
+Z_SCORES = {0.9: 1.6449, 0.95: 1.9600, 0.99: 2.5758}
+
+KEY = "_sample_key"
+ROW = "_sample_row"
+STRATUM = "_stratum"
+WEIGHT = "_weight"
+SERVICE_COLUMNS = [KEY, ROW, STRATUM, WEIGHT]
+
+
+class ReservoirSampler:
+    """Простая случайная выборка из size строк за один проход."""
+
+    method = "reservoir"
+
+    def __init__(self, size: int = DEFAULT_SAMPLE_SIZE, seed: int = 0):
+        self.size = size
+        self.population = 0
+        self._rng = np.random.default_rng(seed)
+        self._sample = None
+
+    def _keyed(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        chunk = chunk.copy()
+        chunk[KEY] = self._rng.random(len(chunk))
+        chunk[ROW] = np.arange(self.population, self.population + len(chunk))
+        self.population += len(chunk)
+        return chunk
+
+    @staticmethod
+    def _bottom_k(df: pd.DataFrame, k: int) -> pd.DataFrame:
+        if len(df) <= k:
+            return df
+        idx = np.argpartition(df[KEY].to_numpy(), k - 1)[:k]
+        return df.iloc[idx]
+
+    def update(self, chunk: pd.DataFrame):
+        chunk = self._keyed(chunk)
+        parts = [chunk] if self._sample is None else [self._sample, chunk]
+        self._sample = self._bottom_k(pd.concat(parts, ignore_index=True), self.size)
+
+    def result(self) -> tuple:
+        """Возвращает (выборка с колонкой _weight, описание выборки)."""
+        sample = self._sample if self._sample is not None else pd.DataFrame()
+        sample = sample.sort_values(ROW).reset_index(drop=True)
+        sample[STRATUM] = 0
+        sample[WEIGHT] = self.population / max(len(sample), 1)
+        info = {
+            "method": self.method,
+            "population": self.population,
+            "sample_size": len(sample),
+            "sampling_fraction": len(sample) / self.population if self.population else 0.0,
+            "strata": [],
+            "n_strata": 1,
+            "strata_sizes": {0: self.population},
+        }
+        return sample.drop(columns=[KEY]), info
+
+
+class StratifiedSampler(ReservoirSampler):
+    """Стратифицированная выборка: size строк в целом и не меньше
+    min_per_stratum строк (или всю страту, если она меньше) в каждой страте."""
+
+    method = "stratified"
+
+    def __init__(self, strata: list, size: int = DEFAULT_SAMPLE_SIZE,
+                 min_per_stratum: int = DEFAULT_MIN_PER_STRATUM, seed: int = 0):
+        super().__init__(size, seed)
+        self.strata = list(strata)
+        self.min_per_stratum = min_per_stratum
+        self._per_stratum = None
+        self._counts = None
+
+    def update(self, chunk: pd.DataFrame):
+        chunk = self._keyed(chunk)
+
+        counts = chunk.groupby(self.strata, dropna=False, observed=True).size()
+        self._counts = counts if self._counts is None else self._counts.add(counts, fill_value=0)
+
+        # глобальная часть — как у простой выборки
+        parts = [chunk] if self._sample is None else [self._sample, chunk]
+        self._sample = self._bottom_k(pd.concat(parts, ignore_index=True), self.size)
+
+        # минимум в каждой страте — bottom-m по тому же ключу
+        parts = [chunk] if self._per_stratum is None else [self._per_stratum, chunk]
+        merged = pd.concat(parts, ignore_index=True)
+        rank = merged.groupby(self.strata, dropna=False, observed=True)[KEY].rank(method="first")
+        self._per_stratum = merged[rank.to_numpy() <= self.min_per_stratum]
+
+    def result(self) -> tuple:
+        if self._sample is None:
+            return super().result()
+        sample = pd.concat([self._sample, self._per_stratum], ignore_index=True)
+        sample = sample.drop_duplicates(ROW).sort_values(ROW).reset_index(drop=True)
+        counts = self._counts.astype(np.int64).rename("N_h").reset_index()
+        sample, info = weight_stratified(sample, self.strata, counts, self.population)
+        info["min_per_stratum"] = self.min_per_stratum
+        return sample.drop(columns=[KEY]), info
+
+
+def weight_stratified(sample: pd.DataFrame, strata: list, counts: pd.DataFrame,
+                      population: int) -> tuple:
+    """Проставляет номер страты и вес N_h / n_h.
+
+    counts — DataFrame с колонками страт и N_h (размер страты в генеральной
+    совокупности).
+    """
+    counts = counts.reset_index(drop=True)
+    counts[STRATUM] = np.arange(len(counts))
+    sample = sample.merge(counts, on=strata, how="left")
+    n_h = sample.groupby(STRATUM)[STRATUM].transform("size")
+    sample[WEIGHT] = sample["N_h"] / n_h
+    info = {
+        "method": "stratified",
+        "population": int(population),
+        "sample_size": len(sample),
+        "sampling_fraction": len(sample) / population if population else 0.0,
+        "strata": list(strata),
+        "n_strata": len(counts),
+        "strata_sizes": dict(zip(counts[STRATUM].tolist(), counts["N_h"].astype(int).tolist())),
+    }
+    return sample.drop(columns=["N_h"]), info
+
+
+def sample_chunks(chunks, size: int = DEFAULT_SAMPLE_SIZE, strata: list = None,
+                  min_per_stratum: int = DEFAULT_MIN_PER_STRATUM, seed: int = 0) -> tuple:
+    """Выборка по итератору DataFrame-частей за один проход."""
+    if strata:
+        sampler = StratifiedSampler(strata, size, min_per_stratum, seed)
+    else:
+        sampler = ReservoirSampler(size, seed)
+    for chunk in chunks:
+        sampler.update(chunk)
+    return sampler.result()
+
+
+def drop_service_columns(sample: pd.DataFrame) -> pd.DataFrame:
+    return sample.drop(columns=[c for c in SERVICE_COLUMNS if c in sample.columns])
+
+
+# ============================================================
+# Оценки с доверительными интервалами
+# ============================================================
+
+def _interval(estimate: float, variance: float, level: float) -> dict:
+    half = Z_SCORES[level] * float(np.sqrt(max(variance, 0.0)))
+    return {"estimate": float(estimate), "low": float(estimate - half),
+            "high": float(estimate + half), "level": level}
+
+
+def _stratified_share(indicator: pd.Series, stratum: pd.Series, sizes: pd.Series,
+                      level: float) -> dict:
+    """Доля строк с признаком: sum W_h p_h, Var = sum W_h^2 (1 - f_h) p_h (1 - p_h) / (n_h - 1)."""
+    grouped = indicator.astype(np.float64).groupby(stratum)
+    p_h = grouped.mean()
+    n_h = grouped.size()
+    N_h = sizes.reindex(p_h.index).astype(np.float64)
+    w_h = N_h / N_h.sum()
+    fpc = 1 - n_h / N_h
+    var = (w_h ** 2 * fpc * p_h * (1 - p_h) / (n_h - 1).clip(lower=1)).sum()
+    ci = _interval((w_h * p_h).sum(), var, level)
+    ci["low"], ci["high"] = max(ci["low"], 0.0), min(ci["high"], 1.0)
+    return ci
+
+
+def _stratified_mean(values: pd.Series, stratum: pd.Series, sizes: pd.Series,
+                     level: float):
+    """Среднее по непустым значениям (оценка по доменам внутри страт)."""
+    mask = values.notna()
+    if not mask.any():
+        return None
+    n_h = stratum.groupby(stratum).size()
+    grouped = values[mask].astype(np.float64).groupby(stratum[mask])
+    m_h = grouped.size()
+    mean_h = grouped.mean()
+    s2_h = grouped.var(ddof=1).fillna(0.0)
+    # оценка числа непустых значений в страте в генеральной совокупности
+    N_h = sizes.reindex(m_h.index).astype(np.float64) * m_h / n_h.reindex(m_h.index)
+    w_h = N_h / N_h.sum()
+    fpc = (1 - m_h / N_h).clip(lower=0)
+    var = (w_h ** 2 * fpc * s2_h / m_h).sum()
+    return _interval((w_h * mean_h).sum(), var, level)
+
+
+def estimate_ci(sample: pd.DataFrame, info: dict, level: float = CI_LEVEL,
+                top_categories: int = 5) -> dict:
+    """Оценки параметров генеральной совокупности по выборке.
+
+    Возвращает {колонка: {"mean"|"p_missing"|"share: <значение>": интервал}}.
+    """
+    sizes = pd.Series(info["strata_sizes"], dtype=np.float64)
+    stratum = sample[STRATUM]
+    result = {}
+    for name in drop_service_columns(sample).columns:
+        col = sample[name]
+        ci = {"p_missing": _stratified_share(col.isna(), stratum, sizes, level)}
+        if pd.api.types.is_numeric_dtype(col) and not pd.api.types.is_bool_dtype(col):
+            mean = _stratified_mean(col, stratum, sizes, level)
+            if mean is not None:
+                ci["mean"] = mean
+        else:
+            top = col.value_counts().head(top_categories).index
+            for value in top:
+                ci[f"share: {value}"] = _stratified_share(col == value, stratum, sizes, level)
+        result[name] = ci
+    return result
+
+
+def describe_ci(ci: dict) -> str:
+    """Текстовое описание интервалов для поля description в YData-Profiling."""
+    parts = []
+    for key, c in ci.items():
+        if key == "mean":
+            parts.append(f"mean ≈ {c['estimate']:.4g} [{c['low']:.4g}; {c['high']:.4g}]")
+        else:
+            parts.append(f"{key} ≈ {c['estimate']:.2%} [{c['low']:.2%}; {c['high']:.2%}]")
+    level = next(iter(ci.values()))["level"] if ci else CI_LEVEL
+    return f"Оценка по выборке ({level:.0%} ДИ): " + "; ".join(parts)
+
+
+def describe_sample(info: dict) -> str:
+    text = (f"Выборка {info['method']}: {info['sample_size']} из {info['population']} строк "
+            f"({info['sampling_fraction']:.2%})")
+    if info["strata"]:
+        text += f", страты по {', '.join(info['strata'])}: {info['n_strata']}"
+    return text + ". Распределения в отчёте — по выборке без весов, оценки с ДИ — с весами."
+
+
+def attach_ci(summary: dict, info: dict, ci: dict) -> dict:
+    """Добавляет описание выборки и интервалы в словарь профиля (profile_html.py)."""
+    summary["sampling"] = {k: v for k, v in info.items() if k != "strata_sizes"}
+    for variable in summary["variables"]:
+        if variable["name"] in ci:
+            variable["ci"] = ci[variable["name"]]
+    return summary
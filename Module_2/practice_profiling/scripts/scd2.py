@@ -0,0 +1,309 @@
+"""
+Практикум по анализу и моделированию данных
+Модуль 2 (доп.): Поиск изменений для измерений SCD Type 2
+Предприятие: «Руда+» — добыча железной руды
+
+Раздел incremental.scd_handling файла etl_config.json (Модуль 4) задаёт
+SCD Type 2: хеш строки MD5(CONCAT_WS('|', ...)) по tracking_columns
+измерения и колонки effective_from / effective_to / is_current с
+«бесконечной» датой 9999-12-31. В 03_etl_incremental.sql это сделано
+циклом по строкам; здесь — векторно, пакетами по batch_size:
+
+  - хеши пакета считаются сразу для всех строк: текст колонок собирает
+    Arrow (binary_join_element_wise — тот же CONCAT_WS: NULL пропускается
+    вместе с разделителем), и хеш совпадает с хешем PostgreSQL;
+  - индекс текущих версий (CurrentIndex): бизнес-ключ → surrogate key
+    и хеш текущей версии; поиск ключей пакета — pd.Index.get_indexer;
+  - строка пакета попадает в одну из групп: insert (ключа нет в
+    измерении), expire (хеш отличается: текущая версия закрывается,
+    добавляется новая) или unchanged (хеш тот же);
+  - индекс обновляется после каждого пакета, поэтому ключ, изменённый
+    в двух пакетах одного запуска, получает две версии.
+
+Стоимость пакета — хеширование и поиск его строк; от размера измерения
+зависит только построение индекса при старте.
+
+    engine = SCD2Engine(scd_dimensions()["dim_operator"], current)
+    for changes in engine.run(rows):       # пакеты по batch_size
+        ...  # changes.inserts — новые версии, changes.expires — закрываемые
+    total = engine.changes()
+    current = apply_changes(current, total.inserts, total.expires, "operator_key")
+"""
+
+import hashlib
+import json
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from datasets import ETL_CONFIG
+from incremental_validation import incremental_settings
+
+ROW_HASH_COLUMN = "_row_hash"
+
+
+def scd_settings(config_path: Path = ETL_CONFIG) -> dict:
+    """Колонки, «бесконечная» дата, хеш и batch_size из раздела incremental."""
+    with open(config_path, encoding="utf-8") as f:
+        scd = json.load(f).get("incremental", {}).get("scd_handling", {})
+    if scd.get("type", 2) != 2:
+        raise ValueError(f"scd_handling.type = {scd['type']}: поддерживается только SCD Type 2")
+    return {
+        "effective_from": scd.get("effective_from_column", "effective_from"),
+        "effective_to": scd.get("effective_to_column", "effective_to"),
+        "is_current": scd.get("is_current_column", "is_current"),
+        "infinity_date": pd.Timestamp(scd.get("infinity_date", "9999-12-31")).date(),
+        "hash_function": scd.get("hash_function", "MD5").lower(),
+        "hash_separator": scd.get("hash_separator", "|"),
+        "batch_size": incremental_settings(config_path)["batch_size"],
+    }
+
+
+def scd_dimensions(config_path: Path = ETL_CONFIG) -> dict:
+    """Измерения target.dimensions со scd_type 2: имя → описание из конфигурации."""
+    with open(config_path, encoding="utf-8") as f:
+        dimensions = json.load(f)["target"]["dimensions"]
+    return {d["name"]: d for d in dimensions if d.get("scd_type") == 2}
+
+
+# ============================================================
+# Хеш строки
+# ============================================================
+
+def _text(series: pd.Series) -> pa.Array:
+    """Колонка → строки Arrow, как их выводит PostgreSQL; NULL остаётся NULL.
+
+    Целые пишутся без «.0», и в колонках float тоже (целые с NaN после
+    чтения CSV; так же выводит float8), даты без времени — YYYY-MM-DD,
+    bool — t/f. NUMERIC с фиксированным масштабом (12.50) совпадёт,
+    только если колонка пришла строкой.
+    """
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        series = series.astype(object)
+    if series.dtype == object:
+        return pa.array(series.to_numpy(), type=pa.string(), from_pandas=True)
+    present = series.notna().to_numpy()
+    if pd.api.types.is_bool_dtype(series):
+        text = np.where(series.to_numpy(dtype=bool, na_value=False), "t", "f").astype(object)
+    elif pd.api.types.is_datetime64_any_dtype(series):
+        values = series.dt.tz_localize(None) if series.dt.tz is not None else series
+        dates_only = (values.dropna() == values.dropna().dt.normalize()).all()
+        text = values.dt.strftime("%Y-%m-%d" if dates_only else "%Y-%m-%d %H:%M:%S").to_numpy(object)
+    elif pd.api.types.is_float_dtype(series):
+        values = series.to_numpy("float64", na_value=np.nan)
+        text = series.astype(str).to_numpy(object)
+        integral = present & (np.mod(values, 1) == 0) & (np.abs(values) < 1e15)
+        text[integral] = values[integral].astype(np.int64).astype(str)
+    else:
+        text = series.astype(str).to_numpy(object)
+    return pa.array(text, type=pa.string(), mask=~present)
+
+
+def join_ws(arrays: list, separator: str = "|") -> pa.Array:
+    """CONCAT_WS(separator, ...) над строковыми массивами Arrow: NULL пропускается с разделителем.
+
+    Первая колонка — пустая строка: null_handling="skip" теряет строки,
+    где все значения NULL (у CONCAT_WS это ''). Лишний ведущий
+    разделитель потом отрезается.
+    """
+    joined = pc.binary_join_element_wise(pa.scalar(""), *arrays, separator, null_handling="skip")
+    return pc.utf8_slice_codeunits(joined, len(separator))
+
+
+def concat_ws(df: pd.DataFrame, columns: list, separator: str = "|") -> pa.Array:
+    """Векторный CONCAT_WS(separator, columns...) по колонкам DataFrame."""
+    return join_ws([_text(df[c]) for c in columns], separator)
+
+
+def hash_hex(joined: pa.Array, hash_function: str = "md5") -> np.ndarray:
+    """Хеш каждой строки в hex; в Python остаётся только вызов хеша на строку."""
+    new = getattr(hashlib, hash_function)
+    return np.array([new(b).hexdigest() for b in joined.cast(pa.binary()).to_pylist()], dtype=object)
+
+
+def row_hashes(df: pd.DataFrame, columns: list, separator: str = "|",
+               hash_function: str = "md5") -> np.ndarray:
+    """Хеш строк как в SQL: MD5(CONCAT_WS('|', columns...)) в hex."""
+    return hash_hex(concat_ws(df, columns, separator), hash_function)
+
+
+# ============================================================
+# Индекс текущих версий
+# ============================================================
+
+class CurrentIndex:
+    """Бизнес-ключ → позиция; по позиции — surrogate key и хеш текущей версии.
+
+    Ключи измерения на старте — pd.Index (поиск пакетом через
+    get_indexer), ключи, добавленные за запуск, — словарь; массивы
+    растут удвоением, так что добавление стоит O(размер пакета).
+    """
+
+    def __init__(self, keys, surrogate_keys, hashes):
+        self.keys = pd.Index(keys)
+        if not self.keys.is_unique:
+            raise ValueError("У нескольких текущих версий один бизнес-ключ — измерение повреждено")
+        self.surrogate = np.asarray(surrogate_keys, dtype=np.int64).copy()
+        self.hash = np.asarray(hashes, dtype=object).copy()
+        self.size = len(self.keys)
+        self.added = {}
+
+    def __len__(self) -> int:
+        return self.size
+
+    def lookup(self, keys: np.ndarray) -> np.ndarray:
+        """Позиции ключей; -1 — ключа нет."""
+        positions = self.keys.get_indexer(keys) if len(self.keys) else np.full(len(keys), -1)
+        if self.added:
+            missing = np.flatnonzero(positions < 0)
+            positions[missing] = [self.added.get(k, -1) for k in keys[missing]]
+        return positions
+
+    def update(self, positions: np.ndarray, surrogate_keys: np.ndarray, hashes: np.ndarray):
+        self.surrogate[positions] = surrogate_keys
+        self.hash[positions] = hashes
+
+    def add(self, keys: np.ndarray, surrogate_keys: np.ndarray, hashes: np.ndarray):
+        end = self.size + len(keys)
+        if end > len(self.surrogate):
+            capacity = max(end, 2 * len(self.surrogate), 1024)
+            self.surrogate = np.resize(self.surrogate, capacity)
+            self.hash = np.resize(self.hash, capacity)
+        self.surrogate[self.size:end] = surrogate_keys
+        self.hash[self.size:end] = hashes
+        self.added.update(zip(keys.tolist(), range(self.size, end)))
+        self.size = end
+
+
+# ============================================================
+# Поиск изменений
+# ============================================================
+
+@dataclass
+class SCD2Changes:
+    """Результат пакета: новые версии, закрываемые версии и счётчики."""
+
+    inserts: pd.DataFrame
+    expires: pd.DataFrame
+    counts: dict = field(default_factory=dict)
+
+
+class SCD2Engine:
+    """Сравнивает пакеты строк-источников с текущими версиями измерения."""
+
+    def __init__(self, dimension: dict, current: pd.DataFrame = None, settings: dict = None,
+                 load_date=None):
+        self.settings = settings or scd_settings()
+        self.business_key = dimension["business_key"]
+        self.surrogate_key = dimension["surrogate_key"]
+        self.tracking_columns = list(dimension["tracking_columns"])
+        # как CURRENT_DATE в 03_etl_incremental.sql: старая версия закрывается
+        # этой датой, новая с неё начинается
+        self.load_date = pd.Timestamp(load_date or pd.Timestamp.now()).date()
+        self.counts = {"insert": 0, "expire": 0, "unchanged": 0, "duplicate": 0}
+        self.inserts = []
+        self.expires = []
+        self.index = self._build_index(current)
+
+    def _build_index(self, current: pd.DataFrame) -> CurrentIndex:
+        if current is None or current.empty:
+            self.next_key = 1
+            return CurrentIndex([], [], [])
+        self.next_key = int(current[self.surrogate_key].max()) + 1
+        rows = current[current[self.settings["is_current"]].astype(bool)]
+        # сохранённый _row_hash; версии без него (загруженные SQL) хешируются заново
+        hashes = (rows[ROW_HASH_COLUMN] if ROW_HASH_COLUMN in rows
+                  else pd.Series(None, index=rows.index, dtype=object)).to_numpy(object)
+        missing = pd.isna(hashes)
+        if missing.any():
+            hashes[missing] = self.hash_rows(rows[missing])
+        return CurrentIndex(rows[self.business_key].to_numpy(object),
+                            rows[self.surrogate_key].to_numpy(), hashes)
+
+    def hash_rows(self, df: pd.DataFrame) -> np.ndarray:
+        missing = [c for c in self.tracking_columns if c not in df]
+        if missing:
+            raise KeyError(f"Нет колонок tracking_columns: {', '.join(missing)}")
+        return row_hashes(df, self.tracking_columns, self.settings["hash_separator"],
+                          self.settings["hash_function"])
+
+    def process(self, batch: pd.DataFrame) -> SCD2Changes:
+        """Пакет строк-источников → новые и закрываемые версии."""
+        s = self.settings
+        n_rows = len(batch)
+        # повтор ключа в пакете: действует последняя строка, как при выгрузке по updated_at
+        batch = batch.drop_duplicates(self.business_key, keep="last")
+        keys = batch[self.business_key].to_numpy(object)
+        hashes = self.hash_rows(batch)
+        positions = self.index.lookup(keys)
+
+        known = positions >= 0
+        changed = known.copy()
+        changed[known] = self.index.hash[positions[known]] != hashes[known]
+        new = ~known
+        write = new | changed
+
+        expires = pd.DataFrame({
+            self.surrogate_key: self.index.surrogate[positions[changed]],
+            self.business_key: keys[changed],
+            s["effective_to"]: self.load_date,
+            s["is_current"]: False,
+        })
+        surrogate_keys = np.arange(self.next_key, self.next_key + int(write.sum()), dtype=np.int64)
+        self.next_key += len(surrogate_keys)
+        inserts = batch[write].copy()
+        inserts.insert(0, self.surrogate_key, surrogate_keys)
+        inserts[s["effective_from"]] = self.load_date
+        inserts[s["effective_to"]] = s["infinity_date"]
+        inserts[s["is_current"]] = True
+        inserts[ROW_HASH_COLUMN] = hashes[write]
+
+        # новые версии становятся текущими для следующих пакетов
+        rank = np.cumsum(write) - 1
+        self.index.update(positions[changed], surrogate_keys[rank[changed]], hashes[changed])
+        self.index.add(keys[new], surrogate_keys[rank[new]], hashes[new])
+
+        counts = {"insert": int(new.sum()), "expire": int(changed.sum()),
+                  "unchanged": int((known & ~changed).sum()), "duplicate": n_rows - len(batch)}
+        for name, value in counts.items():
+            self.counts[name] += value
+        self.inserts.append(inserts)
+        self.expires.append(expires)
+        return SCD2Changes(inserts, expires, counts)
+
+    def run(self, rows: pd.DataFrame, batch_size: int = None):
+        """Строки-источники пакетами по batch_size; генератор SCD2Changes."""
+        batch_size = batch_size or self.settings["batch_size"]
+        for start in range(0, len(rows), batch_size):
+            yield self.process(rows.iloc[start:start + batch_size])
+
+    def changes(self) -> SCD2Changes:
+        """Все изменения запуска одним набором."""
+        return SCD2Changes(_concat(self.inserts), _concat(self.expires), dict(self.counts))
+
+
+def _concat(frames: list) -> pd.DataFrame:
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+
+
+def apply_changes(dimension: pd.DataFrame, inserts: pd.DataFrame, expires: pd.DataFrame,
+                  surrogate_key: str, settings: dict = None) -> pd.DataFrame:
+    """Измерение после запуска: закрытые версии обновлены, новые добавлены.
+
+    Для измерения в PostgreSQL то же самое — UPDATE по surrogate key из
+    expires и INSERT (COPY) строк inserts.
+    """
+    s = settings or scd_settings()
+    frames = [f for f in (dimension, inserts) if f is not None and not f.empty]
+    dimension = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame()
+    if not expires.empty:
+        # закрываться может и версия, добавленная в этом же запуске
+        effective_to = expires.set_index(surrogate_key)[s["effective_to"]]
+        closed = dimension[surrogate_key].isin(effective_to.index)
+        dimension.loc[closed, s["effective_to"]] = dimension.loc[closed, surrogate_key].map(effective_to)
+        dimension.loc[closed, s["is_current"]] = False
+    return dimension
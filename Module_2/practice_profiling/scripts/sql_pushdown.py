@@ -0,0 +1,462 @@
+"""
+Практикум по анализу и моделированию данных
+Модуль 2 (доп.): Валидация на стороне PostgreSQL (SQL pushdown)
+Предприятие: «Руда+» — добыча железной руды
+
+Наборы ожиданий (expectation_suites.py) и правила quality_rules из
+etl_config.json переводятся в SQL. Все проверки таблицы выполняются
+ОДНИМ запросом-агрегатом — таблица сканируется один раз:
+
+    SELECT count(*)                                   AS n,
+           count(*) FILTER (WHERE t.mine_id IS NULL)  AS c0,
+           count(*) FILTER (WHERE t.status NOT IN (...)) AS c1,
+           count(t.production_id) - count(DISTINCT t.production_id) AS c2,
+           count(*) FILTER (WHERE t.equipment_id IS NOT NULL
+                              AND p0._k IS NULL)      AS c3,
+           ...
+    FROM ore_production t
+    LEFT JOIN (SELECT DISTINCT equipment_id AS _k FROM equipment) p0
+           ON t.equipment_id = p0._k
+
+Клиенту возвращается одна строка счётчиков; в ней же count(колонка) —
+доля нарушений, как в GX и validation_engine, считается от непустых
+значений (для not_null — от всех строк). Примеры нарушений запрашиваются
+только для непройденных проверок, отдельным запросом с LIMIT N
+(... WHERE нарушение LIMIT N; для повторов ключа — GROUP BY ... HAVING
+count(*) > 1 LIMIT N): сервер останавливается на N-й строке и не
+собирает в памяти все нарушения, даже если правило провалено на целом
+типе датчика. Проверки, которые гарантирует схема (PRIMARY KEY / UNIQUE,
+NOT NULL), закрываются по каталогу без сканирования.
+
+Выражения check правил quality_rules в SQL напрямую не подставляются:
+compile_check() разбирает их на лексемы и пропускает только колонки
+таблицы, ключевые слова и операторы из белого списка; литералы
+передаются параметрами запроса.
+
+Результат имеет ту же форму, что и у 03_great_expectations.py
+(print_results() читает его без изменений).
+"""
+
+import json
+import re
+from decimal import Decimal
+
+from db_profiling import quote_ident
+from expectation_suites import (
+    downtime_events_suite,
+    equipment_suite,
+    module1_sensor_types,
+    ore_production_suite,
+    sensor_readings_suite,
+)
+from referential_integrity import FOREIGN_KEYS, RULE_ID, relationships
+
+SUITES = {
+    "equipment": equipment_suite,
+    "sensor_readings": sensor_readings_suite,
+    "ore_production": ore_production_suite,
+    "downtime_events": downtime_events_suite,
+}
+DEFAULT_SCHEMA = "ruda_plus"
+DEFAULT_SAMPLE_SIZE = 5
+# колонка значения для QR-007: Модуль 1 — reading_value, Модуль 5 — value
+SENSOR_VALUE_COLUMNS = ["reading_value", "value"]
+# секции timeseries.sensor_readings (Модуль 5): sensor_readings_2025_03
+PARTITION_SUFFIX = re.compile(r"_\d{4}_\d{2}$")
+CHECK_TOKEN = re.compile(r"\s*(?:(?P<number>\d+(?:\.\d+)?)|'(?P<string>(?:[^']|'')*)'"
+                         r"|(?P<word>[A-Za-z_][A-Za-z_0-9]*)|(?P<op><=|>=|<>|!=|=|<|>|[(),+\-*/]))")
+CHECK_KEYWORDS = {"AND", "OR", "NOT", "BETWEEN", "IS", "NULL", "IN", "TRUE", "FALSE"}
+
+
+# ============================================================
+# Сведения из каталога
+# ============================================================
+
+def table_exists(engine, table: str) -> bool:
+    from sqlalchemy import text
+
+    with engine.connect() as conn:
+        return conn.execute(text("SELECT to_regclass(:t) IS NOT NULL"), {"t": table}).scalar()
+
+
+def catalog_facts(engine, table: str) -> dict:
+    """Колонки таблицы, NOT NULL-колонки и колонки с одноколоночным UNIQUE/PK."""
+    from sqlalchemy import text
+
+    with engine.connect() as conn:
+        rows = conn.execute(text(
+            "SELECT attname, attnotnull FROM pg_attribute "
+            "WHERE attrelid = to_regclass(:t) AND attnum > 0 AND NOT attisdropped "
+            "ORDER BY attnum"
+        ), {"t": table}).all()
+        unique = conn.execute(text(
+            "SELECT a.attname FROM pg_index i "
+            "JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = i.indkey[0] "
+            "WHERE i.indrelid = to_regclass(:t) AND i.indisunique AND i.indnatts = 1 "
+            "AND i.indpred IS NULL"
+        ), {"t": table}).scalars().all()
+    return {
+        "columns": [name for name, _ in rows],
+        "not_null": {name for name, notnull in rows if notnull},
+        "unique": set(unique),
+    }
+
+
+# ============================================================
+# Компиляция проверок в SQL
+# ============================================================
+
+class PushdownPlan:
+    """Проверки одной таблицы, собранные в один запрос."""
+
+    def __init__(self, engine, table: str, schema: str = DEFAULT_SCHEMA):
+        self.engine = engine
+        self.table = table
+        self.qualified = table if "." in table else f"{schema}.{table}"
+        self.schema = self.qualified.split(".")[0]
+        self.default_schema = schema
+        self.name = base_name(self.qualified)
+        self.facts = catalog_facts(engine, self.qualified)
+        self.checks = []
+        self.joins = []
+        self.params = {}
+        self.skipped = []
+
+    def q(self, column: str) -> str:
+        return "t." + quote_ident(self.engine, column)
+
+    def _param(self, value) -> str:
+        name = f"p{len(self.params)}"
+        self.params[name] = value
+        return f":{name}"
+
+    def compile_check(self, expression: str) -> tuple:
+        """Выражение check из etl_config.json → (SQL с параметрами, колонки).
+
+        ValueError — в выражении есть что-то кроме колонок таблицы,
+        CHECK_KEYWORDS, операторов и литералов.
+        """
+        expression = expression.strip()
+        parts, columns, pos = [], [], 0
+        while pos < len(expression):
+            token = CHECK_TOKEN.match(expression, pos)
+            if token is None or token.end() == pos:
+                raise ValueError(f"недопустимый фрагмент: {expression[pos:]!r}")
+            pos = token.end()
+            if token["number"] is not None:
+                number = token["number"]
+                parts.append(self._param(float(number) if "." in number else int(number)))
+            elif token["string"] is not None:
+                parts.append(self._param(token["string"].replace("''", "'")))
+            elif token["word"] is not None:
+                word = token["word"]
+                if word.upper() in CHECK_KEYWORDS:
+                    parts.append(word.upper())
+                elif word in self.facts["columns"]:
+                    parts.append(self.q(word))
+                    columns.append(word)
+                else:
+                    raise ValueError(f"нет колонки {word} в {self.qualified}")
+            else:
+                parts.append(token["op"])
+        return " ".join(parts), list(dict.fromkeys(columns))
+
+    def add(self, config: dict, condition: str = None, kind: str = "rows",
+            column: str = None, static: dict = None, sample_columns: list = None,
+            all_rows: bool = False):
+        """Добавляет проверку.
+
+        condition — SQL-условие нарушающей строки (kind="rows");
+        kind="duplicates" — повторы column; kind="row_count" — число строк;
+        kind="present" — condition должно выполниться хотя бы для одной строки;
+        static — результат, известный без сканирования (каталог, ошибка);
+        all_rows — доля нарушений от всех строк, а не от непустых column
+        (проверки на NULL).
+        """
+        self.checks.append({"config": config, "condition": condition, "kind": kind,
+                            "column": column, "static": static,
+                            "sample_columns": sample_columns, "all_rows": all_rows})
+
+    # --- Ожидания ---
+
+    def add_expectation(self, exp: dict):
+        exp_type, kwargs = exp["expectation_type"], exp["kwargs"]
+        column = kwargs.get("column")
+        if exp_type == "expect_table_row_count_to_be_between":
+            self.add(exp, kind="row_count")
+            return
+        if column not in self.facts["columns"]:
+            self.add(exp, static={"exception": f"Колонка '{column}' отсутствует в {self.qualified}"})
+            return
+
+        col = self.q(column)
+        if exp_type == "expect_column_values_to_not_be_null":
+            if column in self.facts["not_null"]:
+                self.add(exp, static={"unexpected_count": 0, "note": "NOT NULL в схеме"})
+            else:
+                self.add(exp, f"{col} IS NULL", column=column, all_rows=True)
+        elif exp_type == "expect_column_values_to_be_unique":
+            if column in self.facts["unique"]:
+                self.add(exp, static={"unexpected_count": 0, "note": "UNIQUE/PRIMARY KEY в схеме"})
+            else:
+                self.add(exp, kind="duplicates", column=column)
+        elif exp_type == "expect_column_values_to_be_in_set":
+            values = ", ".join(self._param(v) for v in kwargs["value_set"])
+            self.add(exp, f"{col} IS NOT NULL AND {col} NOT IN ({values})", column=column)
+        elif exp_type == "expect_column_values_to_be_between":
+            parts = []
+            if kwargs.get("min_value") is not None:
+                op = "<=" if kwargs.get("strict_min") else "<"
+                parts.append(f"{col} {op} {self._param(kwargs['min_value'])}")
+            if kwargs.get("max_value") is not None:
+                op = ">=" if kwargs.get("strict_max") else ">"
+                parts.append(f"{col} {op} {self._param(kwargs['max_value'])}")
+            self.add(exp, f"({' OR '.join(parts) or 'FALSE'})", column=column)
+        else:
+            self.add(exp, static={"exception": f"Ожидание {exp_type} не переводится в SQL"})
+
+    # --- Правила качества из etl_config.json ---
+
+    def add_rule(self, rule: dict, config: dict):
+        tables = {t["name"]: t for t in config["source"]["tables"]}
+        info = tables.get(self.name, {})
+        pk = info.get("primary_key")
+        exp = {"expectation_type": f"{rule['name']} ({rule['severity']}, {rule['action']})",
+               "kwargs": {"column": rule["rule_id"]}}
+
+        if rule["name"] == "not_null_primary_key":
+            if pk in self.facts["not_null"]:
+                self.add(exp, static={"unexpected_count": 0, "note": "NOT NULL в схеме"})
+            elif pk in self.facts["columns"]:
+                self.add(exp, f"{self.q(pk)} IS NULL", column=pk, all_rows=True)
+        elif rule["name"] == "unique_primary_key":
+            if pk in self.facts["unique"]:
+                self.add(exp, static={"unexpected_count": 0, "note": "PRIMARY KEY в схеме"})
+            elif pk in self.facts["columns"]:
+                self.add(exp, kind="duplicates", column=pk)
+        elif rule["name"] == "referential_integrity":
+            for parent in [r["parent"] for r in relationships(config) if r["child"] == self.name]:
+                parent_key = tables.get(parent, {}).get("primary_key")
+                # родитель — в схеме таблицы, иначе в схеме по умолчанию
+                parent_table = next(
+                    (f"{schema}.{parent}" for schema in dict.fromkeys([self.schema, self.default_schema])
+                     if table_exists(self.engine, f"{schema}.{parent}")),
+                    f"{self.schema}.{parent}")
+                fk_exp = {"expectation_type": exp["expectation_type"],
+                          "kwargs": {"column": f"{rule['rule_id']} {parent_key} → {parent}"}}
+                if parent_key not in self.facts["columns"]:
+                    continue
+                if not table_exists(self.engine, parent_table):
+                    self.skipped.append(f"{fk_exp['kwargs']['column']}: нет таблицы {parent_table}")
+                    continue
+                alias = f"p{len(self.joins)}"
+                key = quote_ident(self.engine, parent_key)
+                self.joins.append(
+                    f"LEFT JOIN (SELECT DISTINCT {key} AS _k FROM {quote_ident(self.engine, parent_table)}) "
+                    f"{alias} ON {self.q(parent_key)} = {alias}._k")
+                self.add(fk_exp, f"{self.q(parent_key)} IS NOT NULL AND {alias}._k IS NULL",
+                         column=parent_key)
+        elif "checks_by_type" in rule:
+            value = next((c for c in SENSOR_VALUE_COLUMNS if c in self.facts["columns"]), None)
+            if value is None or "sensor_type" not in self.facts["columns"]:
+                self.add(exp, static={"exception": "Нет колонок sensor_type / значения показания"})
+                return
+            # в Модуле 1 (reading_value) типы датчиков названы по-русски
+            types = (module1_sensor_types(rule["checks_by_type"]) if value == "reading_value"
+                     else rule["checks_by_type"])
+            cases = " ".join(
+                f"WHEN {self._param(sensor)} THEN NOT ({self.q(value)} BETWEEN "
+                f"{self._param(bounds['min'])} AND {self._param(bounds['max'])})"
+                for sensor, bounds in types.items())
+            self.add(exp, f"COALESCE(CASE {self.q('sensor_type')} {cases} END, FALSE)",
+                     column=value, sample_columns=["sensor_type", value])
+            # тип без единой строки — правило для него ничего не проверяет
+            for sensor in types:
+                self.add({"expectation_type": exp["expectation_type"],
+                          "kwargs": {"column": f"{rule['rule_id']} sensor_type = {sensor}"}},
+                         f"{self.q('sensor_type')} = {self._param(sensor)}", kind="present")
+        elif "check" in rule:
+            # «предикат [WHERE фильтр]»: нарушение — фильтр выполнен, предикат ложен
+            try:
+                predicate, columns = self.compile_check(rule["check"].partition(" WHERE ")[0])
+                where, where_columns = self.compile_check(rule["check"].partition(" WHERE ")[2])
+            except ValueError as e:
+                self.add(exp, static={"exception": f"Правило не переводится в SQL ({e}): {rule['check']}"})
+                return
+            condition = f"COALESCE(NOT ({predicate}), FALSE)"
+            if where:
+                condition = f"({where}) AND {condition}"
+            self.add(exp, condition, sample_columns=list(dict.fromkeys(columns + where_columns)))
+
+    def add_rules(self, config: dict):
+        for rule in config.get("quality_rules", []):
+            applies_to = rule["applies_to"]
+            # связи из FOREIGN_KEYS проверяются и вне applies_to, как в referential_integrity
+            if (applies_to == "all_tables" or self.name in applies_to
+                    or (rule["rule_id"] == RULE_ID and self.name in FOREIGN_KEYS)):
+                self.add_rule(rule, config)
+
+    # --- Выполнение ---
+
+    def aggregates(self) -> tuple:
+        """({номер проверки: имя счётчика}, {номер: имя count(колонка)}, {выражение: имя}).
+
+        Одинаковые выражения (например, not_null из набора и QR-001 для PK)
+        считаются один раз.
+        """
+        names, bases, expressions = {}, {}, {}
+        for i, check in enumerate(self.checks):
+            if check["static"] is not None or check["kind"] == "row_count":
+                continue
+            if check["kind"] == "duplicates":
+                col = self.q(check["column"])
+                expr = f"count({col}) - count(DISTINCT {col})"
+            else:
+                expr = f"count(*) FILTER (WHERE {check['condition']})"
+            names[i] = expressions.setdefault(expr, f"c{i}")
+            if check["column"] and check["kind"] != "present" and not check["all_rows"]:
+                bases[i] = expressions.setdefault(f"count({self.q(check['column'])})", f"v{i}")
+        return names, bases, expressions
+
+    def source_sql(self) -> str:
+        return " ".join([f"{quote_ident(self.engine, self.qualified)} t"] + self.joins)
+
+    def aggregate_sql(self) -> str:
+        _, _, expressions = self.aggregates()
+        selects = ["count(*) AS n"] + [f"{expr} AS {name}" for expr, name in expressions.items()]
+        return f"SELECT {', '.join(selects)} FROM {self.source_sql()}"
+
+    def sample_sql(self, check: dict, limit: int) -> str:
+        """Запрос первых limit примеров нарушения — только для непройденной проверки."""
+        if check["kind"] == "duplicates":
+            col = self.q(check["column"])
+            return (f"SELECT {col} AS v FROM {self.source_sql()} WHERE {col} IS NOT NULL "
+                    f"GROUP BY {col} HAVING count(*) > 1 LIMIT {int(limit)}")
+        if check["sample_columns"]:
+            # строка-пример: первичный ключ + колонки правила
+            pk = self._primary_key()
+            columns = list(dict.fromkeys(([pk] if pk else []) + check["sample_columns"]))
+            # ключи JSON — имена колонок из каталога, не из конфигурации
+            value = "json_build_object(" + ", ".join(
+                "'" + c.replace("'", "''") + f"', {self.q(c)}" for c in columns) + ")"
+        else:
+            value = f"to_json({self.q(check['column'])})"
+        return f"SELECT {value} AS v FROM {self.source_sql()} WHERE {check['condition']} LIMIT {int(limit)}"
+
+    def _primary_key(self) -> str:
+        return next((c for c in self.facts["columns"] if c in self.facts["unique"]), None)
+
+    def run(self, sample_size: int = DEFAULT_SAMPLE_SIZE) -> dict:
+        """Агрегирующий запрос со счётчиками, затем примеры для непройденных проверок."""
+        from sqlalchemy import text
+
+        names, bases, _ = self.aggregates()
+        results, n_samples = [], 0
+        with self.engine.connect() as conn:
+            row = conn.execute(text(self.aggregate_sql()), self.params).mappings().one()
+            n_rows = int(row["n"])
+            received = _size(dict(row))
+            for i, check in enumerate(self.checks):
+                result = _result(check, n_rows, row[names[i]] if i in names else None,
+                                 row[bases[i]] if i in bases else None)
+                if (not result["success"] and sample_size and i in names
+                        and check["kind"] in ("rows", "duplicates")):
+                    values = conn.execute(text(self.sample_sql(check, sample_size)), self.params).scalars().all()
+                    result["result"]["partial_unexpected_list"] = _samples(values, check)
+                    received += _size(values)
+                    n_samples += 1
+                results.append(result)
+
+        n_success = sum(1 for r in results if r["success"])
+        return {
+            "success": n_success == len(results),
+            "results": results,
+            "statistics": {
+                "evaluated_expectations": len(results),
+                "successful_expectations": n_success,
+                "unsuccessful_expectations": len(results) - n_success,
+                "row_count": n_rows,
+                "table_scans": 1,
+                # запросы примеров (LIMIT) по непройденным проверкам
+                "sample_queries": n_samples,
+                # приблизительный объём данных, полученных клиентом
+                "bytes_received": received,
+            },
+        }
+
+
+def _samples(values: list, check: dict) -> list:
+    """Примеры: повторяющиеся ключи или значения/строки (JSON)."""
+    if check["kind"] == "duplicates":
+        return [{"value": _json_value(v)} for v in values]
+    return [json.loads(v) if isinstance(v, str) else v for v in values]
+
+
+def _size(value) -> int:
+    return len(json.dumps(value, default=str).encode("utf-8"))
+
+
+def _json_value(value):
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return value
+    if isinstance(value, Decimal):
+        return float(value)
+    return str(value)
+
+
+def _result(check: dict, n_rows: int, count, n_values=None) -> dict:
+    """Результат проверки в форме GX; n_values — непустые значения колонки."""
+    config = {"expectation_type": check["config"]["expectation_type"],
+              "kwargs": dict(check["config"]["kwargs"])}
+    static = check["static"] or {}
+    if "exception" in static:
+        return {"success": False, "expectation_config": config, "result": {},
+                "exception_info": {"raised_exception": True,
+                                   "exception_message": static["exception"]}}
+    if check["kind"] == "row_count":
+        lo, hi = config["kwargs"].get("min_value"), config["kwargs"].get("max_value")
+        success = (lo is None or n_rows >= lo) and (hi is None or n_rows <= hi)
+        return {"success": bool(success), "expectation_config": config,
+                "result": {"observed_value": n_rows}}
+
+    if check["kind"] == "present":
+        return {"success": bool(count), "expectation_config": config,
+                "result": {"observed_value": int(count or 0)}}
+
+    unexpected = int(static.get("unexpected_count", count or 0))
+    # как в GX: для not_null доля от всех строк, для остальных — от непустых
+    base = n_rows if n_values is None else int(n_values)
+    result = {"element_count": n_rows, "unexpected_count": unexpected,
+              "unexpected_percent": 100.0 * unexpected / base if base else None,
+              "partial_unexpected_list": []}
+    if n_values is not None:
+        result["missing_count"] = n_rows - base
+        result["missing_percent"] = 100.0 * (n_rows - base) / n_rows if n_rows else None
+    if "note" in static:
+        result["note"] = static["note"]
+    mostly = config["kwargs"].get("mostly", 1.0)
+    success = unexpected == 0 if mostly >= 1.0 else (
+        not base or 1 - unexpected / base >= mostly)
+    return {"success": bool(success), "expectation_config": config, "result": result}
+
+
+def base_name(table: str) -> str:
+    """Имя таблицы без схемы и суффикса месячной секции:
+    timeseries.sensor_readings_2025_03 → sensor_readings."""
+    return PARTITION_SUFFIX.sub("", table.split(".")[-1])
+
+
+def suite_for(table: str) -> list:
+    """Набор ожиданий по имени таблицы."""
+    factory = SUITES.get(base_name(table))
+    return factory() if factory else []
+
+
+def validate_table(engine, table: str, config: dict, schema: str = DEFAULT_SCHEMA,
+                   sample_size: int = DEFAULT_SAMPLE_SIZE) -> dict:
+    """Набор ожиданий + правила quality_rules для таблицы за одно сканирование."""
+    plan = PushdownPlan(engine, table, schema)
+    for exp in suite_for(table):
+        plan.add_expectation(exp)
+    plan.add_rules(config)
+    return plan.run(sample_size)
@@ -0,0 +1,496 @@
+"""
+Практикум по анализу и моделированию данных
+Модуль 2 (доп.): Загрузка CSV в staging через COPY
+Предприятие: «Руда+» — добыча железной руды
+
+Раздел staging файла etl_config.json (Модуль 4) задаёт слой staging:
+таблицы stg_<источник> с метаданными _load_id, _load_timestamp,
+_source_system и _row_hash и журнал загрузок etl_load_log. В
+02_etl_full_load.sql он заполняется INSERT ... SELECT из ruda_plus;
+здесь в него грузятся файлы — CSV Модуля 1 и выгрузки событий датчиков:
+
+  - файл читается блоками по block_bytes, блок режется по концу строки
+    (значения CSV не должны содержать переводов строки);
+  - блоки обрабатывают workers процессов, у каждого своё соединение:
+    Arrow разбирает блок (все колонки — текст, как в файле), добавляет
+    метаданные и пишет CSV в буфер в памяти, который уходит в
+    COPY ... FROM STDIN;
+  - _row_hash — тот же MD5(CONCAT_WS('|', ...)), что в 02_etl_full_load.sql:
+    колонки и их порядок — HASH_COLUMNS (списки из SQL, без ключа и
+    служебных полей), значения приводятся к типу колонки таблицы и
+    пишутся, как их выводит PostgreSQL (NUMERIC(5,2) — 32.50, даты,
+    метки времени); колонки, которой нет в файле, в staging будет NULL —
+    и в хеше она тоже NULL;
+  - пока процессы грузят свои блоки, главный процесс читает следующие:
+    в работе не больше 2 × workers блоков, память не зависит от файла;
+  - загрузка регистрируется в etl_load_log (running → completed/failed).
+    Полная загрузка начинается с TRUNCATE (cleanup_strategy
+    truncate_before_full_load); при ошибке строки этой загрузки
+    удаляются по _load_id.
+
+Если staging-таблицы ещё нет (01_staging_schema.sql не выполнялся или
+источник новый), она создаётся по типам, которые Arrow определил по
+первому блоку. В существующую таблицу грузятся только её колонки
+(с переименованием из SOURCES); колонки файла, которых в таблице нет,
+пропускаются, только если перечислены в SOURCES["skip"], — иначе
+загрузка не начинается.
+
+Вторичные индексы и внешние ключи на время полной загрузки снимаются.
+Их определения сначала записываются в staging.etl_deferred_ddl — в той же
+транзакции, что и удаление, — и удаляются оттуда по одному по мере
+восстановления. Если процесс упал посреди загрузки, следующая загрузка
+таблицы (или 14_staging_load.py --restore-secondary) строит их заново.
+"""
+
+import atexit
+import csv
+import io
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.csv as pacsv
+
+from datasets import DATA_DIR, ETL_CONFIG
+from db_profiling import make_engine, quote_ident
+from scd2 import hash_hex, join_ws, scd_settings
+from stream_windows import EVENTS_SAMPLE
+
+DEFAULT_BLOCK_MB = 8
+DEFAULT_WORKERS = 4
+DEFERRED_DDL = "etl_deferred_ddl"
+# источник без списка в HASH_COLUMNS: все колонки, кроме служебных
+HASH_EXCLUDED = {"created_at", "updated_at"}
+
+# колонки MD5(CONCAT_WS('|', ...)) из 02_etl_full_load.sql в том же порядке
+HASH_COLUMNS = {
+    "equipment": ["equipment_name", "type_id", "mine_id", "manufacturer", "model", "year_manufactured",
+                  "max_payload_tons", "engine_hours", "status", "last_maintenance_date",
+                  "next_maintenance_date"],
+    "ore_production": ["production_date", "shift", "mine_id", "equipment_id", "operator_id", "block_id",
+                       "ore_type", "tonnage_extracted", "fe_content_pct", "moisture_pct", "status"],
+    "downtime_events": ["equipment_id", "event_type", "event_category", "severity", "start_time",
+                        "end_time", "duration_minutes", "status"],
+    "sensor_readings": ["equipment_id", "sensor_type", "reading_timestamp", "sensor_value", "unit",
+                        "quality_flag"],
+    # в SQL Модуля 4 нет — по образцу sensor_readings
+    "sensor_events": ["equipment_id", "event_type", "event_timestamp", "sensor_value", "unit",
+                      "quality_flag"],
+}
+
+# источник → файл по умолчанию, _source_system, переименование колонок файла
+# в колонки таблиц 01_staging_schema.sql и колонки файла, которых в staging нет
+SOURCES = {
+    "equipment": {"path": DATA_DIR / "equipment.csv", "source_system": "ruda_plus.equipment",
+                  "skip": {"equipment_type": "в staging — type_id",
+                           "mine_name": "название шахты — в stg_mines"}},
+    "sensor_readings": {"path": DATA_DIR / "sensor_readings.csv", "source_system": "ruda_plus.sensor_readings",
+                        "renames": {"reading_value": "sensor_value"}},
+    "ore_production": {"path": DATA_DIR / "ore_production.csv", "source_system": "ruda_plus.ore_production",
+                       "skip": {"mine_name": "название шахты — в stg_mines",
+                                "horizon_level": "в staging нет горизонта",
+                                "operator_name": "ФИО, а в staging — operator_id",
+                                "start_time": "время смены по номеру shift",
+                                "end_time": "время смены по номеру shift"}},
+    "downtime_events": {"path": DATA_DIR / "downtime_events.csv", "source_system": "ruda_plus.downtime_events",
+                        "skip": {"reported_by": "ФИО, а в staging — reported_by_id VARCHAR(10)"}},
+    "sensor_events": {"path": EVENTS_SAMPLE, "source_system": "streaming.raw_sensor_events"},
+}
+
+PG_TYPES = [
+    (pa.types.is_boolean, "BOOLEAN"),
+    (pa.types.is_integer, "BIGINT"),
+    (pa.types.is_floating, "DOUBLE PRECISION"),
+    (pa.types.is_timestamp, "TIMESTAMP"),
+    (pa.types.is_date, "DATE"),
+    (pa.types.is_time, "TIME"),
+]
+
+LOAD_LOG_DDL = """
+CREATE TABLE IF NOT EXISTS {schema}.{load_log} (
+    load_id         SERIAL PRIMARY KEY,
+    table_name      VARCHAR(50) NOT NULL,
+    load_type       VARCHAR(20) NOT NULL CHECK (load_type IN ('full', 'incremental')),
+    status          VARCHAR(20) NOT NULL DEFAULT 'running'
+                    CHECK (status IN ('running', 'completed', 'failed')),
+    rows_extracted  INTEGER DEFAULT 0,
+    rows_loaded     INTEGER DEFAULT 0,
+    rows_rejected   INTEGER DEFAULT 0,
+    error_message   TEXT,
+    started_at      TIMESTAMP NOT NULL DEFAULT NOW(),
+    finished_at     TIMESTAMP
+)"""
+
+DEFERRED_DDL_DDL = """
+CREATE TABLE IF NOT EXISTS {schema}.{deferred} (
+    table_name      TEXT NOT NULL,
+    kind            TEXT NOT NULL CHECK (kind IN ('index', 'foreign_key')),
+    name            TEXT NOT NULL,
+    definition      TEXT NOT NULL,
+    dropped_at      TIMESTAMP NOT NULL DEFAULT NOW(),
+    PRIMARY KEY (table_name, name)
+)"""
+
+
+def staging_settings(config_path: Path = ETL_CONFIG) -> dict:
+    """Схема, префикс, имена колонок метаданных и журнала из раздела staging."""
+    with open(config_path, encoding="utf-8") as f:
+        staging = json.load(f).get("staging", {})
+    meta = staging.get("metadata_columns", {})
+    scd = scd_settings(config_path)
+    return {
+        "schema": staging.get("schema", "staging"),
+        "table_prefix": staging.get("table_prefix", "stg_"),
+        "load_id": meta.get("load_id", "_load_id"),
+        "load_timestamp": meta.get("load_timestamp", "_load_timestamp"),
+        "source_system": meta.get("source_system", "_source_system"),
+        "row_hash": meta.get("row_hash", "_row_hash"),
+        "load_log": staging.get("control_tables", {}).get("load_log", "etl_load_log"),
+        "truncate_full": staging.get("cleanup_strategy") == "truncate_before_full_load",
+        "hash_function": scd["hash_function"],
+        "hash_separator": scd["hash_separator"],
+    }
+
+
+# ============================================================
+# Чтение блоками
+# ============================================================
+
+def read_header(path: Path) -> tuple:
+    """Первая строка файла: (байты, имена колонок)."""
+    with open(path, "rb") as f:
+        header = f.readline()
+    return header, next(csv.reader([header.decode("utf-8-sig")]))
+
+
+def read_blocks(path: Path, block_bytes: int):
+    """Блоки файла без заголовка, каждый заканчивается концом строки."""
+    with open(path, "rb") as f:
+        f.readline()
+        tail = b""
+        while True:
+            data = f.read(block_bytes)
+            if not data:
+                break
+            data = tail + data
+            cut = data.rfind(b"\n") + 1
+            if cut == 0:
+                tail = data
+                continue
+            yield data[:cut]
+            tail = data[cut:]
+    if tail.strip():
+        yield tail + b"\n"
+
+
+def _parse(header: bytes, block: bytes, columns: list = None, as_text: bool = True) -> pa.Table:
+    convert = pacsv.ConvertOptions(
+        include_columns=columns,
+        column_types={c: pa.string() for c in columns} if as_text and columns else None,
+        strings_can_be_null=True)
+    return pacsv.read_csv(io.BytesIO(header + block), read_options=pacsv.ReadOptions(use_threads=False),
+                          convert_options=convert)
+
+
+# ============================================================
+# Рабочий процесс: блок → COPY
+# ============================================================
+
+def _init_worker(task: dict):
+    """Одно соединение на процесс — на все его блоки."""
+    global _task, _conn
+    _task = task
+    _conn = make_engine(pool_size=1).raw_connection()
+    atexit.register(_conn.close)
+
+
+def pg_text(values, pg_type: str, scale: int = None) -> pa.Array:
+    """Текст CSV → текст значения колонки типа pg_type, как его выводит PostgreSQL.
+
+    CONCAT_WS в SQL получает типизированные значения: NUMERIC(5,2)
+    выводится как 32.50, INTEGER — без ведущих нулей, метка времени —
+    без нулевой дробной части. Остальные типы остаются как в файле.
+    """
+    if pg_type in ("smallint", "integer", "bigint"):
+        return pc.cast(pc.cast(values, pa.int64()), pa.string())
+    if pg_type == "numeric" and scale is not None:
+        # PostgreSQL округляет до масштаба колонки половину от нуля
+        wide = pc.cast(values, pa.decimal128(38, max(scale, 10)))
+        rounded = pc.round(wide, ndigits=scale, round_mode="half_towards_infinity")
+        return pc.cast(pc.cast(rounded, pa.decimal128(38, scale)), pa.string())
+    if pg_type in ("double precision", "real"):
+        return pc.cast(pc.cast(values, pa.float64()), pa.string())
+    if pg_type == "date":
+        return pc.cast(pc.cast(values, pa.date32()), pa.string())
+    if pg_type == "timestamp without time zone":
+        text = pc.strftime(pc.cast(values, pa.timestamp("us")), format="%Y-%m-%d %H:%M:%S")
+        text = pc.replace_substring_regex(text, r"(\.\d*?)0+$", r"\1")
+        return pc.replace_substring_regex(text, r"\.$", "")
+    if pg_type == "boolean":
+        return pc.if_else(pc.cast(values, pa.bool_()), "t", "f")
+    return values
+
+
+def encode_block(task: dict, block: bytes) -> tuple:
+    """Блок CSV → (CSV для COPY с метаданными, число строк)."""
+    table = _parse(task["header"], block, task["source_columns"])
+    n = table.num_rows
+    hashed = []
+    for target, source, pg_type, scale in task["hash_columns"]:
+        # колонки нет в файле — в staging она NULL, и CONCAT_WS её пропустит
+        hashed.append(pa.nulls(n, pa.string()) if source is None
+                      else pg_text(table.column(source), pg_type, scale))
+    joined = join_ws(hashed, task["hash_separator"])
+    arrays = [table.column(c) for c in task["source_columns"]] + [
+        pa.repeat(pa.scalar(task["load_id"], pa.int64()), n),
+        pa.repeat(pa.scalar(task["load_timestamp"], pa.string()), n),
+        pa.repeat(pa.scalar(task["source_system"], pa.string()), n),
+        pa.array(hash_hex(joined, task["hash_function"]), pa.string()),
+    ]
+    buffer = io.BytesIO()
+    pacsv.write_csv(pa.table(arrays, names=task["target_columns"]), buffer,
+                    pacsv.WriteOptions(include_header=False))
+    return buffer, n
+
+
+def copy_block(block: bytes) -> dict:
+    """Выполняется в рабочем процессе: разбор, метаданные и COPY одного блока."""
+    started = time.perf_counter()
+    buffer, n = encode_block(_task, block)
+    encoded = time.perf_counter()
+    buffer.seek(0)
+    with _conn.cursor() as cur:
+        cur.copy_expert(_task["copy_sql"], buffer)
+    _conn.commit()
+    return {"rows": n, "bytes": len(block), "pid": os.getpid(),
+            "encode_seconds": encoded - started, "copy_seconds": time.perf_counter() - encoded}
+
+
+# ============================================================
+# Журнал и таблицы
+# ============================================================
+
+def _execute(engine, sql: str, params: dict = None):
+    from sqlalchemy import text
+
+    with engine.begin() as conn:
+        return conn.execute(text(sql), params or {})
+
+
+def ensure_staging(engine, settings: dict):
+    """Схема staging и журнал загрузок (как в 01_staging_schema.sql), если их нет."""
+    schema = quote_ident(engine, settings["schema"])
+    _execute(engine, f"CREATE SCHEMA IF NOT EXISTS {schema}")
+    _execute(engine, LOAD_LOG_DDL.format(schema=schema, load_log=quote_ident(engine, settings["load_log"])))
+    _execute(engine, DEFERRED_DDL_DDL.format(schema=schema, deferred=quote_ident(engine, DEFERRED_DDL)))
+
+
+def table_columns(engine, table: str) -> dict:
+    """Колонки таблицы по порядку: имя → (тип, масштаб NUMERIC)."""
+    schema, name = table.split(".")
+    rows = _execute(engine, "SELECT column_name, data_type, numeric_scale FROM information_schema.columns "
+                            "WHERE table_schema = :s AND table_name = :t ORDER BY ordinal_position",
+                    {"s": schema, "t": name})
+    return {r[0]: (r[1], r[2]) for r in rows}
+
+
+def create_table(engine, table: str, sample: pa.Table, settings: dict, renames: dict = None):
+    """Staging-таблица по типам первого блока и колонки метаданных."""
+    renames = renames or {}
+    columns = []
+    for field in sample.schema:
+        pg_type = next((t for check, t in PG_TYPES if check(field.type)), "TEXT")
+        columns.append(f"{quote_ident(engine, renames.get(field.name, field.name))} {pg_type}")
+    columns += [f"{quote_ident(engine, settings['load_id'])} INTEGER",
+                f"{quote_ident(engine, settings['load_timestamp'])} TIMESTAMP NOT NULL DEFAULT NOW()",
+                f"{quote_ident(engine, settings['source_system'])} VARCHAR(50) NOT NULL",
+                f"{quote_ident(engine, settings['row_hash'])} CHAR(32)"]
+    _execute(engine, f"CREATE TABLE IF NOT EXISTS {quote_ident(engine, table)} ({', '.join(columns)})")
+
+
+def drop_secondary(engine, table: str, settings: dict) -> int:
+    """Удаляет вторичные индексы и внешние ключи таблицы; возвращает их число.
+
+    Определения записываются в etl_deferred_ddl в той же транзакции,
+    что и удаление: после сбоя restore_secondary() найдёт их там.
+    Индексы PRIMARY KEY / UNIQUE остаются: без них нельзя проверить
+    ключ, а COPY в таблицу с ними всё равно быстрее INSERT.
+    """
+    from sqlalchemy import text
+
+    qtable = quote_ident(engine, table)
+    indexes = _execute(engine, """
+        SELECT n.nspname || '.' || i.relname, pg_get_indexdef(i.oid)
+        FROM pg_index x JOIN pg_class i ON i.oid = x.indexrelid
+        JOIN pg_namespace n ON n.oid = i.relnamespace
+        WHERE x.indrelid = to_regclass(:t)
+          AND NOT EXISTS (SELECT 1 FROM pg_constraint c WHERE c.conindid = x.indexrelid)""",
+                       {"t": table}).all()
+    foreign_keys = _execute(engine, "SELECT conname, pg_get_constraintdef(oid) FROM pg_constraint "
+                                    "WHERE conrelid = to_regclass(:t) AND contype = 'f'", {"t": table}).all()
+    deferred = quote_ident(engine, f"{settings['schema']}.{DEFERRED_DDL}")
+    record = text(f"INSERT INTO {deferred} (table_name, kind, name, definition) VALUES (:t, :k, :n, :d)")
+    with engine.begin() as conn:
+        for name, definition in indexes:
+            conn.execute(record, {"t": table, "k": "index", "n": name, "d": definition})
+            conn.execute(text(f"DROP INDEX {quote_ident(engine, name)}"))
+        for name, definition in foreign_keys:
+            conn.execute(record, {"t": table, "k": "foreign_key", "n": name,
+                                  "d": f"ALTER TABLE {qtable} ADD CONSTRAINT {quote_ident(engine, name)} {definition}"})
+            conn.execute(text(f"ALTER TABLE {qtable} DROP CONSTRAINT {quote_ident(engine, name)}"))
+    return len(indexes) + len(foreign_keys)
+
+
+def restore_secondary(engine, table: str, settings: dict) -> int:
+    """Строит снятые индексы и внешние ключи из etl_deferred_ddl; возвращает их число.
+
+    Каждый объект создаётся и вычёркивается из etl_deferred_ddl одной
+    транзакцией, так что повторный вызов после сбоя продолжит с того же места.
+    Индексы строятся раньше внешних ключей.
+    """
+    from sqlalchemy import text
+
+    deferred = quote_ident(engine, f"{settings['schema']}.{DEFERRED_DDL}")
+    rows = _execute(engine, f"SELECT name, definition FROM {deferred} WHERE table_name = :t "
+                            "ORDER BY kind DESC, dropped_at", {"t": table}).all()
+    for name, definition in rows:
+        with engine.begin() as conn:
+            conn.execute(text(definition))
+            conn.execute(text(f"DELETE FROM {deferred} WHERE table_name = :t AND name = :n"),
+                         {"t": table, "n": name})
+    return len(rows)
+
+
+def start_load(engine, settings: dict, name: str, load_type: str) -> tuple:
+    log = quote_ident(engine, f"{settings['schema']}.{settings['load_log']}")
+    row = _execute(engine, f"INSERT INTO {log} (table_name, load_type, status) "
+                           "VALUES (:t, :k, 'running') RETURNING load_id, started_at",
+                   {"t": name, "k": load_type}).one()
+    return row[0], row[1]
+
+
+def finish_load(engine, settings: dict, load_id: int, rows: int):
+    log = quote_ident(engine, f"{settings['schema']}.{settings['load_log']}")
+    _execute(engine, f"UPDATE {log} SET status = 'completed', rows_extracted = :n, rows_loaded = :n, "
+                     "rows_rejected = 0, finished_at = NOW() WHERE load_id = :id", {"n": rows, "id": load_id})
+
+
+def fail_load(engine, settings: dict, load_id: int, table: str, error: str):
+    """Загрузка помечается failed, её строки удаляются из staging."""
+    _execute(engine, f"DELETE FROM {quote_ident(engine, table)} "
+                     f"WHERE {quote_ident(engine, settings['load_id'])} = :id", {"id": load_id})
+    log = quote_ident(engine, f"{settings['schema']}.{settings['load_log']}")
+    _execute(engine, f"UPDATE {log} SET status = 'failed', error_message = :e, finished_at = NOW() "
+                     "WHERE load_id = :id", {"e": error[:2000], "id": load_id})
+
+
+# ============================================================
+# Загрузка файла
+# ============================================================
+
+def load_file(name: str, path: Path = None, load_type: str = "full", workers: int = DEFAULT_WORKERS,
+              block_bytes: int = DEFAULT_BLOCK_MB << 20, settings: dict = None, source_system: str = None,
+              defer_indexes: bool = True, on_block=None) -> dict:
+    """Грузит CSV в staging.<prefix><name>; возвращает итог с load_id и скоростью.
+
+    При полной загрузке (defer_indexes) вторичные индексы и внешние ключи
+    снимаются до COPY и строятся заново одним проходом после: обновлять
+    три индекса stg_sensor_readings и проверять FK _load_id на каждой
+    строке втрое дороже самого COPY. Оставшиеся от упавшей загрузки
+    строятся до начала новой. on_block(result) вызывается после каждого
+    загруженного блока.
+    """
+    settings = settings or staging_settings()
+    source = SOURCES.get(name, {})
+    path = Path(path or source["path"])
+    table = f"{settings['schema']}.{settings['table_prefix']}{name}"
+    engine = make_engine(pool_size=1)
+    ensure_staging(engine, settings)
+
+    header, file_columns = read_header(path)
+    renames = source.get("renames", {})
+    existing = table_columns(engine, table)
+    if not existing:
+        first = next(read_blocks(path, block_bytes), b"")
+        create_table(engine, table, _parse(header, first, as_text=False), settings, renames)
+        existing = table_columns(engine, table)
+    meta = [settings[k] for k in ("load_id", "load_timestamp", "source_system", "row_hash")]
+    missing_meta = [c for c in meta if c not in existing]
+    if missing_meta:
+        raise ValueError(f"В {table} нет колонок метаданных: {', '.join(missing_meta)}")
+    source_columns = [c for c in file_columns if renames.get(c, c) in existing and renames.get(c, c) not in meta]
+    skipped = [c for c in file_columns if c not in source_columns]
+    unmapped = [c for c in skipped if c not in source.get("skip", {})]
+    if unmapped:
+        raise ValueError(f"Колонок файла нет в {table}: {', '.join(unmapped)} "
+                         "(переименование — SOURCES[...]['renames'], пропуск — SOURCES[...]['skip'])")
+    target_columns = [renames.get(c, c) for c in source_columns] + meta
+    by_target = {renames.get(c, c): c for c in source_columns}
+    hash_targets = HASH_COLUMNS.get(name) or [c for c in existing if c not in meta and c not in HASH_EXCLUDED]
+
+    recovered = restore_secondary(engine, table, settings)
+    load_id, started_at = start_load(engine, settings, name, load_type)
+    if load_type == "full" and settings["truncate_full"]:
+        _execute(engine, f"TRUNCATE TABLE {quote_ident(engine, table)}")
+    deferred = drop_secondary(engine, table, settings) if load_type == "full" and defer_indexes else 0
+    columns_sql = ", ".join(quote_ident(engine, c) for c in target_columns)
+    task = {
+        "header": header,
+        "source_columns": source_columns,
+        "target_columns": target_columns,
+        "hash_columns": [(c, by_target.get(c), *existing.get(c, ("text", None))) for c in hash_targets],
+        "hash_function": settings["hash_function"],
+        "hash_separator": settings["hash_separator"],
+        "load_id": load_id,
+        "load_timestamp": f"{started_at:%Y-%m-%d %H:%M:%S.%f}",
+        "source_system": source_system or source.get("source_system", f"file.{path.name}")[:50],
+        "copy_sql": f"COPY {quote_ident(engine, table)} ({columns_sql}) FROM STDIN WITH (FORMAT csv)",
+    }
+
+    started = time.perf_counter()
+    totals = {"rows": 0, "bytes": 0, "blocks": 0, "encode_seconds": 0.0, "copy_seconds": 0.0}
+    try:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(task,)) as pool:
+            pending = set()
+
+            def collect(done):
+                for future in done:
+                    result = future.result()
+                    for key in ("rows", "bytes", "encode_seconds", "copy_seconds"):
+                        totals[key] += result[key]
+                    totals["blocks"] += 1
+                    if on_block:
+                        on_block(result)
+
+            try:
+                for block in read_blocks(path, block_bytes):
+                    # конвейер: пока блоки грузятся, читаются следующие, но не больше 2 × workers
+                    if len(pending) >= 2 * workers:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                        collect(done)
+                    pending.add(pool.submit(copy_block, block))
+                collect(wait(pending).done)
+            except BaseException:
+                for future in pending:
+                    future.cancel()
+                raise
+    except Exception as e:
+        fail_load(engine, settings, load_id, table, f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        indexed = time.perf_counter()
+        restore_secondary(engine, table, settings)
+        totals["index_seconds"] = time.perf_counter() - indexed
+    finish_load(engine, settings, load_id, totals["rows"])
+    engine.dispose()
+
+    seconds = time.perf_counter() - started
+    return {"name": name, "table": table, "path": str(path), "load_id": load_id, "load_type": load_type,
+            "columns": target_columns, "skipped_columns": skipped, "workers": workers,
+            "deferred": deferred, "recovered": recovered,
+            "seconds": seconds, "rows_per_second": totals["rows"] / seconds if seconds else None,
+            "mb_per_second": totals["bytes"] / 2**20 / seconds if seconds else None, **totals}
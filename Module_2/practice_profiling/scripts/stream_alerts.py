@@ -0,0 +1,288 @@
+"""
+Практикум по анализу и моделированию данных
+Модуль 2 (доп.): Потоковые алерты с эскалацией
+Предприятие: «Руда+» — добыча железной руды
+
+Правила берутся из streaming.alert_rules и streaming.escalation файла
+etl_config.json (Модуль 4). В 04_stream_processing.sql те же пороги
+записаны вручную в таблицу streaming.alert_rules и применяются JOIN'ом
+ко всей таблице событий; эскалации там нет.
+
+Правила «компилируются» в четыре массива порогов по типам датчиков:
+warning_low, warning_high, critical_low, critical_high (NaN — порога
+нет). Обычное правило — верхний порог, direction = "below" — нижний,
+warning_low/…_high (давление) — диапазон. Пакет событий проверяется
+против всех правил сразу: индексирование массивов по коду типа и
+сравнения numpy, без цикла по событиям.
+
+Эскалация (escalation) ведётся для ключа equipment_id × sensor_type
+в компактных массивах numpy:
+  - кольцо времён последних warning_to_critical_count предупреждений:
+    если все они уложились в warning_to_critical_window_minutes —
+    выдаётся critical «по повторам»;
+  - время открытия неподтверждённого critical: если за
+    critical_ack_timeout_minutes его не подтвердили (acknowledge) и
+    critical_to_emergency = true — выдаётся emergency.
+Через конечный автомат проходят только нарушившие порог события, обычно
+это доли процента потока.
+
+Время — время событий: таймер подтверждения истекает, когда поток
+дошёл до open + timeout. События с quality_flag = 'bad' (неисправный
+датчик) не проверяются.
+
+Результат — строки в формате timeseries.alerts
+(Module_5/practice/scripts/01_timescaledb_setup.sql).
+
+    engine = AlertEngine(load_config())
+    for batch in read_events(path):
+        alerts = engine.process(batch)
+"""
+
+import numpy as np
+import pandas as pd
+
+from stream_windows import EXCLUDED_QUALITY, MINUTE_MS, KeyRegistry, timestamps_ms
+
+SEVERITIES = ["warning", "critical", "emergency"]
+OUTPUT_COLUMNS = ["alert_time", "equipment_id", "sensor_type", "severity", "trigger_value",
+                  "threshold", "message", "acknowledged", "acknowledged_by", "acknowledged_at"]
+NONE_TS = np.iinfo(np.int64).min
+
+SENSOR_NAMES = {
+    "temperature": "Температура",
+    "vibration": "Вибрация",
+    "pressure": "Давление",
+    "speed": "Скорость",
+    "fuel_level": "Уровень топлива",
+}
+
+
+# ============================================================
+# Компиляция правил
+# ============================================================
+
+def compile_rules(alert_rules: dict) -> dict:
+    """streaming.alert_rules → массивы порогов, индекс — код типа датчика."""
+    types = list(alert_rules)
+    bounds = {name: np.full(len(types), np.nan)
+              for name in ("warning_low", "warning_high", "critical_low", "critical_high")}
+    for i, sensor_type in enumerate(types):
+        rule = alert_rules[sensor_type]
+        if "warning_threshold" in rule:
+            side = "low" if rule.get("direction") == "below" else "high"
+            bounds[f"warning_{side}"][i] = rule["warning_threshold"]
+            bounds[f"critical_{side}"][i] = rule["critical_threshold"]
+        for name in bounds:
+            if name in rule:
+                bounds[name][i] = rule[name]
+    units = [alert_rules[t].get("unit", "") for t in types]
+    return {"types": types, "units": units, **bounds}
+
+
+def evaluate(rules: dict, codes: np.ndarray, values: np.ndarray):
+    """Уровень (0 — норма, 1 — warning, 2 — critical) и нарушенный порог.
+
+    codes — код типа датчика из rules["types"], -1 для типов без правил.
+    """
+    known = codes >= 0
+    idx = np.where(known, codes, 0)
+    level = np.zeros(len(values), dtype=np.int8)
+    threshold = np.full(len(values), np.nan)
+    # сравнение с NaN ложно, поэтому отсутствующий порог не срабатывает
+    for severity, code in (("warning", 1), ("critical", 2)):
+        low, high = rules[f"{severity}_low"][idx], rules[f"{severity}_high"][idx]
+        below, above = values < low, values > high
+        hit = known & (below | above)
+        level[hit] = code
+        threshold[hit] = np.where(below, low, high)[hit]
+    return level, threshold
+
+
+# ============================================================
+# Движок
+# ============================================================
+
+class AlertEngine:
+    """Пороговые алерты по пакетам событий и эскалация по ключам."""
+
+    def __init__(self, config: dict):
+        streaming = config["streaming"]
+        self.rules = compile_rules(streaming["alert_rules"])
+        escalation = streaming.get("escalation", {})
+        self.repeat_count = int(escalation.get("warning_to_critical_count", 0))
+        self.repeat_window_ms = int(escalation.get("warning_to_critical_window_minutes", 0) * MINUTE_MS)
+        self.ack_timeout_ms = int(escalation.get("critical_ack_timeout_minutes", 0) * MINUTE_MS)
+        self.to_emergency = bool(escalation.get("critical_to_emergency", False))
+
+        self.keys = KeyRegistry()
+        self.key_type = np.zeros(0, dtype=np.int64)
+        # состояние эскалации по ключам
+        self.warnings = np.zeros((0, max(self.repeat_count, 1)), dtype=np.int64)
+        self.warning_pos = np.zeros(0, dtype=np.int64)
+        self.open_at = np.zeros(0, dtype=np.int64)
+        self.open_value = np.zeros(0)
+        self.open_threshold = np.zeros(0)
+
+        self.acks = {}
+        self.now = NONE_TS
+        self.n_events = 0
+        self.n_excluded = 0
+        self.n_acknowledged = 0
+        self.n_alerts = dict.fromkeys(SEVERITIES, 0)
+
+    # --- состояние ---
+
+    def _grow(self):
+        n, known = len(self.keys), len(self.open_at)
+        if n == known:
+            return
+        extra = n - known
+        self.warnings = np.vstack([self.warnings, np.full((extra, self.warnings.shape[1]), NONE_TS)])
+        self.warning_pos = np.concatenate([self.warning_pos, np.zeros(extra, dtype=np.int64)])
+        self.open_at = np.concatenate([self.open_at, np.full(extra, NONE_TS)])
+        self.open_value = np.concatenate([self.open_value, np.zeros(extra)])
+        self.open_threshold = np.concatenate([self.open_threshold, np.zeros(extra)])
+        types = np.array([key[1] for key in self.keys.keys[known:]], dtype=object)
+        codes = pd.Categorical(types, categories=self.rules["types"]).codes
+        self.key_type = np.concatenate([self.key_type, codes.astype(np.int64)])
+
+    def acknowledge(self, equipment_id: str, sensor_type: str, at):
+        """Подтверждение оператора: critical, открытый до at, не станет emergency."""
+        at_ms = pd.Timestamp(at).value // 1_000_000
+        self.acks.setdefault((equipment_id, sensor_type), []).append(at_ms)
+
+    def _acknowledged(self, key: int, opened: int, until: int) -> bool:
+        times = self.acks.get(self.keys.keys[key])
+        return bool(times) and any(opened <= t <= until for t in times)
+
+    # --- приём событий ---
+
+    def process(self, events: pd.DataFrame) -> pd.DataFrame:
+        """Проверяет пакет событий; возвращает выданные им алерты."""
+        self.n_events += len(events)
+        if "quality_flag" in events.columns:
+            keep = (events["quality_flag"] != EXCLUDED_QUALITY).to_numpy()
+            self.n_excluded += int((~keep).sum())
+            events = events[keep]
+        if events.empty:
+            return self._frame([])
+
+        values = events["sensor_value"].to_numpy(dtype=np.float64)
+        codes = pd.Categorical(events["event_type"], categories=self.rules["types"]).codes
+        level, threshold = evaluate(self.rules, codes.astype(np.int64), values)
+        ts = timestamps_ms(events["event_timestamp"])
+
+        alerts = []
+        hit = np.flatnonzero(level)
+        if len(hit):
+            keys = self.keys.encode(events["equipment_id"].iloc[hit], events["event_type"].iloc[hit])
+            self._grow()
+            order = np.lexsort((ts[hit], keys))
+            alerts = self._escalate(keys[order], ts[hit][order], values[hit][order],
+                                    level[hit][order], threshold[hit][order])
+        self.now = max(self.now, int(ts.max()))
+        alerts += self._expire(self.now)
+        return self._frame(alerts)
+
+    def _escalate(self, keys, ts, values, level, threshold) -> list:
+        """Конечный автомат по нарушениям, упорядоченным по (ключ, время)."""
+        alerts = []
+        ring = self.warnings.shape[1]
+        for key, at, value, lvl, bound in zip(keys.tolist(), ts.tolist(), values.tolist(),
+                                              level.tolist(), threshold.tolist()):
+            alerts += self._expire_key(key, at)
+            if lvl == 1:
+                alerts.append((at, key, 0, value, bound, None))
+                if not self.repeat_count:
+                    continue
+                self.warnings[key, self.warning_pos[key] % ring] = at
+                self.warning_pos[key] += 1
+                oldest = self.warnings[key].min()
+                if oldest != NONE_TS and at - oldest <= self.repeat_window_ms:
+                    self.warnings[key] = NONE_TS
+                    if self.open_at[key] == NONE_TS:
+                        side = "low" if value < bound else "high"
+                        bound = self.rules[f"critical_{side}"][self.key_type[key]]
+                        alerts.append((at, key, 1, value, bound, "repeat"))
+                        self._open(key, at, value, bound)
+            else:
+                alerts.append((at, key, 1, value, bound, None))
+                if self.open_at[key] == NONE_TS:
+                    self._open(key, at, value, bound)
+        return alerts
+
+    def _open(self, key: int, at: int, value: float, bound: float):
+        if self.to_emergency:
+            self.open_at[key] = at
+            self.open_value[key] = value
+            self.open_threshold[key] = bound
+
+    def _expire_key(self, key: int, now: int) -> list:
+        opened = self.open_at[key]
+        if opened == NONE_TS:
+            return []
+        deadline = opened + self.ack_timeout_ms
+        if self._acknowledged(key, opened, min(now, deadline)):
+            self.open_at[key] = NONE_TS
+            self.n_acknowledged += 1
+            return []
+        if now < deadline:
+            return []
+        self.open_at[key] = NONE_TS
+        return [(opened + self.ack_timeout_ms, key, 2, self.open_value[key], self.open_threshold[key], "timeout")]
+
+    def _expire(self, now: int) -> list:
+        """emergency для всех ключей, чей critical не подтверждён за таймаут."""
+        if now == NONE_TS:
+            return []
+        due = np.flatnonzero((self.open_at != NONE_TS) & (self.open_at <= now - self.ack_timeout_ms))
+        return [alert for key in due.tolist() for alert in self._expire_key(key, now)]
+
+    # --- результат ---
+
+    def _message(self, key: int, severity: int, value: float, bound: float, reason) -> str:
+        sensor_type = self.keys.keys[key][1]
+        code = self.key_type[key]
+        name = SENSOR_NAMES.get(sensor_type, sensor_type)
+        unit = self.rules["units"][code] if code >= 0 else ""
+        if reason == "repeat":
+            return (f"{name}: {self.repeat_count} предупреждения за "
+                    f"{self.repeat_window_ms // MINUTE_MS} мин (значение: {value:.1f} {unit})")
+        if reason == "timeout":
+            return (f"{name}: критическое значение {value:.1f} {unit} не подтверждено "
+                    f"за {self.ack_timeout_ms // MINUTE_MS} мин")
+        side = "ниже" if value < bound else "выше"
+        return f"{name} {side} {bound:g} {unit} — {SEVERITIES[severity]} (значение: {value:.1f} {unit})"
+
+    def _frame(self, alerts: list) -> pd.DataFrame:
+        """Алерты в формате timeseries.alerts, по времени срабатывания."""
+        if not alerts:
+            return pd.DataFrame(columns=OUTPUT_COLUMNS)
+        alerts.sort(key=lambda alert: alert[0])
+        at, keys, severity, value, bound, reason = zip(*alerts)
+        for code in severity:
+            self.n_alerts[SEVERITIES[code]] += 1
+        key_table = self.keys.keys
+        return pd.DataFrame({
+            "alert_time": pd.to_datetime(np.array(at, dtype=np.int64), unit="ms"),
+            "equipment_id": [key_table[k][0] for k in keys],
+            "sensor_type": [key_table[k][1] for k in keys],
+            "severity": [SEVERITIES[s] for s in severity],
+            "trigger_value": value,
+            "threshold": bound,
+            "message": [self._message(*alert[1:]) for alert in alerts],
+            "acknowledged": False,
+            "acknowledged_by": None,
+            "acknowledged_at": pd.NaT,
+        })
+
+    def summary(self) -> dict:
+        return {
+            "n_events": self.n_events,
+            "n_excluded": self.n_excluded,
+            "n_keys": len(self.keys),
+            "n_alerts": dict(self.n_alerts),
+            "n_acknowledged": self.n_acknowledged,
+            "open_critical": int((self.open_at != NONE_TS).sum()),
+        }
+
@@ -0,0 +1,409 @@
+"""
+Практикум по анализу и моделированию данных
+Модуль 2 (доп.): Инкрементальные оконные агрегации потока событий датчиков
+Предприятие: «Руда+» — добыча железной руды
+
+Окна берутся из streaming.window_config файла etl_config.json (Модуль 4):
+tumbling_5min, tumbling_1h и sliding_10min с шагом 1 минута. В
+04_stream_processing.sql каждое окно пересчитывается по всей таблице
+событий. Здесь агрегаты считаются по мере поступления событий.
+
+Время делится на «панели» (panes) длиной НОД всех размеров и шагов окон
+(здесь 1 минута). Событие меняет ровно одну панель своего ключа
+equipment_id × event_type — за O(1), сколько бы окон его ни накрывало.
+В панели хранятся count, сумма и сумма квадратов отклонений от «сдвига»
+ключа (первое значение ключа: так дисперсия не теряет точность), min и
+max. Окно [start, end) — это слияние панелей внутри него: для 5 минут —
+5 панелей, для часа — 60, для скользящего окна 10 минут — 10.
+
+События подаются пакетами (micro-batch). Все операции над пакетом
+векторные (numpy): сортировка по (панель, ключ) и reduceat — Python-кода
+на событие нет.
+
+Время события и поздние события:
+  - watermark = наибольшее время события − lateness (--lateness-seconds);
+    сдвигается после каждого пакета;
+  - окно закрывается и выдаётся, когда watermark дошёл до его конца;
+  - событие старше watermark попадает только в ещё не закрытые окна,
+    для закрытых оно считается поздним (счётчик late по типу окна);
+    если все его окна уже закрыты и панель удалена — событие отброшено.
+
+Как и в SQL, события с quality_flag = 'bad' не агрегируются.
+Результат — строки в формате streaming.window_aggregations.
+
+    aggregator = WindowAggregator(window_specs(config), lateness_ms=60_000)
+    for batch in read_events(path, chunksize=100_000):
+        closed = aggregator.process(batch)
+    closed = aggregator.flush()
+"""
+
+import json
+from math import gcd
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from datasets import ETL_CONFIG
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+MODULE4_DATA = SCRIPT_DIR.parent.parent.parent / "Module_4" / "practice" / "data"
+EVENTS_SAMPLE = MODULE4_DATA / "sensor_events_sample.csv"
+
+EVENT_COLUMNS = ["event_id", "event_timestamp", "equipment_id", "event_type",
+                 "sensor_value", "unit", "quality_flag"]
+EXCLUDED_QUALITY = "bad"
+DEFAULT_LATENESS_MS = 60_000
+MINUTE_MS = 60_000
+OUTPUT_COLUMNS = ["equipment_id", "event_type", "window_type", "window_start", "window_end",
+                  "reading_count", "avg_value", "min_value", "max_value", "stddev_value", "sum_value"]
+
+
+def load_config(path: Path = ETL_CONFIG) -> dict:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def window_specs(config: dict) -> list:
+    """Окна из streaming.window_config: [{"name", "size_ms", "slide_ms"}, ...]."""
+    windows = config["streaming"]["window_config"]
+    specs = [{"name": w["name"], "size_ms": w["size_minutes"] * MINUTE_MS,
+              "slide_ms": w["size_minutes"] * MINUTE_MS}
+             for w in windows.get("tumbling_windows", [])]
+    specs += [{"name": w["name"], "size_ms": w["size_minutes"] * MINUTE_MS,
+               "slide_ms": w["slide_minutes"] * MINUTE_MS}
+              for w in windows.get("sliding_windows", [])]
+    return specs
+
+
+# ============================================================
+# Источники событий
+# ============================================================
+
+def read_events(path: Path = EVENTS_SAMPLE, chunksize: int = 100_000):
+    """CSV в формате sensor_events_sample.csv пакетами по chunksize строк."""
+    dtype = {"event_id": "object", "equipment_id": "category", "event_type": "category",
+             "sensor_value": "float64", "unit": "category", "quality_flag": "category"}
+    with pd.read_csv(path, dtype=dtype, chunksize=chunksize) as reader:
+        for chunk in reader:
+            chunk["event_timestamp"] = pd.to_datetime(chunk["event_timestamp"],
+                                                      format="%Y-%m-%d %H:%M:%S.%f")
+            yield chunk
+
+
+def synthetic_events(n: int, n_equipment: int = 50, start: str = "2025-03-15 08:00:00",
+                     rate_per_second: float = 1000.0, disorder_ms: int = 5_000,
+                     batch_size: int = 100_000, seed: int = 42, template: pd.DataFrame = None):
+    """Поток из n событий с типами, единицами и уровнями значений образца.
+
+    Время событий растёт со скоростью rate_per_second, каждое событие
+    смещено на случайную величину до disorder_ms — поток приходит не по
+    порядку, как из брокера с несколькими секциями.
+    """
+    rng = np.random.default_rng(seed)
+    if template is None:
+        template = pd.read_csv(EVENTS_SAMPLE)
+    levels = template.groupby(["event_type", "unit"])["sensor_value"].agg(["mean", "std"]).reset_index()
+    equipment = np.array([f"EQ-{i:03d}" for i in range(1, n_equipment + 1)], dtype=object)
+    origin = pd.Timestamp(start).value // 1_000_000
+    for offset in range(0, n, batch_size):
+        size = min(batch_size, n - offset)
+        ordinal = np.arange(offset, offset + size)
+        ts = origin + (ordinal * 1000 / rate_per_second).astype(np.int64)
+        ts += rng.integers(-disorder_ms, disorder_ms + 1, size) if disorder_ms else 0
+        kind = rng.integers(0, len(levels), size)
+        values = rng.normal(levels["mean"].to_numpy()[kind], levels["std"].fillna(1.0).to_numpy()[kind])
+        quality = np.where(rng.random(size) < 0.01, "bad", "good").astype(object)
+        yield pd.DataFrame({
+            "event_id": np.char.add("EVT-", np.char.zfill(ordinal.astype(str), 9)),
+            "event_timestamp": pd.to_datetime(ts, unit="ms"),
+            "equipment_id": pd.Categorical(equipment[rng.integers(0, n_equipment, size)]),
+            "event_type": pd.Categorical(levels["event_type"].to_numpy()[kind]),
+            "sensor_value": np.round(values, 2),
+            "unit": pd.Categorical(levels["unit"].to_numpy()[kind]),
+            "quality_flag": pd.Categorical(quality),
+        })
+
+
+def timestamps_ms(series: pd.Series) -> np.ndarray:
+    """Метки времени в миллисекундах epoch (int64)."""
+    return series.to_numpy(dtype="datetime64[ms]").astype(np.int64)
+
+
+# ============================================================
+# Ключи equipment_id × event_type
+# ============================================================
+
+class KeyRegistry:
+    """Сквозные номера ключей (equipment_id, event_type) между пакетами."""
+
+    def __init__(self):
+        self.codes = {}
+        self.keys = []
+
+    def encode(self, equipment: pd.Series, event_type: pd.Series) -> np.ndarray:
+        # пары кодируются внутри пакета, в словарь идут только уникальные
+        pairs = pd.MultiIndex.from_arrays([equipment, event_type])
+        local, uniques = pd.factorize(pairs)
+        ids = np.fromiter((self._id(key) for key in uniques), dtype=np.int64, count=len(uniques))
+        return ids[local]
+
+    def _id(self, key: tuple) -> int:
+        code = self.codes.get(key)
+        if code is None:
+            code = self.codes[key] = len(self.keys)
+            self.keys.append(key)
+        return code
+
+    def __len__(self):
+        return len(self.keys)
+
+
+# ============================================================
+# Панели
+# ============================================================
+
+class Pane:
+    """Агрегаты всех ключей за один интервал длиной pane_ms."""
+
+    __slots__ = ("count", "s1", "s2", "min", "max")
+
+    def __init__(self, capacity: int):
+        self.count = np.zeros(capacity, dtype=np.int64)
+        self.s1 = np.zeros(capacity)
+        self.s2 = np.zeros(capacity)
+        self.min = np.full(capacity, np.inf)
+        self.max = np.full(capacity, -np.inf)
+
+    def grow(self, capacity: int):
+        extra = capacity - len(self.count)
+        if extra > 0:
+            self.count = np.concatenate([self.count, np.zeros(extra, dtype=np.int64)])
+            self.s1 = np.concatenate([self.s1, np.zeros(extra)])
+            self.s2 = np.concatenate([self.s2, np.zeros(extra)])
+            self.min = np.concatenate([self.min, np.full(extra, np.inf)])
+            self.max = np.concatenate([self.max, np.full(extra, -np.inf)])
+
+
+class WindowAggregator:
+    """Tumbling и sliding окна по панелям с watermark и поздними событиями."""
+
+    def __init__(self, specs: list, lateness_ms: int = DEFAULT_LATENESS_MS):
+        self.specs = specs
+        self.lateness_ms = lateness_ms
+        self.pane_ms = 0
+        for spec in specs:
+            self.pane_ms = gcd(self.pane_ms, gcd(spec["size_ms"], spec["slide_ms"]))
+        for spec in specs:
+            spec["size"] = spec["size_ms"] // self.pane_ms
+            spec["slide"] = spec["slide_ms"] // self.pane_ms
+        self.keys = KeyRegistry()
+        self.shift = np.zeros(0)
+        self.panes = {}
+        self.next_end = {spec["name"]: None for spec in specs}
+        self.max_ts = None
+        self.n_events = 0
+        self.n_excluded = 0
+        self.n_dropped = 0
+        self.n_late = {spec["name"]: 0 for spec in specs}
+        self.n_windows = {spec["name"]: 0 for spec in specs}
+
+    @property
+    def watermark(self):
+        return None if self.max_ts is None else self.max_ts - self.lateness_ms
+
+    # --- приём событий ---
+
+    def process(self, events: pd.DataFrame) -> pd.DataFrame:
+        """Добавляет пакет событий; возвращает окна, закрытые этим пакетом."""
+        self.n_events += len(events)
+        if "quality_flag" in events.columns:
+            keep = (events["quality_flag"] != EXCLUDED_QUALITY).to_numpy()
+            self.n_excluded += int((~keep).sum())
+            events = events[keep]
+        if events.empty:
+            return self._frame([])
+        ts = timestamps_ms(events["event_timestamp"])
+        keys = self.keys.encode(events["equipment_id"], events["event_type"])
+        self.add(ts, keys, events["sensor_value"].to_numpy(dtype=np.float64))
+        return self.advance()
+
+    def add(self, ts: np.ndarray, keys: np.ndarray, values: np.ndarray):
+        """Векторное обновление панелей: O(1) работы на событие."""
+        pane_idx = ts // self.pane_ms
+        self._grow(keys, values)
+        if self.max_ts is None:
+            # первые окна — от панели watermark, а не от самого раннего
+            # события пакета: событие новее watermark, пришедшее позже
+            # (поток не по порядку), ещё не считается поздним
+            first = min(int(pane_idx.min()), (int(ts.max()) - self.lateness_ms) // self.pane_ms)
+            for spec in self.specs:
+                self.next_end[spec["name"]] = self._first_end(spec, first)
+
+        # поздние: попадают в уже выданные окна своего типа
+        for spec in self.specs:
+            emitted_until = self.next_end[spec["name"]] - spec["slide"]
+            self.n_late[spec["name"]] += int((pane_idx < emitted_until).sum())
+        # панели, все окна которых закрыты, уже удалены — такие события отбрасываются
+        open_from = self._open_from()
+        accepted = pane_idx >= open_from
+        self.n_dropped += int((~accepted).sum())
+        if not accepted.all():
+            pane_idx, keys, values = pane_idx[accepted], keys[accepted], values[accepted]
+        if not len(values):
+            return
+
+        order = np.lexsort((keys, pane_idx))
+        pane_idx, keys, values = pane_idx[order], keys[order], values[order]
+        boundary = np.flatnonzero((np.diff(pane_idx) != 0) | (np.diff(keys) != 0)) + 1
+        starts = np.concatenate([[0], boundary])
+        shifted = values - self.shift[keys]
+        counts = np.diff(np.concatenate([starts, [len(values)]]))
+        s1 = np.add.reduceat(shifted, starts)
+        s2 = np.add.reduceat(shifted * shifted, starts)
+        mins = np.minimum.reduceat(values, starts)
+        maxs = np.maximum.reduceat(values, starts)
+        group_pane, group_key = pane_idx[starts], keys[starts]
+
+        capacity = len(self.keys)
+        pane_bounds = np.flatnonzero(np.diff(group_pane)) + 1
+        for block in np.split(np.arange(len(starts)), pane_bounds):
+            index = int(group_pane[block[0]])
+            pane = self.panes.get(index)
+            if pane is None:
+                pane = self.panes[index] = Pane(capacity)
+            else:
+                pane.grow(capacity)
+            k = group_key[block]
+            pane.count[k] += counts[block]
+            pane.s1[k] += s1[block]
+            pane.s2[k] += s2[block]
+            pane.min[k] = np.minimum(pane.min[k], mins[block])
+            pane.max[k] = np.maximum(pane.max[k], maxs[block])
+
+        batch_max = int(ts.max())
+        self.max_ts = batch_max if self.max_ts is None else max(self.max_ts, batch_max)
+
+    def _grow(self, keys: np.ndarray, values: np.ndarray):
+        """Сдвиг для новых ключей — первое значение ключа в пакете."""
+        known = len(self.shift)
+        if len(self.keys) == known:
+            return
+        shift = np.zeros(len(self.keys))
+        shift[:known] = self.shift
+        new = keys >= known
+        first = pd.Series(values[new]).groupby(keys[new]).first()
+        shift[first.index.to_numpy()] = first.to_numpy()
+        self.shift = shift
+
+    # --- закрытие окон ---
+
+    @staticmethod
+    def _first_end(spec: dict, pane: int) -> int:
+        """Конец первого окна, накрывающего панель pane (окна выровнены по эпохе)."""
+        start = ((pane - spec["size"]) // spec["slide"] + 1) * spec["slide"]
+        return start + spec["size"]
+
+    def _open_from(self) -> int:
+        """Первая панель, которая ещё нужна какому-либо незакрытому окну."""
+        if any(end is None for end in self.next_end.values()):
+            return np.iinfo(np.int64).min
+        return min(self.next_end[s["name"]] - s["size"] for s in self.specs)
+
+    def advance(self) -> pd.DataFrame:
+        """Закрывает окна, конец которых не позже watermark."""
+        if self.max_ts is None:
+            return self._frame([])
+        return self._close(self.watermark // self.pane_ms)
+
+    def flush(self) -> pd.DataFrame:
+        """Конец потока: закрывает все окна, в которых есть данные."""
+        if not self.panes:
+            return self._frame([])
+        return self._close(max(self.panes) + max(s["size"] for s in self.specs))
+
+    def _close(self, limit_pane: int) -> pd.DataFrame:
+        rows = []
+        for spec in self.specs:
+            name = spec["name"]
+            while self.next_end[name] <= limit_pane:
+                end = self.next_end[name]
+                start = end - spec["size"]
+                inside = [p for p in range(start, end) if p in self.panes]
+                if inside:
+                    rows.append(self._window(spec, start, end, inside))
+                    self.next_end[name] = end + spec["slide"]
+                else:
+                    # пустой промежуток — сразу к первому окну, где есть данные
+                    later = [p for p in self.panes if p >= end]
+                    if not later:
+                        self.next_end[name] = max(end + spec["slide"], self._first_end(spec, limit_pane))
+                        break
+                    self.next_end[name] = max(end + spec["slide"], self._first_end(spec, min(later)))
+        self._evict()
+        return self._frame(rows)
+
+    def _window(self, spec: dict, start: int, end: int, inside: list) -> dict:
+        capacity = len(self.keys)
+        count = np.zeros(capacity, dtype=np.int64)
+        s1, s2 = np.zeros(capacity), np.zeros(capacity)
+        lo, hi = np.full(capacity, np.inf), np.full(capacity, -np.inf)
+        for index in inside:
+            pane = self.panes[index]
+            n = len(pane.count)
+            count[:n] += pane.count
+            s1[:n] += pane.s1
+            s2[:n] += pane.s2
+            np.minimum(lo[:n], pane.min, out=lo[:n])
+            np.maximum(hi[:n], pane.max, out=hi[:n])
+        present = np.flatnonzero(count)
+        self.n_windows[spec["name"]] += len(present)
+        return {"spec": spec, "start": start, "end": end, "keys": present,
+                "count": count[present], "s1": s1[present], "s2": s2[present],
+                "min": lo[present], "max": hi[present]}
+
+    def _evict(self):
+        open_from = self._open_from()
+        for index in [p for p in self.panes if p < open_from]:
+            del self.panes[index]
+
+    def _frame(self, windows: list) -> pd.DataFrame:
+        """Закрытые окна в формате streaming.window_aggregations."""
+        if not windows:
+            return pd.DataFrame(columns=OUTPUT_COLUMNS)
+        keys = np.concatenate([w["keys"] for w in windows])
+        count = np.concatenate([w["count"] for w in windows])
+        s1 = np.concatenate([w["s1"] for w in windows])
+        s2 = np.concatenate([w["s2"] for w in windows])
+        shift = self.shift[keys]
+        mean = s1 / count
+        # выборочное стандартное отклонение, как STDDEV в PostgreSQL
+        with np.errstate(invalid="ignore", divide="ignore"):
+            var = np.where(count > 1, (s2 - s1 * s1 / count) / (count - 1), np.nan)
+        lengths = [len(w["keys"]) for w in windows]
+        key_table = np.array(self.keys.keys, dtype=object)
+        return pd.DataFrame({
+            "equipment_id": key_table[keys, 0],
+            "event_type": key_table[keys, 1],
+            "window_type": np.repeat([w["spec"]["name"] for w in windows], lengths),
+            "window_start": pd.to_datetime(np.repeat([w["start"] * self.pane_ms for w in windows], lengths), unit="ms"),
+            "window_end": pd.to_datetime(np.repeat([w["end"] * self.pane_ms for w in windows], lengths), unit="ms"),
+            "reading_count": count,
+            "avg_value": mean + shift,
+            "min_value": np.concatenate([w["min"] for w in windows]),
+            "max_value": np.concatenate([w["max"] for w in windows]),
+            "stddev_value": np.sqrt(np.maximum(var, 0.0)),
+            "sum_value": s1 + shift * count,
+        })
+
+    def summary(self) -> dict:
+        return {
+            "n_events": self.n_events,
+            "n_excluded": self.n_excluded,
+            "n_dropped": self.n_dropped,
+            "n_late": dict(self.n_late),
+            "n_windows": dict(self.n_windows),
+            "n_keys": len(self.keys),
+            "open_panes": len(self.panes),
+            "watermark": None if self.watermark is None else str(pd.Timestamp(self.watermark, unit="ms")),
+        }
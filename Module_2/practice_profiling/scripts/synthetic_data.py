@@ -0,0 +1,393 @@
+"""
+Практикум по анализу и моделированию данных
+Модуль 2 (доп.): Генератор синтетических данных «Руда+» любого объёма
+Предприятие: «Руда+» — добыча железной руды
+
+Строит версии четырёх CSV Модуля 1 (equipment, sensor_readings,
+ore_production, downtime_events) от 10^4 до 10^8 строк. Домены значений
+берутся из исходных файлов Модуля 1 («образца»):
+
+  - equipment        — строки образца как шаблоны (тип, производитель,
+                       модель, грузоподъёмность), новые ID и наработка
+  - sensor_readings  — для каждого типа машины — датчики, которые у него
+                       есть в образце; значение — в диапазоне датчика
+  - ore_production   — шахта/блок/горизонт/оператор из образца, смена
+                       задаёт время начала и конца, тоннаж и Fe — нормальные
+                       распределения с параметрами образца
+  - downtime_events  — шаблоны событий образца (тип, категория, важность,
+                       описание, длительность), окончание = начало + длительность
+
+Ссылочная целостность соблюдается: equipment_id фактов берётся из
+сгенерированного equipment, mine_id — из шахт образца.
+
+С долей error_rate в строки вносятся ошибки, которые ловят наборы
+ожиданий и правила quality_rules: NULL в обязательном поле, повтор PK,
+значение вне диапазона, неизвестная категория, «сирота» по FK, конец
+простоя раньше начала. Число ошибок каждого вида пишется в manifest.json.
+
+Строки генерируются и пишутся частями по chunksize — память не зависит
+от объёма. CSV пишется через pyarrow (если установлен) или pandas.
+"""
+
+import json
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from datasets import DATA_DIR
+
+DEFAULT_CHUNKSIZE = 1_000_000
+PERIOD_START = np.datetime64("2026-01-01T00:00:00")
+PERIOD_DAYS = 90
+# размеры таблиц относительно rows (= строк sensor_readings)
+PRODUCTION_RATIO = 4
+DOWNTIME_RATIO = 20
+ROWS_PER_MACHINE = 2_500
+MIN_EQUIPMENT = 12
+MAX_EQUIPMENT = 10_000
+ORPHAN_EQUIPMENT_ID = "EQ-X0000"
+INVALID_CATEGORY = "Неизвестно"
+DATE_COLUMNS = {"production_date", "last_maintenance_date", "next_maintenance_date"}
+
+
+def table_sizes(rows: int) -> dict:
+    """Число строк каждой таблицы для размера rows."""
+    return {
+        "equipment": int(np.clip(rows // ROWS_PER_MACHINE, MIN_EQUIPMENT, MAX_EQUIPMENT)),
+        "sensor_readings": rows,
+        "ore_production": max(rows // PRODUCTION_RATIO, 1),
+        "downtime_events": max(rows // DOWNTIME_RATIO, 1),
+    }
+
+
+def make_ids(prefix: str, start: int, stop: int, width: int) -> np.ndarray:
+    """prefix + номер с ведущими нулями: SR-000001, ..."""
+    numbers = np.char.zfill(np.arange(start + 1, stop + 1).astype(str), width)
+    return np.char.add(prefix, numbers).astype(object)
+
+
+# ============================================================
+# Домены значений из образца Модуля 1
+# ============================================================
+
+class Domains:
+    """Шаблоны и распределения, извлечённые из CSV образца."""
+
+    def __init__(self, seed_dir: Path = DATA_DIR):
+        self.equipment = pd.read_csv(Path(seed_dir) / "equipment.csv")
+        sensors = pd.read_csv(Path(seed_dir) / "sensor_readings.csv")
+        self.production = pd.read_csv(Path(seed_dir) / "ore_production.csv")
+        self.downtime = pd.read_csv(Path(seed_dir) / "downtime_events.csv")
+
+        # диапазон каждого датчика с запасом 10% в обе стороны
+        ranges = sensors.groupby(["sensor_type", "unit"])["reading_value"].agg(["min", "max"])
+        margin = (ranges["max"] - ranges["min"]) * 0.1
+        self.sensor_ranges = pd.DataFrame({
+            "low": (ranges["min"] - margin).clip(lower=0),
+            "high": ranges["max"] + margin,
+        }).reset_index()
+
+        # какие датчики стоят на машинах каждого типа
+        types = sensors.merge(self.equipment[["equipment_id", "equipment_type"]], on="equipment_id")
+        self.sensors_by_type = {
+            kind: self.sensor_ranges[self.sensor_ranges["sensor_type"].isin(group["sensor_type"].unique())]
+                .index.to_numpy()
+            for kind, group in types.groupby("equipment_type")
+        }
+        self.all_sensors = self.sensor_ranges.index.to_numpy()
+        self.quality = sensors["quality_flag"].value_counts(normalize=True)
+
+        self.mines = self.equipment[["mine_id", "mine_name"]].drop_duplicates().reset_index(drop=True)
+        self.shift_times = self.production.groupby("shift")[["start_time", "end_time"]].first()
+        self.status = self.production["status"].value_counts(normalize=True)
+        self.ore_types = self.production["ore_type"].value_counts(normalize=True)
+        self.numeric = self.production[["tonnage_extracted", "fe_content_pct", "moisture_pct"]].agg(["mean", "std"])
+
+
+def _choice(rng, distribution: pd.Series, size: int) -> np.ndarray:
+    return rng.choice(distribution.index.to_numpy(dtype=object), size=size, p=distribution.to_numpy())
+
+
+def _timestamps(rng, start: int, stop: int, total: int) -> np.ndarray:
+    """Упорядоченные метки времени части [start, stop) из total строк.
+
+    Каждая часть занимает свою долю периода, поэтому по файлу в целом
+    время не убывает — как у выгрузки из источника.
+    """
+    span = PERIOD_DAYS * 86400
+    low, high = span * start // total, max(span * stop // total, span * start // total + 1)
+    seconds = np.sort(rng.integers(low, high, size=stop - start))
+    return PERIOD_START + seconds.astype("timedelta64[s]")
+
+
+# ============================================================
+# Генераторы таблиц (одна часть строк [start, stop))
+# ============================================================
+
+def generate_equipment(domains: Domains, rng, n: int) -> pd.DataFrame:
+    template = domains.equipment.iloc[rng.integers(0, len(domains.equipment), n)].reset_index(drop=True)
+    mines = domains.mines.iloc[rng.integers(0, len(domains.mines), n)].reset_index(drop=True)
+    prefix = template["equipment_name"].str.split("-").str[0]
+    last = PERIOD_START - rng.integers(0, 120, n).astype("timedelta64[D]")
+    return pd.DataFrame({
+        "equipment_id": make_ids("EQ-", 0, n, max(3, len(str(n)))),
+        "equipment_name": (prefix + "-" + pd.Series(np.arange(1, n + 1)).astype(str).str.zfill(2)).to_numpy(),
+        "equipment_type": template["equipment_type"],
+        "manufacturer": template["manufacturer"],
+        "model": template["model"],
+        "year_manufactured": rng.integers(2012, 2026, n),
+        "mine_id": mines["mine_id"],
+        "mine_name": mines["mine_name"],
+        "status": _choice(rng, domains.equipment["status"].value_counts(normalize=True), n),
+        "last_maintenance_date": last.astype("datetime64[D]"),
+        "next_maintenance_date": (last + np.timedelta64(90, "D")).astype("datetime64[D]"),
+        "engine_hours": rng.integers(0, 25_000, n),
+        "max_payload_tons": template["max_payload_tons"],
+    })
+
+
+def generate_sensor_readings(domains: Domains, rng, start: int, stop: int, total: int,
+                             equipment: pd.DataFrame) -> pd.DataFrame:
+    n = stop - start
+    machine = rng.integers(0, len(equipment), n)
+    machine_type = equipment["equipment_type"].to_numpy()[machine]
+    # датчик выбирается среди датчиков типа машины
+    sensor = np.empty(n, dtype=np.int64)
+    for kind in np.unique(machine_type):
+        mask = machine_type == kind
+        options = domains.sensors_by_type.get(kind, domains.all_sensors)
+        sensor[mask] = rng.choice(options, size=int(mask.sum()))
+    ranges = domains.sensor_ranges.iloc[sensor]
+    low, high = ranges["low"].to_numpy(), ranges["high"].to_numpy()
+    return pd.DataFrame({
+        "reading_id": make_ids("SR-", start, stop, 9),
+        "equipment_id": equipment["equipment_id"].to_numpy()[machine],
+        "sensor_type": ranges["sensor_type"].to_numpy(),
+        "reading_value": np.round(low + rng.random(n) * (high - low), 1),
+        "unit": ranges["unit"].to_numpy(),
+        "reading_timestamp": _timestamps(rng, start, stop, total),
+        "quality_flag": _choice(rng, domains.quality, n),
+    })
+
+
+def generate_ore_production(domains: Domains, rng, start: int, stop: int, total: int,
+                            equipment: pd.DataFrame) -> pd.DataFrame:
+    n = stop - start
+    template = domains.production.iloc[rng.integers(0, len(domains.production), n)].reset_index(drop=True)
+    machine = rng.integers(0, len(equipment), n)
+    shift = rng.choice(domains.shift_times.index.to_numpy(), size=n)
+    times = domains.shift_times.loc[shift]
+    stats = domains.numeric
+
+    def normal(column, low, high):
+        values = rng.normal(stats.loc["mean", column], stats.loc["std", column], n)
+        return np.round(np.clip(values, low, high), 1)
+
+    return pd.DataFrame({
+        "production_id": make_ids("PRD-", start, stop, 9),
+        "mine_id": equipment["mine_id"].to_numpy()[machine],
+        "mine_name": equipment["mine_name"].to_numpy()[machine],
+        "production_date": _timestamps(rng, start, stop, total).astype("datetime64[D]"),
+        "shift": shift,
+        "horizon_level": template["horizon_level"],
+        "block_id": template["block_id"],
+        "ore_type": _choice(rng, domains.ore_types, n),
+        "tonnage_extracted": normal("tonnage_extracted", 1, 500),
+        "fe_content_pct": normal("fe_content_pct", 0, 100),
+        "moisture_pct": normal("moisture_pct", 0, 100),
+        "equipment_id": equipment["equipment_id"].to_numpy()[machine],
+        "operator_name": template["operator_name"],
+        "start_time": times["start_time"].to_numpy(),
+        "end_time": times["end_time"].to_numpy(),
+        "status": _choice(rng, domains.status, n),
+    })
+
+
+def generate_downtime_events(domains: Domains, rng, start: int, stop: int, total: int,
+                             equipment: pd.DataFrame) -> pd.DataFrame:
+    n = stop - start
+    template = domains.downtime.iloc[rng.integers(0, len(domains.downtime), n)].reset_index(drop=True)
+    machine = rng.integers(0, len(equipment), n)
+    # длительность — в пределах ±50% от шаблона, не дольше суток (правило набора)
+    duration = np.clip(np.round(template["duration_minutes"].to_numpy() * rng.uniform(0.5, 1.5, n)), 1, 1440)
+    begin = _timestamps(rng, start, stop, total).astype("datetime64[m]")
+    return pd.DataFrame({
+        "event_id": make_ids("DT-", start, stop, 9),
+        "equipment_id": equipment["equipment_id"].to_numpy()[machine],
+        "event_type": template["event_type"],
+        "event_category": template["event_category"],
+        "start_time": begin.astype("datetime64[s]"),
+        "end_time": (begin + duration.astype("timedelta64[m]")).astype("datetime64[s]"),
+        "duration_minutes": duration.astype(np.int64),
+        "description": template["description"],
+        "severity": template["severity"],
+        "reported_by": template["reported_by"],
+    })
+
+
+# ============================================================
+# Внесение ошибок
+# ============================================================
+
+def _null(column):
+    def apply(df, rows, rng):
+        df[column] = df[column].astype(object)
+        df.loc[rows, column] = None
+    return apply
+
+
+def _duplicate(column):
+    def apply(df, rows, rng):
+        # повтор PK: ключ соседней строки той же части
+        source = np.where(rows > 0, rows - 1, rows + 1).clip(max=len(df) - 1)
+        df.loc[rows, column] = df[column].to_numpy()[source]
+    return apply
+
+
+def _value(column, value):
+    def apply(df, rows, rng):
+        if isinstance(value, str):
+            df[column] = df[column].astype(object)
+        df.loc[rows, column] = value
+    return apply
+
+
+def _swap_times(df, rows, rng):
+    start, end = df.loc[rows, "start_time"].to_numpy(), df.loc[rows, "end_time"].to_numpy()
+    df.loc[rows, "start_time"], df.loc[rows, "end_time"] = end, start
+
+
+ERRORS = {
+    "equipment": {
+        "null_mine_id": _null("mine_id"),
+        "year_out_of_range": _value("year_manufactured", 1990),
+        "payload_out_of_range": _value("max_payload_tons", 250.0),
+        "invalid_status": _value("status", INVALID_CATEGORY),
+    },
+    "sensor_readings": {
+        "null_sensor_type": _null("sensor_type"),
+        "duplicate_reading_id": _duplicate("reading_id"),
+        "negative_value": _value("reading_value", -1.0),
+        "invalid_quality_flag": _value("quality_flag", "BAD"),
+        "orphan_equipment_id": _value("equipment_id", ORPHAN_EQUIPMENT_ID),
+    },
+    "ore_production": {
+        "null_mine_id": _null("mine_id"),
+        "duplicate_production_id": _duplicate("production_id"),
+        "fe_out_of_range": _value("fe_content_pct", 150.0),
+        "negative_tonnage": _value("tonnage_extracted", -10.0),
+        "invalid_status": _value("status", INVALID_CATEGORY),
+        "orphan_equipment_id": _value("equipment_id", ORPHAN_EQUIPMENT_ID),
+    },
+    "downtime_events": {
+        "null_equipment_id": _null("equipment_id"),
+        "duration_out_of_range": _value("duration_minutes", 5000),
+        "end_before_start": _swap_times,
+        "invalid_severity": _value("severity", INVALID_CATEGORY),
+    },
+}
+
+
+def inject_errors(df: pd.DataFrame, name: str, rate: float, rng) -> dict:
+    """Вносит ошибки в долю rate строк; {вид ошибки: число строк}."""
+    counts = dict.fromkeys(ERRORS[name], 0)
+    if rate <= 0 or df.empty:
+        return counts
+    rows = np.flatnonzero(rng.random(len(df)) < rate)
+    kinds = rng.integers(0, len(counts), len(rows))
+    for k, (kind, apply) in enumerate(ERRORS[name].items()):
+        selected = rows[kinds == k]
+        if len(selected):
+            apply(df, selected, rng)
+            counts[kind] = len(selected)
+    return counts
+
+
+# ============================================================
+# Запись
+# ============================================================
+
+class CsvWriter:
+    """Дописывает части в CSV (pyarrow.csv, если есть, иначе pandas)."""
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.writer = None
+        self.header = True
+        try:
+            import pyarrow  # noqa: F401
+            self.arrow = True
+        except ImportError:
+            self.arrow = False
+
+    def write(self, df: pd.DataFrame):
+        if not self.arrow:
+            df.to_csv(self.path, mode="w" if self.header else "a", header=self.header, index=False)
+            self.header = False
+            return
+        import pyarrow as pa
+        import pyarrow.csv as pacsv
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        for i, name in enumerate(table.column_names):
+            # даты без времени — как в образце (2026-02-10)
+            if name in DATE_COLUMNS and pa.types.is_timestamp(table.schema.field(name).type):
+                table = table.set_column(i, name, table.column(name).cast(pa.date32()))
+        if self.writer is None:
+            self.schema = table.schema
+            self.writer = pacsv.CSVWriter(self.path, self.schema,
+                                          write_options=pacsv.WriteOptions(quoting_style="needed"))
+        # типы частей могут различаться (например, колонка целиком из NULL)
+        self.writer.write_table(table if table.schema == self.schema else table.cast(self.schema))
+
+    def close(self):
+        if self.writer is not None:
+            self.writer.close()
+
+
+def generate(out_dir: Path, rows: int, error_rate: float = 0.0, seed: int = 42,
+             chunksize: int = DEFAULT_CHUNKSIZE, seed_dir: Path = DATA_DIR) -> dict:
+    """Генерирует 4 CSV в out_dir и manifest.json; возвращает манифест."""
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    domains = Domains(seed_dir)
+    sizes = table_sizes(rows)
+
+    # справочник генерируется целиком и без ошибок в ключах: факты ссылаются на него
+    equipment = generate_equipment(domains, rng, sizes["equipment"])
+    clean_equipment = equipment.copy()
+    errors = {"equipment": inject_errors(equipment, "equipment", error_rate, rng)}
+    writer = CsvWriter(out_dir / "equipment.csv")
+    writer.write(equipment)
+    writer.close()
+
+    generators = {
+        "sensor_readings": generate_sensor_readings,
+        "ore_production": generate_ore_production,
+        "downtime_events": generate_downtime_events,
+    }
+    for name, generator in generators.items():
+        errors[name] = dict.fromkeys(ERRORS[name], 0)
+        writer = CsvWriter(out_dir / f"{name}.csv")
+        for start in range(0, sizes[name], chunksize):
+            stop = min(start + chunksize, sizes[name])
+            chunk = generator(domains, rng, start, stop, sizes[name], clean_equipment)
+            for kind, count in inject_errors(chunk, name, error_rate, rng).items():
+                errors[name][kind] += count
+            writer.write(chunk)
+        writer.close()
+
+    manifest = {"rows": rows, "error_rate": error_rate, "seed": seed,
+                "sizes": sizes, "errors": errors}
+    (out_dir / "manifest.json").write_text(json.dumps(manifest, ensure_ascii=False, indent=2),
+                                           encoding="utf-8")
+    return manifest
+
+
+def load_manifest(out_dir: Path) -> dict:
+    path = Path(out_dir) / "manifest.json"
+    if not path.exists():
+        return None
+    return json.loads(path.read_text(encoding="utf-8"))
@@ -0,0 +1,353 @@
+"""
+Практикум по анализу и моделированию данных
+Модуль 2 (доп.): Профиль телеметрии по рядам equipment_id × sensor_type
+Предприятие: «Руда+» — добыча железной руды
+
+profile_csv() видит в sensor_readings.csv плоскую таблицу. Здесь каждая
+пара equipment_id × sensor_type — отдельный временной ряд, и для него
+считается то, что важно для телеметрии:
+
+  - шаг опроса — медиана положительных разностей соседних меток времени;
+    доля «регулярных» шагов (в пределах ±10 % от медианы);
+  - пропуски — шаг больше gap_factor × медиана: число, самый длинный,
+    оценка потерянных точек и полнота ряда (сколько точек из ожидаемых
+    при медианном шаге);
+  - строки не по порядку — метка времени меньше наибольшей из уже
+    прочитанных в этом ряду (порядок файла);
+  - дубликаты меток времени — полные (то же значение) и конфликтующие
+    (другое значение в ту же секунду);
+  - диапазон значений, пропуски значений, флаги качества.
+
+Всё считается за одну сортировку всей таблицы по (ряд, время): разности
+соседних строк, np.bincount и сегментные reduceat по рядам — без цикла
+по рядам.
+
+Для графиков ряд прореживается методом LTTB (Largest-Triangle-Three-
+Buckets): из каждого «ведра» точек остаётся та, что образует наибольший
+треугольник с уже выбранной точкой и средним следующего ведра. Форма
+ряда (пики, провалы) сохраняется, а в отчёт попадает не больше
+max_points точек на ряд. Шаги LTTB идут по вёдрам, но каждое ведро
+обрабатывается сразу для всех рядов одной векторной операцией.
+
+Колонки берутся по первому совпадению из TIMESERIES_COLUMNS: подходят
+sensor_readings.csv Модуля 1, sensor_timeseries_sample.csv Модуля 5 и
+sensor_events_sample.csv Модуля 4.
+"""
+
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+TIMESERIES_SAMPLE = SCRIPT_DIR.parent.parent.parent / "Module_5" / "practice" / "data" / "sensor_timeseries_sample.csv"
+
+TIMESERIES_COLUMNS = {
+    "time": ["reading_timestamp", "reading_time", "event_timestamp"],
+    "equipment": ["equipment_id"],
+    "sensor": ["sensor_type", "event_type"],
+    "value": ["reading_value", "value", "sensor_value"],
+    "unit": ["unit"],
+    "quality": ["quality_flag", "quality"],
+}
+DEFAULT_GAP_FACTOR = 3.0
+DEFAULT_MAX_POINTS = 500
+REGULAR_TOLERANCE = 0.1
+DEFAULT_CHUNKSIZE = 1_000_000
+NS = 1_000_000_000
+
+
+def detect_columns(header: list) -> dict:
+    """Роль → имя колонки; обязательны time, equipment, sensor и value."""
+    found = {}
+    for role, names in TIMESERIES_COLUMNS.items():
+        found[role] = next((n for n in names if n in header), None)
+    missing = [r for r in ("time", "equipment", "sensor", "value") if found[r] is None]
+    if missing:
+        raise ValueError(f"Нет колонок для {', '.join(missing)}: ожидаются "
+                         + "; ".join(" / ".join(TIMESERIES_COLUMNS[r]) for r in missing))
+    return found
+
+
+def read_timeseries(path: Path, chunksize: int = DEFAULT_CHUNKSIZE) -> tuple:
+    """Только нужные колонки в компактных типах: (DataFrame, роли колонок).
+
+    Ключи и флаги — category, значение — float64, время — datetime64.
+    На строку ~25 байт, поэтому в память помещаются и десятки миллионов строк.
+    """
+    columns = detect_columns(list(pd.read_csv(path, nrows=0).columns))
+    usecols = [c for c in columns.values() if c]
+    dtype = {columns[r]: "category" for r in ("equipment", "sensor", "unit", "quality") if columns[r]}
+    dtype[columns["value"]] = "float64"
+    parts = []
+    with pd.read_csv(path, usecols=usecols, dtype=dtype, chunksize=chunksize) as reader:
+        for chunk in reader:
+            chunk[columns["time"]] = pd.to_datetime(chunk[columns["time"]], errors="coerce")
+            parts.append(chunk)
+    # union категорий между частями, иначе concat вернёт object
+    df = pd.concat(parts, ignore_index=True) if len(parts) > 1 else parts[0]
+    for role in ("equipment", "sensor", "unit", "quality"):
+        if columns[role] and not isinstance(df[columns[role]].dtype, pd.CategoricalDtype):
+            df[columns[role]] = df[columns[role]].astype("category")
+    return df, columns
+
+
+# ============================================================
+# Профиль рядов
+# ============================================================
+
+def _categorical(series: pd.Series) -> pd.Categorical:
+    return pd.Categorical(series) if not isinstance(series.dtype, pd.CategoricalDtype) else series.array
+
+
+def series_codes(equipment: pd.Series, sensor: pd.Series) -> tuple:
+    """Номер ряда для каждой строки и ключи рядов [(equipment, sensor), ...].
+
+    Номер собирается из кодов категорий и сжимается до встречающихся пар
+    через np.bincount — без groupby по двум колонкам. Строки с пустым
+    ключом получают -1.
+    """
+    eq, sensor = _categorical(equipment), _categorical(sensor)
+    width = len(sensor.categories)
+    raw = eq.codes.astype(np.int64) * width + sensor.codes
+    raw[(eq.codes < 0) | (sensor.codes < 0)] = -1
+    present = np.bincount(raw[raw >= 0], minlength=len(eq.categories) * width) > 0
+    remap = np.cumsum(present) - 1
+    codes = np.where(raw >= 0, remap[np.maximum(raw, 0)], -1)
+    pairs = np.flatnonzero(present)
+    keys = list(zip(eq.categories[pairs // width], sensor.categories[pairs % width]))
+    return codes, keys
+
+
+def _value_counts(codes: np.ndarray, series: pd.Series, n_series: int) -> list:
+    """Счётчики значений категориальной колонки по рядам: [{значение: число}, ...]."""
+    values = _categorical(series)
+    width = len(values.categories)
+    valid = values.codes >= 0
+    counts = np.bincount(codes[valid] * width + values.codes[valid], minlength=n_series * width)
+    counts = counts.reshape(n_series, width)
+    return [{str(values.categories[j]): int(row[j]) for j in np.flatnonzero(row)} for row in counts]
+
+
+def _segment_starts(codes: np.ndarray) -> np.ndarray:
+    """Начала сегментов одинаковых кодов в отсортированном массиве."""
+    return np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+
+
+def sort_order(codes: np.ndarray, ts: np.ndarray, n_series: int) -> np.ndarray:
+    """Порядок по (ряд, время).
+
+    Ряд и время складываются в один int64-ключ, если он не переполняется:
+    одна сортировка по ключу вдвое быстрее np.lexsort по двум массивам.
+    """
+    if not len(ts):
+        return np.arange(0)
+    origin = int(ts.min())
+    width = int(ts.max()) - origin + 1
+    if n_series * width < 2 ** 62:
+        return np.argsort(codes.astype(np.int64) * width + (ts - origin), kind="stable")
+    return np.lexsort((ts, codes))
+
+
+def profile_series(df: pd.DataFrame, columns: dict, gap_factor: float = DEFAULT_GAP_FACTOR,
+                   max_points: int = DEFAULT_MAX_POINTS) -> list:
+    """Статистика по каждому ряду equipment × sensor; строки без метки времени не входят в ряды."""
+    time_col, value_col = columns["time"], columns["value"]
+    df = df[df[time_col].notna() & df[columns["equipment"]].notna() & df[columns["sensor"]].notna()]
+    codes, series_keys = series_codes(df[columns["equipment"]], df[columns["sensor"]])
+    n_series = len(series_keys)
+    ts = df[time_col].to_numpy("datetime64[ns]").view("int64")
+    values = df[value_col].to_numpy("float64")
+
+    # строки не по порядку: метка меньше максимума уже прочитанных в ряду
+    running = pd.Series(ts).groupby(codes).cummax()
+    previous = running.groupby(codes).shift(fill_value=np.iinfo(np.int64).min).to_numpy()
+    out_of_order = np.bincount(codes, weights=ts < previous, minlength=n_series)
+
+    # одна сортировка по (ряд, время); stable — дубликаты в порядке файла
+    order = sort_order(codes, ts, n_series)
+    codes, ts, values = codes[order], ts[order], values[order]
+    starts = _segment_starts(codes)
+    ends = np.r_[starts[1:], len(codes)]
+    n = ends - starts
+
+    same = codes[1:] == codes[:-1]
+    step = np.diff(ts)[same]
+    step_codes = codes[1:][same]
+    current, before = values[1:][same], values[:-1][same]
+    duplicate = step == 0
+    equal_value = (current == before) | (np.isnan(current) & np.isnan(before))
+    duplicates = np.bincount(step_codes, weights=duplicate & equal_value, minlength=n_series)
+    conflicts = np.bincount(step_codes, weights=duplicate & ~equal_value, minlength=n_series)
+
+    positive = step > 0
+    steps = pd.Series(step[positive] / NS).groupby(step_codes[positive])
+    interval = steps.median().reindex(range(n_series)).to_numpy()
+    min_step = steps.min().reindex(range(n_series)).to_numpy()
+    max_step = steps.max().reindex(range(n_series)).to_numpy()
+    median_by_step = interval[step_codes[positive]]
+    seconds = step[positive] / NS
+    regular = np.abs(seconds - median_by_step) <= REGULAR_TOLERANCE * median_by_step
+    n_regular = np.bincount(step_codes[positive], weights=regular, minlength=n_series)
+    n_steps = np.bincount(step_codes[positive], minlength=n_series)
+
+    gap = seconds > gap_factor * median_by_step
+    gap_codes = step_codes[positive][gap]
+    n_gaps = np.bincount(gap_codes, minlength=n_series)
+    gap_seconds = np.bincount(gap_codes, weights=seconds[gap], minlength=n_series)
+    longest_gap = pd.Series(seconds[gap]).groupby(gap_codes).max().reindex(range(n_series)).to_numpy()
+    lost = np.bincount(gap_codes, weights=np.round(seconds[gap] / median_by_step[gap]) - 1, minlength=n_series)
+
+    span = (ts[ends - 1] - ts[starts]) / NS
+    unique_ts = n - duplicates - conflicts
+    expected = np.where(interval > 0, np.floor(span / np.where(interval > 0, interval, 1) + 0.5) + 1, unique_ts)
+
+    valid = ~np.isnan(values)
+    n_valid = np.bincount(codes, weights=valid, minlength=n_series)
+    filled = np.where(valid, values, 0.0)
+    total = np.add.reduceat(filled, starts)
+    mean = np.divide(total, n_valid, out=np.full(n_series, np.nan), where=n_valid > 0)
+    centered = np.where(valid, values - mean[codes], 0.0)
+    m2 = np.add.reduceat(centered ** 2, starts)
+    std = np.sqrt(np.divide(m2, n_valid - 1, out=np.full(n_series, np.nan), where=n_valid > 1))
+    vmin = np.minimum.reduceat(np.where(valid, values, np.inf), starts)
+    vmax = np.maximum.reduceat(np.where(valid, values, -np.inf), starts)
+
+    # порядок строк для счётчиков не важен — исходные коды рядов
+    unsorted_codes = np.empty_like(codes)
+    unsorted_codes[order] = codes
+    extra = {role: _value_counts(unsorted_codes, df[columns[role]], n_series)
+             for role in ("unit", "quality") if columns[role]}
+
+    # секунды от первой метки: суммы x в LTTB не теряют точность на 1,7e9
+    origin = int(ts.min()) if len(ts) else 0
+    charts = lttb((ts - origin) / NS, values, codes, starts, ends, max_points, origin // 1_000_000)
+
+    result = []
+    for i, (equipment, sensor) in enumerate(series_keys):
+        item = {
+            "equipment_id": str(equipment),
+            "sensor_type": str(sensor),
+            "n": int(n[i]),
+            "start": str(pd.Timestamp(int(ts[starts[i]]))),
+            "end": str(pd.Timestamp(int(ts[ends[i] - 1]))),
+            "interval_seconds": _num(interval[i]),
+            "min_step_seconds": _num(min_step[i]),
+            "max_step_seconds": _num(max_step[i]),
+            "p_regular": float(n_regular[i] / n_steps[i]) if n_steps[i] else None,
+            "n_gaps": int(n_gaps[i]),
+            "gap_seconds": float(gap_seconds[i]),
+            "longest_gap_seconds": _num(longest_gap[i]),
+            "missing_points": int(lost[i]),
+            "completeness": float(min(1.0, unique_ts[i] / expected[i])) if expected[i] else None,
+            "out_of_order": int(out_of_order[i]),
+            "duplicate_timestamps": int(duplicates[i]),
+            "conflicting_duplicates": int(conflicts[i]),
+            "n_missing_values": int(n[i] - n_valid[i]),
+            "min": _num(vmin[i]),
+            "max": _num(vmax[i]),
+            "mean": _num(mean[i]),
+            "std": _num(std[i]),
+            "chart": charts[i],
+        }
+        if "unit" in extra:
+            item["unit"] = ", ".join(extra["unit"][i]) or None
+        if "quality" in extra:
+            item["quality"] = extra["quality"][i]
+        result.append(item)
+    return result
+
+
+def _num(value):
+    return float(value) if value is not None and np.isfinite(value) else None
+
+
+# ============================================================
+# Прореживание LTTB
+# ============================================================
+
+def lttb(x: np.ndarray, y: np.ndarray, codes: np.ndarray, starts: np.ndarray, ends: np.ndarray,
+         max_points: int = DEFAULT_MAX_POINTS, origin_ms: int = 0) -> list:
+    """Largest-Triangle-Three-Buckets для всех рядов сразу.
+
+    x (секунды от origin_ms), y отсортированы по (ряд, x); starts/ends —
+    границы рядов. Возвращает по ряду {"t": [мс эпохи], "v": [...]} не
+    длиннее max_points. Точки без значения в график не входят.
+    """
+    keep = ~np.isnan(y)
+    if not keep.all():
+        x, y, codes = x[keep], y[keep], codes[keep]
+        bounds = np.searchsorted(codes, np.arange(len(starts) + 1))
+        # ряды без единого значения дают пустой график
+        starts, ends = bounds[:-1], bounds[1:]
+    n = ends - starts
+    selected = [np.arange(s, e) for s, e in zip(starts, ends)]
+
+    big = np.flatnonzero(n > max(max_points, 2))
+    if len(big) and max_points >= 3:
+        lo, hi = starts[big], ends[big]
+        size = (n[big] - 2) / (max_points - 2)
+        cx, cy = np.r_[0.0, np.cumsum(x)], np.r_[0.0, np.cumsum(y)]
+        a = lo.copy()                       # последняя выбранная точка ряда
+        picks = np.empty((len(big), max_points), dtype=np.int64)
+        picks[:, 0], picks[:, -1] = lo, hi - 1
+        for b in range(max_points - 2):
+            first = lo + np.floor(b * size).astype(np.int64) + 1
+            last = np.minimum(lo + np.floor((b + 1) * size).astype(np.int64) + 1, hi - 1)
+            # среднее следующего ведра (для последнего — последняя точка ряда)
+            nfirst = last
+            nlast = np.minimum(lo + np.floor((b + 2) * size).astype(np.int64) + 1, hi)
+            nlast = np.maximum(nlast, nfirst + 1)
+            avg_x = (cx[nlast] - cx[nfirst]) / (nlast - nfirst)
+            avg_y = (cy[nlast] - cy[nfirst]) / (nlast - nfirst)
+
+            lengths = last - first
+            offsets = np.r_[0, np.cumsum(lengths)[:-1]]
+            idx = np.repeat(first - offsets, lengths) + np.arange(lengths.sum())
+            seg = np.repeat(np.arange(len(big)), lengths)
+            ax, ay = x[a][seg], y[a][seg]
+            area = np.abs((ax - avg_x[seg]) * (y[idx] - ay) - (ax - x[idx]) * (avg_y[seg] - ay))
+            best = np.maximum.reduceat(area, offsets)
+            # первая точка ведра с наибольшей площадью
+            hit = np.flatnonzero(area == best[seg])
+            a = idx[hit[np.searchsorted(seg[hit], np.arange(len(big)))]]
+            picks[:, b + 1] = a
+        for j, i in enumerate(big):
+            selected[i] = picks[j]
+
+    ms = np.round(x * 1000).astype(np.int64) + origin_ms
+    return [{"t": ms[s].tolist(), "v": [round(float(v), 4) for v in y[s]]} for s in selected]
+
+
+def timeseries_summary(df: pd.DataFrame, columns: dict, title: str = "",
+                       gap_factor: float = DEFAULT_GAP_FACTOR, max_points: int = DEFAULT_MAX_POINTS) -> dict:
+    """Словарь для отчёта: общие цифры, ряды и предупреждения."""
+    series = profile_series(df, columns, gap_factor, max_points)
+    alerts = []
+    for s in series:
+        name = f"{s['equipment_id']} / {s['sensor_type']}"
+        if s["n_gaps"]:
+            alerts.append({"series": name, "alert": "gaps",
+                           "text": f"{s['n_gaps']} пропусков, самый длинный {s['longest_gap_seconds']:,.0f} с"})
+        if s["out_of_order"]:
+            alerts.append({"series": name, "alert": "out_of_order",
+                           "text": f"{s['out_of_order']} строк не по порядку"})
+        if s["conflicting_duplicates"]:
+            alerts.append({"series": name, "alert": "conflicting_duplicates",
+                           "text": f"{s['conflicting_duplicates']} меток с разными значениями"})
+    return {
+        "title": title,
+        "columns": columns,
+        "table": {
+            "n": int(len(df)),
+            "n_series": len(series),
+            "n_missing_time": int(df[columns["time"]].isna().sum()),
+            "start": min((s["start"] for s in series), default=None),
+            "end": max((s["end"] for s in series), default=None),
+            "gap_factor": gap_factor,
+            "max_points": max_points,
+            "chart_points": sum(len(s["chart"]["t"]) for s in series),
+        },
+        "series": series,
+        "alerts": alerts,
+    }
@@ -0,0 +1,378 @@
+"""
+Практикум по анализу и моделированию данных
+Модуль 2 (доп.): Компилируемый движок валидации
+Предприятие: «Руда+» — добыча железной руды
+
+Альтернативный бэкенд для 03_great_expectations.py. Принимает тот же
+список ожиданий (expectation_suites.py) и возвращает результат той же
+формы, что и GX: {"success", "results": [{"success", "expectation_config",
+"result"}, ...], "statistics"} — его читает print_results().
+
+Вместо отдельного прохода по колонке на каждое ожидание набор
+«компилируется»: ожидания группируются по колонкам, и каждая колонка
+обрабатывается один раз:
+
+  - маска NULL считается один раз и нужна всем проверкам колонки
+  - pd.factorize() даёт коды и уникальные значения; проверки unique и
+    in_set выполняются над уникальными значениями (их мало), а затем
+    переносятся на строки индексированием по кодам
+  - between — одно векторное сравнение над numpy-массивом
+
+Поддерживаются ожидания:
+  expect_column_values_to_not_be_null
+  expect_column_values_to_be_unique
+  expect_column_values_to_be_in_set
+  expect_column_values_to_be_between  (min/max, strict_min/strict_max)
+  expect_column_pair_values_A_to_be_greater_than_B  (or_equal)
+  expect_column_distinct_values_to_contain_set
+  expect_table_row_count_to_be_between
+и параметры mostly и row_condition (condition_parser="pandas") у
+колоночных ожиданий: как и в GX, ожидание с row_condition проверяется
+только на строках, где условие выполнено.
+
+CompiledSuite.masks() возвращает построчные маски нарушений — по ним
+quarantine.py строит битовую маску и отделяет «плохие» строки.
+
+Для инкрементальной валидации (incremental_validation.py) validate() и
+masks() принимают history — {колонка: маска строк, чей ключ уже есть в
+прошлых загрузках}: такие строки нарушают unique так же, как дубликаты
+внутри пакета, — и n_rows — число строк таблицы для
+expect_table_row_count_to_be_between (вместе с историей).
+"""
+
+import numpy as np
+import pandas as pd
+
+from instrumentation import current
+
+PARTIAL_UNEXPECTED_COUNT = 20
+
+COLUMN_EXPECTATIONS = {
+    "expect_column_values_to_not_be_null",
+    "expect_column_values_to_be_unique",
+    "expect_column_values_to_be_in_set",
+    "expect_column_values_to_be_between",
+}
+PAIR_EXPECTATIONS = {"expect_column_pair_values_A_to_be_greater_than_B"}
+TABLE_EXPECTATIONS = {"expect_table_row_count_to_be_between"}
+# ожидания по множеству значений колонки: построчной маски у них нет
+AGGREGATE_EXPECTATIONS = {"expect_column_distinct_values_to_contain_set"}
+
+
+class CompiledSuite:
+    """Набор ожиданий, сгруппированный по колонкам (и условиям row_condition)."""
+
+    def __init__(self, suite: list):
+        self.suite = list(suite)
+        self.columns = {}
+        self.pairs = []
+        self.table = []
+        self.aggregates = []
+        self.unsupported = []
+        for i, exp in enumerate(self.suite):
+            exp_type = exp["expectation_type"]
+            if exp_type in COLUMN_EXPECTATIONS:
+                key = (exp["kwargs"]["column"], exp["kwargs"].get("row_condition"))
+                self.columns.setdefault(key, []).append(i)
+            elif exp_type in PAIR_EXPECTATIONS:
+                self.pairs.append(i)
+            elif exp_type in TABLE_EXPECTATIONS:
+                self.table.append(i)
+            elif exp_type in AGGREGATE_EXPECTATIONS:
+                self.aggregates.append(i)
+            else:
+                self.unsupported.append(i)
+
+    def masks(self, df: pd.DataFrame, history: dict = None) -> dict:
+        """Маски «неожиданных» строк: {номер ожидания: bool-массив}.
+
+        Для табличных ожиданий маски нет; для отсутствующей колонки —
+        строка с текстом ошибки.
+        """
+        return self._evaluate(df, history)[0]
+
+    def _evaluate(self, df: pd.DataFrame, history: dict = None) -> tuple:
+        """(маски, маски NULL, строки под row_condition) по номерам ожиданий."""
+        masks, nulls, rows = {}, {}, {}
+        conditions = {}
+        metrics = current()
+        for (column, condition), indices in self.columns.items():
+            if column not in df.columns:
+                for i in indices:
+                    masks[i] = f"Колонка '{column}' отсутствует в данных"
+                continue
+            checks = [self.suite[i] for i in indices]
+            try:
+                if condition not in conditions:
+                    conditions[condition] = _row_condition(df, condition)
+                selected = conditions[condition]
+                series = df[column] if selected is None else df.loc[selected, column]
+                # ожидания одной колонки проверяются вместе — и замеряются одним этапом
+                with metrics.stage(f"column:{column}", rows=len(series)):
+                    column_masks, null = evaluate_column(series, checks)
+            except (TypeError, NameError, SyntaxError, ValueError) as e:
+                for i in indices:
+                    masks[i] = f"Колонка '{column}': {e}"
+                continue
+            if selected is not None:
+                column_masks = [_expand(m, selected) for m in column_masks]
+                null = _expand(null, selected)
+            for i, mask in zip(indices, column_masks):
+                exp_type = self.suite[i]["expectation_type"]
+                if history and column in history and exp_type == "expect_column_values_to_be_unique":
+                    mask = mask | (history[column] & ~null)
+                masks[i], nulls[i], rows[i] = mask, null, selected
+
+        for i in self.pairs:
+            kwargs = self.suite[i]["kwargs"]
+            missing = [c for c in (kwargs["column_A"], kwargs["column_B"]) if c not in df.columns]
+            if missing:
+                masks[i] = f"Колонка '{missing[0]}' отсутствует в данных"
+                continue
+            try:
+                with metrics.stage(f"pair:{kwargs['column_A']}>{kwargs['column_B']}", rows=len(df)):
+                    masks[i], nulls[i] = evaluate_pair(df[kwargs["column_A"]], df[kwargs["column_B"]], kwargs)
+            except TypeError as e:
+                masks[i] = f"Колонки {kwargs['column_A']}/{kwargs['column_B']}: {e}"
+                continue
+            rows[i] = None
+        return masks, nulls, rows
+
+    def validate(self, df: pd.DataFrame, history: dict = None, n_rows: int = None) -> dict:
+        """Выполняет набор за один проход по каждой колонке."""
+        n_rows = len(df) if n_rows is None else n_rows
+        masks, nulls, rows = self._evaluate(df, history)
+
+        results = []
+        for i, exp in enumerate(self.suite):
+            if i in self.table:
+                results.append(_table_result(exp, n_rows))
+            elif i in self.aggregates:
+                column = exp["kwargs"]["column"]
+                if column not in df.columns:
+                    results.append(_exception_result(exp, f"Колонка '{column}' отсутствует в данных"))
+                else:
+                    results.append(_contain_set_result(exp, df[column]))
+            elif i in self.unsupported:
+                results.append(_exception_result(
+                    exp, f"Ожидание {exp['expectation_type']} не поддерживается движком"))
+            elif isinstance(masks[i], str):
+                results.append(_exception_result(exp, masks[i]))
+            else:
+                kwargs = exp["kwargs"]
+                if i in self.pairs:
+                    values = df[[kwargs["column_A"], kwargs["column_B"]]]
+                else:
+                    values = df[kwargs["column"]]
+                selected = rows[i]
+                if selected is None:
+                    results.append(_column_result(exp, values, masks[i], nulls[i]))
+                else:
+                    results.append(_column_result(
+                        exp, values[selected], masks[i][selected], nulls[i][selected]))
+
+        n_success = sum(1 for r in results if r["success"])
+        return {
+            "success": n_success == len(results),
+            "results": results,
+            "statistics": {
+                "evaluated_expectations": len(results),
+                "successful_expectations": n_success,
+                "unsuccessful_expectations": len(results) - n_success,
+                "success_percent": 100.0 * n_success / len(results) if results else 100.0,
+            },
+        }
+
+
+def validate_dataframe(df: pd.DataFrame, suite: list) -> dict:
+    """Компилирует набор ожиданий и проверяет DataFrame."""
+    return CompiledSuite(suite).validate(df)
+
+
+# ============================================================
+# Проверки одной колонки
+# ============================================================
+
+def evaluate_column(series: pd.Series, checks: list) -> tuple:
+    """Маски нарушений для всех ожиданий одной колонки (в порядке checks)
+    и маска NULL."""
+    types = {c["expectation_type"] for c in checks}
+    values = _comparable(series)
+    monotonic = isinstance(values, np.ndarray) and _strictly_increasing(values)
+
+    codes = uniques = None
+    if "expect_column_values_to_be_in_set" in types or (
+            "expect_column_values_to_be_unique" in types and not monotonic):
+        codes, uniques = pd.factorize(series, use_na_sentinel=True)
+        # NULL получают код -1 — отдельный проход isna() не нужен
+        null = codes < 0
+    else:
+        null = series.isna().to_numpy()
+
+    masks = []
+    for check in checks:
+        exp_type = check["expectation_type"]
+        kwargs = check["kwargs"]
+        if exp_type == "expect_column_values_to_not_be_null":
+            masks.append(null)
+        elif exp_type == "expect_column_values_to_be_unique":
+            if monotonic:
+                # строго возрастающий ключ (типичный PK) — дубликатов нет
+                masks.append(np.zeros(len(series), dtype=bool))
+                continue
+            counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+            masks.append(_by_code(codes, counts > 1))
+        elif exp_type == "expect_column_values_to_be_in_set":
+            allowed = pd.Index(uniques).isin(kwargs["value_set"])
+            masks.append(_by_code(codes, ~allowed))
+        elif exp_type == "expect_column_values_to_be_between":
+            if isinstance(values, np.ndarray):
+                masks.append(~null & _outside(values, kwargs))
+            else:
+                # строки и даты сравниваются только среди непустых значений
+                mask = np.zeros(len(series), dtype=bool)
+                mask[~null] = _outside(values[~null], kwargs)
+                masks.append(mask)
+    return masks, null
+
+
+def evaluate_pair(a: pd.Series, b: pd.Series, kwargs: dict) -> tuple:
+    """Маска нарушений A > B (A >= B при or_equal) и маска строк, где одно
+    из значений пустое (такие строки, как ignore_row_if="any_value_is_missing"
+    в GX, не проверяются)."""
+    a, b = _pair_comparable(a), _pair_comparable(b)
+    null = (a.isna() | b.isna()).to_numpy()
+    ok = (a >= b) if kwargs.get("or_equal") else (a > b)
+    return ~ok.to_numpy(dtype=bool) & ~null, null
+
+
+def _pair_comparable(series: pd.Series) -> pd.Series:
+    """Строковые даты ('2026-02-10 08:45:00') сравниваются как даты."""
+    if series.dtype != object:
+        return series
+    parsed = pd.to_datetime(series, errors="coerce")
+    if (parsed.isna() & series.notna()).any():
+        raise TypeError("значения не приводятся к дате")
+    return parsed
+
+
+def _row_condition(df: pd.DataFrame, condition: str):
+    """Маска строк под row_condition (None — условия нет)."""
+    if condition is None:
+        return None
+    return df.eval(condition).to_numpy(dtype=bool)
+
+
+def _expand(mask: np.ndarray, selected: np.ndarray) -> np.ndarray:
+    """Маска подмножества строк → маска всей таблицы."""
+    full = np.zeros(len(selected), dtype=bool)
+    full[selected] = mask
+    return full
+
+
+def _by_code(codes: np.ndarray, flags: np.ndarray) -> np.ndarray:
+    """Переносит признак уникального значения на строки (NULL — не нарушение)."""
+    if len(flags) == 0:
+        return np.zeros(len(codes), dtype=bool)
+    return np.where(codes >= 0, flags[np.maximum(codes, 0)], False)
+
+
+def _strictly_increasing(values: np.ndarray) -> bool:
+    return len(values) > 1 and bool(np.all(values[1:] > values[:-1]))
+
+
+def _comparable(series: pd.Series):
+    if pd.api.types.is_numeric_dtype(series) and not pd.api.types.is_bool_dtype(series):
+        return series.to_numpy(dtype=np.float64, na_value=np.nan)
+    return series
+
+
+def _outside(values, kwargs: dict) -> np.ndarray:
+    lo, hi = kwargs.get("min_value"), kwargs.get("max_value")
+    mask = np.zeros(len(values), dtype=bool)
+    with np.errstate(invalid="ignore"):
+        if lo is not None:
+            below = values <= lo if kwargs.get("strict_min") else values < lo
+            mask |= np.asarray(below, dtype=bool)
+        if hi is not None:
+            above = values >= hi if kwargs.get("strict_max") else values > hi
+            mask |= np.asarray(above, dtype=bool)
+    return mask
+
+
+# ============================================================
+# Результаты в формате GX
+# ============================================================
+
+def _config(exp: dict) -> dict:
+    config = {"expectation_type": exp["expectation_type"], "kwargs": dict(exp["kwargs"])}
+    if "meta" in exp:
+        config["meta"] = dict(exp["meta"])
+    return config
+
+
+def _column_result(exp: dict, series, mask: np.ndarray, null: np.ndarray) -> dict:
+    """series — колонка или (для пары колонок) DataFrame из двух колонок."""
+    n = len(series)
+    n_missing = int(null.sum())
+    n_unexpected = int(mask.sum())
+    # как в GX: для not_null доля считается от всех строк, для остальных — от непустых
+    if exp["expectation_type"] == "expect_column_values_to_not_be_null":
+        base = n
+    else:
+        base = n - n_missing
+    mostly = exp["kwargs"].get("mostly", 1.0)
+    success = n_unexpected == 0 if mostly >= 1.0 else (
+        base == 0 or 1 - n_unexpected / base >= mostly)
+
+    index = np.flatnonzero(mask)[:PARTIAL_UNEXPECTED_COUNT]
+    partial = series.iloc[index]
+    if isinstance(partial, pd.DataFrame):
+        values = list(partial.itertuples(index=False, name=None))
+    else:
+        values = [None if pd.isna(v) else v for v in partial.tolist()]
+    return {
+        "success": bool(success),
+        "expectation_config": _config(exp),
+        "result": {
+            "element_count": n,
+            "missing_count": n_missing,
+            "missing_percent": 100.0 * n_missing / n if n else None,
+            "unexpected_count": n_unexpected,
+            "unexpected_percent": 100.0 * n_unexpected / base if base else None,
+            "partial_unexpected_list": values,
+            "partial_unexpected_index_list": partial.index.tolist(),
+        },
+        "exception_info": {"raised_exception": False, "exception_message": None},
+    }
+
+
+def _table_result(exp: dict, n_rows: int) -> dict:
+    lo, hi = exp["kwargs"].get("min_value"), exp["kwargs"].get("max_value")
+    success = (lo is None or n_rows >= lo) and (hi is None or n_rows <= hi)
+    return {
+        "success": bool(success),
+        "expectation_config": _config(exp),
+        "result": {"observed_value": n_rows},
+        "exception_info": {"raised_exception": False, "exception_message": None},
+    }
+
+
+def _contain_set_result(exp: dict, series: pd.Series) -> dict:
+    observed = pd.unique(series.dropna())
+    missing = [v for v in exp["kwargs"]["value_set"] if v not in set(observed.tolist())]
+    return {
+        "success": not missing,
+        "expectation_config": _config(exp),
+        "result": {"observed_value": sorted(map(str, observed)), "details": {"missing_values": missing}},
+        "exception_info": {"raised_exception": False, "exception_message": None},
+    }
+
+
+def _exception_result(exp: dict, message: str) -> dict:
+    return {
+        "success": False,
+        "expectation_config": _config(exp),
+        "result": {},
+        "exception_info": {"raised_exception": True, "exception_message": message},
+    }
@@ -0,0 +1,259 @@
+"""
+Практикум по анализу и моделированию данных
+Модуль 2 (доп.): Постоянный рабочий процесс профилирования и валидации
+Предприятие: «Руда+» — добыча железной руды
+
+Запуск каждого скрипта по расписанию платит одни и те же секунды:
+импорт ydata_profiling и great_expectations, gx.get_context(), сборку
+источников GX, компиляцию наборов ожиданий, открытие индексов ключей.
+WorkerDaemon делает это один раз и дальше держит в памяти:
+
+  - импортированные библиотеки (preload: "ydata", "gx");
+  - контекст GX и определения батчей (03_great_expectations.batch_definition);
+  - скомпилированные наборы (CompiledSuite) по датасетам;
+  - инкрементальные валидаторы (IncrementalValidator) с открытыми
+    индексами ключей — между заданиями вызывается только start_run().
+
+Задания приходят через multiprocessing.connection (сокет с authkey) —
+словарь {"job": вид, ...}; ответ — {"ok", "result" | "error", "seconds"}.
+Соединения обслуживаются в отдельных потоках, а сами задания выполняются
+по одному (общее состояние, контекст GX не потокобезопасен) — это и есть
+очередь заданий.
+
+Виды заданий:
+  ping         pid, время работы, что загружено
+  status       число заданий и задержки по видам
+  validate     {"dataset", "path" | "records", "backend"}: набор ожиданий
+  incremental  {"dataset", "path" | "records", "reset"}: 08 без запуска процесса
+  profile      {"dataset" | "path", "name", "title", "mode", "output"}: профиль
+  shutdown     остановить процесс
+
+Клиент — 11_worker.py. Пока процесс работает, каталоги состояния
+инкрементальной валидации принадлежат ему: не запускайте параллельно
+08_incremental_validation.py по тем же датасетам.
+"""
+
+import importlib
+import os
+import shutil
+import threading
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from datasets import DATA_DIR, ETL_CONFIG, SCHEMAS, apply_schema, read_csv_typed, read_options
+from expectation_suites import downtime_events_suite, equipment_suite, ore_production_suite, sensor_readings_suite
+from incremental_validation import INCREMENTAL_DATASETS, INCREMENTAL_DIR, IncrementalValidator, incremental_settings
+from profile_stats import DEFAULT_CHUNKSIZE, TableStats
+from profile_store import write_summary, write_ydata
+from validation_engine import CompiledSuite
+
+SCRIPT_DIR = Path(__file__).resolve().parent
+REPORTS_DIR = SCRIPT_DIR.parent / "reports"
+
+SUITES = {
+    "equipment": equipment_suite,
+    "sensor_readings": sensor_readings_suite,
+    "ore_production": ore_production_suite,
+    "downtime_events": downtime_events_suite,
+}
+
+# функции 03_great_expectations для бэкенда gx (у них свои имена источников)
+GX_VALIDATORS = {
+    "equipment": "validate_equipment",
+    "sensor_readings": "validate_sensor_readings",
+    "ore_production": "validate_ore_production",
+    "downtime_events": "validate_downtime_events",
+}
+
+
+def brief_result(result: dict) -> dict:
+    """Результат в формате GX → короткий ответ клиенту (без списков значений)."""
+    failed = []
+    for r in result["results"]:
+        if not r["success"]:
+            config = r["expectation_config"]
+            failed.append({"expectation": config["expectation_type"],
+                           "column": config.get("kwargs", {}).get("column", "table"),
+                           "unexpected_count": r["result"].get("unexpected_count")})
+    return {"success": bool(result["success"]), "statistics": result.get("statistics", {}),
+            "failed": failed}
+
+
+class WorkerDaemon:
+    """Состояние рабочего процесса и выполнение заданий."""
+
+    def __init__(self, preload: list = (), state_dir: Path = INCREMENTAL_DIR,
+                 config_path: Path = ETL_CONFIG):
+        self.started = time.time()
+        self.state_dir = Path(state_dir)
+        self.settings = incremental_settings(config_path)
+        self.suites = {name: CompiledSuite(suite()) for name, suite in SUITES.items()}
+        self.validators = {}
+        self.context = None
+        self.ge = None
+        self.stats = {}
+        self.lock = threading.Lock()
+        self.stopping = False
+        self.preloaded = []
+        for name in preload:
+            self.preload(name)
+
+    def preload(self, name: str):
+        if name == "ydata":
+            importlib.import_module("ydata_profiling")
+        elif name == "gx":
+            self._gx_context()
+        else:
+            raise ValueError(f"Неизвестная библиотека для preload: {name}")
+        self.preloaded.append(name)
+
+    def _gx_context(self):
+        if self.context is None:
+            # 03 лёгкий при импорте: great_expectations загружается в make_context
+            self.ge = importlib.import_module("03_great_expectations")
+            self.context = self.ge.make_context("gx")
+        return self.context
+
+    # --- выполнение ---
+
+    def handle(self, job: dict) -> dict:
+        """Выполняет задание; ошибка задания не останавливает процесс."""
+        kind = job.get("job")
+        started = time.perf_counter()
+        with self.lock:
+            try:
+                handler = getattr(self, f"job_{kind}", None)
+                if handler is None:
+                    raise ValueError(f"Неизвестное задание: {kind}")
+                reply = {"ok": True, "result": handler(job)}
+            except Exception as e:
+                reply = {"ok": False, "error": f"{type(e).__name__}: {e}"}
+            reply["seconds"] = time.perf_counter() - started
+            self.stats.setdefault(kind, []).append(reply["seconds"])
+        return reply
+
+    def _frame(self, job: dict, dataset: str) -> pd.DataFrame:
+        """Строки задания: records (список словарей) или CSV по path."""
+        if job.get("records") is not None:
+            return apply_schema(pd.DataFrame.from_records(job["records"]), dataset)
+        return read_csv_typed(Path(job.get("path") or DATA_DIR / f"{dataset}.csv"), dataset)
+
+    def job_ping(self, job: dict) -> dict:
+        return {"pid": os.getpid(), "uptime_seconds": round(time.time() - self.started, 3),
+                "preloaded": self.preloaded, "validators": sorted(self.validators)}
+
+    def job_status(self, job: dict) -> dict:
+        result = {}
+        for kind, times in self.stats.items():
+            ms = np.array(times) * 1000
+            result[kind] = {"jobs": len(ms), "median_ms": round(float(np.median(ms)), 2),
+                            "p99_ms": round(float(np.percentile(ms, 99)), 2),
+                            "max_ms": round(float(ms.max()), 2)}
+        return {"uptime_seconds": round(time.time() - self.started, 3), "jobs": result}
+
+    def job_validate(self, job: dict) -> dict:
+        dataset = job["dataset"]
+        df = self._frame(job, dataset)
+        if job.get("backend", "compiled") == "gx":
+            context = self._gx_context()
+            result = getattr(self.ge, GX_VALIDATORS[dataset])(context, df, "gx")
+        else:
+            result = self.suites[dataset].validate(df)
+        return {"rows": len(df), **brief_result(result)}
+
+    def job_incremental(self, job: dict) -> dict:
+        dataset = job["dataset"]
+        if dataset not in INCREMENTAL_DATASETS:
+            raise ValueError(f"Нет инкрементальной схемы для {dataset}")
+        if job.get("reset"):
+            self.validators.pop(dataset, None)
+            shutil.rmtree(self.state_dir / dataset, ignore_errors=True)
+        validator = self.validators.get(dataset)
+        if validator is None:
+            validator = self.validators[dataset] = IncrementalValidator(
+                dataset, self.state_dir, overlap_minutes=self.settings["overlap_minutes"],
+                batch_size=self.settings["batch_size"])
+        try:
+            validator.process(self._frame(job, dataset))
+            state = validator.commit()
+            result = validator.result()
+            return {"counts": dict(validator.counts), "watermark": state["watermark"],
+                    "n_rows": state["n_rows"], **brief_result(result)}
+        finally:
+            # и после ошибки следующий запуск начинается от сохранённого состояния
+            validator.start_run()
+
+    def job_profile(self, job: dict) -> dict:
+        dataset = job.get("dataset")
+        path = Path(job["path"]) if job.get("path") else DATA_DIR / f"{dataset}.csv"
+        name = job.get("name") or path.stem
+        title = job.get("title") or f"Руда+ | {name}"
+        report_path = Path(job.get("reports_dir") or REPORTS_DIR) / f"profile_{name}.html"
+        report_path.parent.mkdir(parents=True, exist_ok=True)
+        output = job.get("output", "stats")
+        options = read_options(dataset) if dataset in SCHEMAS else {}
+
+        if job.get("mode", "streaming") == "ydata":
+            from ydata_profiling import ProfileReport
+
+            df = pd.read_csv(path, **options)
+            profile = ProfileReport(df, title=title, minimal=job.get("minimal", True), progress_bar=False)
+            profile.get_description()
+            return {"rows": len(df), "files": [str(p) for p in write_ydata(profile, report_path, output)]}
+
+        stats = TableStats()
+        with pd.read_csv(path, chunksize=job.get("chunksize", DEFAULT_CHUNKSIZE), **options) as reader:
+            for chunk in reader:
+                stats.update(chunk)
+        written = write_summary(stats.summary(title), report_path, output)
+        return {"rows": stats.n_rows, "files": [str(p) for p in written]}
+
+    def job_shutdown(self, job: dict) -> dict:
+        self.stopping = True
+        return {"pid": os.getpid(), "jobs": sum(len(t) for t in self.stats.values())}
+
+    # --- сокет ---
+
+    def _serve_connection(self, conn, address, authkey: bytes):
+        with conn:
+            while not self.stopping:
+                try:
+                    job = conn.recv()
+                except (EOFError, OSError):
+                    return
+                conn.send(self.handle(job))
+        # accept() в главном потоке ждёт соединения — будим его, чтобы он увидел stopping
+        Client(address, authkey=authkey).close()
+
+    def serve(self, address, authkey: bytes, on_ready=None):
+        """Принимает соединения, пока не придёт задание shutdown.
+
+        address — (хост, порт) или путь Unix-сокета. Сокет, оставшийся
+        от упавшего процесса, удаляется; если по нему отвечают — процесс
+        уже запущен, и второй не стартует.
+        """
+        if isinstance(address, str) and os.path.exists(address):
+            try:
+                Client(address, authkey=authkey).close()
+            except (ConnectionRefusedError, AuthenticationError, EOFError):
+                os.unlink(address)
+            else:
+                raise RuntimeError(f"Рабочий процесс уже слушает {address}")
+        with Listener(address, authkey=authkey) as listener:
+            if on_ready:
+                on_ready(listener.address)
+            while not self.stopping:
+                try:
+                    conn = listener.accept()
+                except (OSError, AuthenticationError):
+                    continue  # клиент с чужим authkey или оборванное соединение
+                if self.stopping:
+                    conn.close()
+                    break
+                threading.Thread(target=self._serve_connection,
+                                 args=(conn, listener.address, authkey), daemon=True).start()
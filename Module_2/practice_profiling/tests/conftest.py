@@ -0,0 +1,6 @@
+"""Скрипты практикума импортируются как модули из scripts/."""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "scripts"))
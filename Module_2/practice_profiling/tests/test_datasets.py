@@ -0,0 +1,30 @@
+"""Схемы датасетов: измерения не теряют точность (datasets.py)."""
+
+import pandas as pd
+
+from datasets import DATA_DIR, SCHEMAS, apply_schema, load_dataset, memory_mb
+from expectation_suites import between
+from validation_engine import validate_dataframe
+
+
+def test_range_checked_measurements_keep_precision():
+    df = apply_schema(pd.DataFrame({"fe_content_pct": ["99.5", "100.00001"]}), "ore_production")
+
+    assert df["fe_content_pct"].iloc[1] > 100
+    results = validate_dataframe(df, [between("fe_content_pct", min_value=0, max_value=100)])
+    assert not results["results"][0]["success"]
+
+
+def test_loaded_frames_dtypes_and_memory(tmp_path):
+    for name in SCHEMAS:
+        plain = pd.read_csv(DATA_DIR / f"{name}.csv")
+        # первый вызов разбирает CSV, второй читает кэш Feather
+        for df in (load_dataset(name, cache_dir=tmp_path), load_dataset(name, cache_dir=tmp_path)):
+            dtypes = {column: str(dtype) for column, dtype in df.dtypes.items()}
+            assert "float32" not in dtypes.values(), name
+            assert "object" not in dtypes.values(), (name, dtypes)
+            assert memory_mb(df) < memory_mb(plain), name
+
+    df = load_dataset("sensor_readings", cache_dir=tmp_path)
+    assert df["reading_id"].dtype == pd.StringDtype("pyarrow")
+    assert df["reading_value"].dtype == "float64"
@@ -0,0 +1,20 @@
+"""Диапазоны параллельного профилирования (db_profiling.py)."""
+
+from db_profiling import histogram_cuts
+
+
+def test_numeric_histogram_bounds_keep_column_order():
+    bounds = ["1", "990", "1010", "2000", "100000"]
+
+    cuts = histogram_cuts(bounds, 4)
+
+    # как строки они бы отсортировались в 100000, 1010, 2000, 990
+    assert cuts == ["990", "1010", "2000"]
+    numbers = [float(c) for c in cuts]
+    assert numbers == sorted(numbers)
+
+
+def test_repeated_bounds_are_dropped():
+    bounds = ["1", "5", "5", "5", "5", "9", "12"]
+
+    assert histogram_cuts(bounds, 6) == ["5", "9"]
@@ -0,0 +1,12 @@
+"""Колонки базового профиля дрейфа (drift.py)."""
+
+from drift import KEY_COLUMNS, drift_columns
+
+
+def test_key_columns_are_not_compared():
+    columns = drift_columns("ore_production")
+
+    assert not KEY_COLUMNS & set(columns)
+    assert columns["tonnage_extracted"] == "Numeric"
+    assert columns["ore_type"] == "Categorical"
+    assert "production_id" not in columns
@@ -0,0 +1,21 @@
+"""Правила качества etl_config.json на данных Модуля 1 (expectation_suites.py)."""
+
+import json
+
+import pandas as pd
+
+from datasets import DATA_DIR, ETL_CONFIG
+from expectation_suites import quality_rule_suite
+from validation_engine import CompiledSuite
+
+
+def test_sensor_ranges_pass_on_clean_readings():
+    config = json.loads(ETL_CONFIG.read_text(encoding="utf-8"))
+    suite = [exp for exp in quality_rule_suite(config, "sensor_readings")
+             if exp["meta"]["rule_id"] == "QR-007"]
+    df = pd.read_csv(DATA_DIR / "sensor_readings.csv")
+
+    results = CompiledSuite(suite).validate(df)["results"]
+
+    assert len(results) > 1
+    assert [r["expectation_config"]["kwargs"] for r in results if not r["success"]] == []
@@ -0,0 +1,27 @@
+"""Ключи узлов графа при коллизии 64-битных хешей (graph_index.py)."""
+
+import numpy as np
+
+import graph_index
+from graph_index import NodeKeys
+
+
+def test_colliding_keys_stay_distinct(monkeypatch):
+    # два хеша на все ключи — почти каждая пара ключей коллизирует
+    real = graph_index._hashes
+    monkeypatch.setattr(graph_index, "_hashes", lambda keys: real(keys) % np.uint64(2))
+
+    keys = NodeKeys(["EQ-001", "EQ-002", "EQ-003", "EQ-002", "EQ-004", "EQ-001"])
+
+    assert len(keys) == 4
+    assert keys.rows.tolist() == [0, 1, 2, 4]
+    assert keys.lookup(["EQ-004", "EQ-001", "EQ-005", "EQ-003", "EQ-002"]).tolist() == [3, 0, -1, 2, 1]
+
+
+def test_lookup_without_collisions():
+    keys = NodeKeys([f"EQ-{i:04d}" for i in range(3000)])
+
+    assert keys.rows is None
+    ids = keys.lookup([f"EQ-{i:04d}" for i in range(2999, -1, -1)] + ["EQ-9999"])
+    assert ids[:-1].tolist() == list(range(2999, -1, -1))
+    assert ids[-1] == -1
@@ -0,0 +1,26 @@
+"""Инкрементальная валидация: строки без метки времени (incremental_validation.py)."""
+
+import pandas as pd
+
+from expectation_suites import not_null
+from incremental_validation import IncrementalValidator
+
+
+def test_undated_rows_are_checked_once(tmp_path):
+    df = pd.DataFrame({
+        "production_id": ["PRD-1", "PRD-2", "PRD-3"],
+        "production_date": pd.to_datetime(["2026-02-10", None, "2026-02-11"]),
+        "tonnage_extracted": [10.0, 20.0, 30.0],
+    })
+    validator = IncrementalValidator("ore_production", tmp_path, suite=[not_null("production_date")])
+    validator.process(df)
+    state = validator.commit()
+    assert state["null_keys"] == ["PRD-2"]
+
+    validator = IncrementalValidator("ore_production", tmp_path, suite=[not_null("production_date")])
+    validator.process(df)
+    assert validator.counts["validated"] == 0
+    # PRD-1 старше watermark, PRD-2 без метки времени уже проверена,
+    # PRD-3 в окне перекрытия — повторная доставка
+    assert validator.counts["skipped"] == 2
+    assert validator.counts["redelivered"] == 1
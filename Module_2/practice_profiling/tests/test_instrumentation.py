@@ -0,0 +1,21 @@
+"""Метрики monitoring по времени событий (instrumentation.py)."""
+
+import pandas as pd
+
+from instrumentation import Metrics
+
+
+def test_lag_and_freshness_follow_event_time():
+    metrics = Metrics("test", {"streaming_lag_seconds": {"threshold": 60}})
+    metrics.observe_events(pd.Timestamp.now(tz="UTC") - pd.Timedelta(seconds=120))
+    # метка без зоны — местное время, как в CSV Модуля 1
+    metrics.observe_freshness(pd.Timestamp.now() - pd.Timedelta(minutes=10))
+    for _ in metrics.chunks([[1, 2], [3]]):
+        pass
+
+    values = metrics.etl_metrics()
+    assert 119 <= values["streaming_lag_seconds"]["value"] < 130
+    assert values["streaming_lag_seconds"]["alert"]
+    assert 9.9 <= values["etl_data_freshness_minutes"]["value"] < 10.5
+    assert values["ruda_chunk_seconds_max"]["value"] < 1
+    assert not values["ruda_chunk_seconds_max"]["alert"]
@@ -0,0 +1,20 @@
+"""Сливаемая статистика профиля (profile_stats.py)."""
+
+import numpy as np
+import pandas as pd
+
+from profile_stats import CorrelationStats
+
+
+def test_correlation_keeps_precision_with_large_means():
+    rng = np.random.default_rng(0)
+    a = rng.normal(size=10_000)
+    df = pd.DataFrame({"a": a + 1e9, "b": 0.5 * a + rng.normal(size=10_000) - 3e8})
+    df.loc[::7, "b"] = np.nan
+
+    stats = CorrelationStats(["a", "b"])
+    for start in range(0, len(df), 1000):
+        stats.update(df.iloc[start:start + 1000])
+
+    r = stats.pearson()["matrix"][0][1]
+    assert abs(r - df["a"].corr(df["b"])) < 1e-6
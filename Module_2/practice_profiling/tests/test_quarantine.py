@@ -0,0 +1,55 @@
+"""Карантин строк: повтор ключа в другом пакете (quarantine.py)."""
+
+import pandas as pd
+
+from expectation_suites import between, unique
+from quarantine import FAILED_RULES, QuarantineSplitter, quarantine_file
+
+SUITE = [
+    unique("production_id"),
+    between("tonnage_extracted", min_value=0),
+]
+
+
+def test_duplicate_split_across_batches():
+    splitter = QuarantineSplitter(SUITE)
+    first = pd.DataFrame({"production_id": [1, 2, 3], "tonnage_extracted": [10.0, 20.0, 30.0]})
+    second = pd.DataFrame({"production_id": [4.0, 2.0, None], "tonnage_extracted": [40.0, 50.0, 60.0]})
+
+    clean, quarantined = splitter.split(first)
+    assert len(quarantined) == 0
+
+    clean, quarantined = splitter.split(second)
+    assert quarantined["production_id"].tolist() == [2.0]
+    assert quarantined[FAILED_RULES].iloc[0] == "be_unique:production_id"
+    assert clean["production_id"].tolist()[:1] == [4.0]
+    assert splitter.summary()["n_quarantined"] == 1
+
+
+def test_quarantine_file_chunks(tmp_path):
+    source = tmp_path / "ore_production.csv"
+    pd.DataFrame({"production_id": [1, 2, 3, 4, 1, 5],
+                  "tonnage_extracted": [1.0, 2.0, 3.0, -4.0, 5.0, 6.0]}).to_csv(source, index=False)
+
+    summary = quarantine_file(source, SUITE, tmp_path / "out", fmt="csv", chunksize=2)
+
+    quarantined = pd.read_csv(summary["quarantine"])
+    assert quarantined["production_id"].tolist() == [4, 1]
+    assert summary["n_clean"] == 4
+    assert len(pd.read_csv(summary["clean"])) == 4
+
+
+def test_history_runs_are_merged():
+    splitter = QuarantineSplitter(SUITE)
+    for start in range(0, 100, 5):
+        ids = list(range(start, start + 5))
+        splitter.split(pd.DataFrame({"production_id": ids, "tonnage_extracted": [1.0] * 5}))
+
+    runs = splitter.seen["production_id"]
+    assert len(runs) < 20
+    assert sum(len(run) for _, run in runs) == 100
+
+    clean, quarantined = splitter.split(pd.DataFrame({"production_id": [3, 97, 100],
+                                                      "tonnage_extracted": [1.0] * 3}))
+    assert quarantined["production_id"].tolist() == [3, 97]
+    assert clean["production_id"].tolist() == [100]
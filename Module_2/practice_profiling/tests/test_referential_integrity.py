@@ -0,0 +1,15 @@
+"""Ссылочная целостность QR-003 на данных Модулей 1 и 2 (referential_integrity.py)."""
+
+from datasets import DATA_DIR, ETL_CONFIG
+from referential_integrity import check_files, load_config
+
+REFERENCE_DIR = DATA_DIR.parent.parent.parent / "Module_2" / "practice" / "data"
+
+
+def test_module1_keys_match_reference_tables():
+    results = {(r["child"], r["parent"]): r for r in check_files(load_config(ETL_CONFIG), [DATA_DIR, REFERENCE_DIR])}
+
+    # MINE-1 в Модуле 1 и MINE-01 в справочнике — один ключ
+    assert results[("equipment", "mines")]["n_orphans"] == 0
+    assert results[("ore_production", "mines")]["n_orphans"] == 0
+    assert results[("sensor_readings", "equipment")]["status"] == "checked"
@@ -0,0 +1,43 @@
+"""Агрегаты телеметрии: сбой посреди загрузки (rollups.py)."""
+
+import pandas as pd
+import pytest
+
+import rollups
+from rollups import RollupStore, synthetic_readings
+
+
+def test_crash_between_raw_and_rollups_is_not_counted_twice(tmp_path, monkeypatch):
+    first = synthetic_readings(600, n_series=6, interval_seconds=3600, start="2025-03-30")
+    # вторая порция — апрель и май: сбой после слияния первого месяца
+    second = synthetic_readings(600, n_series=6, interval_seconds=3600, start="2025-04-28", seed=7)
+
+    store = RollupStore(tmp_path)
+    store.refresh(first, "first.csv", "a")
+
+    merge = RollupStore._merge_month
+    calls = []
+
+    def crash(self, grain, month, partial):
+        calls.append(month)
+        if len(calls) > 1:
+            raise RuntimeError("сбой")
+        merge(self, grain, month, partial)
+
+    monkeypatch.setattr(RollupStore, "_merge_month", crash)
+    with pytest.raises(RuntimeError):
+        store.refresh(second, "second.csv", "b")
+    monkeypatch.undo()
+
+    store = RollupStore(tmp_path)
+    assert not store.seen("b")
+    store.refresh(second, "second.csv", "b")
+
+    total = len(first) + len(second)
+    assert sum(len(store.read_raw(month)) for month in store.months()) == total
+    for grain in ("hourly", "daily"):
+        rows = store.read(grain, "2025-03-01", "2025-06-01")
+        assert rows["reading_count"].sum() == total
+        expected = rollups.rollup(pd.concat([first, second], ignore_index=True), grain)
+        assert rows["avg_value"].sum() == pytest.approx(expected["avg_value"].sum())
+    assert store.state["pending"] is None
@@ -0,0 +1,42 @@
+"""Оконные агрегации: первый пакет не по порядку (stream_windows.py)."""
+
+import pandas as pd
+
+from stream_windows import WindowAggregator, load_config, window_specs
+
+
+def events(*stamps):
+    return pd.DataFrame({
+        "event_id": [f"EVT-{i}" for i in range(len(stamps))],
+        "event_timestamp": pd.to_datetime(list(stamps)),
+        "equipment_id": "EQ-001",
+        "event_type": "temperature",
+        "sensor_value": 80.0,
+        "unit": "C",
+        "quality_flag": "good",
+    })
+
+
+def test_event_after_watermark_in_later_batch_is_not_late():
+    aggregator = WindowAggregator(window_specs(load_config()), lateness_ms=60_000)
+    aggregator.process(events("2025-03-15 08:00:30", "2025-03-15 08:00:40"))
+    assert aggregator.summary()["watermark"] == "2025-03-15 07:59:40"
+
+    aggregator.process(events("2025-03-15 07:59:50"))
+    closed = aggregator.flush()
+
+    assert all(n == 0 for n in aggregator.summary()["n_late"].values())
+    windows = set(zip(closed["window_type"], closed["window_start"].astype(str), closed["window_end"].astype(str)))
+    assert ("tumbling_5min", "2025-03-15 07:55:00", "2025-03-15 08:00:00") in windows
+    assert ("tumbling_1h", "2025-03-15 07:00:00", "2025-03-15 08:00:00") in windows
+    assert ("sliding_10min", "2025-03-15 07:50:00", "2025-03-15 08:00:00") in windows
+    hour = closed[closed["window_type"] == "tumbling_1h"]
+    assert hour["reading_count"].sum() == 3
+
+
+def test_event_before_watermark_is_late():
+    aggregator = WindowAggregator(window_specs(load_config()), lateness_ms=60_000)
+    aggregator.process(events("2025-03-15 08:00:30"))
+    aggregator.process(events("2025-03-15 07:40:00"))
+
+    assert aggregator.summary()["n_late"]["tumbling_5min"] == 1